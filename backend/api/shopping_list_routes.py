@@ -3,26 +3,33 @@ from backend.services import shopping_list_service
 
 router = APIRouter()
 
+# Every route takes the owner of the list as user_id (query string, or in
+# the JSON body for POSTs); without one it is the household's default list.
+
 @router.post("/shopping-list/add")
-async def add_to_list(request: Request):
+async def add_to_list(request: Request, user_id: str = shopping_list_service.DEFAULT_OWNER):
     data = await request.json()
     items_text = data.get("items", "")
-    result = shopping_list_service.add_items_to_shopping_list(items_text)
+    user_id = data.get("user_id", user_id)
+    result = shopping_list_service.add_items_to_shopping_list(items_text, user_id)
     return {"message": result}
 
 @router.get("/shopping-list")
-async def get_list():
-    result = shopping_list_service.get_shopping_list()
+async def get_list(user_id: str = shopping_list_service.DEFAULT_OWNER):
+    result = shopping_list_service.get_shopping_list(user_id)
     return {"shopping_list": result}
 
 @router.post("/shopping-list/clear")
-async def clear_list():
-    result = shopping_list_service.clear_shopping_list()
+async def clear_list(request: Request, user_id: str = shopping_list_service.DEFAULT_OWNER):
+    data = await request.json() if await request.body() else {}
+    user_id = data.get("user_id", user_id)
+    result = shopping_list_service.clear_shopping_list(user_id)
     return {"message": result}
 
 @router.post("/shopping-list/remove")
-async def remove_item(request: Request):
+async def remove_item(request: Request, user_id: str = shopping_list_service.DEFAULT_OWNER):
     data = await request.json()
     item_text = data.get("item", "")
-    result = shopping_list_service.remove_item_from_shopping_list(item_text)
+    user_id = data.get("user_id", user_id)
+    result = shopping_list_service.remove_item_from_shopping_list(item_text, user_id)
     return {"message": result}
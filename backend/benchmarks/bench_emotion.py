@@ -0,0 +1,83 @@
+"""
+bench_emotion.py
+
+Emotion detection on the logged turns: the substring scan the engine used
+before (up to six any(word in text ...) passes per turn) against the
+compiled lexicon (one walk over the turn's tokens), one text at a time and
+through detect_batch() for log analytics.
+
+Also reports accuracy on the labelled fixtures in
+tests/test_emotion_lexicon.py, and how many logged turns the old scan
+called emotional that the lexicon does not (substring hits such as
+"down" in "download").
+
+Both paths start from an Utterance, as the turn pipeline hands them one,
+so tokenizing is not counted for either.
+
+Run from backend/:
+    python -m benchmarks.bench_emotion
+    python -m benchmarks.bench_emotion --repeat 3
+"""
+
+import argparse
+import time
+from collections import Counter
+
+from benchmarks.bench_replay import load_turns
+from chapo_engines.emotion_lexicon import get_lexicon
+from chapo_engines.utterance import Utterance
+from tests.test_emotion_lexicon import LABELLED
+
+OLD_WORDS = [
+    ("sad", ["sad", "depressed", "unhappy", "lonely", "down", "blue"]),
+    ("happy", ["happy", "excited", "glad", "joyful", "great", "awesome"]),
+    ("angry", ["angry", "mad", "furious", "upset", "pissed"]),
+    ("tired", ["tired", "sleepy", "exhausted", "fatigued", "drained"]),
+    ("anxious", ["anxious", "worried", "nervous", "stressed", "panicky"]),
+]
+
+
+def old_label(text):
+    lowered = Utterance.of(text).lowered
+    for emotion, words in OLD_WORDS:
+        if any(word in lowered for word in words):
+            return emotion
+    return "neutral"
+
+
+def timed(run, texts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(texts)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def accuracy(label):
+    return sum(label(text) == expected for text, expected in LABELLED) / len(LABELLED)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="substring scan vs compiled emotion lexicon")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lexicon = get_lexicon()
+    texts = [Utterance(t["text"]) for t in load_turns()]
+    if not texts:
+        raise SystemExit("no logged turns found")
+    get_lexicon().detect_batch(texts[:1])  # numpy import out of the timing
+
+    old = timed(lambda ts: [old_label(t) for t in ts], texts, args.repeat)
+    one = timed(lambda ts: [lexicon.label(t) for t in ts], texts, args.repeat)
+    batch = timed(lexicon.detect_batch, texts, args.repeat)
+    print(f"{len(texts)} logged turns")
+    for name, elapsed in [("substring scan", old), ("lexicon label()", one), ("lexicon detect_batch()", batch)]:
+        print(f"  {name:<24} {elapsed * 1e3:8.1f} ms   {len(texts) / elapsed:>10,.0f} turns/s")
+
+    before, after = [old_label(t) for t in texts], lexicon.detect_batch(texts)[0]
+    dropped = Counter(b for b, a in zip(before, after) if b != "neutral" and a == "neutral")
+    print(f"  old scan emotional, lexicon neutral: {sum(dropped.values())} {dict(dropped)}")
+    print(f"accuracy on {len(LABELLED)} labelled fixtures: substring scan {accuracy(old_label):.0%}, "
+          f"lexicon {accuracy(lexicon.label):.0%}")
@@ -0,0 +1,162 @@
+"""
+bench_event_store.py
+
+Dashboard query latency on 10M synthetic interactions in a local mongod:
+the old layout (one document per event in `logs`, no indexes, as
+save_interaction / log_to_mongo wrote it) against db/event_store.py
+(per-session minute buckets, hourly rollups).
+
+Seeds both layouts with the same events (buckets are inserted prebuilt,
+not through the per-event upsert, so seeding takes minutes, not hours),
+runs the rollup over the whole range and times each query (median of
+--runs):
+    hourly intent counts, last 24 h      logs $group  vs  rollups find
+    hourly intent counts, last 30 days   logs $group  vs  rollups find
+    top intents, last 7 days             logs $group  vs  totals() over rollups
+    latest 10 turns of one session       logs sort    vs  recent()
+
+Needs a throwaway mongod (the database named by --db is dropped first):
+    docker run -d -p 27017:27017 mongo:7
+
+Run from backend/:
+    python -m benchmarks.bench_event_store
+    python -m benchmarks.bench_event_store --events 1000000 --runs 5
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from db.event_store import EMOTIONS, INTERACTIONS, EventStore, field_key, minute_of
+
+INTENTS = ["get_weather", "set_alarm", "play_music", "tell_joke", "get_news", "add_to_shopping_list",
+           "set_reminder", "play_trivia", "greet", "small_talk"]
+EMOTION_NAMES = ["happy", "neutral", "sad", "angry", "surprise"]
+BATCH = 5000
+
+
+def synthetic_minutes(events, sessions, days, end, seed=0):
+    """(session_id, minute, [event, ...]) until `events` events, over `days` days before `end`."""
+    rng = random.Random(seed)
+    weights = [rng.random() for _ in INTENTS]
+    span = days * 1440
+    made = 0
+    while made < events:
+        n = min(events - made, rng.randint(1, 24))
+        minute = minute_of(end - timedelta(minutes=rng.randrange(span)))
+        session_id = f"user_{rng.randrange(sessions)}"
+        batch = []
+        for second in sorted(rng.sample(range(60), n)):
+            intent = rng.choices(INTENTS, weights)[0]
+            batch.append({"timestamp": minute + timedelta(seconds=second), "intent": intent,
+                          "user_input": f"synthetic {intent}", "response": "ok", "confidence": round(rng.random(), 2)})
+        made += n
+        yield session_id, minute, batch
+
+
+def seed(db, args, end):
+    expires = datetime.utcnow() + timedelta(days=1)  # the seeded past must outlive the run
+    flat, buckets = [], []
+    start = time.perf_counter()
+    for session_id, minute, batch in synthetic_minutes(args.events, args.sessions, args.days, end):
+        intents = {}
+        for event in batch:
+            intents[field_key(event["intent"])] = intents.get(field_key(event["intent"]), 0) + 1
+            flat.append(dict(event, session_id=session_id))
+        buckets.append({"session_id": session_id, "start": minute, "count": len(batch), "events": batch,
+                        "intents": intents, "first": batch[0]["timestamp"], "last": batch[-1]["timestamp"],
+                        "expires_at": expires})
+        if len(flat) >= BATCH:
+            db.logs.insert_many(flat, ordered=False)
+            db[INTERACTIONS].insert_many(buckets, ordered=False)
+            flat, buckets = [], []
+    if flat:
+        db.logs.insert_many(flat, ordered=False)
+        db[INTERACTIONS].insert_many(buckets, ordered=False)
+
+    rng = random.Random(1)
+    camera = []
+    for m in range(args.days * 1440):  # the face pipeline: one bucket per minute
+        minute = minute_of(end - timedelta(minutes=m))
+        counts = {e: rng.randint(0, 120) for e in EMOTION_NAMES}
+        camera.append({"session_id": "camera", "start": minute, "count": 60, "counts": counts,
+                       "samples": sum(counts.values()), "expires_at": expires})
+    db[EMOTIONS].insert_many(camera, ordered=False)
+    print(f"  seeded {args.events:,} events: {db.logs.estimated_document_count():,} log documents, "
+          f"{db[INTERACTIONS].estimated_document_count():,} buckets in {time.perf_counter() - start:.0f}s")
+
+
+def flat_hourly(db, start, end):
+    return list(db.logs.aggregate([
+        {"$match": {"timestamp": {"$gte": start, "$lt": end}}},
+        {"$group": {"_id": {"hour": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}, "intent": "$intent"},
+                    "n": {"$sum": 1}}},
+    ]))
+
+
+def flat_top(db, start, end):
+    return list(db.logs.aggregate([
+        {"$match": {"timestamp": {"$gte": start, "$lt": end}}},
+        {"$group": {"_id": "$intent", "n": {"$sum": 1}}},
+        {"$sort": {"n": -1}}, {"$limit": 5},
+    ]))
+
+
+def flat_recent(db, session_id):
+    return list(db.logs.find({"session_id": session_id}).sort("timestamp", -1).limit(10))
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="flat logs vs bucketed events + rollups in Mongo")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="chapo_bench")
+    parser.add_argument("--events", type=int, default=10_000_000)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri, serverSelectionTimeoutMS=2000)
+    client.drop_database(args.db)
+    db = client[args.db]
+    end = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    store = EventStore(db)
+    seed(db, args, end)
+
+    start = time.perf_counter()
+    store.rollup(end - timedelta(days=args.days), end + timedelta(hours=1))
+    print(f"  rollup of {args.days} days: {time.perf_counter() - start:.1f}s "
+          f"(scheduled runs redo the last 2 hours only)")
+
+    day, week, month = (end - timedelta(days=d) for d in (1, 7, args.days))
+    session_id = "user_7"
+    rows = [
+        ("hourly intents, 24 h", lambda: flat_hourly(db, day, end), lambda: store.hourly_counts("intent", day, end)),
+        (f"hourly intents, {args.days} d", lambda: flat_hourly(db, month, end),
+         lambda: store.hourly_counts("intent", month, end)),
+        ("top intents, 7 d", lambda: flat_top(db, week, end), lambda: store.top("intent", week, end)),
+        ("top emotions, 7 d", None, lambda: store.top("emotion", week, end)),
+        ("latest 10 turns, 1 session", lambda: flat_recent(db, session_id), lambda: store.recent(session_id)),
+    ]
+    print(f"median of {args.runs} runs:")
+    for label, old, new in rows:
+        new_s = timed(new, args.runs)
+        if old is None:
+            print(f"  {label:<28} {'':>14}   event store {new_s * 1e3:9.1f} ms")
+            continue
+        old_s = timed(old, args.runs)
+        print(f"  {label:<28} logs {old_s * 1e3:9.1f} ms   event store {new_s * 1e3:9.1f} ms   x{old_s / new_s:,.0f}")
+    client.close()
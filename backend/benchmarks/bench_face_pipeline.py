@@ -0,0 +1,68 @@
+"""
+bench_face_pipeline.py
+
+Achieved FPS and CPU use of facial emotion detection on a synthetic 30 FPS
+640x480 camera, headless: the old loop (detector on every full-size frame
+on the capture thread, one insert per face per frame) against
+FacePipeline at several detect-every-N settings.
+
+The detector is SyntheticDetector with --cost-ms of simulated inference
+(FER without MTCNN is tens of ms per 640x480 frame on a laptop CPU);
+inserts are simulated round trips of --insert-ms. CPU is process time of
+this process plus the detector worker, as a percentage of one core.
+
+Run from backend/:
+    python -m benchmarks.bench_face_pipeline
+    python -m benchmarks.bench_face_pipeline --seconds 10 --cost-ms 60
+"""
+
+import argparse
+import time
+
+from chapo_engines.face_pipeline import FacePipeline, SyntheticDetector, SyntheticSource
+
+
+def old_loop(source, detector, insert_s):
+    """realtime_emotion_detect.py before the pipeline, minus the window."""
+    detect = detector()
+    frames = faces = 0
+    cpu_start, start = time.process_time(), time.perf_counter()
+    for frame in source:
+        for result in detect(frame):
+            emotions = result["emotions"]
+            max(emotions, key=emotions.get)
+            time.sleep(insert_s)  # db.emotions.insert_one(...)
+            faces += 1
+        frames += 1
+    wall = time.perf_counter() - start
+    return {"fps": round(frames / wall, 1), "cpu_percent": round(100 * (time.process_time() - cpu_start) / wall, 1),
+            "detections": frames, "faces": faces, "dropped": 0}
+
+
+def report(label, stats):
+    print(f"  {label:<18} {stats['fps']:6.1f} FPS   CPU {stats['cpu_percent']:5.1f}%   "
+          f"{stats['detections']:4} detections   {stats['faces']:4} faces   {stats['dropped']:4} dropped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="old capture loop vs staged face pipeline")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--faces", type=int, default=2)
+    parser.add_argument("--cost-ms", type=float, default=40.0)
+    parser.add_argument("--insert-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    detector = SyntheticDetector(cost_s=args.cost_ms / 1000)
+
+    def source():
+        return SyntheticSource(seconds=args.seconds, faces=args.faces)
+
+    print(f"{args.seconds:g}s of 30 FPS 640x480, {args.faces} faces, detector {args.cost_ms:g} ms, "
+          f"insert {args.insert_ms:g} ms")
+    report("old loop", old_loop(source(), detector, args.insert_ms / 1000))
+    for every in (1, 3, 5, 10):
+        pipeline = FacePipeline(detector=detector, every=every, scale=0.5, write_many=lambda docs: None)
+        try:
+            report(f"pipeline every={every}", pipeline.run(source()))
+        finally:
+            pipeline.shutdown()
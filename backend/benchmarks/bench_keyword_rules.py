@@ -0,0 +1,131 @@
+"""
+bench_keyword_rules.py
+
+Per-turn cost of the voice loop's keyword fallbacks: the compiled rule
+table (chapo_engines/keyword_rules.py) against the old inline blocks of
+test_voice.handle_turn, which rebuilt every keyword list on each turn and
+scanned them one `in` at a time.
+
+Utterances come from the training CSV; each is run under a few NLU
+outcomes (no intent, unsure, confident) since the guards decide how many
+blocks even look at the text.
+
+Run from backend/:
+    python -m benchmarks.bench_keyword_rules
+    python -m benchmarks.bench_keyword_rules --repeat 20
+"""
+
+import argparse
+import csv
+import re
+import statistics
+import time
+from pathlib import Path
+
+from chapo_engines.keyword_rules import fallback_rules
+
+TRAINING_CSV = Path(__file__).resolve().parents[2] / "new_batch" / "chapo_mega_training_dataset.csv"
+NLU_OUTCOMES = [(None, 0.0), ("greeting", 0.5), ("help", 0.72), ("get_weather", 0.95)]
+
+
+def load_utterances(path=TRAINING_CSV):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row["uttrance"] for row in csv.DictReader(f) if row.get("uttrance")]
+
+
+def clean(text):
+    return re.sub(r'[^\w\s]', '', text.lower().strip())
+
+
+def legacy_fallbacks(cleaned_text, intent, confidence):
+    """The keyword fallback blocks of test_voice.handle_turn before the rule table, minus the prints."""
+    if (not intent or intent == "unknown" or confidence < 0.6):
+        news_keywords = ["news", "headlines", "updates", "latest news", "top news", "today's headlines"]
+        if any(word in cleaned_text for word in news_keywords):
+            intent = "get_news"
+
+    shopping_add = ["add", "buy", "put"]
+    shopping_remove = ["remove", "delete", "take off"]
+    shopping_clear = ["clear"]
+    shopping_check_phrases = [
+        "what is on", "whats on", "show", "list", "display", "read", "check", "tell me whats", "tell me what is"
+    ]
+    shopping_keywords = ["shopping list", "grocery list"]
+    if (not intent or intent == "unknown" or confidence < 0.7):
+        if any(add_word in cleaned_text for add_word in shopping_add) and any(kw in cleaned_text for kw in shopping_keywords):
+            intent = "add_to_shopping_list"
+        elif any(remove_word in cleaned_text for remove_word in shopping_remove) and any(kw in cleaned_text for kw in shopping_keywords):
+            intent = "remove_from_shopping_list"
+        elif any(clear_word in cleaned_text for clear_word in shopping_clear) and any(kw in cleaned_text for kw in shopping_keywords):
+            intent = "clear_shopping_list"
+        elif any(phrase in cleaned_text for phrase in shopping_check_phrases) and any(word in cleaned_text for word in shopping_keywords):
+            intent = "get_shopping_list"
+
+    if (not intent or intent == "unknown" or confidence < 0.6):
+        trivia_keywords = ["trivia", "quiz", "question", "fun fact", "let's play"]
+        if any(word in cleaned_text for word in trivia_keywords):
+            intent = "play_trivia"
+
+    alarm_keywords = [
+        "set alarm", "wake me", "alarm for", "remind me to wake", "alarm at", "wake up at",
+        "remind me to get up", "set an alarm", "please set alarm", "i want an alarm", "i need to wake"
+    ]
+    if (not intent or intent == "unknown" or confidence < 0.6) or any(word in cleaned_text for word in alarm_keywords):
+        if "alarm" in cleaned_text or any(word in cleaned_text for word in alarm_keywords):
+            intent = "set_alarm"
+
+    calendar_keywords = [
+        "add to calendar", "schedule", "put on calendar", "calendar event",
+        "add meeting", "schedule meeting", "put event", "calendar reminder", "log event"
+    ]
+    if (not intent or intent == "unknown" or confidence < 0.7):
+        if any(kw in cleaned_text for kw in calendar_keywords):
+            intent = "calendar_event"
+
+    if (not intent or confidence < 0.6) and "calorie" in cleaned_text:
+        intent = "calorie_info"
+
+    fact_keywords = [
+        "what is", "who is", "define", "tell me about", "where is",
+        "when did", "how many", "how much", "how big", "capital of",
+        "how far", "who invented", "explain"
+    ]
+    if (not intent or intent == "unknown" or confidence < 0.7):
+        if any(kw in cleaned_text for kw in fact_keywords):
+            intent = "get_fact"
+
+    math_keywords = [
+        "plus", "minus", "times", "divided", "multiply", "add", "subtract",
+        "+", "-", "*", "/", "=", "equals", "calculate", "mod", "sqrt", "over"
+    ]
+    if intent in ["unknown", "what_can_you_do", "help"] or confidence < 0.75:
+        if any(kw in cleaned_text for kw in fact_keywords + math_keywords):
+            intent = "get_fact"
+    return intent
+
+
+def _time(fn, cases, repeat):
+    per_turn = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text, intent, confidence in cases:
+            fn(text, intent, confidence)
+        per_turn.append((time.perf_counter() - start) / len(cases))
+    return min(per_turn), statistics.median(per_turn)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keyword fallback cost per turn: rule table vs inline blocks")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    utterances = [clean(u) for u in load_utterances()]
+    cases = [(u, intent, conf) for u in utterances for intent, conf in NLU_OUTCOMES]
+    rules = fallback_rules()
+
+    mismatches = sum(legacy_fallbacks(*case) != rules.resolve(*case)[0] for case in cases)
+    print(f"{len(utterances)} utterances x {len(NLU_OUTCOMES)} NLU outcomes = {len(cases)} turns, "
+          f"{mismatches} intent mismatches")
+    for label, fn in [("inline blocks", legacy_fallbacks), ("rule table", rules.resolve)]:
+        best, median = _time(fn, cases, args.repeat)
+        print(f"  {label:<14} best {best * 1e6:6.2f} us/turn   median {median * 1e6:6.2f} us/turn")
@@ -0,0 +1,73 @@
+"""
+bench_nlu_cascade.py
+
+Replays the logged utterances through the NLU cascade with Wit.ai stubbed
+by FakeWit (the answer Wit gave when the turn was logged, after --wit-ms of
+simulated network time) and reports, per stage:
+- share of turns it answered ("none" = no stage was confident),
+- how often it was called,
+- agreement with the intent recorded in the log,
+plus the remote calls avoided and mean NLU time per turn against calling
+Wit.ai on every turn.
+
+The recorded intent is what Wit said at the time, not a hand label, so
+"agreement" is parity with the old behaviour rather than accuracy.
+
+Run from backend/:
+    python -m benchmarks.bench_nlu_cascade
+    python -m benchmarks.bench_nlu_cascade --stages exact:0.9,local:0.7,wit:0.7 --wit-ms 0
+"""
+
+import argparse
+import os
+import time
+from collections import Counter
+
+os.environ.setdefault("CHAPO_TRACE_EXPORT", "none")
+
+from benchmarks.bench_replay import FakeWit, load_turns  # noqa: E402
+from chapo_engines.nlu_cascade import DEFAULT_STAGES, build_cascade  # noqa: E402
+
+
+def _label(intent):
+    return (intent or "none").split("$")[-1]
+
+
+def run(turns, spec, wit_ms):
+    wit = FakeWit(turns, wit_ms / 1000)
+    nlu = build_cascade(wit=wit, spec=spec)
+    answered, agreed = Counter(), Counter()
+    started = time.perf_counter()
+    for turn in turns:
+        prediction = nlu.resolve(turn["text"])
+        stage = prediction.stage if prediction.confident else "none"
+        answered[stage] += 1
+        agreed[stage] += _label(prediction.intent) == _label(turn["intent"])
+    elapsed = time.perf_counter() - started
+
+    stats = nlu.stats()
+    n = len(turns)
+    print(f"\nCascade {spec}  ({n} turns, Wit.ai stub {wit_ms:.0f} ms)")
+    print(f"  {'stage':<10} {'answered':>9} {'share':>7} {'calls':>7} {'agrees':>7}")
+    for stage in [s.name for s in nlu.stages] + ["none"]:
+        if not answered[stage] and stage not in stats["calls"]:
+            continue
+        share = 100 * answered[stage] / n
+        agree = 100 * agreed[stage] / answered[stage] if answered[stage] else 0.0
+        print(f"  {stage:<10} {answered[stage]:>9} {share:>6.1f}% {stats['calls'].get(stage, 0):>7} {agree:>6.1f}%")
+    print(f"  agreement with the logged intent: {100 * sum(agreed.values()) / n:.1f}%")
+    print(f"  remote calls: {stats['remote_calls']} of {n} turns ({stats['remote_avoided_pct']}% avoided)")
+    print(f"  mean NLU time per turn: {elapsed / n * 1000:.2f} ms "
+          f"(Wit.ai on every turn: >= {wit_ms:.0f} ms)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage shares and remote calls avoided by the NLU cascade")
+    parser.add_argument("--stages", default=DEFAULT_STAGES, help="cascade spec, as in CHAPO_NLU_STAGES")
+    parser.add_argument("--wit-ms", type=float, default=5.0, help="simulated Wit.ai round trip (real: ~150-400 ms)")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    turns = load_turns()[: args.limit]
+    run(turns, args.stages, args.wit_ms)
@@ -0,0 +1,379 @@
+"""
+bench_replay.py
+
+End-to-end replay benchmark: the utterances recorded in the session logs
+are pushed through route_intent() (and, with --target http, the FastAPI
+/text/ endpoint), with everything remote stubbed locally:
+- Wit.ai      -> the intent/confidence recorded with the utterance
+- WeatherAPI / NewsAPI -> canned JSON from a fake `requests.get`
+- MongoDB     -> an in-memory collection
+
+spaCy runs for real: it is local work and part of the turn cost.
+
+Per intent it reports throughput and p50/p95/p99 latency, plus a second,
+separate pass under tracemalloc for peak bytes allocated per turn and
+blocks still held afterwards (sys.getallocatedblocks). The per-stage span
+percentiles from chapo_engines.tracing are included as well.
+
+Results are written as JSON (--out). --compare <older.json> prints the
+deltas and exits 1 if p95 or throughput got worse than --threshold
+(default 20 %), so runs can be diffed in CI.
+
+Run from backend/:
+    python -m benchmarks.bench_replay
+    python -m benchmarks.bench_replay --target http --limit 500
+    python -m benchmarks.bench_replay --compare benchmarks/results/replay_20250824-101500.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+from collections import defaultdict
+from pathlib import Path
+
+# spans are still aggregated in memory, just not written to disk mid-benchmark
+os.environ.setdefault("CHAPO_TRACE_EXPORT", "none")
+
+BACKEND = Path(__file__).resolve().parent.parent
+SOURCES = [
+    BACKEND / "session_logs.json",
+    BACKEND.parent / "logs" / "session_logs.json",
+    BACKEND / "feedback_logs.json",
+]
+RESULTS = Path(__file__).resolve().parent / "results"
+ALLOC_SAMPLES = 25  # turns per intent in the tracemalloc pass
+COMPARE_MIN_N = 30  # intents seen fewer times than this are too noisy to flag
+
+
+# ---------- Recorded traffic ----------
+def load_turns(paths=SOURCES):
+    """Every logged turn with a non-empty utterance, in file order (one JSON object per line)."""
+    turns = []
+    for path in paths:
+        if not path.exists():
+            continue
+        kept = 0
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            text = (record.get("user_input") or "").strip()
+            if not text:
+                continue
+            turns.append({
+                "session_id": record.get("session_id") or "default",
+                "text": text,
+                "intent": record.get("intent"),
+                "confidence": record.get("confidence") or 0.0,
+            })
+            kept += 1
+        print(f"  {path.relative_to(BACKEND.parent)}: {kept} utterances")
+    return turns
+
+
+# ---------- Local stubs ----------
+class FakeWit:
+    """get_intent_from_wit() stand-in: answers with what Wit said when the turn was logged."""
+
+    def __init__(self, turns, latency=0.0):
+        self.answers = {t["text"]: (t["intent"], t["confidence"], {}) for t in turns}
+        self.latency = latency
+
+    def __call__(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.answers.get(text, (None, 0.0, {}))
+
+
+class _FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+        self.status_code = 200
+        self.ok = True
+        self.text = json.dumps(payload)
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+WEATHER = {"current": {"condition": {"text": "Partly cloudy"}, "temp_c": 18.0}}
+NEWS = {"articles": [{"title": f"Headline {i}", "source": {"name": "Replay"}} for i in range(1, 4)]}
+CHAT = {"choices": [{"message": {"content": "Replay fallback answer."}}]}
+
+
+def fake_requests(latency=0.0):
+    """A `requests` module stand-in: canned Weather/News JSON for get(), a GPT reply for post()."""
+
+    def get(url, params=None, timeout=None, **kwargs):
+        if latency:
+            time.sleep(latency)
+        return _FakeResponse(NEWS if "newsapi" in url else WEATHER)
+
+    def post(url, **kwargs):
+        if latency:
+            time.sleep(latency)
+        return _FakeResponse(CHAT)
+
+    return types.SimpleNamespace(get=get, post=post)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+
+    def insert_one(self, doc):
+        self.docs.append(doc)
+
+
+class FakeMongo:
+    def __init__(self):
+        self._collections = defaultdict(FakeCollection)
+
+    def __getattr__(self, name):
+        return self._collections[name]
+
+    def __getitem__(self, name):
+        return self._collections[name]
+
+
+def install_stubs(api_latency):
+    from chapo_engines import news_engine, weather_engine
+    from db import mongo
+
+    weather_engine.requests = fake_requests(api_latency)
+    news_engine.requests = fake_requests(api_latency)
+    mongo.db = FakeMongo()
+
+
+# ---------- Targets ----------
+def router_target(wit):
+    """Calls route_intent() in-process, the way the voice loop does."""
+    from intent import intent_router
+
+    intent_router.db = FakeMongo()
+
+    def call(turn):
+        intent, _, entities = wit(turn["text"])
+        intent_router.route_intent(intent, entities, turn["text"], turn["session_id"])
+
+    return call
+
+
+def http_target(wit):
+    """POSTs to /text/ through Starlette's TestClient (no sockets)."""
+    sys.path.insert(0, str(BACKEND.parent))
+    from fastapi.testclient import TestClient
+    try:
+        from backend.main import app
+        from backend.services import nlp
+    except Exception as e:
+        sys.exit(f"/text/ is not importable, cannot run the http target: {e!r}")
+
+    nlp.get_intent_from_wit = wit  # the cascade's remote stage
+    client = TestClient(app)
+
+    def call(turn):
+        resp = client.post("/text/", json={"user_input": turn["text"]})
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+
+    return call
+
+
+TARGETS = {"router": router_target, "http": http_target}
+
+
+# ---------- Measurement ----------
+def _pct(values, p):
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def _intent_key(turn):
+    return turn["intent"] or "none"
+
+
+def time_pass(call, turns):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    started = time.perf_counter()
+    for turn in turns:
+        start = time.perf_counter()
+        try:
+            call(turn)
+        except Exception:
+            errors[_intent_key(turn)] += 1
+            continue
+        latencies[_intent_key(turn)].append(time.perf_counter() - start)
+    return time.perf_counter() - started, latencies, errors
+
+
+def alloc_pass(call, turns, samples=ALLOC_SAMPLES):
+    """Peak bytes above the pre-turn baseline and net blocks retained, averaged per intent."""
+    seen = defaultdict(int)
+    peak = defaultdict(list)
+    retained = defaultdict(list)
+    tracemalloc.start()
+    try:
+        for turn in turns:
+            key = _intent_key(turn)
+            if seen[key] >= samples:
+                continue
+            seen[key] += 1
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            blocks = sys.getallocatedblocks()
+            try:
+                call(turn)
+            except Exception:
+                continue
+            peak[key].append(tracemalloc.get_traced_memory()[1] - baseline)
+            retained[key].append(sys.getallocatedblocks() - blocks)
+    finally:
+        tracemalloc.stop()
+    return {
+        key: {
+            "peak_kib": round(sum(peak[key]) / len(peak[key]) / 1024, 1),
+            "retained_blocks": round(sum(retained[key]) / len(retained[key]), 1),
+        }
+        for key in peak
+    }
+
+
+def summarize(elapsed, latencies, errors, allocs):
+    intents = {}
+    for key in sorted(set(latencies) | set(errors)):
+        values = sorted(latencies.get(key, []))
+        entry = {"n": len(values), "errors": errors.get(key, 0)}
+        if values:
+            entry.update({
+                "throughput_per_s": round(len(values) / sum(values), 1),
+                "p50_ms": round(_pct(values, 0.5) * 1000, 3),
+                "p95_ms": round(_pct(values, 0.95) * 1000, 3),
+                "p99_ms": round(_pct(values, 0.99) * 1000, 3),
+            })
+        entry.update(allocs.get(key, {}))
+        intents[key] = entry
+    everything = sorted(v for values in latencies.values() for v in values)
+    overall = {
+        "turns": len(everything),
+        "errors": sum(errors.values()),
+        "wall_s": round(elapsed, 3),
+        "throughput_per_s": round(len(everything) / elapsed, 1) if elapsed else None,
+    }
+    if everything:
+        overall.update({
+            "p50_ms": round(_pct(everything, 0.5) * 1000, 3),
+            "p95_ms": round(_pct(everything, 0.95) * 1000, 3),
+            "p99_ms": round(_pct(everything, 0.99) * 1000, 3),
+        })
+    return overall, intents
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# ---------- Comparison ----------
+def compare(old, new, threshold):
+    """Prints deltas vs an older result file; returns the list of regressions."""
+    regressions = []
+
+    def check(label, before, after, lower_is_better):
+        if not before or after is None:
+            return
+        change = (after - before) / before
+        worse = change > threshold if lower_is_better else change < -threshold
+        flag = "  <-- REGRESSION" if worse else ""
+        print(f"  {label:<40} {before:>10} -> {after:>10}  ({change:+.0%}){flag}")
+        if worse:
+            regressions.append(label)
+
+    print(f"\nvs {old['meta'].get('commit')} ({old['meta'].get('target')}), threshold {threshold:.0%}")
+    check("overall throughput_per_s", old["overall"].get("throughput_per_s"),
+          new["overall"].get("throughput_per_s"), lower_is_better=False)
+    check("overall p95_ms", old["overall"].get("p95_ms"), new["overall"].get("p95_ms"), lower_is_better=True)
+    for key, entry in new["intents"].items():
+        before = old["intents"].get(key)
+        if before and min(before["n"], entry["n"]) >= COMPARE_MIN_N:
+            check(f"{key} p95_ms", before.get("p95_ms"), entry.get("p95_ms"), lower_is_better=True)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded utterances through the router")
+    parser.add_argument("--target", choices=sorted(TARGETS), default="router")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N turns")
+    parser.add_argument("--wit-ms", type=float, default=0.0, help="simulated Wit.ai round trip")
+    parser.add_argument("--api-ms", type=float, default=0.0, help="simulated Weather/News API round trip")
+    parser.add_argument("--no-alloc", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print("Loading recorded turns")
+    turns = load_turns()[:args.limit]
+    if not turns:
+        sys.exit("No utterances found in the session logs.")
+
+    install_stubs(args.api_ms / 1000)
+    call = TARGETS[args.target](FakeWit(turns, args.wit_ms / 1000))
+
+    from chapo_engines.tracing import tracer
+
+    call(turns[0])  # imports, spaCy model load, first-call caches
+    tracer.reset()
+    elapsed, latencies, errors = time_pass(call, turns)
+    stages = tracer.stage_stats()
+    allocs = {} if args.no_alloc else alloc_pass(call, turns)
+    overall, intents = summarize(elapsed, latencies, errors, allocs)
+
+    result = {
+        "meta": {
+            "target": args.target,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "wit_ms": args.wit_ms,
+            "api_ms": args.api_ms,
+        },
+        "overall": overall,
+        "intents": intents,
+        "stages": stages,
+    }
+
+    print(f"\n{args.target}: {overall['turns']} turns in {overall['wall_s']} s "
+          f"({overall['throughput_per_s']}/s), errors: {overall['errors']}")
+    print(f"  {'intent':<28}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KiB':>10}")
+    for key, e in sorted(intents.items(), key=lambda kv: -kv[1]["n"]):
+        print(f"  {key:<28}{e['n']:>6}{e.get('p50_ms', '-'):>10}{e.get('p95_ms', '-'):>10}"
+              f"{e.get('p99_ms', '-'):>10}{e.get('peak_kib', '-'):>10}")
+
+    out = args.out or RESULTS / f"replay_{args.target}_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"\nSaved {out}")
+
+    if args.compare:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        if compare(old, result, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+bench_schedule_store.py
+
+Benchmarks the SQLite schedule store against the old JSON read-append-rewrite
+pattern used by alarm_engine.save_alarm.
+
+Run from backend/:
+    python -m benchmarks.bench_schedule_store [N]
+"""
+
+import datetime
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytz
+
+from db.schedule_store import ScheduleStore
+
+BST = pytz.timezone("Europe/London")
+
+
+def bench_json(n, path):
+    path.write_text("[]")
+    start = time.perf_counter()
+    for i in range(n):
+        with open(path, "r", encoding="utf-8") as f:
+            alarms = json.load(f)
+        alarms.append((datetime.datetime.now(BST) + datetime.timedelta(minutes=i)).isoformat())
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(alarms, f, indent=2)
+    return time.perf_counter() - start
+
+
+def bench_store(n, path):
+    store = ScheduleStore(path)
+    now = datetime.datetime.now(BST)
+    start = time.perf_counter()
+    for i in range(n):
+        due = now + datetime.timedelta(minutes=random.randint(1, 60 * 24 * 30))
+        store.add(random.choice(["alarm", "reminder"]), due, session_id=f"user_{i % 100}", task=f"task {i}")
+    insert_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        store.next_due(10)
+    next_due_ms = (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(1000):
+        store.list_for_session(f"user_{i % 100}", "reminder")
+    per_session_ms = (time.perf_counter() - start)
+    store.close()
+    return insert_s, next_due_ms, per_session_ms
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        insert_s, next_due_ms, per_session_ms = bench_store(n, tmp / "bench.db")
+        print(f"SQLite store: {n} inserts in {insert_s:.2f}s ({n / insert_s:,.0f}/s)")
+        print(f"  next_due(10):       {next_due_ms:.3f} ms/query")
+        print(f"  list_for_session(): {per_session_ms:.3f} ms/query")
+
+        json_n = min(n, 2_000)  # the JSON path is quadratic; cap it
+        json_s = bench_json(json_n, tmp / "alarms.json")
+        print(f"JSON rewrite: {json_n} inserts in {json_s:.2f}s ({json_n / json_s:,.0f}/s)")
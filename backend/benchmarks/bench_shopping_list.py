@@ -0,0 +1,112 @@
+"""
+bench_shopping_list.py
+
+Shopping list add/remove on big lists: the per-user SQLite store behind
+ShoppingListEngine vs the old single-list engine (a Python list deduped
+with `[x.lower() for x in list]` per item and the whole JSON file
+rewritten on every change, re-read on every get).
+
+Seeds --users lists of --items items each, then times single-item adds
+and removes on random users, plus reads of a recently used list.
+
+Run from backend/:
+    python -m benchmarks.bench_shopping_list --users 1000 --items 10000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from chapo_engines.shopping_list_engine import ShoppingListEngine
+from db.shopping_list_store import ShoppingListStore
+
+
+class LegacyShoppingList:
+    """The pre-store engine's add/remove/get, kept here for comparison."""
+
+    def __init__(self, path):
+        self.path = path
+        self.list = []
+
+    def save_list(self):
+        with open(self.path, "w") as f:
+            json.dump(self.list, f, indent=2)
+
+    def add_items(self, items):
+        for item in items:
+            item_clean = item.strip().lower()
+            if item_clean and item_clean not in [x.lower() for x in self.list]:
+                self.list.append(item_clean)
+        self.save_list()
+
+    def remove_item(self, item):
+        for i in self.list:
+            if i.lower() == item.lower():
+                self.list.remove(i)
+                self.save_list()
+                return
+
+    def get_list(self):
+        with open(self.path) as f:
+            self.list = json.load(f)
+        return self.list
+
+
+def _timed(fn, args_list):
+    times = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _line(label, times):
+    times = sorted(times)
+    p95 = times[int(len(times) * 0.95) - 1]
+    print(f"  {label:<22} mean {statistics.mean(times) * 1e6:9.0f} us   p95 {p95 * 1e6:9.0f} us   (n={len(times)})")
+
+
+def bench_store(tmp, users, items, ops):
+    store = ShoppingListStore(tmp / "lists.db")
+    start = time.perf_counter()
+    for u in range(users):
+        store.add(f"user_{u}", [f"item {i}" for i in range(items)])
+    print(f"\nSQLite per-user store: seeded {users} x {items} items in {time.perf_counter() - start:.1f} s")
+
+    engine = ShoppingListEngine(store, legacy_file=tmp / "none.json")
+    owners = [f"user_{random.randrange(users)}" for _ in range(ops)]
+    _line("add (random user)", _timed(engine.add_items, [([f"new {i}"], o) for i, o in enumerate(owners)]))
+    _line("duplicate add", _timed(engine.add_items, [(["ITEM 5"], o) for o in owners]))
+    _line("remove (random user)", _timed(engine.remove_item, [(f"item {random.randrange(items)}", o) for o in owners]))
+    engine.get_list("user_0")
+    _line("get_list (cached)", _timed(engine.get_list, [("user_0",)] * ops))
+    _line("get_list (cold)", _timed(lambda o: ShoppingListEngine(store, tmp / "none.json").get_list(o), [(o,) for o in owners[:50]]))
+
+
+def bench_legacy(tmp, items, ops):
+    legacy = LegacyShoppingList(tmp / "shopping_list.json")
+    legacy.add_items([f"item {i}" for i in range(items)])
+    print(f"\nLegacy single list ({items} items, one list for everybody)")
+    _line("add", _timed(legacy.add_items, [([f"new {i}"],) for i in range(ops)]))
+    _line("duplicate add", _timed(legacy.add_items, [(["ITEM 5"],)] * ops))
+    _line("remove", _timed(legacy.remove_item, [(f"item {random.randrange(items)}",) for _ in range(ops)]))
+    _line("get_list", _timed(legacy.get_list, [()] * ops))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shopping list add/remove on large per-user lists")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--ops", type=int, default=500, help="timed operations of each kind")
+    args = parser.parse_args()
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        bench_store(tmp, args.users, args.items, args.ops)
+        bench_legacy(tmp, args.items, min(args.ops, 200))  # every legacy op is O(n) plus a full rewrite
@@ -0,0 +1,56 @@
+"""
+bench_stt_streaming.py
+
+Speech-end -> intent-ready latency for the voice loop: the old
+"upload the whole clip, wait, then classify" path vs. streaming STT with
+intent prefetch on stable partials.
+
+Both sides use local fakes with the same interface as the real backends:
+- batch: FakeFileSTT, upload round trip + time proportional to clip length
+- streaming: FakeStreamingSTT, partials while talking, final shortly after
+- classifier: a fixed Wit-like round trip
+
+The recorded clips in the repo are replayed in real time through the VAD.
+Run from backend/:
+    python -m benchmarks.bench_stt_streaming
+"""
+
+import statistics
+import time
+from pathlib import Path
+
+from chapo_engines.stt_stream import FakeFileSTT, FakeStreamingSTT, IntentPrefetcher, listen
+from chapo_engines.voice_capture import EnergyVAD, WavFileSource
+
+BACKEND = Path(__file__).resolve().parent.parent
+CLIPS = [BACKEND / "test.wav", BACKEND / "voice_input.wav", BACKEND.parent / "test.wav"]
+SCRIPT = "set a reminder to call mum"
+WIT_LATENCY = 0.25
+RUNS = 3
+
+
+def wit_like(text):
+    time.sleep(WIT_LATENCY)
+    return "set_reminder", 0.93, {}
+
+
+def run(make_stt):
+    samples = []
+    for clip in CLIPS:
+        for _ in range(RUNS):
+            prefetcher = IntentPrefetcher(wit_like)   # fresh cache: no cross-run hits
+            turn = listen(WavFileSource(clip, realtime=True), make_stt(), prefetcher, vad=EnergyVAD())
+            turn.intent()
+            samples.append(turn.timings["intent_ms"])
+    return samples
+
+
+if __name__ == "__main__":
+    batch = run(lambda: FakeFileSTT(SCRIPT, base_latency=0.3, per_audio_second=0.15))
+    stream = run(lambda: FakeStreamingSTT(SCRIPT, frames_per_word=3, final_delay=0.08))
+
+    b, s = statistics.median(batch), statistics.median(stream)
+    print(f"clips: {len(CLIPS)} x {RUNS} runs, Wit round trip {WIT_LATENCY * 1000:.0f} ms")
+    print(f"  batch  (upload, then classify)   : median {b:.0f} ms  (max {max(batch):.0f})")
+    print(f"  stream (partials + prefetch)     : median {s:.0f} ms  (max {max(stream):.0f})")
+    print(f"  speech-end -> intent reduced by {b - s:.0f} ms ({(b - s) / b:.0%})")
@@ -0,0 +1,83 @@
+"""
+bench_time_parser.py
+
+Time-expression parsing per call: dateparser as the engines called it
+before, against chapo_engines.time_parser (fast paths, dateparser with a
+per-minute LRU for the rest).
+
+Two workloads:
+    expressions   Wit datetime values and short phrases ("in 10 minutes",
+                  "tomorrow at 3 pm", ISO strings): parse() per value,
+                  what alarm_engine / reminder_engine do per entity
+    replay turns  the logged alarm / reminder / calendar utterances:
+                  parse(text) (alarm and reminder fallbacks) and
+                  search(text) (calendar), as each turn does
+
+The cache is cleared before every pass, so only repeats inside a pass hit it.
+
+Run from backend/:
+    python -m benchmarks.bench_time_parser
+    python -m benchmarks.bench_time_parser --repeat 3
+"""
+
+import argparse
+import time
+
+import dateparser
+from dateparser.search import search_dates
+
+from benchmarks.bench_replay import load_turns
+from chapo_engines import time_parser
+
+EXPRESSIONS = [
+    "in 10 minutes", "in 5 mins", "in an hour", "in 30 secs", "at 7 am", "7pm", "at 19:00", "at 7 a.m.",
+    "tomorrow at 3 pm", "tomorrow at 7:45 am", "on friday at 3 pm", "monday at 9:30 am",
+    "2025-08-29T19:00:00.000+01:00", "2025-12-01T07:00:00Z",
+]
+TIME_INTENTS = {"set_alarm", "set_reminder", "calendar_event", "add_event"}
+
+
+def before(texts, search=False):
+    for text in texts:
+        if search:
+            search_dates(text, settings=time_parser.SEARCH_SETTINGS)
+        else:
+            dateparser.parse(text, settings=time_parser.PARSE_SETTINGS)
+
+
+def after(texts, search=False):
+    for text in texts:
+        (time_parser.search if search else time_parser.parse)(text)
+
+
+def timed(run, texts, repeat, search=False):
+    best = float("inf")
+    for _ in range(repeat):
+        time_parser.clear_cache()
+        start = time.perf_counter()
+        run(texts, search)
+        best = min(best, (time.perf_counter() - start) / len(texts))
+    return best
+
+
+def report(label, texts, repeat, search=False):
+    if not texts:
+        print(f"  {label:<22} (no utterances)")
+        return
+    old, new = timed(before, texts, repeat, search), timed(after, texts, repeat, search)
+    print(f"  {label:<22} n={len(texts):<5} dateparser {old * 1e3:7.3f} ms   time_parser {new * 1e3:7.3f} ms"
+          f"   x{old / new:,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="dateparser vs time_parser, per call")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    dateparser.parse("warm up")  # dateparser's first call loads its language data
+    turns = [t["text"] for t in load_turns() if t["intent"] in TIME_INTENTS]
+    fast = sum(time_parser.fast_parse(e) is not None for e in EXPRESSIONS)
+    print(f"{fast}/{len(EXPRESSIONS)} expressions take a fast path")
+    report("expressions parse()", EXPRESSIONS * 10, args.repeat)
+    report("replay turns parse()", turns, args.repeat)
+    report("replay turns search()", turns, args.repeat, search=True)
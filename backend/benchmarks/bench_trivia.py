@@ -0,0 +1,95 @@
+"""
+bench_trivia.py
+
+Trivia ask/answer cycles: the engine as it was (trivia_questions.json
+re-read and re-parsed for every question, random.choice, option lists
+rebuilt for every answer) against the TriviaBank in
+chapo_engines.trivia_engine (loaded once, compiled questions, a lazy
+per-session deck).
+
+Each cycle is ask_trivia_question then check_trivia_answer for one of
+--sessions sessions in turn, against a plain dict session memory (the
+session store's own cost is the same either way). Also reports how many
+asks repeated a question the session had already heard.
+
+Run from backend/:
+    python -m benchmarks.bench_trivia
+    python -m benchmarks.bench_trivia --cycles 10000 --sessions 1000
+"""
+
+import argparse
+import json
+import random
+import time
+
+from chapo_engines import trivia_engine
+from chapo_engines.trivia_engine import TriviaBank, ask_trivia_question, check_trivia_answer, format_trivia_question
+
+
+# ---------- The engine before the bank ----------
+def old_ask(session_id, session_memory):
+    with open(trivia_engine.TRIVIA_FILE, "r") as f:
+        questions = json.load(f)
+    question = random.choice(questions)
+    session = session_memory.get(session_id, {})
+    session["pending_trivia_answer"] = question
+    session_memory[session_id] = session
+    return format_trivia_question(question)
+
+
+def old_check(user_input, session_id, session_memory):
+    session = session_memory.get(session_id, {})
+    current = session.get("pending_trivia_answer")
+    correct = current["answer"].strip().lower()
+    user_ans = user_input.strip().lower()
+    options = [opt.strip().lower() for opt in current["options"]]
+    option_letters = [chr(65 + i).lower() for i in range(len(options))]
+    guessed_letter = None
+    for letter in option_letters:
+        if f"{letter}." in user_ans or f"{letter} " in user_ans or user_ans.strip() == letter:
+            guessed_letter = letter
+            break
+    session.pop("pending_trivia_answer", None)
+    session_memory[session_id] = session
+    if user_ans == correct:
+        return True
+    if guessed_letter and options[option_letters.index(guessed_letter)] == correct:
+        return True
+    return correct in user_ans
+
+
+# ---------- Run ----------
+def run(ask, check, cycles, sessions):
+    memory, heard, repeats = {}, {}, 0
+    start = time.perf_counter()
+    for i in range(cycles):
+        session_id = f"s{i % sessions}"
+        ask(session_id, memory)
+        question = memory[session_id]["pending_trivia_answer"]
+        seen = heard.setdefault(session_id, set())
+        repeats += question["question"] in seen
+        seen.add(question["question"])
+        reply = "b" if i % 3 == 0 else question["answer"] if i % 3 == 1 else "no idea"
+        check(reply, session_id, memory)
+    return time.perf_counter() - start, repeats
+
+
+def report(label, elapsed, repeats, cycles):
+    print(f"  {label:<8} {elapsed * 1e3:8.1f} ms total   {elapsed / cycles * 1e6:7.1f} us/cycle   "
+          f"{repeats} repeated question(s)")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="trivia ask/answer cycles, old engine vs TriviaBank")
+    parser.add_argument("--cycles", type=int, default=10000)
+    parser.add_argument("--sessions", type=int, default=1000)
+    args = parser.parse_args()
+
+    trivia_engine._bank = TriviaBank()
+    size = len(trivia_engine.load_trivia_questions())
+    print(f"{args.cycles} cycles over {args.sessions} sessions, {size} questions "
+          f"({args.cycles // args.sessions} per session)")
+    old = report("before", *run(old_ask, old_check, args.cycles, args.sessions), args.cycles)
+    new = report("bank", *run(ask_trivia_question, check_trivia_answer, args.cycles, args.sessions), args.cycles)
+    print(f"  x{old / new:,.1f}")
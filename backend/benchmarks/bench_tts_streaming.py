@@ -0,0 +1,55 @@
+"""
+bench_tts_streaming.py
+
+Time-to-first-audio for TTS: the old "download whole clip, then play" path
+vs. AudioService.submit_stream(), against a local fake TTS stream that
+mimics ElevenLabs (first-byte latency + chunks trickling in).
+
+Runs on SDL's dummy audio driver, so no speakers are needed.
+Run from backend/:
+    python -m benchmarks.bench_tts_streaming
+"""
+
+import statistics
+import time
+
+import numpy as np
+
+from chapo_engines.audio_service import AudioService
+
+RATE = 22050
+
+
+def fake_tts_stream(seconds=3.0, chunks=30, first_byte=0.25, per_chunk=0.04):
+    total = int(RATE * seconds)
+    pcm = (np.sin(np.arange(total) / 8) * 6000).astype(np.int16).tobytes()
+    step = len(pcm) // chunks
+    time.sleep(first_byte)
+    for i in range(chunks):
+        yield pcm[i * step:(i + 1) * step]
+        time.sleep(per_chunk)
+
+
+def buffered_ttfa(audio):
+    start = time.perf_counter()
+    clip = b"".join(fake_tts_stream())
+    job = audio.submit_stream([clip], RATE)
+    job.wait()
+    return job.first_audio_at - start
+
+
+def streaming_ttfa(audio):
+    job = audio.submit_stream(fake_tts_stream(), RATE)
+    job.wait()
+    return job.time_to_first_audio
+
+
+if __name__ == "__main__":
+    audio = AudioService(driver="dummy")
+    audio.start()
+    runs = 5
+    buffered = [buffered_ttfa(audio) for _ in range(runs)]
+    streamed = [streaming_ttfa(audio) for _ in range(runs)]
+    audio.shutdown()
+    print(f"buffered  TTFA: median {statistics.median(buffered) * 1000:.0f} ms")
+    print(f"streaming TTFA: median {statistics.median(streamed) * 1000:.0f} ms")
@@ -0,0 +1,115 @@
+"""
+bench_utterance.py
+
+Per-turn allocations of utterance preprocessing on the replay set: every
+call site that used to lowercase / strip / regex-clean the turn's text on
+its own, against one shared Utterance read by all of them.
+
+Call sites per turn (before):
+    handle_turn           text.lower().strip(), then re.sub(punct, text.lower().strip())
+    get_expected_intent   re.sub(punct, text.lower().strip())       (metrics, every turn)
+    detect_emotion        text.lower()
+    nlu cascade           " ".join(re.sub(punct, text.lower()).split())
+    detect_intent/process text.lower() x3                           (small talk)
+    extract_items         text.lower()                              (shopping)
+    normalize_user_input  re.sub(punct, text.lower())               (recipes)
+    intent_matcher        text.lower().strip()
+
+Under tracemalloc, each turn records the bytes allocated across its call
+sites: every site's peak above where it started, so temporaries such as
+the lower() inside re.sub() count. Objects reused from CPython's free
+lists (small tuples, dicts) are invisible to tracemalloc, so both numbers
+are lower bounds. Time per turn comes from a separate untraced pass.
+
+Run from backend/:
+    python -m benchmarks.bench_utterance
+    python -m benchmarks.bench_utterance --limit 500
+"""
+
+import argparse
+import re
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.bench_replay import load_turns
+from chapo_engines.utterance import Utterance
+
+PUNCT = r'[^\w\s]'
+
+
+def separate_passes(text):
+    """The preprocessing each consumer did for itself before Utterance, one callable per call site."""
+    return [
+        lambda: text.lower().strip(),
+        lambda: re.sub(PUNCT, '', text.lower().strip()),
+        lambda: re.sub(PUNCT, '', text.lower().strip()),
+        lambda: text.lower(),
+        lambda: " ".join(re.sub(PUNCT, "", (text or "").lower()).split()),
+        lambda: text.lower(), lambda: text.lower(), lambda: text.lower(),
+        lambda: text.lower(),
+        lambda: re.sub(PUNCT, '', text.lower()),
+        lambda: text.lower().strip(),
+    ]
+
+
+def shared_utterance(text):
+    """One Utterance built by the turn; the call sites read its attributes (the cascade joins its tokens)."""
+    shared = []
+
+    def build():
+        shared.append(Utterance(text))
+        return shared[0]
+
+    sites = [lambda: shared[0].lowered, lambda: shared[0].cleaned, lambda: shared[0].cleaned,
+             lambda: shared[0].lowered, lambda: " ".join(shared[0].tokens)]
+    sites += [lambda: shared[0].lowered] * 5 + [lambda: shared[0].cleaned]
+    return [build] + sites
+
+
+def alloc_pass(plan, texts):
+    """Mean bytes allocated per turn, summed over its call sites (each site's peak above its start)."""
+    allocated = []
+    tracemalloc.start()
+    try:
+        for text in texts:
+            sites = plan(text)
+            total, held = 0, []  # a turn keeps its forms alive until it ends
+            for site in sites:
+                start = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                held.append(site())
+                total += tracemalloc.get_traced_memory()[1] - start
+            allocated.append(total)
+            del held, sites
+    finally:
+        tracemalloc.stop()
+    return statistics.mean(allocated)
+
+
+def time_pass(plan, texts, repeat=5):
+    plans = [plan(text) for text in texts]
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for sites in plans:
+            for site in sites:
+                site()
+        best = min(best, (time.perf_counter() - start) / len(texts))
+        plans = [plan(text) for text in texts]
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-turn preprocessing allocations: separate passes vs one Utterance")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    texts = [t["text"] for t in load_turns()][: args.limit]
+    print(f"{len(texts)} replayed turns")
+    results = {}
+    for label, plan in [("separate passes", separate_passes), ("shared Utterance", shared_utterance)]:
+        allocated = results[label] = alloc_pass(plan, texts)
+        print(f"  {label:<17} {allocated:6.0f} B allocated/turn   {time_pass(plan, texts) * 1e6:5.2f} us/turn")
+    saved = 1 - results["shared Utterance"] / results["separate passes"]
+    print(f"  preprocessing allocations per turn: {saved * 100:.0f}% fewer bytes")
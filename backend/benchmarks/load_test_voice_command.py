@@ -0,0 +1,208 @@
+"""
+load_test_voice_command.py
+
+/voice-command under concurrent load: the legacy Flask bridge
+(chapo_server.py) vs the FastAPI route, driven with the same replay set
+(the utterances from the session logs, see bench_replay.py).
+
+In-process (default), with Wit.ai, the Weather/News/OpenAI APIs and Mongo
+stubbed and --wit-ms / --api-ms of simulated network time:
+- Flask:   app.test_client() from -c threads (like the threaded dev server)
+- FastAPI: the router on one event loop through httpx's ASGI transport
+Run from backend/:
+    python -m benchmarks.load_test_voice_command -n 500 -c 16
+
+Against running servers (real backends, no stubs):
+    python -m benchmarks.load_test_voice_command \\
+        --url http://127.0.0.1:5000/voice-command --url http://127.0.0.1:8000/voice-command
+
+Worker scaling: the stubbed FastAPI app (benchmarks/stub_server.py) under
+`uvicorn --workers N` for each N, over real HTTP, all workers sharing one
+session store:
+    python -m benchmarks.load_test_voice_command --workers 1 2 4 -n 800 -c 64
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_replay import BACKEND, FakeWit, fake_requests, install_stubs, load_turns
+from benchmarks.load_test_voice_upload import _report
+
+
+def _payloads(turns, n, sessions):
+    session_ids = itertools.cycle([f"load_{i}" for i in range(sessions)])
+    texts = itertools.cycle([t["text"] for t in turns])
+    return [{"text": next(texts), "session_id": next(session_ids)} for _ in range(n)]
+
+
+# ---------- In-process ----------
+def install_voice_stubs(turns, wit_ms, api_ms, flask=True):
+    sys.path.insert(0, str(BACKEND.parent))  # for the backend.* imports
+    from backend.services import nlp, responder
+
+    install_stubs(api_ms / 1000)
+    wit = FakeWit(turns, wit_ms / 1000)
+    responder.requests = fake_requests(api_ms / 1000)
+    nlp.get_intent_from_wit = wit  # the cascade's remote stage
+    if not flask:
+        return None
+    import chapo_server
+    import services.responder  # test_voice's copy, which chapo_server answers with
+    services.responder.requests = fake_requests(api_ms / 1000)
+    chapo_server.get_intent_from_wit = wit
+    return chapo_server.app
+
+
+def run_flask(app, payloads, concurrency):
+    latencies, statuses = [], []
+
+    def one(payload):
+        client = app.test_client()
+        start = time.perf_counter()
+        resp = client.post("/voice-command", json=payload)
+        statuses.append(resp.status_code)
+        if resp.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, payloads))
+    _report(f"Flask (threads={concurrency})  x{len(payloads)}", started, latencies, statuses)
+
+
+async def run_fastapi(payloads, concurrency):
+    import httpx
+    from fastapi import FastAPI
+    from backend.routers import voice_command
+    from backend.services.voice_command import use_io_executor
+
+    use_io_executor()  # as the app's startup hook does
+    app = FastAPI()
+    app.include_router(voice_command.router)
+    latencies, statuses = [], []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(client, payload):
+        async with gate:
+            start = time.perf_counter()
+            resp = await client.post("/voice-command", json=payload)
+            statuses.append(resp.status_code)
+            if resp.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://chapo", timeout=300) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, p) for p in payloads))
+    _report(f"FastAPI (in-flight={concurrency})  x{len(payloads)}", started, latencies, statuses)
+
+
+# ---------- Over HTTP ----------
+async def run_http(url, payloads, concurrency):
+    import httpx
+
+    latencies, statuses = [], []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(client, payload):
+        async with gate:
+            start = time.perf_counter()
+            resp = await client.post(url, json=payload)
+            statuses.append(resp.status_code)
+            if resp.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(timeout=300) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, p) for p in payloads))
+    _report(f"HTTP {url} (in-flight={concurrency})  x{len(payloads)}", started, latencies, statuses)
+    return statuses.count(200) / (time.perf_counter() - started)
+
+
+# ---------- Worker scaling ----------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url, proc, timeout=120):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn exited with {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"{url} not ready after {timeout} s")
+
+
+def run_workers(worker_counts, payloads, concurrency, wit_ms, api_ms):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in worker_counts:
+            port = _free_port()
+            env = dict(
+                os.environ,
+                CHAPO_BENCH_WIT_MS=str(wit_ms),
+                CHAPO_BENCH_API_MS=str(api_ms),
+                CHAPO_BENCH_STATE_DB=os.path.join(tmp, f"sessions_{n}.db"),
+            )
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "benchmarks.stub_server:app", "--port", str(port),
+                 "--workers", str(n), "--log-level", "warning"],
+                cwd=BACKEND, env=env,
+            )
+            try:
+                base = f"http://127.0.0.1:{port}"
+                _wait_ready(f"{base}/health", proc)
+                asyncio.run(run_http(f"{base}/voice-command", payloads[: max(1, len(payloads) // 10)], concurrency))  # warm every worker
+                print(f"\n=== uvicorn --workers {n} ===")
+                results[n] = asyncio.run(run_http(f"{base}/voice-command", payloads, concurrency))
+            finally:
+                proc.terminate()
+                proc.wait(30)
+
+    base = results[worker_counts[0]]
+    print(f"\n{'workers':>8} {'req/s':>9} {'speedup':>8}")
+    for n, rps in results.items():
+        print(f"{n:>8} {rps:>9.1f} {rps / base:>7.2f}x")
+    print(f"(cpu_count={os.cpu_count()})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/voice-command load test: Flask vs FastAPI")
+    parser.add_argument("-n", type=int, default=300)
+    parser.add_argument("-c", type=int, default=16, help="concurrent requests")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--url", action="append", default=None)
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="uvicorn worker counts to compare, e.g. --workers 1 2 4")
+    parser.add_argument("--wit-ms", type=float, default=80)
+    parser.add_argument("--api-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    turns = load_turns()
+    payloads = _payloads(turns, args.n, args.sessions)
+    if args.workers:
+        run_workers(args.workers, payloads, args.c, args.wit_ms, args.api_ms)
+    elif args.url:
+        for url in args.url:
+            asyncio.run(run_http(url, payloads, args.c))
+    else:
+        flask_app = install_voice_stubs(turns, args.wit_ms, args.api_ms)
+        run_flask(flask_app, payloads, args.c)
+        asyncio.run(run_fastapi(payloads, args.c))
@@ -0,0 +1,125 @@
+"""
+load_test_voice_upload.py
+
+Fires N concurrent /voice uploads and reports throughput, latency
+percentiles and how many were turned away with 503 + Retry-After.
+
+Against a running server (uvicorn backend.main:app):
+    python -m benchmarks.load_test_voice_upload --url http://127.0.0.1:8000/voice/ -n 50
+
+Without a server (--local): drives STTPool directly with a fake model that
+takes --fake-ms per clip, to check pool sizing and backpressure on this box.
+Run from backend/:
+    python -m benchmarks.load_test_voice_upload --local -n 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from pathlib import Path
+
+CLIP = Path(__file__).resolve().parent.parent / "test.wav"
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else float("nan")
+
+
+def _report(label, started, latencies, statuses):
+    elapsed = time.perf_counter() - started
+    ok = statuses.count(200)
+    print(f"\n{label}")
+    print(f"  requests      : {len(statuses)}  (200: {ok}, 503: {statuses.count(503)}, "
+          f"other: {len(statuses) - ok - statuses.count(503)})")
+    print(f"  wall time     : {elapsed:.2f} s")
+    print(f"  throughput    : {ok / elapsed:.2f} transcriptions/s")
+    if latencies:
+        print(f"  latency p50   : {statistics.median(latencies) * 1000:.0f} ms")
+        print(f"  latency p95   : {_pct(latencies, 0.95) * 1000:.0f} ms")
+
+
+async def run_http(url, n, clip):
+    import httpx
+
+    data = clip.read_bytes()
+    latencies, statuses = [], []
+
+    async def one(client):
+        start = time.perf_counter()
+        resp = await client.post(url, files={"file": (clip.name, data, "audio/wav")})
+        statuses.append(resp.status_code)
+        if resp.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(timeout=300) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client) for _ in range(n)))
+    _report(f"HTTP {url}  x{n}", started, latencies, statuses)
+
+
+class FakeModel:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def transcribe(self, audio):
+        # busy CPU, like the real model, rather than sleeping
+        end = time.perf_counter() + self.delay
+        while time.perf_counter() < end:
+            pass
+        return "fake"
+
+
+class FakeLoader:
+    """Picklable loader, so the spawned workers get the same delay."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def __call__(self, config):
+        return FakeModel(self.delay)
+
+
+async def run_local(n, clip, fake_ms, workers, max_pending):
+    from chapo_engines.stt_pool import STTBusy, STTPool
+
+    pool = STTPool(workers=workers, max_pending=max_pending, loader=FakeLoader(fake_ms / 1000))
+    pool.start()
+    data = clip.read_bytes()
+    latencies, statuses = [], []
+
+    async def one():
+        start = time.perf_counter()
+        try:
+            await pool.transcribe_async(data)
+        except STTBusy:
+            statuses.append(503)
+            return
+        statuses.append(200)
+        latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    _report(f"STTPool workers={pool.workers} max_pending={pool.max_pending}  x{n}",
+            started, latencies, statuses)
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent /voice upload load test")
+    parser.add_argument("-n", type=int, default=50)
+    parser.add_argument("--url", default="http://127.0.0.1:8000/voice/")
+    parser.add_argument("--clip", type=Path, default=CLIP)
+    parser.add_argument("--local", action="store_true")
+    parser.add_argument("--fake-ms", type=float, default=300)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="--local: STT processes (the server runs CHAPO_STT_WORKERS, default 1, per API worker)")
+    parser.add_argument("--max-pending", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.local:
+        asyncio.run(run_local(args.n, args.clip, args.fake_ms, args.workers, args.max_pending))
+    else:
+        asyncio.run(run_http(args.url, args.n, args.clip))
@@ -0,0 +1,46 @@
+"""
+stub_server.py
+
+The /voice-command app with the replay stubs installed (Wit.ai, the
+Weather/News/OpenAI APIs and Mongo answer from memory after a simulated
+network delay), for running under real uvicorn workers:
+
+    CHAPO_BENCH_WIT_MS=80 CHAPO_BENCH_API_MS=150 \\
+        uvicorn benchmarks.stub_server:app --workers 4 --port 8000
+
+Every worker opens the same session store (CHAPO_BENCH_STATE_DB, default
+the normal sessions.db). Used by load_test_voice_command.py --workers.
+"""
+
+import os
+
+from fastapi import FastAPI
+
+from benchmarks.bench_replay import load_turns
+from benchmarks.load_test_voice_command import install_voice_stubs
+from db import session_store
+
+install_voice_stubs(
+    load_turns(),
+    float(os.getenv("CHAPO_BENCH_WIT_MS", "80")),
+    float(os.getenv("CHAPO_BENCH_API_MS", "150")),
+    flask=False,
+)
+if os.getenv("CHAPO_BENCH_STATE_DB"):
+    session_store._store = session_store.SessionStore(os.environ["CHAPO_BENCH_STATE_DB"])
+
+from backend.routers import voice_command  # noqa: E402  (needs the backend.* path set up above)
+from backend.services.voice_command import use_io_executor  # noqa: E402
+
+app = FastAPI(title="Chapo /voice-command (replay stubs)")
+app.include_router(voice_command.router)
+
+
+@app.on_event("startup")
+async def startup_event():
+    use_io_executor()
+
+
+@app.get("/health")
+def health_check():
+    return {"status": "ok"}
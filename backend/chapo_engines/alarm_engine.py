@@ -3,85 +3,106 @@ alarm_engine.py
 
 Handles user alarms: set, stop, and persist alarms to disk.
 - Uses asyncio for alarm scheduling
-- Plays an alarm sound and system notification on trigger
+- Plays an alarm sound and system notification on trigger (via the shared
+  AudioService, so the sound is decoded once and preempts any TTS)
+- Alarms live in the shared SQLite schedule store (db/schedule_store.py);
+  the old alarms.json is imported once on first start.
+- An alarm is claimed in the store before it rings, so with several server
+  processes (and the leader scheduler, chapo_engines/scheduler.py) it
+  still rings exactly once.
 
 Author: [naim], 2025-05-28
 """
 
 import asyncio
 import datetime
-import json
 from pathlib import Path
 from plyer import notification
-import pygame
 import pytz
 from typing import Optional
-import dateparser
+
+from db.schedule_store import get_schedule_store
+from chapo_engines.audio_service import get_audio_service, PRIORITY_ALARM
+from chapo_engines import time_parser
 
 # Timezone BST
 BST = pytz.timezone("Europe/London")
 
-# File paths
+# File paths (ALARM_FILE is only read once, for migration)
 ALARM_FILE = Path.home() / "chapo-bot-backend" / "backend" / "chapo_engines" / "alarms.json"
 ALARM_SOUND = Path.home() / "chapo-bot-backend" / "alarm.mp3"
+get_audio_service().register("alarm", ALARM_SOUND)
 
 # ---- PATCH: Store all scheduled alarm tasks here!
+# (this process's timers only; who rings is decided by ScheduleStore.claim)
 scheduled_alarms = []
 
 def save_alarm_task(task):
     scheduled_alarms.append(task)
 
-def load_alarms():
+def _alarm_rows_from_json(data):
+    for alarm_str in data:
+        try:
+            alarm_time = datetime.datetime.fromisoformat(alarm_str).astimezone(BST)
+            yield "alarm", alarm_time, "default", None
+        except Exception as e:
+            print(f"[ERROR] Skipping unreadable alarm during migration: {alarm_str}, error: {e}")
+
+def get_alarm_store():
+    store = get_schedule_store()
+    store.migrate_json("alarms.json", ALARM_FILE, _alarm_rows_from_json)
+    return store
+
+def load_alarms(session_id: Optional[str] = None):
     print("[DEBUG] load_alarms called")
     try:
-        if ALARM_FILE.exists():
-            print(f"[DEBUG] Alarm file {ALARM_FILE} exists")
-            with open(ALARM_FILE, 'r', encoding='utf-8') as f:
-                alarms = json.load(f)
-                print(f"[DEBUG] Loaded alarms: {alarms}")
-                return alarms
-        else:
-            print(f"[DEBUG] Alarm file {ALARM_FILE} does not exist")
+        store = get_alarm_store()
+        rows = store.list_for_session(session_id, "alarm") if session_id else store.list_pending("alarm")
+        alarms = [row["time"] for row in rows]
+        print(f"[DEBUG] Loaded alarms: {alarms}")
+        return alarms
     except Exception as e:
-        print(f"[ERROR] Error reading alarm file: {e}")
+        print(f"[ERROR] Error reading alarm store: {e}")
     return []
 
-def save_alarm(alarm_time_bst):
+def save_alarm(alarm_time_bst, session_id: str = "default") -> Optional[int]:
     print(f"[DEBUG] save_alarm called with {alarm_time_bst}")
     try:
-        alarms = load_alarms()
-        alarms.append(alarm_time_bst.isoformat())
-        with open(ALARM_FILE, 'w', encoding='utf-8') as f:
-            json.dump(alarms, f, indent=2)
-        print(f"[DEBUG] Alarm saved to {ALARM_FILE}")
+        alarm_id = get_alarm_store().add("alarm", alarm_time_bst, session_id=session_id)
+        print(f"[DEBUG] Alarm #{alarm_id} saved")
+        return alarm_id
     except Exception as e:
         print(f"[ERROR] Error saving alarm: {e}")
+    return None
 
 def parse_time_from_text(text: str) -> Optional[datetime.datetime]:
     print(f"[DEBUG] parse_time_from_text called with '{text}'")
-    # Use dateparser for robust natural language parsing
-    parsed_time = dateparser.parse(
-        text,
-        settings={
-            'TIMEZONE': 'Europe/London',
-            'RETURN_AS_TIMEZONE_AWARE': True,
-            'PREFER_DATES_FROM': 'future'
-        }
-    )
+    # Common forms (and Wit ISO values) parse directly; dateparser for the rest
+    parsed_time = time_parser.parse(text)
     if parsed_time:
         parsed_time = parsed_time.astimezone(BST)
-        print(f"[DEBUG] dateparser matched: {parsed_time}")
+        print(f"[DEBUG] time_parser matched: {parsed_time}")
         return parsed_time
 
-    print("[DEBUG] dateparser found no match")
+    print("[DEBUG] time_parser found no match")
     return None
 
-async def trigger_alarm_after_delay(delay_seconds: float):
+async def trigger_alarm_after_delay(delay_seconds: float, alarm_id: Optional[int] = None):
     print(f"[DEBUG] >>>>> ENTERED trigger_alarm_after_delay at {datetime.datetime.now(BST)}")
     print(f"[DEBUG] Alarm scheduled in {delay_seconds} seconds")
     await asyncio.sleep(delay_seconds)
     print("[DEBUG] Woke up from sleep, triggering alarm actions...")
+    if alarm_id is not None:
+        try:
+            if not get_alarm_store().claim(alarm_id):
+                print(f"[DEBUG] Alarm #{alarm_id} already fired or deleted elsewhere")
+                return
+        except Exception as e:
+            print(f"[ERROR] Could not claim alarm #{alarm_id}: {e}")
+    await fire_alarm()
 
+async def fire_alarm(item: Optional[dict] = None):
+    """Notification + sound. The caller has already claimed the alarm."""
     try:
         print("[DEBUG] Sending notification...")
         notification.notify(
@@ -94,19 +115,9 @@ async def trigger_alarm_after_delay(delay_seconds: float):
         print(f"[ERROR] Notification error: {e}")
 
     try:
-        print("[DEBUG] Initializing pygame mixer...")
-        pygame.mixer.init()
-        print("[DEBUG] Pygame mixer initialized.")
         if ALARM_SOUND.exists():
-            print(f"[DEBUG] Alarm sound file exists: {ALARM_SOUND}")
-            pygame.mixer.music.load(str(ALARM_SOUND))
-            print("[DEBUG] Alarm sound loaded.")
-            pygame.mixer.music.play()
+            await get_audio_service().play("alarm", priority=PRIORITY_ALARM)
             print("🔊 Playing alarm sound...")
-            while pygame.mixer.music.get_busy():
-                print("[DEBUG] Music is playing...")
-                await asyncio.sleep(0.1)
-            print("[DEBUG] Music finished.")
         else:
             print(f"[ERROR] Alarm sound file not found: {ALARM_SOUND}")
     except Exception as e:
@@ -159,10 +170,10 @@ async def set_alarm(text: str, entities: dict, session_id: str, context: dict) -
                 "session_id": session_id
             }
 
-        save_alarm(alarm_time)
+        alarm_id = save_alarm(alarm_time, session_id)
         print("[DEBUG] Creating asyncio task for alarm...")
         # --- PATCH: store all scheduled alarm tasks!
-        t = asyncio.create_task(trigger_alarm_after_delay(delay))
+        t = asyncio.create_task(trigger_alarm_after_delay(delay, alarm_id))
         save_alarm_task(t)
         print("[DEBUG] Alarm task created.")
 
@@ -187,22 +198,25 @@ async def set_alarm(text: str, entities: dict, session_id: str, context: dict) -
         }
 
 async def schedule_existing_alarms():
-    alarms = load_alarms()
+    store = get_alarm_store()
+    removed = store.purge_past()
+    if removed:
+        print(f"[DEBUG] Removed {removed} past/fired schedule entries")
+    alarms = store.list_pending("alarm")
     now = datetime.datetime.now(BST)
-    print(f"[DEBUG] Scheduling all existing alarms: {alarms}")
-    for alarm_str in alarms:
+    print(f"[DEBUG] Scheduling all existing alarms: {[a['time'] for a in alarms]}")
+    for alarm in alarms:
         try:
-            alarm_time = datetime.datetime.fromisoformat(alarm_str)
-            alarm_time = alarm_time.astimezone(BST)
+            alarm_time = datetime.datetime.fromisoformat(alarm["time"]).astimezone(BST)
             delay = (alarm_time - now).total_seconds()
             if delay > 0:
                 print(f"[DEBUG] Scheduling alarm for {alarm_time} (in {delay} seconds)")
-                t = asyncio.create_task(trigger_alarm_after_delay(delay))
+                t = asyncio.create_task(trigger_alarm_after_delay(delay, alarm["id"]))
                 save_alarm_task(t)
             else:
                 print(f"[DEBUG] Skipping past alarm: {alarm_time}")
         except Exception as e:
-            print(f"[ERROR] Could not parse alarm time: {alarm_str}, error: {e}")
+            print(f"[ERROR] Could not parse alarm time: {alarm.get('time')}, error: {e}")
 
 # Example for test only
 async def main():
@@ -0,0 +1,377 @@
+"""
+audio_service.py
+
+One long-lived audio output service for alarms, reminders and TTS.
+
+- Owns the pygame mixer for the whole process (init once, quit on shutdown).
+- Keeps registered sounds (alarm.mp3, ...) decoded in memory.
+- Playback runs on a dedicated worker thread fed by a priority queue;
+  a higher-priority job (alarm) stops a lower-priority one (TTS) mid-play.
+- play() returns a PlaybackJob immediately; callers that need to know when
+  the sound ended can job.wait() / await job.wait_async().
+- submit_stream() plays raw PCM while it is still arriving: a feeder thread
+  copies chunks into an in-memory ring buffer and the worker queues ~100 ms
+  blocks on a mixer channel, so the first audio starts after the first chunk.
+
+Tests (and headless boxes) can run it on SDL's dummy driver:
+    AudioService(driver="dummy")  or  CHAPO_AUDIO_DRIVER=dummy
+
+Usage Example:
+    from chapo_engines.audio_service import get_audio_service, PRIORITY_ALARM
+
+    audio = get_audio_service()
+    audio.register("alarm", ALARM_SOUND)
+    job = await audio.play("alarm", priority=PRIORITY_ALARM)
+"""
+
+import asyncio
+import heapq
+import io
+import itertools
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pygame
+
+# Lower number = more important
+PRIORITY_ALARM = 0
+PRIORITY_REMINDER = 1
+PRIORITY_TTS = 2
+
+POLL_INTERVAL = 0.05  # seconds between "still playing / preempted?" checks
+
+# Mixer output format; streamed PCM is converted to this
+MIXER_FREQUENCY = 44100
+MIXER_CHANNELS = 2
+
+STREAM_BLOCK_SECONDS = 0.1
+RING_BUFFER_SECONDS = 10
+
+
+class PcmRingBuffer:
+    """
+    Fixed-size byte ring buffer between a producer (network chunks) and the
+    audio worker. write() blocks when full; read() blocks until data arrives
+    or the producer calls close().
+
+    Reads come out in whole frames (`frame_bytes`, 2 for int16 mono): network
+    chunks can have any length, and a read ending mid-sample would shift every
+    later sample by one byte. A partial frame stays buffered until the rest
+    of it arrives; only the tail of a closed stream can be shorter.
+    """
+
+    def __init__(self, capacity: int, frame_bytes: int = 2):
+        self._buf = bytearray(capacity)
+        self._capacity = capacity
+        self._frame = frame_bytes
+        self._start = 0
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            with self._cond:
+                while self._size == self._capacity and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                end = (self._start + self._size) % self._capacity
+                n = min(len(view), self._capacity - self._size, self._capacity - end)
+                self._buf[end:end + n] = view[:n]
+                self._size += n
+                view = view[n:]
+                self._cond.notify_all()
+
+    def read(self, n: int, timeout: float = None):
+        """Up to n bytes in whole frames; b"" on timeout; None once closed and drained."""
+        with self._cond:
+            if self._size < self._frame and not self._closed:
+                self._cond.wait(timeout)
+            if not self._size:
+                return None if self._closed else b""
+            n = min(n, self._size)
+            if n < self._size or not self._closed:
+                n -= n % self._frame
+            if not n:
+                return b""
+            first = min(n, self._capacity - self._start)
+            out = bytes(self._buf[self._start:self._start + first]) + bytes(self._buf[:n - first])
+            self._start = (self._start + n) % self._capacity
+            self._size -= n
+            self._cond.notify_all()
+            return out
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class PcmStream:
+    """16-bit little-endian mono PCM arriving from an iterator of chunks."""
+
+    def __init__(self, chunks, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.ring = PcmRingBuffer(sample_rate * 2 * RING_BUFFER_SECONDS)
+        self.error = None
+        self._feeder = threading.Thread(target=self._feed, args=(chunks,), daemon=True)
+
+    def start(self):
+        self._feeder.start()
+
+    def _feed(self, chunks):
+        try:
+            for chunk in chunks:
+                if chunk:
+                    self.ring.write(chunk)
+        except Exception as e:
+            self.error = e
+            logging.error(f"[AUDIO] Stream source failed: {e}")
+        finally:
+            self.ring.close()
+
+
+def pcm_to_mixer(pcm: bytes, sample_rate: int) -> bytes:
+    """Converts mono int16 PCM at `sample_rate` to the mixer's rate and channel count."""
+    samples = np.frombuffer(pcm[: len(pcm) - len(pcm) % 2], dtype=np.int16)
+    if sample_rate != MIXER_FREQUENCY and len(samples):
+        n_out = int(len(samples) * MIXER_FREQUENCY / sample_rate)
+        idx = (np.arange(n_out) * sample_rate // MIXER_FREQUENCY).astype(np.int64)
+        samples = samples[idx]
+    return np.repeat(samples, MIXER_CHANNELS).tobytes()
+
+
+class PlaybackJob:
+    """A queued or playing sound. `done` is set when it finishes, fails or is preempted."""
+
+    def __init__(self, source, priority, volume):
+        self.source = source
+        self.priority = priority
+        self.volume = volume
+        self.done = threading.Event()
+        self.preempted = False
+        self.error = None
+        self.submitted_at = time.perf_counter()
+        self.first_audio_at = None  # perf_counter() when the first sample hit the mixer
+
+    @property
+    def time_to_first_audio(self):
+        if self.first_audio_at is None:
+            return None
+        return self.first_audio_at - self.submitted_at
+
+    def wait(self, timeout=None) -> bool:
+        return self.done.wait(timeout)
+
+    async def wait_async(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.done.wait)
+
+    def cancel(self):
+        """Stops the job if it is playing, or skips it if still queued."""
+        self.preempted = True
+
+
+class AudioService:
+    def __init__(self, volume: float = 0.6, driver: str = None):
+        self.volume = volume
+        self.driver = driver or os.getenv("CHAPO_AUDIO_DRIVER")
+        self._registry = {}   # key -> path
+        self._sounds = {}     # key -> decoded pygame.mixer.Sound
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._current = None
+
+    # ---------- Lifecycle ----------
+    def start(self):
+        """Initialises the mixer once and starts the playback thread (idempotent)."""
+        with self._cond:
+            if self._running:
+                return
+            if self.driver:
+                os.environ["SDL_AUDIODRIVER"] = self.driver
+            if not pygame.mixer.get_init():
+                pygame.mixer.init(frequency=MIXER_FREQUENCY, size=-16, channels=MIXER_CHANNELS)
+            for key, path in self._registry.items():
+                self._decode(key, path)
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="chapo-audio", daemon=True)
+            self._thread.start()
+        logging.info("🔊 AudioService started.")
+
+    def shutdown(self):
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            if self._current:
+                self._current.preempted = True
+            self._cond.notify_all()
+        self._thread.join(timeout=2)
+        for _, _, job in self._heap:
+            job.done.set()
+        self._heap.clear()
+        pygame.mixer.quit()
+
+    # ---------- Sound bank ----------
+    def register(self, key: str, path):
+        """Registers a sound file to keep decoded in memory under `key`."""
+        path = Path(path)
+        with self._cond:
+            self._registry[key] = path
+            if self._running:
+                self._decode(key, path)
+
+    def _decode(self, key, path):
+        if not path.exists():
+            logging.warning(f"[AUDIO] Sound file not found for '{key}': {path}")
+            return
+        try:
+            self._sounds[key] = pygame.mixer.Sound(str(path))
+        except Exception as e:
+            logging.error(f"[AUDIO] Could not decode '{key}' ({path}): {e}")
+
+    # ---------- Playback ----------
+    def submit(self, source, priority: int = PRIORITY_TTS, volume: float = None) -> PlaybackJob:
+        """
+        Queues `source` and returns at once. `source` is a registered key,
+        a file path, or encoded audio bytes (e.g. MP3 from ElevenLabs).
+        """
+        self.start()
+        job = PlaybackJob(source, priority, self.volume if volume is None else volume)
+        with self._cond:
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self._cond.notify_all()
+        return job
+
+    def submit_stream(self, chunks, sample_rate: int, priority: int = PRIORITY_TTS,
+                      volume: float = None) -> PlaybackJob:
+        """
+        Queues PCM that is still being produced (e.g. the ElevenLabs `convert`
+        iterator with a pcm_* output format). Chunks are pulled on a feeder
+        thread right away, so download overlaps with whatever is playing now.
+        """
+        stream = PcmStream(chunks, sample_rate)
+        stream.start()
+        return self.submit(stream, priority, volume)
+
+    async def play(self, source, priority: int = PRIORITY_TTS, volume: float = None) -> PlaybackJob:
+        """Async front door for submit(); never waits for playback."""
+        return self.submit(source, priority, volume)
+
+    def stop_all(self):
+        """Stops what is playing and drops everything queued."""
+        with self._cond:
+            if self._current:
+                self._current.preempted = True
+            for _, _, job in self._heap:
+                job.preempted = True
+                job.done.set()
+            self._heap.clear()
+            self._cond.notify_all()
+
+    def _resolve(self, source):
+        if isinstance(source, str) and source in self._sounds:
+            return self._sounds[source]
+        if isinstance(source, (bytes, bytearray)):
+            return pygame.mixer.Sound(file=io.BytesIO(source))
+        return pygame.mixer.Sound(str(source))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                _, _, job = heapq.heappop(self._heap)
+                if job.preempted:
+                    job.done.set()
+                    continue
+                self._current = job
+            try:
+                self._play(job)
+            except Exception as e:
+                job.error = e
+                logging.error(f"[AUDIO] Playback failed: {e}")
+            finally:
+                with self._cond:
+                    self._current = None
+                job.done.set()
+
+    def _play(self, job):
+        if isinstance(job.source, PcmStream):
+            return self._play_stream(job)
+        sound = self._resolve(job.source)
+        channel = sound.play()
+        if channel is None:
+            raise RuntimeError("no free mixer channel")
+        job.first_audio_at = time.perf_counter()
+        channel.set_volume(job.volume)
+        while channel.get_busy():
+            if self._should_stop(job):
+                channel.stop()
+                return
+            with self._cond:
+                self._cond.wait(POLL_INTERVAL)
+
+    def _should_stop(self, job):
+        with self._cond:
+            outranked = self._heap and self._heap[0][0] < job.priority
+            if outranked or job.preempted or not self._running:
+                job.preempted = True
+                return True
+        return False
+
+    def _play_stream(self, job):
+        stream = job.source
+        block_bytes = int(stream.sample_rate * STREAM_BLOCK_SECONDS) * 2
+        channel = pygame.mixer.find_channel(True)
+        channel.set_volume(job.volume)
+        drained = False
+        try:
+            while not drained or channel.get_busy():
+                if self._should_stop(job):
+                    channel.stop()
+                    return
+                if drained or channel.get_queue() is not None:
+                    with self._cond:
+                        self._cond.wait(POLL_INTERVAL / 2)
+                    continue
+                block = stream.ring.read(block_bytes, timeout=POLL_INTERVAL)
+                if block is None:
+                    drained = True
+                    continue
+                if len(block) < 2:
+                    continue  # empty poll, or a closed stream's half-sample tail
+                sound = pygame.mixer.Sound(buffer=pcm_to_mixer(block, stream.sample_rate))
+                if channel.get_busy():
+                    channel.queue(sound)
+                else:
+                    channel.play(sound)
+                    if job.first_audio_at is None:
+                        job.first_audio_at = time.perf_counter()
+            if stream.error:
+                job.error = stream.error
+        finally:
+            stream.ring.close()
+
+
+# --- Shared instance for the whole process ---
+_audio_service = None
+
+
+def get_audio_service() -> AudioService:
+    global _audio_service
+    if _audio_service is None:
+        _audio_service = AudioService()
+    return _audio_service
@@ -1,14 +1,29 @@
 # chapo_engines/calendar_auth.py
+#
+# Google Calendar credentials for the calendar sync (chapo_engines/calendar_sync.py).
+#
+# One CredentialManager per process:
+# - the token is read from GOOGLE_TOKEN_FILE once and kept in memory;
+# - the discovery-based service client is built once per access token and
+#   reused, not rebuilt on every call;
+# - a timer refreshes the access token REFRESH_MARGIN_S before it expires,
+#   so a sync never waits on a refresh;
+# - with no usable token, service() returns None right away and starts the
+#   device-code flow as an asyncio task (on the running loop, or a loop of
+#   its own in a daemon thread). Nothing waits for the user to approve:
+#   calendar writes stay queued in the calendar outbox and the callbacks
+#   registered with on_authorized() (the sync's kick) run once they do.
 
 import os
 import json
 import time
+import asyncio
+import logging
+import threading
 import requests
 from dotenv import load_dotenv
 from pathlib import Path
 from chapo_engines.tts_util import speak
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
 
 load_dotenv()
 
@@ -26,107 +41,256 @@ GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 DEVICE_AUTH_URL = "https://oauth2.googleapis.com/device/code"
 TOKEN_URL = "https://oauth2.googleapis.com/token"
 
-def get_google_calendar_service():
-    # ✅ Step 1: Load token if it exists
-    if GOOGLE_TOKEN_FILE.exists():
-        with open(GOOGLE_TOKEN_FILE, "r") as token_file:
-            token_data = json.load(token_file)
-            if not is_token_expired(token_data):
-                return build_calendar_service(token_data)
-            else:
-                refresh_token = token_data.get("refresh_token")
-                if refresh_token:
-                    token_data = refresh_access_token(refresh_token)
-                    if token_data:
-                        return build_calendar_service(token_data)
-
-    # 🟡 Step 2: Start Device OAuth Flow
-    speak("Initiating calendar connection...")
-
-    device_payload = {
-        "client_id": GOOGLE_CLIENT_ID,
-        "scope": " ".join(SCOPES)
-    }
-
-    response = requests.post(DEVICE_AUTH_URL, data=device_payload)
-    if response.status_code != 200:
-        speak("Failed to contact Google for authentication.")
-        print("Error:", response.text)
-        return None
+REFRESH_MARGIN_S = 300       # refresh this long before the access token expires
+INLINE_REFRESH_S = 10       # a caller refreshes itself only this close to expiry (the timer failed)
+DEVICE_FLOW_RETRY_S = 900    # don't ask again on our own sooner than this after a flow ended
+HTTP_TIMEOUT_S = 10
 
-    data = response.json()
-    user_code = data["user_code"]
-    verification_url = data["verification_url"]
-    interval = data.get("interval", 5)
-    device_code = data["device_code"]
-
-    speak(f"To link your calendar, go to google dot com slash device and enter the code: {user_code}")
-    print(f"[Google OAuth] Visit {verification_url} and enter code: {user_code}")
-
-    # 🔁 Step 3: Poll for user approval
-    while True:
-        time.sleep(interval)
-        token_response = requests.post(
-            TOKEN_URL,
-            data={
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "device_code": device_code,
-                "grant_type": "urn:ietf:params:oauth:grant-type:device_code"
-            }
-        )
-
-        if token_response.status_code == 200:
-            token_data = token_response.json()
-            token_data["created_at"] = time.time()
-
-            with open(GOOGLE_TOKEN_FILE, "w") as token_file:
-                json.dump(token_data, token_file)
 
-            speak("✅ Calendar connected successfully.")
-            return build_calendar_service(token_data)
+def build_calendar_service(token_data, client_id=None, client_secret=None, token_uri=TOKEN_URL):
+    from googleapiclient.discovery import build
+    from google.oauth2.credentials import Credentials
 
-        elif token_response.status_code in [428, 403]:
-            continue  # Still waiting for user to authorize
+    creds = Credentials(
+        token=token_data["access_token"],
+        refresh_token=token_data.get("refresh_token"),
+        token_uri=token_uri,
+        client_id=client_id or GOOGLE_CLIENT_ID,
+        client_secret=client_secret or GOOGLE_CLIENT_SECRET
+    )
+    return build("calendar", "v3", credentials=creds, cache_discovery=False)
 
-        else:
-            speak("❌ Authentication failed. Please try again.")
-            print("Auth Error:", token_response.text)
-            return None
 
-def is_token_expired(token_data):
+def expires_at(token_data):
     expires_in = token_data.get("expires_in")
-    issued_at = token_data.get("created_at", 0)
-    return time.time() > issued_at + expires_in if expires_in else True
-
-def refresh_access_token(refresh_token):
-    response = requests.post(
-        TOKEN_URL,
-        data={
-            "client_id": GOOGLE_CLIENT_ID,
-            "client_secret": GOOGLE_CLIENT_SECRET,
-            "refresh_token": refresh_token,
-            "grant_type": "refresh_token"
-        }
-    )
-    if response.status_code == 200:
-        token_data = response.json()
+    return token_data.get("created_at", 0) + expires_in if expires_in else 0
+
+
+def is_token_expired(token_data, margin=0):
+    return time.time() + margin > expires_at(token_data)
+
+
+class CredentialManager:
+    def __init__(self, token_file=GOOGLE_TOKEN_FILE, client_id=None, client_secret=None,
+                 device_auth_url=DEVICE_AUTH_URL, token_url=TOKEN_URL, builder=build_calendar_service,
+                 announce=speak, refresh_margin=REFRESH_MARGIN_S):
+        self.token_file = Path(token_file)
+        self.client_id = client_id or GOOGLE_CLIENT_ID
+        self.client_secret = client_secret or GOOGLE_CLIENT_SECRET
+        self.device_auth_url = device_auth_url
+        self.token_url = token_url
+        self.builder = builder
+        self.announce = announce
+        self.refresh_margin = refresh_margin
+        self._lock = threading.RLock()
+        self._token = self._load()
+        self._service = None
+        self._service_token = None   # access token the cached service was built with
+        self._device_flow = None     # asyncio task or thread while the user is being asked
+        self._device_flow_started = 0.0
+        self._timer = None
+        self._callbacks = []
+        if self._token:
+            self._schedule_refresh()
+
+    # ---------- Token ----------
+    def _load(self):
+        try:
+            with open(self.token_file, "r") as token_file:
+                return json.load(token_file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"[CALENDAR AUTH] Could not read {self.token_file}: {e}")
+            return None
+
+    def _save(self, token_data):
         token_data["created_at"] = time.time()
-        with open(GOOGLE_TOKEN_FILE, "w") as token_file:
-            json.dump(token_data, token_file)
-        speak("🔄 Calendar token refreshed.")
-        return token_data
-    else:
-        speak("❌ Failed to refresh calendar token.")
-        print("Refresh Error:", response.text)
+        with self._lock:
+            if "refresh_token" not in token_data and self._token:
+                token_data["refresh_token"] = self._token.get("refresh_token")  # refreshes don't resend it
+            self._token = token_data
+            with open(self.token_file, "w") as token_file:
+                json.dump(token_data, token_file)
+        self._schedule_refresh()
+
+    def token(self):
+        """The current token, refreshed first if it is (about to be) expired; None when there is none."""
+        with self._lock:
+            token = self._token
+        if token and is_token_expired(token, margin=min(self.refresh_margin, INLINE_REFRESH_S)):
+            token = self.refresh() if token.get("refresh_token") else None
+        return token
+
+    def refresh(self):
+        """Trades the refresh token for a new access token. Returns the new token or None."""
+        with self._lock:
+            refresh_token = (self._token or {}).get("refresh_token")
+        if not refresh_token:
+            return None
+        try:
+            response = requests.post(self.token_url, data={
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "refresh_token": refresh_token,
+                "grant_type": "refresh_token"
+            }, timeout=HTTP_TIMEOUT_S)
+        except requests.RequestException as e:
+            logging.warning(f"[CALENDAR AUTH] Refresh failed: {e}")
+            return None
+        if response.status_code == 200:
+            self._save(response.json())
+            logging.info("[CALENDAR AUTH] Calendar token refreshed.")
+            return self._token
+        logging.error(f"[CALENDAR AUTH] Refresh rejected: {response.text}")
+        if response.status_code in (400, 401):  # revoked: ask the user again
+            with self._lock:
+                self._token = None
         return None
 
-def build_calendar_service(token_data):
-    creds = Credentials(
-        token=token_data["access_token"],
-        refresh_token=token_data.get("refresh_token"),
-        token_uri=TOKEN_URL,
-        client_id=GOOGLE_CLIENT_ID,
-        client_secret=GOOGLE_CLIENT_SECRET
-    )
-    return build("calendar", "v3", credentials=creds)
+    def _schedule_refresh(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            if not (self._token and self._token.get("refresh_token")):
+                self._timer = None
+                return
+            delay = max(0.0, expires_at(self._token) - self.refresh_margin - time.time())
+            self._timer = threading.Timer(delay, self.refresh)
+            self._timer.daemon = True
+            self._timer.start()
+
+    # ---------- Service ----------
+    def service(self):
+        """The calendar service, or None (device-code flow started) until the user has linked Google."""
+        token = self.token()
+        if token is None:
+            if self._device_flow is None or time.time() - self._device_flow_started > DEVICE_FLOW_RETRY_S:
+                self.start_device_flow()
+            return None
+        with self._lock:
+            if self._service is None or self._service_token != token["access_token"]:
+                self._service = self.builder(token)
+                self._service_token = token["access_token"]
+            return self._service
+
+    @property
+    def authorized(self) -> bool:
+        return self.token() is not None
+
+    def on_authorized(self, callback):
+        """Runs callback() each time the device-code flow completes."""
+        self._callbacks.append(callback)
+
+    # ---------- Device-code flow ----------
+    def start_device_flow(self):
+        """Starts asking the user to link Google, unless that is already under way. Never blocks."""
+        with self._lock:
+            if self._device_flow is not None and not self._device_flow_done():
+                return self._device_flow
+            self._device_flow_started = time.time()
+            try:
+                self._device_flow = asyncio.get_running_loop().create_task(self.device_flow())
+            except RuntimeError:  # no loop on this thread (sync thread, voice loop): give it its own
+                self._device_flow = threading.Thread(
+                    target=lambda: asyncio.run(self.device_flow()), name="calendar-device-auth", daemon=True
+                )
+                self._device_flow.start()
+            return self._device_flow
+
+    def _device_flow_done(self):
+        flow = self._device_flow
+        return flow.done() if isinstance(flow, asyncio.Task) else not flow.is_alive()
+
+    async def device_flow(self):
+        """
+        Google's device-code grant: shows the user a code, then polls the
+        token endpoint every `interval` seconds without blocking the loop.
+        Returns the token, or None if the code was refused or expired.
+        """
+        try:
+            response = await asyncio.to_thread(requests.post, self.device_auth_url, data={
+                "client_id": self.client_id,
+                "scope": " ".join(SCOPES)
+            }, timeout=HTTP_TIMEOUT_S)
+        except requests.RequestException as e:
+            response = None
+            logging.error(f"[CALENDAR AUTH] Device code request failed: {e}")
+        if response is None or response.status_code != 200:
+            self.announce("Failed to contact Google for authentication.")
+            if response is not None:
+                logging.error(f"[CALENDAR AUTH] Device code request failed: {response.text}")
+            return None
+
+        data = response.json()
+        interval = data.get("interval", 5)
+        deadline = time.time() + data.get("expires_in", 1800)
+        self.announce(f"To link your calendar, go to google dot com slash device and enter the code: {data['user_code']}")
+        logging.info(f"[CALENDAR AUTH] Visit {data['verification_url']} and enter code: {data['user_code']}")
+
+        while time.time() < deadline:
+            await asyncio.sleep(interval)
+            try:
+                token_response = await asyncio.to_thread(requests.post, self.token_url, data={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "device_code": data["device_code"],
+                    "grant_type": "urn:ietf:params:oauth:grant-type:device_code"
+                }, timeout=HTTP_TIMEOUT_S)
+            except requests.RequestException as e:
+                logging.warning(f"[CALENDAR AUTH] Token poll failed, retrying: {e}")
+                continue
+
+            if token_response.status_code == 200:
+                self._save(token_response.json())
+                self.announce("✅ Calendar connected successfully.")
+                for callback in list(self._callbacks):
+                    try:
+                        callback()
+                    except Exception as e:
+                        logging.error(f"[CALENDAR AUTH] on_authorized callback failed: {e}")
+                return self._token
+
+            error = _error_code(token_response)
+            if error == "slow_down":
+                interval += 5
+            elif token_response.status_code in [428, 403] or error == "authorization_pending":
+                continue  # Still waiting for user to authorize
+            else:
+                self.announce("❌ Authentication failed. Please try again.")
+                logging.error(f"[CALENDAR AUTH] Auth error: {token_response.text}")
+                return None
+
+        self.announce("❌ The calendar link code expired. Ask me again to connect your calendar.")
+        return None
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+def _error_code(response):
+    try:
+        return response.json().get("error")
+    except ValueError:
+        return None
+
+
+# --- Shared instance (one per process) ---
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_credential_manager() -> CredentialManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = CredentialManager()
+        return _manager
+
+
+def get_google_calendar_service():
+    """The cached calendar service, or None while the device-code flow waits for the user."""
+    return get_credential_manager().service()
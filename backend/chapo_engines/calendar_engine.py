@@ -1,22 +1,32 @@
 # chapo_engines/calendar_engine.py
+#
+# Events are written to the local mirror (db/calendar_store.py) and queued
+# for Google in its outbox; chapo_engines/calendar_sync.py sends them and
+# pulls Google's changes in the background, so no voice turn waits on the
+# Calendar API and "what's on my calendar" is answered locally.
 
-from chapo_engines.calendar_auth import get_google_calendar_service
 from chapo_engines.tts_util import speak
+from chapo_engines.tracing import traced
 from datetime import datetime, timedelta
-from dateparser.search import search_dates
-import dateparser
+from chapo_engines import time_parser
+from chapo_engines.calendar_sync import get_calendar_sync
+from db.calendar_store import get_calendar_store
 import pytz
 import re
-import json
 from pathlib import Path
 from dateutil.relativedelta import relativedelta, MO, TU, WE, TH, FR, SA, SU
 
 CALENDAR_FILE = Path(__file__).parent / "calendar_events.json"
 LONDON = pytz.timezone("Europe/London")
 
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
 class CalendarEngine:
-    def __init__(self):
-        self.service = get_google_calendar_service()
+    def __init__(self, store=None, sync=None):
+        self.store = store or get_calendar_store()
+        self.sync = sync or get_calendar_sync()
+        # legacy calendar_events.json -> the mirror, once
+        self.store.migrate_json("calendar_events.json", CALENDAR_FILE)
 
     def normalize_spoken_time(self, text):
         time_words = {
@@ -68,13 +78,10 @@ class CalendarEngine:
             return LONDON.localize(dt)
         return dt.astimezone(LONDON)
 
+    @traced("engine.calendar")
     def add_event(self, user_text, entities=None):
-        if not self.service:
-            speak("❌ Calendar service not available.")
-            return
-
         normalized_text = self.normalize_spoken_time(user_text)
-        found = search_dates(normalized_text, settings={'PREFER_DATES_FROM': 'future'})
+        found = time_parser.search(normalized_text)  # fast path, else dateparser's search_dates
         start_time = None
         now = datetime.now(LONDON)
         time_was_explicit = False
@@ -174,37 +181,45 @@ class CalendarEngine:
                 else:
                     event_summary = "Meeting"
 
-        event = {
-            'summary': event_summary,
-            'start': {
-                'dateTime': start_time.isoformat(),
-                'timeZone': 'Europe/London'
-            },
-            'end': {
-                'dateTime': end_time.isoformat(),
-                'timeZone': 'Europe/London'
-            },
-        }
-
         try:
-            self.service.events().insert(calendarId='primary', body=event).execute()
-
-            local_event = {
-                "name": event_summary,
-                "start": start_time.isoformat(),
-                "end": end_time.isoformat()
-            }
-            events = []
-            if CALENDAR_FILE.exists():
-                with open(CALENDAR_FILE, "r", encoding="utf-8") as f:
-                    events = json.load(f)
-            events.append(local_event)
-            with open(CALENDAR_FILE, "w", encoding="utf-8") as f:
-                json.dump(events, f, indent=2)
-
+            # local write + outbox row in one transaction; Google gets it from the sync thread
+            self.store.add(event_summary, start_time, end_time)
+            self.sync.kick()
             speak(f"📅 I've added {event_summary} for {start_time.strftime('%A at %I:%M %p')}.")
         except Exception as e:
             print("[Calendar Error]", e)
             speak("❌ Failed to save the event to your calendar.")
 
-calendar_engine = CalendarEngine()
+    def day_from_text(self, text, now=None):
+        """The day a "what's on" question is about: today, tomorrow or a weekday (default today)."""
+        now = now or datetime.now(LONDON)
+        lowered = (text or "").lower()
+        if "tomorrow" in lowered:
+            return (now + timedelta(days=1)).date()
+        for i, name in enumerate(WEEKDAYS):
+            if name in lowered:
+                return (now + timedelta(days=(i - now.weekday()) % 7)).date()
+        return now.date()
+
+    @traced("engine.calendar.events_on")
+    def events_on(self, day):
+        """Events overlapping one London day, from the local mirror."""
+        start = LONDON.localize(datetime.combine(day, datetime.min.time()))
+        end = LONDON.localize(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+        return self.store.between(start, end)
+
+    def whats_on(self, user_text, now=None):
+        if self.store.sync_token() is not None:
+            self.sync.kick()  # already linked: pick up Google-side changes for next time
+        day = self.day_from_text(user_text, now)
+        today = (now or datetime.now(LONDON)).date()
+        label = "today" if day == today else "tomorrow" if day == today + timedelta(days=1) else day.strftime("%A")
+        events = self.events_on(day)
+        if not events:
+            return f"📅 Nothing on your calendar {label}."
+        items = [
+            f"{event['summary']} at {datetime.fromisoformat(event['start']).astimezone(LONDON).strftime('%I:%M %p')}"
+            for event in events
+        ]
+        return f"📅 {label.capitalize()} you have: " + "; ".join(items) + "."
+
@@ -0,0 +1,210 @@
+"""
+calendar_sync.py
+
+Keeps the local calendar mirror (db/calendar_store.py) and Google in step,
+off the voice turn.
+
+- push: outbox rows are sent with events().insert() and marked pushed.
+  The insert carries its own event id (google_event_id: the database's
+  device key + the local id), so a retry after a lost response or a crash
+  before mark_pushed gets 409 Conflict instead of creating a duplicate;
+  409 counts as pushed. Any other failure leaves the row in the outbox
+  with an exponential backoff (RETRY_BASE_S doubling, capped at
+  RETRY_MAX_S).
+  Until Google is linked (chapo_engines/calendar_auth.py) nothing is
+  claimed: rows wait in the outbox and go out when the link completes.
+- pull: events().list() with the stored sync token only returns what
+  changed since the last pull; the new token is saved with the last page.
+  A 410 Gone (token expired) drops the token and does one full pull.
+
+One daemon thread per process runs both: right away when kick() is called
+(CalendarEngine.add_event does, after writing the event locally), else
+every POLL_SECONDS. Outbox rows are claimed in the store, so with several
+server processes each row is still sent once.
+
+Usage Example:
+    from chapo_engines.calendar_sync import get_calendar_sync
+
+    sync = get_calendar_sync()
+    sync.start()
+    sync.kick()        # push now
+    sync.sync_once()   # one push + pull, on the calling thread
+"""
+
+import logging
+import os
+import threading
+import time
+
+from db.calendar_store import get_calendar_store
+
+POLL_SECONDS = float(os.getenv("CHAPO_CALENDAR_SYNC_S", "300"))
+RETRY_BASE_S = 5.0
+RETRY_MAX_S = 900.0
+CLAIM_LEASE_S = 60.0
+
+
+def _google_service():
+    from chapo_engines.calendar_auth import get_google_calendar_service
+    return get_google_calendar_service()
+
+
+def _on_google_linked(callback):
+    from chapo_engines.calendar_auth import get_credential_manager
+    get_credential_manager().on_authorized(callback)
+
+
+def google_event_id(device_key: str, event_id: int) -> str:
+    """The id we give Google for a local event: lowercase hex, valid base32hex as the API requires."""
+    return f"{device_key}{event_id:x}"
+
+
+def _http_status(error):
+    """HTTP status of a googleapiclient HttpError (or anything shaped like one), else None."""
+    return getattr(getattr(error, "resp", None), "status", None)
+
+
+class CalendarSync:
+    def __init__(self, store=None, service_factory=_google_service, calendar_id="primary", poll_seconds=POLL_SECONDS):
+        self.store = store or get_calendar_store()
+        self.service_factory = service_factory
+        self.calendar_id = calendar_id
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._linked = True  # as of the last push; until then, assume so
+
+    @property
+    def service(self):
+        return self.service_factory()  # cached by the credential manager; None until Google is linked
+
+    # ---------- Push ----------
+    def push(self, now: float = None) -> int:
+        """Sends every due outbox row. Returns how many are now on Google."""
+        now = time.time() if now is None else now
+        service = self.service
+        self._linked = service is not None
+        if service is None:
+            return 0  # not linked yet: the outbox stays queued until on_authorized kicks us
+        pushed = 0
+        device_key = None
+        for item in self.store.claim_outbox(now, lease=CLAIM_LEASE_S):
+            device_key = device_key or self.store.device_key()
+            google_id = google_event_id(device_key, item["id"])
+            try:
+                if item["op"] != "insert":
+                    raise ValueError(f"unknown outbox op {item['op']!r}")
+                body = {
+                    "id": google_id,
+                    "summary": item["summary"],
+                    "start": {"dateTime": item["start"], "timeZone": "Europe/London"},
+                    "end": {"dateTime": item["end"], "timeZone": "Europe/London"},
+                }
+                created = service.events().insert(calendarId=item["calendar_id"], body=body).execute()
+            except Exception as e:
+                if _http_status(e) == 409:
+                    # an earlier attempt got through; its response (or our mark_pushed) was lost
+                    logging.info(f"[CALENDAR] Event #{item['id']} was already pushed as {google_id}")
+                    self.store.mark_pushed(item["outbox_id"], item["id"], google_id)
+                    pushed += 1
+                    continue
+                delay = min(RETRY_BASE_S * 2 ** item["attempts"], RETRY_MAX_S)
+                logging.warning(f"[CALENDAR] Push of event #{item['id']} failed ({e}); retrying in {delay:.0f}s")
+                self.store.retry_later(item["outbox_id"], str(e), delay, now)
+                continue
+            self.store.mark_pushed(item["outbox_id"], item["id"], created["id"], created.get("updated"))
+            pushed += 1
+        return pushed
+
+    # ---------- Pull ----------
+    def pull(self) -> int:
+        """Applies Google's changes since the last pull (all events the first time). Returns rows changed."""
+        service = self.service
+        if service is None:
+            return 0
+        token = self.store.sync_token(self.calendar_id)
+        try:
+            return self._pull(service, token)
+        except Exception as e:
+            if token is None or _http_status(e) != 410:
+                raise
+            logging.info("[CALENDAR] Sync token expired; doing a full sync")
+            self.store.reset_sync(self.calendar_id)
+            return self._pull(service, None)
+
+    def _pull(self, service, token):
+        changed, page_token, first = 0, None, True
+        while True:
+            params = {"calendarId": self.calendar_id, "showDeleted": True, "singleEvents": True}
+            if token:
+                params["syncToken"] = token
+            if page_token:
+                params["pageToken"] = page_token
+            page = service.events().list(**params).execute()
+            changed += self.store.apply_remote(
+                page.get("items", []), page.get("nextSyncToken"), self.calendar_id, full=first and not token
+            )
+            first = False
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return changed
+
+    def sync_once(self):
+        """One push then one pull; errors are logged, not raised."""
+        try:
+            self.push()
+        except Exception as e:
+            logging.error(f"[CALENDAR] Push failed: {e}")
+        try:
+            self.pull()
+        except Exception as e:
+            logging.error(f"[CALENDAR] Pull failed: {e}")
+
+    # ---------- Background thread ----------
+    def kick(self):
+        """Asks the background thread to sync now (starting it if needed). Never blocks."""
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="calendar-sync", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.clear()
+            self.sync_once()
+            self._wake.wait(self._next_wait())
+
+    def _next_wait(self):
+        """
+        Until the next poll, or sooner if an outbox retry comes due first.
+        While Google is unlinked queued rows are never claimed, so they stay
+        due: wait for the poll (or the kick from on_authorized) instead.
+        """
+        if not self._linked:
+            return self.poll_seconds
+        return min(self.poll_seconds, self.store.seconds_until_next_push())
+
+
+# --- Shared instance (one per process) ---
+_sync = None
+
+
+def get_calendar_sync() -> CalendarSync:
+    global _sync
+    if _sync is None:
+        _sync = CalendarSync()
+        _on_google_linked(_sync.kick)  # events queued while unlinked go out as soon as the user approves
+    return _sync
@@ -1,6 +1,8 @@
 import os
 import requests
 
+from chapo_engines.tracing import traced
+
 class CookingEngine:
     def __init__(self):
         from dotenv import load_dotenv
@@ -10,6 +12,7 @@ class CookingEngine:
         if not self.api_key:
             print("⚠️ SPOONACULAR_API_KEY not set in .env")
 
+    @traced("engine.cooking")
     def get_recipe(self, dish_name):
         if not self.api_key:
             return "❗ Recipe service is not available right now."
@@ -67,6 +70,7 @@ class CookingEngine:
             print(f"[get_recipe error]: {e}")
             return "❗ I had trouble finding that recipe. Please try again later."
 
+    @traced("engine.cooking")
     def suggest_recipe(self, ingredients):
         """
         Suggest up to 3 recipes using one or more ingredients.
@@ -2,6 +2,8 @@
 
 import random
 
+from chapo_engines.utterance import Utterance
+
 class EpisodicMemory:
     """Stores user facts, recent dialogue, etc."""
     def __init__(self):
@@ -63,7 +65,7 @@ class CoreConversationEngine:
         self.turns = []  # Stores recent dialog (for context/follow-up)
 
     def detect_intent(self, user_input):
-        user_input = user_input.lower()
+        user_input = Utterance.of(user_input).lowered
         if any(greet in user_input for greet in ["hello", "hi", "hey"]):
             return "greeting"
         if "how are you" in user_input:
@@ -80,24 +82,26 @@ class CoreConversationEngine:
         return "small_talk"
 
     def process(self, user_input):
+        utterance = Utterance.of(user_input)
+        lowered = utterance.lowered
         # Save utterance for context/episodic memory
-        self.turns.append({"user": user_input})
+        self.turns.append({"user": utterance.raw})
 
         # --- Episodic memory: capture name ---
-        if "my name is" in user_input.lower():
-            name = user_input.lower().split("my name is")[-1].strip().split()[0].capitalize()
+        if "my name is" in lowered:
+            name = lowered.split("my name is")[-1].strip().split()[0].capitalize()
             self.memory.remember("user_name", name)
             return f"Hi {name}, nice to meet you!"
 
         # --- Retrieve user name in response ---
         if self.memory.recall("user_name") and (
-            "how are you" in user_input.lower() or "hello" in user_input.lower() or "hi" in user_input.lower()
+            "how are you" in lowered or "hello" in lowered or "hi" in lowered
         ):
             name = self.memory.recall("user_name")
             return f"Hi {name}, I'm just a bunch of code, but I'm here to help!"
 
         # --- Intent detection ---
-        intent = self.detect_intent(user_input)
+        intent = self.detect_intent(utterance)
 
         # --- Personalized reply if possible ---
         if intent == "greeting" and self.memory.recall("user_name"):
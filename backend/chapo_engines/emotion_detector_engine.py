@@ -3,98 +3,148 @@
 """
 EmotionDetectorEngine
 ---------------------
-Detects and responds to user emotions based on simple keyword heuristics.
+Detects and responds to user emotions, scored by the word-level lexicon in
+chapo_engines/emotion_lexicon.py (word boundaries, weights, negation).
+Each session keeps its own last HISTORY_LEN emotions in a bounded deque;
+the least recently seen sessions are dropped past MAX_SESSIONS.
 
 Usage Example:
     from chapo_engines.emotion_detector_engine import EmotionDetectorEngine
 
     engine = EmotionDetectorEngine()
-    emotion = engine.detect_emotion("I feel sad today")
-    response = engine.generate_emotion_response()
+    emotion = engine.detect_emotion("I feel sad today", session_id="user_1")
+    response = engine.generate_emotion_response("user_1")
+    labels, scores = engine.detect_batch(logged_texts)   # log analytics, no history
 
 Author: [Your Name]
 Date: 2025-05-28
 """
 
 import random
+import threading
+from collections import OrderedDict, deque
+
+from chapo_engines.emotion_lexicon import NEUTRAL, get_lexicon
+
+HISTORY_LEN = 5
+MAX_SESSIONS = 1000
+DEFAULT_SESSION = "default"
+
 
 class EmotionDetectorEngine:
     """
-    Tracks user emotions and produces empathy-driven responses.
-    Emotion is detected from keywords in the user's input.
+    Tracks user emotions per session and produces empathy-driven responses.
+    Emotion is detected from the words in the user's input.
     """
 
-    def __init__(self):
-        self.current_emotion = "neutral"
-        self.emotion_history = []
-
-    def detect_emotion(self, text: str) -> str:
+    def __init__(self, lexicon=None, history_len=HISTORY_LEN, max_sessions=MAX_SESSIONS):
+        self.lexicon = lexicon or get_lexicon()
+        self.history_len = history_len
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> deque of recent emotions, least recently used first
+        self._lock = threading.Lock()
+
+    def history(self, session_id: str = DEFAULT_SESSION) -> deque:
+        """The session's recent emotions, oldest first (at most history_len)."""
+        with self._lock:
+            recent = self._sessions.get(session_id)
+            if recent is None:
+                recent = self._sessions[session_id] = deque(maxlen=self.history_len)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            return recent
+
+    def current(self, session_id: str = DEFAULT_SESSION) -> str:
+        recent = self._sessions.get(session_id)  # a read doesn't start a history
+        return recent[-1] if recent else NEUTRAL
+
+    @property
+    def current_emotion(self) -> str:
+        return self.current()
+
+    @property
+    def emotion_history(self) -> deque:
+        return self.history()
+
+    def scores(self, text) -> dict:
+        """Score per emotion for one text (str or Utterance); doesn't touch any history."""
+        return self.lexicon.scores(text)
+
+    def detect_emotion(self, text: str, session_id: str = DEFAULT_SESSION) -> str:
         """
-        Detects the user's emotion from keywords.
-        Updates emotion history.
-        :param text: User input text
+        Detects the user's emotion from the lexicon.
+        Updates the session's emotion history.
+        :param text: User input text (str or Utterance)
+        :param session_id: Whose history to update
         :return: Detected emotion string (e.g., 'sad', 'happy', etc.)
         """
-        text = text.lower()
-        emotion = "neutral"
-        if any(word in text for word in ["sad", "depressed", "unhappy", "lonely", "down", "blue"]):
-            emotion = "sad"
-        elif any(word in text for word in ["happy", "excited", "glad", "joyful", "great", "awesome"]):
-            emotion = "happy"
-        elif any(word in text for word in ["angry", "mad", "furious", "upset", "pissed"]):
-            emotion = "angry"
-        elif any(word in text for word in ["tired", "sleepy", "exhausted", "fatigued", "drained"]):
-            emotion = "tired"
-        elif any(word in text for word in ["anxious", "worried", "nervous", "stressed", "panicky"]):
-            emotion = "anxious"
-        elif any(word in text for word in ["okay", "fine", "alright", "neutral"]):
-            emotion = "neutral"
-        # Extend as needed
-
-        self.update_emotion(emotion)
+        emotion = self.lexicon.label(text)
+        self.update_emotion(emotion, session_id)
         return emotion
 
-    def update_emotion(self, new_emotion: str):
+    def detect_batch(self, texts):
+        """(labels, texts x emotions score matrix) for many texts at once; no history is updated."""
+        return self.lexicon.detect_batch(texts)
+
+    def update_emotion(self, new_emotion: str, session_id: str = DEFAULT_SESSION):
         """
-        Updates emotion history and current emotion.
-        Keeps only the last 5 entries.
+        Appends to the session's emotion history; the deque keeps only the
+        last history_len entries.
         :param new_emotion: Newly detected emotion
         """
-        self.emotion_history.append(new_emotion)
-        if len(self.emotion_history) > 5:
-            self.emotion_history.pop(0)
-        self.current_emotion = new_emotion
+        self.history(session_id).append(new_emotion)
 
-    def generate_emotion_response(self) -> str:
+    def to_state(self, session_id: str = DEFAULT_SESSION) -> dict:
+        """
+        Plain-dict snapshot of the tracked emotion, so per-session state can
+        live in a shared store instead of one global engine.
+        """
+        return {"current": self.current(session_id), "history": list(self.history(session_id))}
+
+    @classmethod
+    def from_state(cls, state: dict = None, session_id: str = DEFAULT_SESSION):
+        """Rebuilds an engine from to_state() output (None -> fresh, neutral engine)."""
+        engine = cls()
+        if state:
+            recent = engine.history(session_id)
+            recent.extend(state.get("history", []))
+            if not recent and state.get("current", NEUTRAL) != NEUTRAL:
+                recent.append(state["current"])
+        return engine
+
+    def generate_emotion_response(self, session_id: str = DEFAULT_SESSION) -> str:
         """
-        Produces a natural language response based on the latest detected emotion.
+        Produces a natural language response based on the session's latest detected emotion.
         :return: A chatbot reply string
         """
-        if self.current_emotion == "sad":
+        current_emotion = self.current(session_id)
+        if current_emotion == "sad":
             return random.choice([
                 "I'm here for you. Remember, tough times don't last.",
                 "Sending you a virtual hug. Want to talk about it?",
                 "You're not alone, and things can get better. Let me know if you want a distraction or a fun fact."
             ])
-        elif self.current_emotion == "happy":
+        elif current_emotion == "happy":
             return random.choice([
                 "I love seeing you in high spirits!",
                 "That's awesome! Keep enjoying your day!",
                 "Yay, your happiness is contagious!"
             ])
-        elif self.current_emotion == "angry":
+        elif current_emotion == "angry":
             return random.choice([
                 "That sounds frustrating. I'm here to listen if you want to talk.",
                 "Sometimes venting helps. Do you want to share more?",
                 "Take a deep breath. You're stronger than you think."
             ])
-        elif self.current_emotion == "tired":
+        elif current_emotion == "tired":
             return random.choice([
                 "Rest is important. Maybe take a short break if you can.",
                 "Take it easy—your well-being matters.",
                 "It's okay to pause and recharge. Let me know if I can help with anything."
             ])
-        elif self.current_emotion == "anxious":
+        elif current_emotion == "anxious":
             return random.choice([
                 "Let's take a deep breath together. You're not alone.",
                 "You're doing better than you think. Would a fun fact help distract you?",
@@ -0,0 +1,158 @@
+"""
+emotion_lexicon.py
+
+Word-level emotion scoring for EmotionDetectorEngine. Replaces the
+`any(word in text ...)` substring scans, which matched inside other words
+("down" in "download", "mad" in "made", "sad" in "crusade") and ignored
+"not".
+
+The lexicon is compiled once into token and two-word-phrase tables, each
+entry an (emotion, weight) pair. scores() walks the Utterance tokens
+once (the turn has already tokenized them) and returns one score per
+emotion:
+    - a phrase ("feeling down") is tried before its first word alone
+    - an intensifier ("so", "really") scales the next hit
+    - a negator ("not", "dont", "never") flips the next hit within
+      NEGATION_WINDOW tokens to -NEGATION_WEIGHT of its weight, so
+      "not happy" counts against happy instead of for it
+label() picks the highest positive score; ties go to the order of
+EMOTIONS (the order the old checks ran in), nothing positive is neutral.
+
+detect_batch() scores many texts at once for log analytics: one token
+walk fills (row, emotion, weight) arrays that numpy sums into a
+texts x emotions matrix.
+
+Usage Example:
+    from chapo_engines.emotion_lexicon import get_lexicon
+
+    lexicon = get_lexicon()
+    lexicon.scores("I'm not happy, just really tired")
+    # {'sad': 0.0, 'happy': -0.5, 'angry': 0.0, 'tired': 1.5, 'anxious': 0.0}
+    lexicon.label("downloading the update")   # 'neutral'
+    labels, matrix = lexicon.detect_batch(texts)
+"""
+
+from chapo_engines.utterance import Utterance
+
+NEUTRAL = "neutral"
+EMOTIONS = ("sad", "happy", "angry", "tired", "anxious")
+
+LEXICON = {
+    "sad": {
+        "sad": 1.0, "depressed": 1.5, "unhappy": 1.0, "lonely": 1.0, "miserable": 1.5, "heartbroken": 1.5,
+        "feeling down": 1.0, "feel down": 1.0, "felt down": 1.0, "so down": 1.0,
+        "feeling blue": 1.0, "feel blue": 1.0, "crying": 1.0,
+    },
+    "happy": {
+        "happy": 1.0, "excited": 1.0, "glad": 1.0, "joyful": 1.0, "great": 0.8, "awesome": 1.0,
+        "delighted": 1.0, "thrilled": 1.0, "cheerful": 1.0, "feeling good": 1.0,
+    },
+    "angry": {
+        "angry": 1.0, "mad": 1.0, "furious": 1.5, "upset": 1.0, "pissed": 1.5, "annoyed": 0.8,
+        "irritated": 0.8, "fed up": 1.0,
+    },
+    "tired": {
+        "tired": 1.0, "sleepy": 1.0, "exhausted": 1.5, "fatigued": 1.0, "drained": 1.0, "worn out": 1.0,
+    },
+    "anxious": {
+        "anxious": 1.0, "worried": 1.0, "nervous": 1.0, "stressed": 1.0, "panicky": 1.5, "scared": 1.0,
+        "afraid": 1.0, "overwhelmed": 1.0,
+    },
+}
+
+# Utterance.tokens have punctuation removed, so "don't" arrives as "dont"
+NEGATORS = frozenset({
+    "not", "no", "never", "dont", "didnt", "doesnt", "isnt", "arent", "wasnt", "werent", "cant", "cannot",
+    "wont", "aint", "hardly",
+})
+INTENSIFIERS = {"so": 1.5, "very": 1.5, "really": 1.5, "extremely": 2.0, "super": 1.5, "bit": 0.5}
+NEGATION_WINDOW = 3
+NEGATION_WEIGHT = 0.5
+
+
+class EmotionLexicon:
+    def __init__(self, lexicon=LEXICON, negators=NEGATORS, intensifiers=INTENSIFIERS):
+        self.emotions = tuple(lexicon)
+        self.words, self.phrases = {}, {}
+        for column, (emotion, entries) in enumerate(lexicon.items()):
+            for term, weight in entries.items():
+                parts = tuple(term.split())
+                table = self.words if len(parts) == 1 else self.phrases
+                table[parts[0] if len(parts) == 1 else parts] = (column, weight)
+        self.negators = frozenset(negators)
+        self.intensifiers = dict(intensifiers)
+
+    def hits(self, tokens):
+        """(emotion column, signed weight) for each lexicon hit in one walk over `tokens`."""
+        words, phrases, negators, intensifiers = self.words, self.phrases, self.negators, self.intensifiers
+        negated_until, boost = -1, 1.0
+        i, n = 0, len(tokens)
+        while i < n:
+            token = tokens[i]
+            entry = phrases.get((token, tokens[i + 1])) if i + 1 < n else None
+            width = 2
+            if entry is None:
+                entry, width = words.get(token), 1
+            if entry is not None:
+                column, weight = entry
+                weight *= boost
+                if i <= negated_until:
+                    weight *= -NEGATION_WEIGHT
+                    negated_until = -1
+                yield column, weight
+                boost = 1.0
+                i += width
+                continue
+            if token in negators:
+                negated_until = i + NEGATION_WINDOW
+            boost = intensifiers.get(token, 1.0)
+            i += 1
+
+    def vector(self, text) -> list:
+        """Score per emotion column, in self.emotions order."""
+        totals = [0.0] * len(self.emotions)
+        for column, weight in self.hits(Utterance.of(text).tokens):
+            totals[column] += weight
+        return totals
+
+    def scores(self, text) -> dict:
+        return dict(zip(self.emotions, self.vector(text)))
+
+    def pick(self, totals) -> str:
+        best = max(range(len(totals)), key=totals.__getitem__)  # first column wins a tie
+        return self.emotions[best] if totals[best] > 0 else NEUTRAL
+
+    def label(self, text) -> str:
+        return self.pick(self.vector(text))
+
+    def detect_batch(self, texts):
+        """
+        Labels and the texts x emotions score matrix (numpy) for many texts.
+        Ties and all-zero rows resolve exactly as label() does.
+        """
+        import numpy as np  # only log analytics needs it; keeps the engine import light
+
+        rows, columns, weights = [], [], []
+        for row, text in enumerate(texts):
+            for column, weight in self.hits(Utterance.of(text).tokens):
+                rows.append(row)
+                columns.append(column)
+                weights.append(weight)
+        matrix = np.zeros((len(texts), len(self.emotions)))
+        np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)), weights)
+        best = matrix.argmax(axis=1)  # first column wins a tie, as in pick()
+        found = matrix[np.arange(len(texts)), best] > 0
+        names = np.array(self.emotions + (NEUTRAL,), dtype=object)
+        labels = names[np.where(found, best, len(self.emotions))].tolist()
+        return labels, matrix
+
+
+# --- Shared instance (one per process) ---
+_lexicon = None
+
+
+def get_lexicon() -> EmotionLexicon:
+    global _lexicon
+    if _lexicon is None:
+        _lexicon = EmotionLexicon()
+    return _lexicon
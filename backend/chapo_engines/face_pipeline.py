@@ -0,0 +1,450 @@
+"""
+face_pipeline.py
+
+Staged realtime facial emotion pipeline (realtime_emotion_detect.py is its
+command line). The old loop ran FER.detect_emotions on every webcam frame
+on the capture thread and did one blocking insert_one per face per frame,
+so the frame rate was the detector's and every frame waited on Mongo.
+
+Stages:
+    capture    a thread reads the source and keeps only the latest frame
+               (LatestFrame); frames the pipeline can't keep up with are
+               dropped and counted, never queued
+    detect     every `every`-th frame, downscaled by `scale` (strided
+               numpy view, no cv2 needed), goes to a detector in a worker
+               process; at most one detection is in flight, so a slow
+               detector lowers the detection rate, not the frame rate
+    track      between detections, BoxTracker moves each face's box along
+               its last velocity and keeps its last emotion (IoU matching)
+    aggregate  each detection's faces go into per-second EmotionBuckets;
+               finished seconds are written in one bulk write by a
+               BulkWriter thread
+
+stats() reports the frames read, processed and dropped, detections, the
+achieved FPS and CPU use (this process plus the detector worker, as a
+percentage of one core).
+
+SyntheticSource and SyntheticDetector let the whole thing run headless
+without a camera or the FER model: the source draws moving coloured
+squares, one colour per emotion, and the detector finds them by colour
+after an optional simulated inference cost.
+
+Usage Example:
+    from chapo_engines.face_pipeline import FacePipeline, SyntheticSource, SyntheticDetector
+
+    pipeline = FacePipeline(detector=SyntheticDetector(cost_s=0.03), every=5, scale=0.5)
+    stats = pipeline.run(SyntheticSource(seconds=10))
+    print(stats["fps"], stats["cpu_percent"])
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+FER_EMOTIONS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+DETECT_EVERY = int(os.getenv("CHAPO_FACE_DETECT_EVERY", "5"))
+DETECT_SCALE = float(os.getenv("CHAPO_FACE_DETECT_SCALE", "0.5"))
+TRACK_IOU = 0.3
+TRACK_MAX_AGE = 30  # frames a face is kept without being detected again
+
+
+# ---------- Detectors (run in the worker process) ----------
+def load_fer():
+    from fer import FER  # heavy (tensorflow): only in the detector worker
+    return FER(mtcnn=False).detect_emotions
+
+
+class SyntheticDetector:
+    """
+    SyntheticSource's counterpart: finds its squares by colour and reports
+    FER-shaped results. `cost_s` sleeps per call, standing in for inference.
+    """
+
+    def __init__(self, cost_s=0.0):
+        self.cost_s = cost_s
+
+    def __call__(self):
+        return self.detect  # the worker calls the loader once, like load_fer
+
+    def detect(self, frame):
+        if self.cost_s:
+            time.sleep(self.cost_s)
+        results = []
+        for i, emotion in enumerate(FER_EMOTIONS):
+            ys, xs = np.nonzero((frame == SyntheticSource.colour(i)).all(axis=2))
+            if len(xs):
+                x, y = int(xs.min()), int(ys.min())
+                scores = dict.fromkeys(FER_EMOTIONS, 0.02)
+                scores[emotion] = 0.88
+                results.append({"box": (x, y, int(xs.max()) - x + 1, int(ys.max()) - y + 1), "emotions": scores})
+        return results
+
+
+_worker_detect = None
+
+
+def _init_worker(loader):
+    global _worker_detect
+    _worker_detect = loader()
+
+
+def _worker_run(frame):
+    """(results, this worker's CPU seconds so far)."""
+    return _worker_detect(frame), time.process_time()
+
+
+def downscale(frame, scale):
+    """Every 1/scale-th pixel (a strided view, copied to one contiguous array) and the factor used."""
+    step = max(1, int(round(1 / scale)))
+    return np.ascontiguousarray(frame[::step, ::step]), step
+
+
+# ---------- Sources ----------
+class SyntheticSource:
+    """
+    `seconds` of width x height frames with `faces` squares bouncing around,
+    face i coloured for FER_EMOTIONS[i]. realtime=True paces frames at `fps`
+    like a camera; False yields them as fast as they can be drawn.
+    """
+
+    def __init__(self, width=640, height=480, fps=30, seconds=10, faces=2, size=96, realtime=True, seed=0):
+        self.width, self.height, self.fps = width, height, fps
+        self.frames = int(seconds * fps)
+        self.size = size
+        self.realtime = realtime
+        rng = np.random.default_rng(seed)
+        self.faces = [(i % len(FER_EMOTIONS), rng.uniform(0, width - size), rng.uniform(0, height - size),
+                       rng.uniform(-6, 6), rng.uniform(-4, 4)) for i in range(faces)]
+
+    @staticmethod
+    def colour(i):
+        return np.array([40 + 30 * i, 255 - 30 * i, 120], dtype=np.uint8)
+
+    def boxes(self, n):
+        """Where the squares are in frame n: [(emotion index, (x, y, w, h))]."""
+        out = []
+        for emotion, x, y, dx, dy in self.faces:
+            out.append((emotion, (_bounce(x + dx * n, self.width - self.size),
+                                  _bounce(y + dy * n, self.height - self.size), self.size, self.size)))
+        return out
+
+    def __iter__(self):
+        start = time.perf_counter()
+        for n in range(self.frames):
+            frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+            for emotion, (x, y, w, h) in self.boxes(n):
+                frame[y:y + h, x:x + w] = self.colour(emotion)
+            if self.realtime:
+                delay = start + n / self.fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield frame
+
+
+def _bounce(position, limit):
+    period = 2 * limit
+    p = position % period
+    return int(p if p <= limit else period - p)
+
+
+class VideoSource:
+    """Frames from a video file or a camera index, through OpenCV."""
+
+    def __init__(self, path_or_index=0):
+        self.path_or_index = path_or_index
+
+    def __iter__(self):
+        import cv2
+        capture = cv2.VideoCapture(self.path_or_index)
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    return
+                yield frame
+        finally:
+            capture.release()
+
+
+class LatestFrame:
+    """One-slot handoff from the capture thread: a new frame replaces an unread one."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._closed = False
+        self.captured = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self.captured += 1
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def take(self, timeout=None):
+        """The latest unread frame; None once the source is finished and drained."""
+        with self._cond:
+            while self._frame is None and not self._closed:
+                if not self._cond.wait(timeout):
+                    return None
+            frame, self._frame = self._frame, None
+            return frame
+
+
+# ---------- Tracking ----------
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / (aw * ah + bw * bh - inter)
+
+
+class BoxTracker:
+    """
+    Faces between detections: a detection updates the best-overlapping track
+    (and its per-frame velocity) or starts one; predict() moves each box on
+    by its velocity. Tracks unseen for max_age frames are dropped.
+    """
+
+    def __init__(self, min_iou=TRACK_IOU, max_age=TRACK_MAX_AGE):
+        self.min_iou = min_iou
+        self.max_age = max_age
+        self.tracks = []  # dicts: box, velocity, frame, emotion, confidence
+
+    def update(self, frame_no, detections):
+        unmatched = list(self.tracks)
+        for det in detections:
+            best = max(unmatched, key=lambda t: iou(self._at(t, frame_no), det["box"]), default=None)
+            if best is not None and iou(self._at(best, frame_no), det["box"]) >= self.min_iou:
+                unmatched.remove(best)
+                elapsed = max(1, frame_no - best["frame"])
+                best["velocity"] = tuple((n - o) / elapsed for n, o in zip(det["box"][:2], best["box"][:2]))
+            else:
+                best = {"velocity": (0.0, 0.0)}
+                self.tracks.append(best)
+            best.update(box=tuple(det["box"]), frame=frame_no, emotion=det["emotion"], confidence=det["confidence"])
+        self.tracks = [t for t in self.tracks if frame_no - t["frame"] <= self.max_age]
+
+    @staticmethod
+    def _at(track, frame_no):
+        x, y, w, h = track["box"]
+        dx, dy = track["velocity"]
+        elapsed = frame_no - track["frame"]
+        return (int(x + dx * elapsed), int(y + dy * elapsed), w, h)
+
+    def predict(self, frame_no):
+        """[(box, emotion, confidence)] for every live track at frame_no."""
+        return [(self._at(t, frame_no), t["emotion"], t["confidence"])
+                for t in self.tracks if frame_no - t["frame"] <= self.max_age]
+
+
+# ---------- Aggregation ----------
+class BulkWriter:
+    """Bulk writes on their own thread, so the pipeline never waits on the database."""
+
+    def __init__(self, write_many):
+        self.write_many = write_many
+        self.written = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="emotion-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, docs):
+        if docs:
+            self._queue.put(docs)
+
+    def _run(self):
+        while True:
+            docs = self._queue.get()
+            if docs is None:
+                return
+            try:
+                self.write_many(docs)
+                self.written += len(docs)
+            except Exception as e:
+                logging.error(f"[FACE] Writing {len(docs)} emotion bucket(s) failed: {e}")
+
+    def close(self, timeout=5.0):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+class EmotionBuckets:
+    """
+    Detected faces summed per wall-clock second: samples, count and mean
+    confidence per emotion, the dominant emotion. A second is handed to
+    `writer` (all finished seconds in one batch) once a later one starts.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self._open = {}  # second -> {emotion: [count, confidence sum]}
+
+    def add(self, ts, emotion, confidence):
+        second = int(ts)
+        if any(s < second for s in self._open):
+            self.flush(before=second)
+        counts = self._open.setdefault(second, {}).setdefault(emotion, [0, 0.0])
+        counts[0] += 1
+        counts[1] += confidence
+
+    def flush(self, before=None):
+        done = sorted(s for s in self._open if before is None or s < before)
+        self.writer.submit([self._doc(s, self._open.pop(s)) for s in done])
+
+    @staticmethod
+    def _doc(second, emotions):
+        return {
+            "timestamp": datetime.fromtimestamp(second, timezone.utc).replace(tzinfo=None),
+            "samples": sum(c for c, _ in emotions.values()),
+            "counts": {e: c for e, (c, _) in emotions.items()},
+            "confidence": {e: round(total / c, 4) for e, (c, total) in emotions.items()},
+            "dominant": max(emotions, key=lambda e: emotions[e][0]),
+        }
+
+
+def mongo_writer(db, session_id="camera"):
+    """Per-second buckets into the session's minute buckets in Mongo (db/event_store.py), one bulk write."""
+    from db.event_store import get_event_store
+    store = get_event_store(db)
+    return lambda docs: store.record_emotions(docs, session_id)
+
+
+# ---------- Pipeline ----------
+class FacePipeline:
+    def __init__(self, detector=load_fer, every=DETECT_EVERY, scale=DETECT_SCALE, write_many=None,
+                 on_frame=None):
+        self.detector = detector
+        self.every = max(1, every)
+        self.scale = scale
+        self.write_many = write_many or (lambda docs: None)
+        self.on_frame = on_frame  # on_frame(frame, [(box, emotion, confidence)]) -> False to stop
+        self.tracker = BoxTracker()
+        self._executor = None
+        self._worker_cpu_start = 0.0
+
+    def start(self):
+        """Spawns the detector worker and waits until its model is loaded."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(self.detector,),
+            )
+            self._worker_cpu_start = self._executor.submit(time.process_time).result()  # model load excluded
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def run(self, source, seconds=None) -> dict:
+        """Runs until the source ends, `seconds` pass or on_frame returns False. Returns stats()."""
+        self.start()
+        slot = LatestFrame()
+        stopping = threading.Event()
+
+        def capture():
+            try:
+                for frame in source:
+                    if stopping.is_set():
+                        break
+                    slot.put(frame)
+            finally:
+                slot.close()
+
+        writer = BulkWriter(self.write_many)
+        buckets = EmotionBuckets(writer)
+        self.tracker = BoxTracker()
+        self._counts = dict(processed=0, detections=0, faces=0)
+        worker_cpu = self._worker_cpu_start
+        in_flight = None  # (future, frame_no, step)
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        threading.Thread(target=capture, name="face-capture", daemon=True).start()
+        try:
+            frame_no = -1
+            while seconds is None or time.perf_counter() - wall_start < seconds:
+                frame = slot.take(timeout=1.0)
+                if frame is None:
+                    if slot.closed:
+                        break
+                    continue
+                frame_no += 1
+
+                if in_flight is not None and in_flight[0].done():
+                    worker_cpu = self._apply(in_flight, buckets) or worker_cpu
+                    in_flight = None
+                if in_flight is None and frame_no % self.every == 0:
+                    small, step = downscale(frame, self.scale)
+                    in_flight = (self._executor.submit(_worker_run, small), frame_no, step)
+
+                self._counts["processed"] += 1
+                if self.on_frame and self.on_frame(frame, self.tracker.predict(frame_no)) is False:
+                    break
+            if in_flight is not None:
+                worker_cpu = self._apply(in_flight, buckets) or worker_cpu
+        finally:
+            stopping.set()
+            buckets.flush()
+            writer.close()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start + worker_cpu - self._worker_cpu_start
+        self._worker_cpu_start = worker_cpu
+        return self.stats(slot, writer, wall, cpu)
+
+    def _apply(self, in_flight, buckets):
+        """Feeds a finished detection to the tracker and the buckets. Returns the worker's CPU seconds."""
+        future, frame_no, step = in_flight
+        try:
+            results, worker_cpu = future.result()
+        except Exception as e:
+            logging.error(f"[FACE] Detection failed: {e}")
+            return None
+        now = time.time()
+        detections = []
+        for result in results:
+            emotions = result["emotions"]
+            dominant = max(emotions, key=emotions.get)
+            box = tuple(int(v * step) for v in result["box"])  # back to full-frame pixels
+            detections.append({"box": box, "emotion": dominant, "confidence": emotions[dominant]})
+            buckets.add(now, dominant, emotions[dominant])
+        self.tracker.update(frame_no, detections)
+        self._counts["detections"] += 1
+        self._counts["faces"] += len(detections)
+        return worker_cpu
+
+    def stats(self, slot, writer, wall, cpu) -> dict:
+        processed = self._counts["processed"]
+        return {
+            "captured": slot.captured,
+            "processed": processed,
+            "dropped": slot.dropped,
+            "detections": self._counts["detections"],
+            "faces": self._counts["faces"],
+            "buckets_written": writer.written,
+            "seconds": round(wall, 2),
+            "fps": round(processed / wall, 1) if wall else 0.0,
+            "cpu_percent": round(100 * cpu / wall, 1) if wall else 0.0,
+        }
@@ -0,0 +1,240 @@
+"""
+keyword_rules.py
+
+The voice loop's keyword fallbacks (news, shopping list, trivia, alarm,
+calendar, calorie, fact, math) as one declarative rule table, and the NLU
+cascade's keyword stage (unambiguous commands) as a second one, with the
+same intent names.
+
+Each Rule says which keywords it needs (any word from each group in
+all_of, matched as substrings of the cleaned utterance, as before), which
+intent it sets, and when it may fire (its Guard on the NLU intent and
+confidence). All keywords of all rules are compiled once into a single
+trie-shaped regex, so one scan of the utterance finds every rule that
+matches; resolve() then applies them in priority order.
+
+Priorities keep the old "later block wins" behaviour: a rule with a
+higher priority overrides a lower one. Rules sharing a group are
+alternatives (the old if/elif chains): only the highest-priority match in
+a group fires. Guards see the intent as it stands when the rule is
+reached, so once a fallback has fired the later guards only look at
+confidence, exactly like the old sequence of if blocks.
+
+Usage Example:
+    from chapo_engines.keyword_rules import fallback_rules
+
+    intent, fired = fallback_rules().resolve(cleaned_text, intent, confidence)
+    for rule in fired:
+        print(rule.name, "→", rule.intent)
+
+    command_intent(cleaned_text)   # "tell me a joke" → "tell_joke", else None
+"""
+
+import re
+from collections import namedtuple
+
+NO_INTENT = (None, "", "unknown")
+
+
+class Guard(namedtuple("Guard", "below intents")):
+    """Fires when the current intent is one of `intents` or confidence < `below`."""
+
+    def allows(self, intent, confidence) -> bool:
+        return intent in self.intents or (confidence or 0.0) < self.below
+
+
+ALWAYS = Guard(float("inf"), ())
+
+
+def unsure(below, intents=NO_INTENT):
+    return Guard(below, tuple(intents))
+
+
+class Rule(namedtuple("Rule", "name intent all_of guard priority group")):
+    """all_of: tuple of keyword groups; every group needs at least one keyword in the utterance."""
+
+    def __new__(cls, name, intent, all_of, guard=ALWAYS, priority=0, group=None):
+        all_of = tuple(tuple(words) for words in all_of)
+        return super().__new__(cls, name, intent, all_of, guard, priority, group or name)
+
+
+# ---------- Multi-pattern matcher ----------
+def _trie_pattern(words):
+    """Regex for `words` with shared prefixes factored out; greedy, so the longest word wins at a position."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node):
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+class KeywordMatcher:
+    """
+    Every keyword occurring anywhere in a text, overlaps included, from one
+    regex scan. The lookahead tries each position; the longest keyword found
+    there also implies every shorter keyword that is a prefix of it.
+    """
+
+    def __init__(self, keywords):
+        keywords = sorted(set(keywords))
+        self._pattern = re.compile(f"(?=({_trie_pattern(keywords)}))")
+        self.implied = {kw: frozenset(k for k in keywords if kw.startswith(k)) for kw in keywords}
+
+    def scan(self, text: str) -> set:
+        """The longest keyword at each position where one starts (see `implied` for the rest)."""
+        return set(self._pattern.findall(text))
+
+    def find(self, text: str) -> set:
+        found = set()
+        for kw in self.scan(text):
+            found |= self.implied[kw]
+        return found
+
+
+# ---------- Rule engine ----------
+class RuleEngine:
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda r: r.priority)
+        self.matcher = KeywordMatcher(w for r in self.rules for words in r.all_of for w in words)
+        # keyword -> the (rule, keyword group) requirements it satisfies, prefixes folded in
+        needs = {}
+        for i, rule in enumerate(self.rules):
+            for g, words in enumerate(rule.all_of):
+                for word in words:
+                    needs.setdefault(word, set()).add((i, g))
+        self._satisfies = {
+            kw: frozenset().union(*(needs[k] for k in implied))
+            for kw, implied in self.matcher.implied.items()
+        }
+
+    def matches(self, cleaned: str) -> list:
+        """Every rule whose keywords are all present, lowest priority first (guards not applied)."""
+        satisfied = set()
+        for kw in self.matcher.scan(cleaned):
+            satisfied |= self._satisfies[kw]
+        if not satisfied:
+            return []
+        groups_met = {}
+        for i, _ in satisfied:
+            groups_met[i] = groups_met.get(i, 0) + 1
+        return [self.rules[i] for i in sorted(groups_met) if groups_met[i] == len(self.rules[i].all_of)]
+
+    def resolve(self, cleaned: str, intent, confidence):
+        """(final intent, rules that fired in order); intent is unchanged when none fired."""
+        fired = []
+        matched = self.matches(cleaned)
+        while matched:
+            group = matched[0].group
+            candidates = [r for r in matched if r.group == group]
+            matched = [r for r in matched if r.group != group]
+            for rule in reversed(candidates):  # highest priority of the group first
+                if rule.guard.allows(intent, confidence):
+                    intent = rule.intent
+                    fired.append(rule)
+                    break
+        return intent, fired
+
+
+# ---------- The voice loop's fallback table ----------
+NEWS_WORDS = ["news", "headlines", "updates", "latest news", "top news"]
+SHOPPING_LISTS = ["shopping list", "grocery list"]
+SHOPPING_ADD = ["add", "buy", "put"]
+SHOPPING_REMOVE = ["remove", "delete", "take off"]
+SHOPPING_CLEAR = ["clear"]
+SHOPPING_CHECK = ["what is on", "whats on", "show", "list", "display", "read", "check", "tell me whats", "tell me what is"]
+TRIVIA_WORDS = ["trivia", "quiz", "question", "fun fact"]
+ALARM_PHRASES = [
+    "set alarm", "wake me", "alarm for", "remind me to wake", "alarm at", "wake up at",
+    "remind me to get up", "set an alarm", "please set alarm", "i want an alarm", "i need to wake",
+]
+CALENDAR_PHRASES = [
+    "add to calendar", "schedule", "put on calendar", "calendar event",
+    "add meeting", "schedule meeting", "put event", "calendar reminder", "log event",
+]
+FACT_PHRASES = [
+    "what is", "who is", "define", "tell me about", "where is", "when did", "how many", "how much",
+    "how big", "capital of", "how far", "who invented", "explain",
+]
+MATH_WORDS = ["plus", "minus", "times", "divided", "multiply", "add", "subtract", "equals", "calculate", "mod", "sqrt", "over"]
+
+FALLBACK_RULES = [
+    Rule("NEWS", "get_news", [NEWS_WORDS], unsure(0.6), priority=10),
+    # one if/elif chain: add beats remove beats clear beats check
+    Rule("GET SHOPPING LIST", "get_shopping_list", [SHOPPING_CHECK, SHOPPING_LISTS], unsure(0.7), 20, "shopping"),
+    Rule("CLEAR SHOPPING", "clear_shopping_list", [SHOPPING_CLEAR, SHOPPING_LISTS], unsure(0.7), 21, "shopping"),
+    Rule("REMOVE FROM SHOPPING", "remove_from_shopping_list", [SHOPPING_REMOVE, SHOPPING_LISTS], unsure(0.7), 22, "shopping"),
+    Rule("ADD TO SHOPPING", "add_to_shopping_list", [SHOPPING_ADD, SHOPPING_LISTS], unsure(0.7), 23, "shopping"),
+    Rule("TRIVIA", "play_trivia", [TRIVIA_WORDS], unsure(0.6), priority=30),
+    # "alarm" alone only when NLU is unsure; an explicit alarm phrase always wins
+    Rule("ALARM", "set_alarm", [["alarm"]], unsure(0.6), 40, "alarm"),
+    Rule("ALARM PHRASE", "set_alarm", [ALARM_PHRASES], ALWAYS, 41, "alarm"),
+    Rule("CALENDAR", "calendar_event", [CALENDAR_PHRASES], unsure(0.7), priority=50),
+    Rule("CALORIE", "calorie_info", [["calorie"]], unsure(0.6, intents=(None, "")), priority=60),
+    Rule("FACT", "get_fact", [FACT_PHRASES], unsure(0.7), priority=70),
+    Rule("MATH", "get_fact", [FACT_PHRASES + MATH_WORDS], unsure(0.75, intents=("unknown", "what_can_you_do", "help")),
+         priority=80),
+]
+
+
+# ---------- The NLU cascade's keyword stage ----------
+def whole_words(phrases):
+    """Keywords that only match whole words of a text passed through command_intent()."""
+    return [f" {p} " for p in phrases]
+
+
+# unambiguous commands only (not "what time is it (in X)"); one group, so the
+# highest-priority match answers
+COMMAND_RULES = [
+    Rule("TIME", "time_now", [whole_words(["whats the time", "tell me the time", "current time"])],
+         priority=80, group="command"),
+    Rule("CHECK SHOPPING", "get_shopping_list",
+         [whole_words(["whats on my shopping list", "read my shopping list", "show my shopping list",
+                       "check my shopping list", "whats on my grocery list"])], priority=70, group="command"),
+    Rule("CLEAR SHOPPING", "clear_shopping_list", [whole_words(["clear my shopping list", "clear the shopping list"])],
+         priority=60, group="command"),
+    Rule("ALARM", "set_alarm", [whole_words(["set an alarm", "set alarm", "wake me up at", "wake me up in"])],
+         priority=50, group="command"),
+    Rule("TRIVIA", "play_trivia", [whole_words(["play trivia", "lets play trivia", "trivia question", "quiz me"])],
+         priority=40, group="command"),
+    Rule("JOKE", "tell_joke", [whole_words(["tell me a joke", "tell a joke", "make me laugh"])],
+         priority=30, group="command"),
+    Rule("NEWS", "get_news", [whole_words(["latest news", "top news", "news headlines", "todays headlines"])],
+         priority=20, group="command"),
+    Rule("CHECK CALENDAR", "check_calendar",
+         [whole_words(["whats on my calendar", "whats on my schedule", "what do i have on today",
+                       "what do i have on tomorrow", "what have i got on today", "what have i got on tomorrow"])],
+         priority=10, group="command"),
+]
+
+_fallback_rules = None
+_command_rules = None
+
+
+def fallback_rules() -> RuleEngine:
+    global _fallback_rules
+    if _fallback_rules is None:
+        _fallback_rules = RuleEngine(FALLBACK_RULES)
+    return _fallback_rules
+
+
+def command_rules() -> RuleEngine:
+    global _command_rules
+    if _command_rules is None:
+        _command_rules = RuleEngine(COMMAND_RULES)
+    return _command_rules
+
+
+def command_intent(cleaned: str, engine: RuleEngine = None):
+    """The intent of the command rule matching the cleaned utterance, or None."""
+    intent, fired = (engine or command_rules()).resolve(f" {cleaned} ", None, 0.0)
+    return intent if fired else None
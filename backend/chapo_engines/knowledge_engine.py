@@ -1,18 +1,27 @@
 # chapo_engines/knowledge_engine.py
 
 import os
-import wikipedia
 import requests
-from openai import OpenAI
 from dotenv import load_dotenv
 
+from chapo_engines.tracing import traced
+
 # Load environment variables
 load_dotenv()
 
 WOLFRAMALPHA_APP_ID = os.getenv("WOLFRAMALPHA_APP_ID")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+_client = None
+
+
+def get_client():
+    """OpenAI client, created on the first GPT fallback rather than at import."""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
 
 
 def query_wolframalpha(question):
@@ -33,6 +42,7 @@ def query_wolframalpha(question):
 
 
 def query_wikipedia(topic):
+    import wikipedia  # pulls in BeautifulSoup; only needed on this path
     try:
         topic = topic.strip().title()
         summary = wikipedia.summary(topic, sentences=2, auto_suggest=True)
@@ -55,7 +65,7 @@ def query_wikipedia(topic):
 
 def fallback_with_openai_gpt(question):
     try:
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model="gpt-4",
             messages=[
                 {
@@ -75,6 +85,7 @@ def fallback_with_openai_gpt(question):
         return "Sorry, I couldn't find the answer."
 
 
+@traced("engine.knowledge")
 def get_knowledge_answer(question):
     print(f"\U0001f9e0 Searching for: {question}")
 
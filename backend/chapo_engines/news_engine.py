@@ -10,6 +10,8 @@ import os
 import requests
 import logging
 
+from chapo_engines.tracing import traced
+
 class NewsEngine:
     def __init__(self, api_key=None):
         self.api_key = api_key or os.getenv("NEWS_API_KEY", "6513b1d989e44d3c853ff6e1e9eba7e3")
@@ -52,6 +54,7 @@ class NewsEngine:
             return "Sorry, I couldn't fetch the news right now."
 
 
+    @traced("engine.news")
     def _fetch_and_format_news(self, params, header):
         try:
             resp = requests.get(self.base_url, params=params, timeout=8)
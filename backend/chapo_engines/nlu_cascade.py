@@ -0,0 +1,404 @@
+"""
+nlu_cascade.py
+
+Intent resolution as a cascade of stages, cheapest first. The first stage
+whose confidence reaches its own threshold answers the turn and the rest
+never run, so most turns never reach Wit.ai.
+
+Default stages (name, threshold):
+  exact      0.90  utterance seen before: the labelled examples, or a
+                   confident remote answer cached by this cascade
+  keywords   0.80  the command rules of keyword_rules.py (unambiguous
+                   commands, one compiled scan)
+  local      0.80  nearest labelled utterance (TF-IDF cosine) over
+                   intent_to_utterances.json, in-process
+  wit        0.70  Wit.ai (remote)
+  zero_shot  0.60  bart-large-mnli (off by default; heavy, loaded on first use)
+
+Local stages only name the intent, so for intents that need a slot the
+cascade fills it in Wit.ai's shape before a local answer can end the turn
+(fill_slots): set_alarm / set_reminder need a time the time_parser fast
+paths can read ("at 7 am", "in 10 minutes", "tomorrow at 3 pm"), and
+without one the turn goes on to Wit; weather intents get the place after
+"in" / "for" when there is one.
+
+If no stage is confident, the most confident answer seen is returned with
+confident=False. Order and thresholds can be changed per deployment:
+    CHAPO_NLU_STAGES="exact:0.9,keywords:0.8,local:0.8,wit:0.7"
+
+Every answer records the stage that produced it (Prediction.stage, the
+"nlu.cascade" span and NLUCascade.stats()), which is how the replay
+benchmark counts the remote calls the cascade avoided.
+
+Usage Example:
+    from chapo_engines.nlu_cascade import build_cascade
+
+    nlu = build_cascade(wit=get_intent_from_wit)
+    intent, confidence, entities = prediction = nlu.resolve("what time is it")
+    prediction.stage        # "exact" (a labelled example)
+"""
+
+import abc
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from pathlib import Path
+
+from chapo_engines import time_parser
+from chapo_engines.keyword_rules import RuleEngine, command_intent, command_rules
+from chapo_engines.tracing import span
+from chapo_engines.utterance import Utterance
+
+INTENT_EXAMPLES = Path(__file__).resolve().parent.parent / "intent_to_utterances.json"
+DEFAULT_STAGES = "exact:0.9,keywords:0.8,local:0.8,wit:0.7"
+EXACT_CACHE_SIZE = 4096
+
+
+def clean_utterance(text) -> str:
+    return " ".join(Utterance.of(text).tokens)
+
+
+class Prediction(tuple):
+    """
+    (intent, confidence, entities), so it unpacks like the old Wit.ai
+    tuple, plus the stage that answered and whether it cleared that
+    stage's threshold.
+    """
+
+    def __new__(cls, intent, confidence=0.0, entities=None, stage=None, confident=False):
+        self = super().__new__(cls, (intent, confidence, entities or {}))
+        self.stage = stage
+        self.confident = confident
+        return self
+
+    @property
+    def intent(self):
+        return self[0]
+
+    @property
+    def confidence(self):
+        return self[1]
+
+    @property
+    def entities(self):
+        return self[2]
+
+
+# ---------- Stages ----------
+class Stage(abc.ABC):
+    """predict(text, cleaned) -> (intent, confidence, entities) or None."""
+
+    name = "stage"
+    remote = False
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+
+    @abc.abstractmethod
+    def predict(self, text, cleaned):
+        """None when this stage has no answer."""
+
+    def observe(self, cleaned, prediction):
+        """Sees the final answer of every turn (lets a stage learn from later ones)."""
+
+
+class ExactStage(Stage):
+    """
+    Exact (cleaned) utterance lookup: the labelled examples, plus an LRU of
+    confident answers from remote stages. Answers whose entities carry a
+    resolved datetime are not cached ("in 10 minutes" means a new time
+    every turn).
+    """
+
+    name = "exact"
+
+    def __init__(self, threshold, known=None, cache_size=EXACT_CACHE_SIZE):
+        super().__init__(threshold)
+        self.known = known or {}
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def predict(self, text, cleaned):
+        with self._lock:
+            hit = self._cache.get(cleaned)
+            if hit is not None:
+                self._cache.move_to_end(cleaned)
+                return hit
+        intent = self.known.get(cleaned)
+        return (intent, 1.0, {}) if intent else None
+
+    def observe(self, cleaned, prediction):
+        if not (prediction.confident and prediction.stage in _REMOTE_STAGES and cleaned):
+            return
+        if any("datetime" in key for key in prediction.entities):
+            return
+        with self._lock:
+            self._cache[cleaned] = tuple(prediction)
+            self._cache.move_to_end(cleaned)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+class KeywordStage(Stage):
+    """keyword_rules.COMMAND_RULES (or `rules`), so it names intents as the voice loop's fallbacks do."""
+
+    name = "keywords"
+
+    def __init__(self, threshold, rules=None, confidence=0.9):
+        super().__init__(threshold)
+        self.confidence = confidence
+        self.engine = command_rules() if rules is None else RuleEngine(rules)
+
+    def predict(self, text, cleaned):
+        intent = command_intent(cleaned, self.engine)
+        return (intent, self.confidence, {}) if intent else None
+
+
+class NearestUtteranceModel:
+    """
+    TF-IDF nearest neighbour over labelled utterances, scored through an
+    inverted index (only examples sharing a word with the input are touched).
+    predict() -> (intent, cosine similarity of the closest example).
+    """
+
+    def __init__(self, examples):
+        docs = [(intent, Counter(clean_utterance(u).split())) for intent, utterances in examples.items()
+                for u in utterances]
+        docs = [(intent, tf) for intent, tf in docs if tf]
+        df = Counter(token for _, tf in docs for token in tf)
+        n = len(docs)
+        self.idf = {token: math.log((n + 1) / (count + 1)) + 1 for token, count in df.items()}
+        self.unseen_idf = math.log(n + 1) + 1  # words never seen in an example still count against the match
+        self.intents = []
+        self.index = defaultdict(list)  # token -> [(doc id, weight)]
+        for doc_id, (intent, tf) in enumerate(docs):
+            weights = {t: c * self.idf[t] for t, c in tf.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            for token, w in weights.items():
+                self.index[token].append((doc_id, w / norm))
+            self.intents.append(intent)
+
+    @classmethod
+    def from_file(cls, path=INTENT_EXAMPLES):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def predict(self, cleaned):
+        tf = Counter(cleaned.split())
+        weights = {t: c * self.idf[t] for t, c in tf.items() if t in self.idf}
+        if not weights:
+            return None, 0.0
+        norm = math.sqrt(sum((c * self.idf.get(t, self.unseen_idf)) ** 2 for t, c in tf.items()))
+        scores = defaultdict(float)
+        for token, w in weights.items():
+            for doc_id, dw in self.index[token]:
+                scores[doc_id] += w * dw
+        doc_id, score = max(scores.items(), key=lambda kv: kv[1])
+        return self.intents[doc_id], score / norm
+
+
+def load_intent_model():
+    return NearestUtteranceModel.from_file()
+
+
+class LocalModelStage(Stage):
+    name = "local"
+
+    def __init__(self, threshold, model):
+        super().__init__(threshold)
+        self.model = model  # anything with predict(cleaned) -> (intent, score); may be a LazyEngine
+
+    def predict(self, text, cleaned):
+        intent, score = self.model.predict(cleaned)
+        return (intent, score, {}) if intent else None
+
+
+class WitStage(Stage):
+    name = "wit"
+    remote = True
+
+    def __init__(self, threshold, wit):
+        super().__init__(threshold)
+        self.wit = wit
+
+    def predict(self, text, cleaned):
+        intent, confidence, entities = self.wit(text)
+        return (intent, confidence or 0.0, entities or {}) if intent else None
+
+
+class ZeroShotStage(Stage):
+    name = "zero_shot"
+
+    def __init__(self, threshold, classifier, candidate_labels):
+        super().__init__(threshold)
+        self.classifier = classifier
+        self.candidate_labels = candidate_labels
+
+    def predict(self, text, cleaned):
+        result = self.classifier(text, candidate_labels=self.candidate_labels)
+        return result["labels"][0], result["scores"][0], {}
+
+
+_REMOTE_STAGES = {WitStage.name}
+
+
+# ---------- Slots for local answers ----------
+_PLACE = re.compile(r"\b(?:in|for)\s+([a-z][a-z ]*)")
+_NOT_PLACE = re.compile(r"\s+(?:today|tonight|tomorrow|now|right now|this \w+|next \w+|please)$|^(?:the|a)\b.*")
+
+
+def _time_slot(text):
+    """A wit$datetime entity for the time in `text`, or None (required)."""
+    hit = time_parser.fast_search(text)
+    if hit is None:
+        return None
+    phrase, when = hit
+    return {"wit$datetime:datetime": [{"value": when.isoformat(), "body": phrase}]}
+
+
+def _place_slot(text):
+    """A wit$location entity for "... in paris", else no entities (optional)."""
+    m = _PLACE.search(clean_utterance(text))
+    place = _NOT_PLACE.sub("", m.group(1).strip()) if m else ""
+    return {"wit$location": [{"value": place.title()}]} if place else {}
+
+
+SLOT_FILLERS = {
+    "set_alarm": _time_slot,
+    "set_reminder": _time_slot,
+    "get_weather": _place_slot,
+    "weather_forecast": _place_slot,
+}
+
+
+def fill_slots(intent, text, entities):
+    """`entities`, or the slots `intent` needs read from `text`; None when a required one is missing."""
+    filler = SLOT_FILLERS.get(intent)
+    if entities or filler is None:
+        return entities
+    return filler(text)
+
+
+# ---------- Cascade ----------
+class NLUCascade:
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def resolve(self, text: str) -> Prediction:
+        cleaned = clean_utterance(text)
+        best = Prediction(None, 0.0, {}, stage=None)
+        if not cleaned:
+            return best
+        called = []
+        with span("nlu.cascade") as root:
+            for stage in self.stages:
+                called.append(stage.name)
+                try:
+                    with span(f"nlu.{stage.name}"):
+                        answer = stage.predict(text, cleaned)
+                except Exception as e:
+                    logging.error(f"[NLU] Stage {stage.name} failed: {e}")
+                    continue
+                if answer is None:
+                    continue
+                intent, confidence, entities = answer
+                if not stage.remote:
+                    filled = fill_slots(intent, text, entities)
+                    if filled is None:  # right intent maybe, but the slot is Wit's job
+                        if confidence > best.confidence:
+                            best = Prediction(intent, confidence, entities, stage=stage.name)
+                        continue
+                    entities = filled
+                if confidence >= stage.threshold:
+                    best = Prediction(intent, confidence, entities, stage=stage.name, confident=True)
+                    break
+                if confidence > best.confidence:
+                    best = Prediction(intent, confidence, entities, stage=stage.name)
+            root.set("nlu.stage", best.stage)
+            root.set("nlu.confident", best.confident)
+        for stage in self.stages:
+            stage.observe(cleaned, best)
+        self._count(best, called)
+        return best
+
+    # ---------- Stats ----------
+    def reset_stats(self):
+        with self._lock:
+            self._turns = 0
+            self._answered = Counter()
+            self._calls = Counter()
+
+    def _count(self, prediction, called):
+        with self._lock:
+            self._turns += 1
+            self._answered[prediction.stage if prediction.confident else "none"] += 1
+            self._calls.update(called)
+
+    def stats(self) -> dict:
+        """Turns answered per stage, calls per stage, and the share of turns that never called a remote stage."""
+        remote = [s.name for s in self.stages if s.remote]
+        with self._lock:
+            remote_calls = sum(self._calls[name] for name in remote)
+            return {
+                "turns": self._turns,
+                "answered_by": dict(self._answered),
+                "calls": dict(self._calls),
+                "remote_calls": remote_calls,
+                "remote_avoided_pct": round(100 * (1 - remote_calls / self._turns), 1) if self._turns else 0.0,
+            }
+
+
+def parse_stages(spec: str):
+    """'exact:0.9,wit:0.7' -> [('exact', 0.9), ('wit', 0.7)]"""
+    stages = []
+    for part in spec.split(","):
+        name, _, threshold = part.strip().partition(":")
+        if name:
+            stages.append((name, float(threshold) if threshold else 0.0))
+    return stages
+
+
+def build_cascade(wit=None, spec=None, known=None, candidate_labels=None) -> NLUCascade:
+    """
+    The configured cascade (spec, else CHAPO_NLU_STAGES, else DEFAULT_STAGES).
+    `wit` is the Wit.ai call, `known` extra cleaned-utterance -> intent labels
+    for the exact stage; zero_shot needs `candidate_labels`.
+    """
+    from chapo_engines.registry import engines
+
+    spec = spec or os.getenv("CHAPO_NLU_STAGES") or DEFAULT_STAGES
+    stages = []
+    for name, threshold in parse_stages(spec):
+        if name == "exact":
+            stages.append(ExactStage(threshold, known=_known_utterances(known)))
+        elif name == "keywords":
+            stages.append(KeywordStage(threshold))
+        elif name == "local":
+            stages.append(LocalModelStage(threshold, engines.lazy("intent_model")))
+        elif name == "wit" and wit is not None:
+            stages.append(WitStage(threshold, wit))
+        elif name == "zero_shot" and candidate_labels:
+            stages.append(ZeroShotStage(threshold, engines.lazy("zero_shot"), candidate_labels))
+        else:
+            logging.warning(f"[NLU] Skipping stage {name!r} (unknown or not configured)")
+    return NLUCascade(stages)
+
+
+def _known_utterances(extra=None):
+    known = {}
+    try:
+        with open(INTENT_EXAMPLES, "r", encoding="utf-8") as f:
+            for intent, utterances in json.load(f).items():
+                for u in utterances:
+                    known.setdefault(clean_utterance(u), intent)
+    except Exception as e:
+        logging.error(f"[NLU] Could not load {INTENT_EXAMPLES}: {e}")
+    known.update(extra or {})
+    return known
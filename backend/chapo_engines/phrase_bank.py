@@ -0,0 +1,209 @@
+"""
+phrase_bank.py
+
+Pre-synthesized audio for Chapo's canned replies.
+
+Most spoken replies are fixed strings: INTENT_RESPONSES, the
+CoreConversationEngine reply lists and the error/status lines in the
+test_voice.py loop and services/responder.py. This module collects them,
+synthesizes each one once into a content-addressed bank on disk (file
+name = hash of text + voice + model + format), and writes a manifest.
+speak() checks the bank before going to the network.
+
+The build is incremental: entries whose file already exists are skipped,
+new ones are synthesized on a thread pool, and files no longer referenced
+are deleted.
+
+CLI (run from backend/):
+    python -m chapo_engines.phrase_bank build [--workers 8]
+    python -m chapo_engines.phrase_bank report     # share of logged turns the bank covers
+"""
+
+import argparse
+import ast
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from chapo_engines.tts_cache import cache_key
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PHRASE_BANK_DIR = Path(__file__).resolve().parent / "phrase_bank"
+MANIFEST_NAME = "manifest.json"
+VOICE_LOOP_FILES = [BACKEND_DIR / "test_voice.py", BACKEND_DIR / "services" / "responder.py"]
+SESSION_LOG_FILES = [
+    BACKEND_DIR / "session_logs.json",
+    BACKEND_DIR.parent / "logs" / "session_logs.json",
+]
+
+
+# ---------- Collect the static phrases ----------
+def _voice_loop_phrases(path):
+    """String literals passed to speak()/EndSession() or returned directly in `path`."""
+    try:
+        tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    except (OSError, SyntaxError) as e:
+        logging.warning(f"[PhraseBank] Could not parse {path}: {e}")
+        return []
+    phrases = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and getattr(node.func, "id", None) in ("speak", "EndSession") and node.args:
+            value = node.args[0]
+        elif isinstance(node, ast.Return):
+            value = node.value
+        else:
+            continue
+        if isinstance(value, ast.Constant) and isinstance(value.value, str):
+            text = value.value.strip()
+            # skip labels like "unknown"; keep sentences
+            if text and (" " in text or text[-1] in ".!?"):
+                phrases.append(text)
+    return phrases
+
+
+def collect_static_phrases():
+    """Every fixed reply Chapo can speak, de-duplicated, in a stable order."""
+    from intent_responses import INTENT_RESPONSES
+    from chapo_engines.core_conversation_engine import CoreConversationEngine
+
+    phrases = []
+    for responses in INTENT_RESPONSES.values():
+        phrases.extend(r for r in responses if isinstance(r, str))
+    for responses in CoreConversationEngine().responses.values():
+        phrases.extend(responses)
+    for path in VOICE_LOOP_FILES:
+        phrases.extend(_voice_loop_phrases(path))
+
+    seen = set()
+    unique = []
+    for phrase in phrases:
+        text = phrase.strip()
+        if text and text not in seen:
+            seen.add(text)
+            unique.append(text)
+    return unique
+
+
+# ---------- Runtime lookup ----------
+class PhraseBank:
+    def __init__(self, directory=PHRASE_BANK_DIR):
+        self.directory = Path(directory)
+        self.entries = {}  # text -> file name
+        self.settings = {}
+        manifest = self.directory / MANIFEST_NAME
+        if manifest.exists():
+            try:
+                data = json.loads(manifest.read_text(encoding="utf-8"))
+                self.entries = data.get("entries", {})
+                self.settings = {k: data.get(k) for k in ("voice_id", "model_id", "output_format")}
+            except Exception as e:
+                logging.error(f"[PhraseBank] Could not read manifest: {e}")
+
+    def lookup(self, text: str, voice_id: str, model_id: str, output_format: str):
+        """Pre-synthesized audio for `text`, or None if the bank doesn't have it."""
+        name = self.entries.get(text.strip())
+        if not name or name != cache_key(text, voice_id, model_id, output_format) + ".pcm":
+            return None
+        try:
+            return (self.directory / name).read_bytes()
+        except OSError:
+            return None
+
+    def __contains__(self, text) -> bool:
+        return isinstance(text, str) and text.strip() in self.entries
+
+
+# ---------- Build job ----------
+def build_phrase_bank(synthesize, voice_id, model_id, output_format,
+                      directory=PHRASE_BANK_DIR, phrases=None, workers=4):
+    """
+    Synthesizes every phrase missing from the bank and rewrites the manifest.
+    `synthesize(text) -> bytes` does the actual TTS call.
+    Returns (synthesized, reused, removed) counts.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    phrases = collect_static_phrases() if phrases is None else phrases
+
+    wanted = {text: cache_key(text, voice_id, model_id, output_format) + ".pcm" for text in phrases}
+    missing = {text: name for text, name in wanted.items() if not (directory / name).exists()}
+
+    def _job(text, name):
+        audio = synthesize(text)
+        tmp = directory / (name + ".part")
+        tmp.write_bytes(audio)
+        os.replace(tmp, directory / name)
+
+    failed = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_job, text, name): text for text, name in missing.items()}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failed.add(futures[future])
+                logging.error(f"[PhraseBank] Failed to synthesize '{futures[future]}': {e}")
+
+    entries = {text: name for text, name in wanted.items() if text not in failed}
+    manifest = {
+        "voice_id": voice_id,
+        "model_id": model_id,
+        "output_format": output_format,
+        "entries": entries,
+    }
+    tmp = directory / (MANIFEST_NAME + ".part")
+    tmp.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, directory / MANIFEST_NAME)
+
+    keep = set(entries.values())
+    removed = 0
+    for path in directory.glob("*.pcm"):
+        if path.name not in keep:
+            path.unlink()
+            removed += 1
+    return len(missing) - len(failed), len(wanted) - len(missing), removed
+
+
+# ---------- Coverage report ----------
+def bank_coverage(bank_phrases, log_files=SESSION_LOG_FILES):
+    """
+    Replays the logged sessions and returns (served_from_bank, total_turns):
+    a turn counts as served if its spoken response is a bank phrase.
+    """
+    bank_phrases = {p.strip() for p in bank_phrases}
+    served = total = 0
+    for path in log_files:
+        if not Path(path).exists():
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    response = json.loads(line).get("response")
+                except ValueError:
+                    continue
+                if not isinstance(response, str) or not response.strip():
+                    continue
+                total += 1
+                served += response.strip() in bank_phrases
+    return served, total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chapo pre-synthesized phrase bank")
+    parser.add_argument("command", choices=["build", "report"])
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from chapo_engines import tts_util
+        made, reused, removed = build_phrase_bank(
+            tts_util.synthesize, tts_util.VOICE_ID, tts_util.MODEL_ID, tts_util.OUTPUT_FORMAT,
+            workers=args.workers,
+        )
+        print(f"🔊 Phrase bank: {made} synthesized, {reused} unchanged, {removed} removed.")
+    else:
+        served, total = bank_coverage(collect_static_phrases())
+        share = served / total if total else 0.0
+        print(f"📊 {served}/{total} logged turns ({share:.1%}) would be served from the phrase bank.")
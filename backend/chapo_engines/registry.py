@@ -0,0 +1,160 @@
+"""
+registry.py
+
+Lazy registry for engines and models, so importing the app is cheap.
+
+Before this, importing test_voice.py or the FastAPI app loaded
+bart-large-mnli, spaCy, ElevenLabs, a Google Calendar service, a
+MongoClient and every engine up front, whether or not the turn needed
+them. Now each one is registered by dotted path and built on first use:
+
+- get(name) imports and builds it once (thread-safe); lazy(name) returns a
+  proxy that does the same on first attribute access or call, so
+  module-level names like `weather_engine` keep working unchanged.
+- warm_up() / warm_up_async() build everything marked warm=True. The
+  server runs it as a background task after startup, so it is already
+  accepting traffic while the models load.
+- stats() shows what has been built and how long each build took.
+
+Usage Example:
+    from chapo_engines.registry import engines
+
+    weather_engine = engines.lazy("weather")     # nothing imported yet
+    weather_engine.get_current_weather("Paris")  # imported + built here
+
+    app.state.engine_warm_up = asyncio.create_task(engines.warm_up_async())  # keep a reference
+"""
+
+import asyncio
+import importlib
+import logging
+import threading
+import time
+
+
+def _resolve(target):
+    """'package.module:attr' -> the attribute; callables pass through."""
+    if callable(target):
+        return target
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class LazyEngine:
+    """Stands in for a registered engine until the first real use."""
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry, name):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __call__(self, *args, **kwargs):
+        return self._registry.get(self._name)(*args, **kwargs)
+
+    def __repr__(self):
+        state = "built" if self._registry.is_built(self._name) else "not built"
+        return f"<LazyEngine {self._name!r} ({state})>"
+
+
+class EngineRegistry:
+    def __init__(self):
+        self._factories = {}   # name -> (factory, warm)
+        self._instances = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.build_seconds = {}
+
+    def register(self, name, factory, warm=True):
+        """`factory` is a callable or a 'module:attr' path to one (a class or a function)."""
+        with self._lock:
+            self._factories[name] = (factory, warm)
+            self._locks.setdefault(name, threading.Lock())
+            self._instances.pop(name, None)
+
+    def provide(self, name, instance):
+        """Registers an already-built instance (tests, or objects built elsewhere)."""
+        with self._lock:
+            self._factories[name] = (lambda: instance, False)
+            self._locks.setdefault(name, threading.Lock())
+            self._instances[name] = instance
+
+    def is_built(self, name) -> bool:
+        return name in self._instances
+
+    def get(self, name):
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        if name not in self._factories:
+            raise KeyError(f"No engine registered as {name!r}")
+        with self._locks[name]:
+            if name not in self._instances:
+                factory, _ = self._factories[name]
+                start = time.perf_counter()
+                instance = _resolve(factory)()
+                self.build_seconds[name] = round(time.perf_counter() - start, 3)
+                self._instances[name] = instance
+                logging.info(f"[REGISTRY] Built {name} in {self.build_seconds[name]:.2f}s")
+            return self._instances[name]
+
+    def lazy(self, name) -> LazyEngine:
+        return LazyEngine(self, name)
+
+    def warm_up(self, names=None) -> dict:
+        """Builds the given (default: all warm=True) entries; failures are logged, not raised."""
+        if names is None:
+            names = [name for name, (_, warm) in list(self._factories.items()) if warm]
+        failed = {}
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                failed[name] = str(e)
+                logging.error(f"[REGISTRY] Warm-up of {name} failed: {e}")
+        return failed
+
+    async def warm_up_async(self, names=None) -> dict:
+        return await asyncio.to_thread(self.warm_up, names)
+
+    def stats(self) -> dict:
+        return {
+            name: {"built": name in self._instances, "build_s": self.build_seconds.get(name)}
+            for name in self._factories
+        }
+
+
+# ---------- Models ----------
+def load_zero_shot():
+    from transformers import pipeline
+    return pipeline("zero-shot-classification", model="facebook/bart-large-mnli", framework="pt")
+
+
+def load_spacy():
+    import spacy
+    return spacy.load("en_core_web_sm")
+
+
+# ---------- Default registrations ----------
+engines = EngineRegistry()
+
+# engines used on most turns are warmed in the background at startup
+engines.register("weather", "chapo_engines.weather_engine:WeatherEngine")
+engines.register("news", "chapo_engines.news_engine:NewsEngine")
+engines.register("emotion", "chapo_engines.emotion_detector_engine:EmotionDetectorEngine")
+engines.register("core_convo", "chapo_engines.core_conversation_engine:CoreConversationEngine")
+engines.register("shopping_list", "chapo_engines.shopping_list_engine:get_shopping_list_engine")
+engines.register("reminder", "chapo_engines.reminder_engine:ReminderEngine")
+engines.register("alarm", lambda: importlib.import_module("chapo_engines.alarm_engine"))  # functions, not a class
+engines.register("time", "chapo_engines.time_engine:ChapoTimeEngine")
+engines.register("cooking", "chapo_engines.cooking_engine:CookingEngine")
+engines.register("fitness", "chapo_engines.fitness_engine:FitnessEngine")
+engines.register("spacy", load_spacy)
+engines.register("intent_model", "chapo_engines.nlu_cascade:load_intent_model")  # the cascade's local stage
+# rarely needed and slow to build: only on first use
+engines.register("calendar", "chapo_engines.calendar_engine:CalendarEngine", warm=False)
+engines.register("zero_shot", load_zero_shot, warm=False)
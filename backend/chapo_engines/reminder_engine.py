@@ -2,26 +2,33 @@
 reminder_engine.py
 
 Handles reminders: add, delete, list, and persist reminders for each user session.
-- Uses a JSON file for simple persistence.
+- Persists to the shared SQLite schedule store (db/schedule_store.py); the old
+  reminders.json is imported once on first start.
+- A reminder is claimed in the store before it fires, so it fires once even
+  with several server processes running.
 - Supports async notifications and sound alerts.
 
 Author: [Naim], 2025-05-28
 """
 
 import asyncio
-import json
 import re
 from pathlib import Path
 from datetime import datetime, timedelta
 import dateparser
 from plyer import notification
-import pygame
 import pytz
 
+from db.schedule_store import get_schedule_store
+from chapo_engines.audio_service import get_audio_service, PRIORITY_REMINDER
+from chapo_engines import time_parser
+
 BST = pytz.timezone("Europe/London")
 
+# Legacy JSON file, only read once for migration
 REMINDER_FILE = Path.home() / "chapo-bot-backend" / "backend" / "chapo_engines" / "reminders.json"
 REMINDER_SOUND = Path.home() / "chapo-bot-backend" / "alarm.mp3"  # Adjust if needed
+get_audio_service().register("reminder", REMINDER_SOUND)
 
 def to_london_aware(dt):
     """Ensure datetime is timezone-aware in Europe/London (BST)."""
@@ -30,31 +37,24 @@ def to_london_aware(dt):
     else:
         return dt.astimezone(BST)
 
-class ReminderEngine:
-    def __init__(self):
-        self.reminders = self.load_file()
-        self.tasks = []
-
-    def load_file(self):
-        if REMINDER_FILE.exists():
-            try:
-                with open(REMINDER_FILE, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"[REMINDER] Error loading file: {e}")
-        return []
-
-    def save_file(self):
+def _reminder_rows_from_json(data):
+    for r in data:
         try:
-            with open(REMINDER_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.reminders, f, indent=2)
+            reminder_time = to_london_aware(dateparser.parse(r["time"]))
+            yield "reminder", reminder_time, r.get("session_id", "default"), r.get("task")
         except Exception as e:
-            print(f"[REMINDER] Error saving file: {e}")
+            print(f"[REMINDER] Skipping unreadable reminder during migration: {r}, {e}")
+
+class ReminderEngine:
+    def __init__(self, store=None):
+        self.store = store or get_schedule_store()
+        self.store.migrate_json("reminders.json", REMINDER_FILE, _reminder_rows_from_json)
+        self.tasks = []
 
-    def generate_id(self):
-        if not self.reminders:
-            return 1
-        return max(r.get("id", 0) for r in self.reminders) + 1
+    @property
+    def reminders(self):
+        """Pending reminders across all sessions (read from the store)."""
+        return self.store.list_pending("reminder")
 
     def extract_task_and_time(self, text, entities):
         time = None
@@ -67,10 +67,8 @@ class ReminderEngine:
 
         if datetime_entity:
             try:
-                datetime_entity = datetime_entity.replace('.', '')  # Fix 'a.m.' → 'am'
-                parsed_time = dateparser.parse(datetime_entity, settings={"PREFER_DATES_FROM": "future"})
+                parsed_time = time_parser.parse(datetime_entity)  # 'a.m.' → 'am' handled there
                 if parsed_time:
-                    parsed_time = to_london_aware(parsed_time)
                     now = datetime.now(BST)
                     if parsed_time > now:
                         time = parsed_time.isoformat()
@@ -80,9 +78,8 @@ class ReminderEngine:
         # 2. Fallback: NLP parse full text
         if not time:
             try:
-                parsed_time = dateparser.parse(text, settings={"PREFER_DATES_FROM": "future"})
+                parsed_time = time_parser.parse(text)
                 if parsed_time:
-                    parsed_time = to_london_aware(parsed_time)
                     now = datetime.now(BST)
                     if parsed_time > now:
                         time = parsed_time.isoformat()
@@ -111,42 +108,43 @@ class ReminderEngine:
 
     async def trigger_reminder_after_delay(self, reminder):
         try:
-            reminder_time = dateparser.parse(reminder["time"])
+            reminder_time = datetime.fromisoformat(reminder["time"])
             reminder_time = to_london_aware(reminder_time)
             now = datetime.now(BST)
             delay = (reminder_time - now).total_seconds()
             if delay > 0:
                 await asyncio.sleep(delay)
 
-            print(f"[REMINDER] Triggering: {reminder['task']} at {reminder['time']}")
-            try:
-                notification.notify(
-                    title="⏰ Chapo Reminder",
-                    message=f"Task: {reminder['task']}",
-                    timeout=10
-                )
-            except Exception as e:
-                print(f"[REMINDER] Notification failed: {e}")
-            try:
-                pygame.mixer.init()
-                if REMINDER_SOUND.exists():
-                    pygame.mixer.music.load(str(REMINDER_SOUND))
-                    pygame.mixer.music.play()
-                    while pygame.mixer.music.get_busy():
-                        await asyncio.sleep(0.1)
-                pygame.mixer.music.stop()
-                pygame.mixer.quit()
-            except Exception as e:
-                print(f"[REMINDER] Sound failed: {e}")
+            if not self.store.claim(reminder["id"]):
+                print(f"[REMINDER] #{reminder['id']} was deleted or already fired")
+                return
+            await self.fire_reminder(reminder)
         except Exception as e:
             print(f"[REMINDER] Error in trigger_reminder_after_delay: {e}")
 
+    async def fire_reminder(self, reminder):
+        """Notification + sound. The caller has already claimed the reminder."""
+        print(f"[REMINDER] Triggering: {reminder['task']} at {reminder['time']}")
+        try:
+            notification.notify(
+                title="⏰ Chapo Reminder",
+                message=f"Task: {reminder['task']}",
+                timeout=10
+            )
+        except Exception as e:
+            print(f"[REMINDER] Notification failed: {e}")
+        try:
+            if REMINDER_SOUND.exists():
+                await get_audio_service().play("reminder", priority=PRIORITY_REMINDER)
+        except Exception as e:
+            print(f"[REMINDER] Sound failed: {e}")
+
     async def schedule_existing_reminders(self):
         now = datetime.now(BST)
-        for reminder in self.reminders:
+        self.store.purge_past(now.timestamp())
+        for reminder in self.store.list_pending("reminder"):
             try:
-                reminder_time = dateparser.parse(reminder["time"])
-                reminder_time = to_london_aware(reminder_time)
+                reminder_time = to_london_aware(datetime.fromisoformat(reminder["time"]))
                 if reminder_time > now:
                     print(f"[REMINDER] Scheduling: {reminder['task']} at {reminder['time']}")
                     task = asyncio.create_task(self.trigger_reminder_after_delay(reminder))
@@ -156,17 +154,15 @@ class ReminderEngine:
             except Exception as e:
                 print(f"[REMINDER] Could not parse reminder time: {reminder.get('time')}, {e}")
 
-    async def handle_reminder(self, text, entities):
+    async def handle_reminder(self, text, entities, session_id="default"):
         task, time = self.extract_task_and_time(text, entities)
         if not task:
             return "❓ What should I remind you about?"
         if not time:
             return "⏰ When should I remind you?"
 
-        reminder_id = self.generate_id()
+        reminder_id = self.store.add("reminder", datetime.fromisoformat(time), session_id=session_id, task=task)
         reminder = {"id": reminder_id, "task": task, "time": time}
-        self.reminders.append(reminder)
-        self.save_file()
         print(f"[REMINDER] Set: {reminder}")
 
         try:
@@ -176,28 +172,26 @@ class ReminderEngine:
         except Exception as e:
             print(f"[REMINDER] Notification failed: {e}")
 
-        asyncio.create_task(self.trigger_reminder_after_delay(reminder))
+        self.tasks.append(asyncio.create_task(self.trigger_reminder_after_delay(reminder)))
 
         return f"🔔 Reminder #{reminder_id} set to '{task}' at {time}."
 
-    def list_reminders(self):
-        if not self.reminders:
+    def list_reminders(self, session_id=None):
+        reminders = (
+            self.store.list_for_session(session_id, "reminder") if session_id else self.reminders
+        )
+        if not reminders:
             return "🔕 No reminders set."
         return "🔔 Reminders:\n" + "\n".join(
-            [f"{r['id']}. {r['task']} at {r['time']}" for r in self.reminders]
+            [f"{r['id']}. {r['task']} at {r['time']}" for r in reminders]
         )
 
-    def delete_reminder(self, task_or_id):
-        initial_len = len(self.reminders)
+    def delete_reminder(self, task_or_id, session_id=None):
         if isinstance(task_or_id, int) or (isinstance(task_or_id, str) and task_or_id.isdigit()):
-            task_or_id = int(task_or_id)
-            self.reminders = [r for r in self.reminders if r["id"] != task_or_id]
+            deleted = self.store.delete(int(task_or_id), kind="reminder", session_id=session_id)
         else:
-            self.reminders = [
-                r for r in self.reminders if r["task"].lower() != str(task_or_id).lower()
-            ]
-        self.save_file()
-        if len(self.reminders) < initial_len:
+            deleted = self.store.delete_by_task("reminder", str(task_or_id), session_id=session_id)
+        if deleted:
             return "🗑️ Reminder deleted."
         return "⚠️ Reminder not found."
 
@@ -0,0 +1,149 @@
+"""
+scheduler.py
+
+One scheduler for alarms and reminders, no matter how many server
+processes are running.
+
+With `uvicorn --workers N` every worker used to re-schedule every pending
+alarm at startup, so each alarm rang N times. Now:
+
+- Workers compete for a lease row in the schedule store; the holder renews
+  it every poll and is the only one that runs the loop. If it dies, the
+  lease expires after LEASE_TTL and another worker takes over.
+- The leader claims due items with ScheduleStore.claim_due() and hands each
+  to the handler registered for its kind.
+- The timer a worker starts when it sets an alarm (exact to the second)
+  also claims before it rings, so an alarm fires exactly once whichever
+  side gets there first; the leader is the backstop for alarms whose
+  worker has gone away.
+- Periodic jobs registered with every() (the Mongo event rollup) run on
+  the leader only, in a worker thread.
+
+Usage Example:
+    from chapo_engines.scheduler import get_scheduler
+
+    scheduler = get_scheduler()
+    scheduler.on("alarm", fire_alarm)   # async fn(item)
+    scheduler.every(600, rollup)        # blocking fn(), leader only
+    scheduler.start()                   # from the app's startup hook
+    ...
+    await scheduler.stop()
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+from db.schedule_store import get_schedule_store
+
+LEASE_NAME = "scheduler"
+LEASE_TTL = float(os.getenv("CHAPO_SCHEDULER_LEASE_S", "10"))
+POLL_SECONDS = float(os.getenv("CHAPO_SCHEDULER_POLL_S", "1"))
+MISSED_GRACE_SECONDS = 60  # items overdue by more than this are dropped, not fired
+
+
+class LeaderScheduler:
+    def __init__(self, store=None, holder=None, lease_ttl=LEASE_TTL, poll_seconds=POLL_SECONDS):
+        self.store = store or get_schedule_store()
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease_ttl = lease_ttl
+        self.poll_seconds = poll_seconds
+        self.handlers = {}
+        self.jobs = []  # [seconds, fn, next run]
+        self.is_leader = False
+        self._task = None
+        self._running = set()  # fired handlers / jobs; the loop only keeps weak references
+
+    def on(self, kind: str, handler):
+        """Registers the coroutine function that fires items of `kind`."""
+        self.handlers[kind] = handler
+
+    def every(self, seconds: float, fn):
+        """Runs the blocking fn() every `seconds` on the leader (first run on its first tick)."""
+        self.jobs.append([seconds, fn, 0.0])
+
+    def try_lead(self) -> bool:
+        was_leader = self.is_leader
+        self.is_leader = self.store.acquire_lease(LEASE_NAME, self.holder, self.lease_ttl)
+        if self.is_leader != was_leader:
+            logging.info(f"[SCHEDULER] {self.holder} {'is now' if self.is_leader else 'is no longer'} the leader")
+        return self.is_leader
+
+    async def tick(self, now: float = None) -> int:
+        """One poll: renew/take the lease and, if leading, fire what is due. Returns items fired."""
+        if not await asyncio.to_thread(self.try_lead):
+            return 0
+        now = time.time() if now is None else now
+        fired = 0
+        for item in await asyncio.to_thread(self.store.claim_due, now):
+            handler = self.handlers.get(item["kind"])
+            if now - item["due_at"] > MISSED_GRACE_SECONDS:
+                logging.warning(f"[SCHEDULER] Dropping missed {item['kind']} #{item['id']} due {item['time']}")
+            elif handler is None:
+                logging.warning(f"[SCHEDULER] No handler for {item['kind']} #{item['id']}")
+            else:
+                self._spawn(self._fire(handler, item))
+                fired += 1
+        for job in self.jobs:
+            seconds, fn, next_run = job
+            if now >= next_run:
+                job[2] = now + seconds
+                self._spawn(self._run_job(fn))
+        return fired
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+        return task
+
+    async def _fire(self, handler, item):
+        try:
+            await handler(item)
+        except Exception as e:
+            logging.error(f"[SCHEDULER] {item['kind']} #{item['id']} handler failed: {e}")
+
+    async def _run_job(self, fn):
+        try:
+            await asyncio.to_thread(fn)
+        except Exception as e:
+            logging.error(f"[SCHEDULER] Job {getattr(fn, '__name__', fn)} failed: {e}")
+
+    async def run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logging.error(f"[SCHEDULER] Tick failed: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            self.store.release_lease(LEASE_NAME, self.holder)
+            self.is_leader = False
+
+
+# --- Shared instance (one per process; only one process leads) ---
+_scheduler = None
+
+
+def get_scheduler() -> LeaderScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LeaderScheduler()
+    return _scheduler
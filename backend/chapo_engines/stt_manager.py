@@ -0,0 +1,199 @@
+"""
+stt_manager.py
+
+One shared Whisper model for the whole process.
+
+Before this, realtime_voice.transcribe_audio() called whisper.load_model()
+on every utterance, and services/voice_handler kept its own copy. Now:
+- The model is loaded once (thread-safe) and warmed up with a short silent
+  clip, so the first real utterance doesn't pay for lazy kernel setup.
+- Model size and CPU precision come from the environment:
+    CHAPO_WHISPER_MODEL    tiny | base | small | ...        (default: base)
+    CHAPO_WHISPER_COMPUTE  int8 | fp16 | fp32                (default: int8)
+    CHAPO_WHISPER_BACKEND  openai | faster                   (default: openai)
+  With openai-whisper, int8 applies torch dynamic quantization to the
+  Linear layers; with faster-whisper it maps to compute_type directly.
+- transcribe() runs on a single dedicated worker thread; transcribe_async()
+  awaits it without blocking the FastAPI event loop.
+- Model load time and per-utterance latency are tracked separately.
+
+Usage Example:
+    from chapo_engines.stt_manager import get_stt_manager
+
+    stt = get_stt_manager()
+    stt.warm_up()                                   # at startup
+    text = stt.transcribe(audio.to_float32())       # realtime loop
+    text = await stt.transcribe_async(tmp_path)     # FastAPI handler
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from chapo_engines.tracing import traced
+
+SAMPLE_RATE = 16000
+WARM_UP_SECONDS = 1.0
+LATENCY_WINDOW = 200  # utterances kept for the latency summary
+
+
+class STTConfig:
+    def __init__(self, model_size=None, compute=None, backend=None, language="en"):
+        self.model_size = model_size or os.getenv("CHAPO_WHISPER_MODEL", "base")
+        self.compute = (compute or os.getenv("CHAPO_WHISPER_COMPUTE", "int8")).lower()
+        self.backend = (backend or os.getenv("CHAPO_WHISPER_BACKEND", "openai")).lower()
+        self.language = language
+
+    def __repr__(self):
+        return f"STTConfig(model={self.model_size}, compute={self.compute}, backend={self.backend})"
+
+
+# ---------- Backends ----------
+class _OpenAIWhisper:
+    def __init__(self, config: STTConfig):
+        import whisper
+        import torch
+
+        self.model = whisper.load_model(config.model_size, device="cpu")
+        if config.compute == "int8":
+            self.model = torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        # fp16 only helps on GPU; on CPU whisper would warn and fall back anyway
+        self.fp16 = config.compute == "fp16" and torch.cuda.is_available()
+        self.language = config.language
+
+    def transcribe(self, audio) -> str:
+        result = self.model.transcribe(audio, language=self.language, fp16=self.fp16)
+        return result.get("text", "").strip()
+
+
+class _FasterWhisper:
+    _COMPUTE_TYPES = {"int8": "int8", "fp16": "float16", "fp32": "float32"}
+
+    def __init__(self, config: STTConfig):
+        from faster_whisper import WhisperModel
+
+        compute_type = self._COMPUTE_TYPES.get(config.compute, "int8")
+        self.model = WhisperModel(config.model_size, device="cpu", compute_type=compute_type)
+        self.language = config.language
+
+    def transcribe(self, audio) -> str:
+        segments, _ = self.model.transcribe(audio, language=self.language)
+        return "".join(s.text for s in segments).strip()
+
+
+def load_backend(config: STTConfig):
+    if config.backend == "faster":
+        return _FasterWhisper(config)
+    return _OpenAIWhisper(config)
+
+
+# ---------- Manager ----------
+class STTManager:
+    """
+    Owns the model and the transcription thread.
+    `loader(config)` builds the backend (an object with transcribe(audio) -> str);
+    tests pass a fake one.
+    """
+
+    def __init__(self, config: STTConfig = None, loader=load_backend):
+        self.config = config or STTConfig()
+        self._loader = loader
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chapo-stt")
+        self.load_seconds = None
+        self.warm_up_seconds = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # seconds per utterance
+
+    @property
+    def model(self):
+        """The loaded backend, loading it on first use."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = self._loader(self.config)
+                    self.load_seconds = time.perf_counter() - start
+                    logging.info(f"[STT] Loaded {self.config} in {self.load_seconds:.2f}s")
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _warm_up(self):
+        model = self.model
+        start = time.perf_counter()
+        model.transcribe(np.zeros(int(SAMPLE_RATE * WARM_UP_SECONDS), dtype=np.float32))
+        self.warm_up_seconds = time.perf_counter() - start
+        logging.info(f"[STT] Warm-up pass took {self.warm_up_seconds:.2f}s")
+
+    def warm_up(self):
+        """Loads the model and runs one silent clip through it (on the STT thread)."""
+        self._executor.submit(self._warm_up).result()
+
+    async def warm_up_async(self):
+        await asyncio.wrap_future(self._executor.submit(self._warm_up))
+
+    @traced("stt.whisper")
+    def _run(self, audio) -> str:
+        model = self.model
+        start = time.perf_counter()
+        text = model.transcribe(audio)
+        elapsed = time.perf_counter() - start
+        self.latencies.append(elapsed)
+        logging.info(f"[STT] Transcribed in {elapsed * 1000:.0f} ms")
+        return text
+
+    def submit(self, audio):
+        """Queues `audio` (float32 array or file path) on the STT thread; returns a Future."""
+        return self._executor.submit(self._run, audio)
+
+    def transcribe(self, audio) -> str:
+        return self.submit(audio).result()
+
+    async def transcribe_async(self, audio) -> str:
+        return await asyncio.wrap_future(self.submit(audio))
+
+    def stats(self) -> dict:
+        """Model load time vs. per-utterance latency (ms)."""
+        lat = sorted(self.latencies)
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 1) if lat else None
+
+        return {
+            "model": self.config.model_size,
+            "compute": self.config.compute,
+            "backend": self.config.backend,
+            "load_ms": round(self.load_seconds * 1000, 1) if self.load_seconds is not None else None,
+            "warm_up_ms": round(self.warm_up_seconds * 1000, 1) if self.warm_up_seconds is not None else None,
+            "utterances": len(lat),
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+# --- Shared instance (realtime_voice and the FastAPI /voice path) ---
+_stt_manager = None
+_stt_lock = threading.Lock()
+
+
+def get_stt_manager() -> STTManager:
+    global _stt_manager
+    if _stt_manager is None:
+        with _stt_lock:
+            if _stt_manager is None:
+                _stt_manager = STTManager()
+    return _stt_manager
@@ -0,0 +1,234 @@
+"""
+stt_pool.py
+
+Process pool for speech-to-text on the FastAPI /voice upload path.
+
+- Worker processes, each loading its own Whisper model in the pool
+  initializer and warming it up, so jobs never contend for one model/GIL.
+  Every uvicorn worker has its own pool, so the default is one STT process
+  per API worker; CHAPO_STT_WORKERS raises it (mind the total: API workers
+  x STT workers models in memory).
+- The workers are spawned on first use; start() also waits for their
+  models, and FastAPI runs it as a background task at startup, so the app
+  serves other routes while the models load. A clip that arrives first
+  just queues behind the load.
+- Jobs take the uploaded bytes as-is: decode_audio() turns them into a
+  16 kHz float32 array in memory (WAV via the wave module, anything else
+  piped through ffmpeg), no temp file.
+- Backpressure: at most `max_pending` jobs (queued + running) are accepted.
+  Past that, submit() raises STTBusy with a Retry-After estimate and the
+  router answers 503 instead of letting requests pile up.
+
+The realtime CLI loop keeps using the in-process STTManager (stt_manager.py);
+this pool is for concurrent uploads.
+
+Usage Example:
+    from chapo_engines.stt_pool import get_stt_pool, STTBusy
+
+    pool = get_stt_pool()
+    await pool.start_async()                      # FastAPI startup (background task)
+    text = await pool.transcribe_async(raw_bytes)
+"""
+
+import asyncio
+import io
+import logging
+import math
+import os
+import subprocess
+import threading
+import time
+import wave
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+
+from chapo_engines.stt_manager import SAMPLE_RATE, WARM_UP_SECONDS, STTConfig, load_backend
+
+LATENCY_WINDOW = 200
+
+
+class STTBusy(Exception):
+    """The STT queue is full; try again after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"STT queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+# ---------- Decoding ----------
+def _decode_wav(data: bytes) -> np.ndarray:
+    with wave.open(io.BytesIO(data), "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError("only 16-bit WAV is decoded natively")
+        rate = wf.getframerate()
+        channels = wf.getnchannels()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    audio = samples.astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE and len(audio):
+        n_out = int(len(audio) * SAMPLE_RATE / rate)
+        audio = np.interp(np.arange(n_out) * rate / SAMPLE_RATE, np.arange(len(audio)), audio)
+        audio = audio.astype(np.float32)
+    return audio
+
+
+def _decode_ffmpeg(data: bytes) -> np.ndarray:
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+           "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"]
+    out = subprocess.run(cmd, input=data, capture_output=True, check=True).stdout
+    return np.frombuffer(out, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def decode_audio(data: bytes) -> np.ndarray:
+    """Uploaded audio bytes -> mono float32 at 16 kHz (Whisper's input format)."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            return _decode_wav(data)
+        except (wave.Error, ValueError):
+            pass
+    return _decode_ffmpeg(data)
+
+
+# ---------- Worker process side ----------
+_worker_model = None
+
+
+def _init_worker(config, loader):
+    global _worker_model
+    # one core per worker; the pool already provides the parallelism
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    _worker_model = loader(config)
+    _worker_model.transcribe(np.zeros(int(SAMPLE_RATE * WARM_UP_SECONDS), dtype=np.float32))
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def _worker_transcribe(data: bytes):
+    start = time.perf_counter()
+    text = _worker_model.transcribe(decode_audio(data))
+    return text, time.perf_counter() - start
+
+
+# ---------- Pool ----------
+class STTPool:
+    def __init__(self, config: STTConfig = None, workers: int = None, max_pending: int = None,
+                 loader=load_backend):
+        self.config = config or STTConfig()
+        self.workers = workers or int(os.getenv("CHAPO_STT_WORKERS", 0)) or 1
+        self.max_pending = max_pending or int(os.getenv("CHAPO_STT_MAX_PENDING", 0)) or self.workers * 2
+        self._loader = loader
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._ready = False
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.rejected = 0
+
+    def _ensure_executor(self):
+        """The executor, created on first use; its worker processes load their models as they start."""
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: torch and fork()ed threads don't mix
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.config, self._loader),
+                )
+            return self._executor
+
+    def start(self):
+        """Spawns the workers and waits until every one has its model loaded (idempotent)."""
+        if self._ready:
+            return
+        executor = self._ensure_executor()
+        start = time.perf_counter()
+        futures = [executor.submit(_worker_ready) for _ in range(self.workers)]
+        pids = {f.result() for f in futures}
+        if not self._ready:
+            self._ready = True
+            logging.info(f"[STT] Pool ready: {len(pids)} worker(s), {self.config}, "
+                         f"{time.perf_counter() - start:.2f}s")
+
+    async def start_async(self):
+        await asyncio.to_thread(self.start)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def retry_after(self) -> int:
+        """Rough seconds until a slot frees up, from recent job latency."""
+        avg = sum(self.latencies) / len(self.latencies) if self.latencies else 1.0
+        return max(1, math.ceil(avg * self._pending / self.workers))
+
+    def submit(self, data: bytes):
+        """Queues one clip; returns a Future of (text, seconds). Raises STTBusy when full."""
+        executor = self._ensure_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise STTBusy(self.retry_after())
+            self._pending += 1
+        try:
+            future = executor.submit(_worker_transcribe, data)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending -= 1
+        if not future.cancelled() and future.exception() is None:
+            self.latencies.append(future.result()[1])
+
+    async def transcribe_async(self, data: bytes) -> str:
+        text, _ = await asyncio.wrap_future(self.submit(data))
+        return text
+
+    def stats(self) -> dict:
+        lat = sorted(self.latencies)
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 1) if lat else None
+
+        return {
+            "workers": self.workers,
+            "ready": self._ready,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "rejected": self.rejected,
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._ready = False
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# --- Shared instance for the API process ---
+_stt_pool = None
+
+
+def get_stt_pool() -> STTPool:
+    global _stt_pool
+    if _stt_pool is None:
+        _stt_pool = STTPool()
+    return _stt_pool
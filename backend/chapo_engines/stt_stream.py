@@ -0,0 +1,436 @@
+"""
+stt_stream.py
+
+One speech-to-text interface for the voice loop, with a streaming mode.
+
+Every backend hands out a connection with a websocket-style shape:
+    conn = backend.connect(rate)
+    conn.send(frame)          # while the user is still talking
+    conn.finish()             # end of utterance (VAD endpoint)
+    for t in conn.transcripts():   # partials..., then one final
+        ...
+
+Backends:
+- DeepgramStreamingSTT  live websocket, interim results (needs `websockets`)
+- DeepgramFileSTT       one POST of the whole utterance (raw linear16)
+- WhisperSTT            local model through the shared STTManager
+- FakeStreamingSTT      scripted partials/final, no network (tests, benchmarks)
+- FakeFileSTT           scripted batch reply with an upload-like delay
+
+Batch backends get a connection that buffers frames and transcribes on
+finish(), so the loop code is identical either way.
+
+IntentPrefetcher starts the (cached) intent classification as soon as a
+partial transcript is stable, so by the time the final transcript lands
+the Wit/local classification is usually already done.
+
+Usage Example:
+    from chapo_engines.stt_stream import IntentPrefetcher, default_stt, listen
+
+    stt = default_stt()
+    prefetch = IntentPrefetcher(get_intent_from_wit)
+    with MicrophoneSource() as mic:
+        turn = listen(mic, stt, prefetch)
+    intent, confidence, entities = turn.intent()
+"""
+
+import abc
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+
+from chapo_engines.tracing import traced
+from chapo_engines.utterance import Utterance
+from chapo_engines.voice_capture import SAMPLE_RATE, CapturedAudio, capture_utterance
+
+try:
+    from websockets.sync.client import connect as ws_connect  # optional, for live streaming
+except ImportError:
+    ws_connect = None
+
+DEEPGRAM_LISTEN_URL = "https://api.deepgram.com/v1/listen"
+DEEPGRAM_STREAM_URL = "wss://api.deepgram.com/v1/listen"
+
+
+class Transcript:
+    def __init__(self, text: str, is_final: bool = False):
+        self.text = text
+        self.is_final = is_final
+        self.at = time.perf_counter()
+
+    def __repr__(self):
+        return f"Transcript({self.text!r}, final={self.is_final})"
+
+
+# ---------- Connections ----------
+class STTConnection(abc.ABC):
+    """Base connection: a transcript queue that ends after the final one."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def _emit(self, text, is_final=False):
+        self._queue.put(Transcript(text, is_final))
+
+    @abc.abstractmethod
+    def send(self, frame: bytes):
+        """Queues one PCM frame for recognition."""
+
+    @abc.abstractmethod
+    def finish(self):
+        """End of audio: the final transcript follows on transcripts()."""
+
+    def transcripts(self, timeout: float = 30.0):
+        """Yields partials as they arrive, ending with the final transcript."""
+        while True:
+            try:
+                t = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                logging.warning("[STT] Timed out waiting for the final transcript")
+                yield Transcript("", is_final=True)
+                return
+            yield t
+            if t.is_final:
+                return
+
+
+class BufferedConnection(STTConnection):
+    """For batch backends: collect frames, transcribe the whole clip on finish()."""
+
+    def __init__(self, backend, rate):
+        super().__init__()
+        self._backend = backend
+        self._rate = rate
+        self._frames = []
+
+    def send(self, frame):
+        self._frames.append(frame)
+
+    def finish(self):
+        def _run():
+            text = ""
+            try:
+                text = self._backend.transcribe(CapturedAudio(b"".join(self._frames), self._rate))
+            except Exception as e:
+                logging.error(f"[STT] {self._backend.name} failed: {e}")
+            self._emit(text, is_final=True)
+
+        threading.Thread(target=_run, daemon=True).start()
+
+
+# ---------- Backends ----------
+class STTBackend(abc.ABC):
+    name = "stt"
+    streaming = False
+
+    def connect(self, rate: int = SAMPLE_RATE) -> STTConnection:
+        return BufferedConnection(self, rate)
+
+    @abc.abstractmethod
+    def transcribe(self, audio: CapturedAudio) -> str:
+        """The whole clip's transcript ("" when nothing was recognized)."""
+
+
+class DeepgramFileSTT(STTBackend):
+    name = "deepgram"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or os.getenv("DEEPGRAM_API_KEY")
+
+    @traced("stt.deepgram")
+    def transcribe(self, audio: CapturedAudio) -> str:
+        if not audio:
+            return ""
+        response = requests.post(
+            DEEPGRAM_LISTEN_URL,
+            headers={"Authorization": f"Token {self.api_key}", "Content-Type": "audio/l16"},
+            params={"encoding": "linear16", "sample_rate": audio.sample_rate, "channels": 1},
+            data=audio.pcm,
+        )
+        if response.status_code != 200:
+            logging.error(f"[STT] Deepgram error: {response.text}")
+            return ""
+        result = response.json()
+        return result["results"]["channels"][0]["alternatives"][0]["transcript"]
+
+
+class _DeepgramStreamConnection(STTConnection):
+    """
+    Live websocket. Deepgram sends interim results and finalises segments
+    (is_final); the utterance transcript is the finalised segments joined,
+    emitted as our final once the server closes after CloseStream.
+    """
+
+    def __init__(self, api_key, rate):
+        super().__init__()
+        params = {"encoding": "linear16", "sample_rate": rate, "channels": 1,
+                  "interim_results": "true", "punctuate": "true"}
+        self._ws = ws_connect(f"{DEEPGRAM_STREAM_URL}?{urlencode(params)}",
+                              additional_headers={"Authorization": f"Token {api_key}"})
+        self._segments = []
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        try:
+            for message in self._ws:
+                data = json.loads(message)
+                if data.get("type") != "Results":
+                    continue
+                text = data["channel"]["alternatives"][0]["transcript"].strip()
+                if data.get("is_final"):
+                    if text:
+                        self._segments.append(text)
+                    self._emit(" ".join(self._segments))
+                elif text:
+                    self._emit(" ".join(self._segments + [text]))
+        except Exception as e:
+            logging.error(f"[STT] Deepgram stream failed: {e}")
+        finally:
+            self._emit(" ".join(self._segments), is_final=True)
+
+    def send(self, frame):
+        try:
+            self._ws.send(frame)
+        except Exception as e:
+            logging.error(f"[STT] Could not send audio: {e}")
+
+    def finish(self):
+        try:
+            self._ws.send(json.dumps({"type": "CloseStream"}))
+        except Exception as e:
+            logging.error(f"[STT] Could not close stream: {e}")
+
+
+class DeepgramStreamingSTT(STTBackend):
+    name = "deepgram-stream"
+    streaming = True
+
+    def __init__(self, api_key=None):
+        if ws_connect is None:
+            raise RuntimeError("DeepgramStreamingSTT needs the `websockets` package")
+        self.api_key = api_key or os.getenv("DEEPGRAM_API_KEY")
+
+    def connect(self, rate=SAMPLE_RATE):
+        return _DeepgramStreamConnection(self.api_key, rate)
+
+    def transcribe(self, audio):
+        return DeepgramFileSTT(self.api_key).transcribe(audio)
+
+
+class WhisperSTT(STTBackend):
+    name = "whisper"
+
+    def transcribe(self, audio: CapturedAudio) -> str:
+        from chapo_engines.stt_manager import get_stt_manager
+
+        return get_stt_manager().transcribe(audio.to_float32()) if audio else ""
+
+
+# ---------- Fakes (tests / benchmarks) ----------
+class _FakeStreamConnection(STTConnection):
+    def __init__(self, words, frames_per_word, final_delay):
+        super().__init__()
+        self._words = words
+        self._frames_per_word = frames_per_word
+        self._final_delay = final_delay
+        self._frames = 0
+
+    def send(self, frame):
+        # like interim results: one partial per word-interval, repeated once all words are out
+        self._frames += 1
+        if self._frames % self._frames_per_word == 0:
+            shown = min(len(self._words), self._frames // self._frames_per_word)
+            self._emit(" ".join(self._words[:shown]))
+
+    def finish(self):
+        text = " ".join(self._words) if self._frames else ""
+        timer = threading.Timer(self._final_delay, self._emit, args=(text, True))
+        timer.daemon = True
+        timer.start()
+
+
+class FakeStreamingSTT(STTBackend):
+    """
+    Local stand-in for a streaming server: sends a partial every
+    `frames_per_word` frames, one more word of `script` each time, and the
+    final `final_delay` s after finish().
+    """
+
+    name = "fake-stream"
+    streaming = True
+
+    def __init__(self, script: str, frames_per_word: int = 8, final_delay: float = 0.08):
+        self.words = script.split()
+        self.frames_per_word = frames_per_word
+        self.final_delay = final_delay
+
+    def connect(self, rate=SAMPLE_RATE):
+        return _FakeStreamConnection(self.words, self.frames_per_word, self.final_delay)
+
+    def transcribe(self, audio):
+        return " ".join(self.words)
+
+
+class FakeFileSTT(STTBackend):
+    """Batch stand-in: fixed round trip plus time proportional to the clip length."""
+
+    name = "fake-file"
+
+    def __init__(self, script: str, base_latency: float = 0.3, per_audio_second: float = 0.15):
+        self.script = script
+        self.base_latency = base_latency
+        self.per_audio_second = per_audio_second
+
+    def transcribe(self, audio):
+        time.sleep(self.base_latency + self.per_audio_second * audio.duration)
+        return self.script
+
+
+def default_stt() -> STTBackend:
+    """CHAPO_STT_MODE = deepgram-stream | deepgram | whisper (streaming when available)."""
+    mode = os.getenv("CHAPO_STT_MODE", "deepgram-stream" if ws_connect else "deepgram")
+    if mode == "whisper":
+        return WhisperSTT()
+    if mode == "deepgram-stream" and ws_connect:
+        return DeepgramStreamingSTT()
+    return DeepgramFileSTT()
+
+
+# ---------- Intent prefetch ----------
+def _normalize(text: str) -> str:
+    return re.sub(r"[^\w\s]", "", text.lower()).strip()
+
+
+def _time_bound(future) -> bool:
+    """A finished classification whose entities hold a datetime, which is only right for its own turn."""
+    if not future.done() or future.exception():
+        return False
+    entities = future.result()[2] or {}
+    return any("datetime" in key for key in entities)
+
+
+class IntentPrefetcher:
+    """
+    Runs `classify(text)` early and caches the result by normalised text.
+    A partial counts as stable once the same text arrives `stable_after`
+    times in a row (or it is final). Results are kept in an LRU, so repeat
+    commands ("what time is it") skip the classifier entirely; results that
+    carry a resolved datetime ("remind me in 10 minutes") only serve the
+    utterance they were made for and are dropped at the next reset().
+    """
+
+    def __init__(self, classify, stable_after: int = 2, cache_size: int = 256, workers: int = 2):
+        self.classify = classify
+        self.stable_after = stable_after
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # normalised text -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chapo-intent")
+        self._last = None
+        self._repeats = 0
+
+    def reset(self):
+        """Call at the start of each utterance."""
+        self._last, self._repeats = None, 0
+        with self._lock:
+            for key in [k for k, f in self._cache.items() if _time_bound(f)]:
+                del self._cache[key]
+
+    def on_transcript(self, t: Transcript):
+        key = _normalize(t.text)
+        if not key:
+            return
+        if key == self._last:
+            self._repeats += 1
+        else:
+            self._last, self._repeats = key, 1
+        if t.is_final or self._repeats >= self.stable_after:
+            self.prefetch(t.text)
+
+    def prefetch(self, text: str) -> Future:
+        key = _normalize(text)
+        with self._lock:
+            future = self._cache.get(key)
+            if future is not None and not (future.done() and future.exception()):
+                self._cache.move_to_end(key)
+                return future
+            future = self._executor.submit(self.classify, text)
+            self._cache[key] = future
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return future
+
+    def result(self, text: str):
+        """Classification for the final text; reuses a prefetched/cached one if it matches."""
+        return self.prefetch(text).result()
+
+
+# ---------- One turn ----------
+class Turn:
+    def __init__(self, text, captured, prefetcher, speech_end, final_at):
+        self.text = Utterance.of(text)  # preprocessed once, shared by every consumer of the turn
+        self.captured = captured
+        self.speech_end = speech_end  # perf_counter() at the VAD endpoint
+        self.timings = {"final_ms": _ms_since(speech_end, final_at)}
+        self._prefetcher = prefetcher
+
+    def intent(self):
+        """Prefetched (or freshly computed) classification of the final text."""
+        result = self._prefetcher.result(self.text) if self._prefetcher else None
+        self.timings.setdefault("intent_ms", _ms_since(self.speech_end, time.perf_counter()))
+        return result
+
+
+def _ms_since(start, end):
+    return None if end is None else round((end - start) * 1000, 1)
+
+
+def listen(source, stt: STTBackend, prefetcher: IntentPrefetcher = None, on_speech_start=None,
+           **capture_kwargs) -> Turn:
+    """
+    Captures one utterance from `source` while streaming it to `stt`, feeding
+    partials to `prefetcher`. Returns once the final transcript is in.
+    `on_speech_start()` fires once, when the VAD triggers (used for barge-in).
+    """
+    rate = capture_kwargs.pop("rate", None) or getattr(source, "rate", SAMPLE_RATE)
+    conn = stt.connect(rate)
+    if prefetcher:
+        prefetcher.reset()
+    final = []
+
+    def _read():
+        for t in conn.transcripts():
+            if prefetcher:
+                prefetcher.on_transcript(t)
+            if t.is_final:
+                final.append(t)
+
+    reader = threading.Thread(target=_read, daemon=True)
+    reader.start()
+
+    started = []
+
+    def _on_frame(frame):
+        if not started:
+            started.append(True)
+            if on_speech_start:
+                on_speech_start()
+        conn.send(frame)
+
+    captured = capture_utterance(source, rate=rate, on_frame=_on_frame, **capture_kwargs)
+    end = time.perf_counter()
+    conn.finish()
+    reader.join()
+
+    text = final[0].text.strip() if final else ""
+    return Turn(text, captured, prefetcher, end, final[0].at if final else None)
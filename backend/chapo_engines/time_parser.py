@@ -0,0 +1,233 @@
+"""
+time_parser.py
+
+Shared time-expression parsing for alarms, reminders and the calendar.
+
+The forms people actually say are parsed by precompiled regexes, straight
+into Europe/London aware datetimes:
+    in 10 minutes / in an hour / in 30 secs
+    at 7 am / 7:30pm / at 19:00       (today, or tomorrow once it has passed)
+    tomorrow at 3 pm
+    (on) friday at 9:30 am            (next friday; "friday" on a friday is next week)
+    2025-08-29T19:00:00.000+01:00     (Wit.ai wit$datetime values)
+Anything else goes to dateparser with the settings the engines used before
+(future dates, London time), behind an LRU of (text, reference minute) ->
+result, so a sentence dateparser can't read is only paid for once a minute.
+
+parse() replaces dateparser.parse() for a whole expression; search()
+replaces dateparser.search.search_dates() and returns the same
+[(phrase, datetime)] list. The fast paths give the same answers as
+dateparser (tests/test_time_parser.py keeps a corpus of both).
+
+Usage Example:
+    from chapo_engines.time_parser import parse, search
+
+    parse("in 10 minutes")                   # now + 10 min, London time
+    parse("2025-08-29T19:00:00.000+01:00")   # Wit entity value
+    search("add dentist to my calendar tomorrow at 3 pm")
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, time
+from typing import Optional
+
+import pytz
+
+LONDON = pytz.timezone("Europe/London")
+CACHE_SIZE = 1024
+
+PARSE_SETTINGS = {"TIMEZONE": "Europe/London", "RETURN_AS_TIMEZONE_AWARE": True, "PREFER_DATES_FROM": "future"}
+SEARCH_SETTINGS = {"PREFER_DATES_FROM": "future"}
+
+# ---------- Fast paths ----------
+_CLOCK = (
+    r"(?:(?P<h12>1[0-2]|0?[1-9])(?::(?P<m12>[0-5]\d))?\s*(?P<ampm>[ap])m"
+    r"|(?P<h24>[01]?\d|2[0-3]):(?P<m24>[0-5]\d))"
+)
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_UNITS = {"sec": "seconds", "second": "seconds", "min": "minutes", "minute": "minutes", "hr": "hours", "hour": "hours"}
+
+_RELATIVE = re.compile(r"in\s+(?P<n>\d+|an?)\s+(?P<unit>sec|second|min|minute|hr|hour)s?")
+_TOMORROW = re.compile(rf"tomorrow\s+(?:at\s+)?{_CLOCK}")
+_WEEKDAY = re.compile(rf"(?:on\s+)?(?P<weekday>{'|'.join(_WEEKDAYS)})\s+(?:at\s+)?{_CLOCK}")
+_AT = re.compile(rf"(?:at\s+)?{_CLOCK}")
+_ISO = re.compile(r"\d{4}-\d\d-\d\dT\d\d:\d\d(?::\d\d(?:\.\d+)?)?(?:Z|[+-]\d\d:?\d\d)?")
+_DOTTED_AMPM = re.compile(r"\b([ap])\.m\.?", re.IGNORECASE)
+_TRAILING = re.compile(r"[\s.!?]+$")
+
+# anything else in a sentence that could be part of a date; search() leaves those to dateparser
+_OTHER_DATE_WORDS = re.compile(
+    r"\d|\b(?:today|tonight|tomorrow|yesterday|next|last|this|week|weekend|month|year|noon|midnight|morning"
+    r"|afternoon|evening|night|ago|" + "|".join(_WEEKDAYS) +
+    r"|jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec|january|february|march|april|june|july|august"
+    r"|september|october|november|december)\b"
+)
+
+
+def now_london() -> datetime:
+    return datetime.now(LONDON)
+
+
+def _london(dt: datetime) -> datetime:
+    return LONDON.localize(dt) if dt.tzinfo is None else dt.astimezone(LONDON)
+
+
+def _clock(m) -> time:
+    if m.group("h24") is not None:
+        return time(int(m.group("h24")), int(m.group("m24")))
+    hour = int(m.group("h12")) % 12
+    if m.group("ampm") == "p":
+        hour += 12
+    return time(hour, int(m.group("m12") or 0))
+
+
+def _at(day, clock) -> datetime:
+    return LONDON.localize(datetime.combine(day, clock))
+
+
+def _relative(m, now):
+    n = m.group("n")
+    n = 1 if n in ("a", "an") else int(n)
+    return LONDON.normalize(now + timedelta(**{_UNITS[m.group("unit")]: n}))
+
+
+def _tomorrow(m, now):
+    return _at(now.date() + timedelta(days=1), _clock(m))
+
+
+def _weekday(m, now):
+    ahead = (_WEEKDAYS.index(m.group("weekday")) - now.weekday()) % 7 or 7
+    return _at(now.date() + timedelta(days=ahead), _clock(m))
+
+
+def _time_of_day(m, now):
+    clock = _clock(m)
+    candidate = _at(now.date(), clock)
+    if candidate <= now:
+        candidate = _at(now.date() + timedelta(days=1), clock)
+    return candidate
+
+
+# most specific first: "tomorrow at 3 pm" must not be read as "at 3 pm"
+_FAST_PATHS = [(_RELATIVE, _relative), (_TOMORROW, _tomorrow), (_WEEKDAY, _weekday), (_AT, _time_of_day)]
+_IN_SENTENCE = [(re.compile(rf"\b{pattern.pattern}\b"), resolve) for pattern, resolve in _FAST_PATHS]
+
+
+def _normalize(text: str) -> str:
+    return _TRAILING.sub("", _DOTTED_AMPM.sub(r"\1m", text.strip())).lower()
+
+
+def fast_parse(text: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """A fast-path form covering the whole text, else None (dateparser not consulted)."""
+    if not text:
+        return None
+    if _ISO.fullmatch(text.strip()):
+        try:
+            return _london(datetime.fromisoformat(text.strip()))
+        except ValueError:
+            return None
+    cleaned = _normalize(text)
+    now = _london(now) if now else now_london()
+    for pattern, resolve in _FAST_PATHS:
+        m = pattern.fullmatch(cleaned)
+        if m:
+            return resolve(m, now)
+    return None
+
+
+def fast_search(text: str, now: Optional[datetime] = None):
+    """
+    (phrase, datetime) for the first fast-path form inside a sentence, but
+    only when nothing else in the sentence looks like part of a date.
+    """
+    cleaned = _DOTTED_AMPM.sub(r"\1m", text or "").lower()
+    now = _london(now) if now else now_london()
+    for pattern, resolve in _IN_SENTENCE:
+        m = pattern.search(cleaned)
+        if m and not _OTHER_DATE_WORDS.search(cleaned[:m.start()] + " " + cleaned[m.end():]):
+            return m.group(0), resolve(m, now)
+    return None
+
+
+# ---------- dateparser fallback ----------
+class _LRU:
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        value = compute()
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_parse_cache = _LRU()
+_search_cache = _LRU()
+
+
+def _minute(now):
+    return (now or now_london()).replace(second=0, microsecond=0)
+
+
+def _settings(base, now):
+    if now is None:
+        return base
+    return dict(base, RELATIVE_BASE=_london(now).replace(tzinfo=None))
+
+
+def parse(text: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    A whole time expression -> aware Europe/London datetime, or None.
+    Same answers as dateparser.parse(text, PARSE_SETTINGS); `now` is the
+    reference time (defaults to the clock).
+    """
+    if not text or not text.strip():
+        return None
+    dt = fast_parse(text, now)
+    if dt is not None:
+        return dt
+
+    def slow():
+        import dateparser
+        parsed = dateparser.parse(_DOTTED_AMPM.sub(r"\1m", text), settings=_settings(PARSE_SETTINGS, now))
+        return _london(parsed) if parsed else None
+
+    return _parse_cache.get((text, _minute(now)), slow)
+
+
+def search(text: str, now: Optional[datetime] = None):
+    """
+    Dates mentioned in a sentence, as [(phrase, datetime)] like
+    dateparser.search.search_dates(text, SEARCH_SETTINGS), or None.
+    Fast-path hits come back London-aware; dateparser's as it returns them.
+    """
+    if not text or not text.strip():
+        return None
+    hit = fast_search(text, now)
+    if hit is not None:
+        return [hit]
+
+    def slow():
+        from dateparser.search import search_dates
+        return search_dates(text, settings=_settings(SEARCH_SETTINGS, now))
+
+    return _search_cache.get((text, _minute(now)), slow)
+
+
+def clear_cache():
+    _parse_cache.clear()
+    _search_cache.clear()
@@ -0,0 +1,242 @@
+"""
+tracing.py
+
+Lightweight tracing for a full assistant turn: spans, contextvars, and
+per-stage latency percentiles.
+
+- span("wit.intent", text_len=12) is a context manager; @traced("name")
+  wraps sync and async functions. The current span lives in a contextvar,
+  so children nest correctly across awaits and asyncio.to_thread().
+- Finished spans can be exported as OpenTelemetry-style JSON (traceId,
+  spanId, parentSpanId, name, start/endTimeUnixNano, attributes, status),
+  one per line, to a file or the console:
+    CHAPO_TRACE_EXPORT = file | console | none      (default: none)
+    CHAPO_TRACE_FILE   = logs/traces.jsonl
+  The file exporter only queues the span; a writer thread appends them in
+  batches, so ending a span on the event loop never waits on the disk.
+- Every span's duration also goes into an in-memory per-name window, from
+  which stage_stats() gives p50/p95/p99 and prometheus_text() renders a
+  Prometheus summary for the /metrics endpoint.
+
+Usage Example:
+    from chapo_engines.tracing import span, traced
+
+    @traced("weather.fetch")
+    def get_current_weather(self, city): ...
+
+    with span("turn", session_id=session_id):
+        ...
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+WINDOW = 2048  # recent durations kept per span name
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current_span = contextvars.ContextVar("chapo_current_span", default=None)
+
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, error=None):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        self.error = error
+        tracer.finish(self)
+
+    def to_otel(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.start_ns + int((self.duration or 0) * 1e9),
+            "attributes": [{"key": k, "value": {"stringValue": str(v)}} for k, v in self.attributes.items()],
+            "status": {"code": "STATUS_CODE_ERROR", "message": str(self.error)} if self.error
+            else {"code": "STATUS_CODE_OK"},
+        }
+
+
+# ---------- Exporters ----------
+class FileExporter:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="chapo-trace-writer", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        self._queue.put(span)
+
+    def _run(self):
+        while True:
+            spans = [self._queue.get()]
+            while True:
+                try:
+                    spans.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                lines = "".join(json.dumps(s.to_otel()) + "\n" for s in spans)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except Exception as e:
+                logging.error(f"[TRACE] Export failed: {e}")
+            finally:
+                for _ in spans:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Blocks until every span exported so far is on disk."""
+        self._queue.join()
+
+
+class ConsoleExporter:
+    def export(self, span: Span):
+        indent = "  " if span.parent_span_id else ""
+        print(f"[trace] {indent}{span.name} {span.duration * 1000:.1f} ms")
+
+
+def _default_exporter():
+    mode = os.getenv("CHAPO_TRACE_EXPORT", "none").lower()
+    if mode == "console":
+        return ConsoleExporter()
+    if mode == "file":
+        return FileExporter(os.getenv("CHAPO_TRACE_FILE", os.path.join("logs", "traces.jsonl")))
+    return None
+
+
+# ---------- Tracer ----------
+class Tracer:
+    def __init__(self, exporter="default"):
+        self.exporter = _default_exporter() if exporter == "default" else exporter
+        self._lock = threading.Lock()
+        self._durations = {}  # name -> deque of seconds
+        self._counts = {}     # name -> (count, sum) over the whole process lifetime
+
+    def start_span(self, name, parent="current", **attributes) -> Span:
+        """A span that is NOT made current; end it with span.end()."""
+        if parent == "current":
+            parent = _current_span.get()
+        return Span(name, parent, attributes)
+
+    def finish(self, span: Span):
+        with self._lock:
+            self._durations.setdefault(span.name, deque(maxlen=WINDOW)).append(span.duration)
+            count, total = self._counts.get(span.name, (0, 0.0))
+            self._counts[span.name] = (count + 1, total + span.duration)
+        if self.exporter is not None:
+            try:
+                self.exporter.export(span)
+            except Exception as e:
+                logging.error(f"[TRACE] Export failed: {e}")
+
+    def stage_stats(self) -> dict:
+        """{span name: {count, sum_s, p50_ms, p95_ms, p99_ms}}"""
+        with self._lock:
+            snapshot = {name: sorted(d) for name, d in self._durations.items()}
+            counts = dict(self._counts)
+        stats = {}
+        for name, values in snapshot.items():
+            count, total = counts[name]
+            stats[name] = {"count": count, "sum_s": round(total, 6)}
+            for q in QUANTILES:
+                value = values[min(len(values) - 1, int(q * len(values)))]
+                stats[name][f"p{int(q * 100)}_ms"] = round(value * 1000, 2)
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._counts.clear()
+
+
+tracer = Tracer()
+
+
+# ---------- API ----------
+class span:
+    """Context manager: starts a child of the current span and makes it current."""
+
+    def __init__(self, name, **attributes):
+        self._span = tracer.start_span(name, **attributes)
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        self._span.end(error=exc)
+        return False
+
+
+def current_span():
+    return _current_span.get()
+
+
+def traced(name=None):
+    """Decorator: runs the function (sync or async) inside span(name)."""
+
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def prometheus_text() -> str:
+    """Per-stage latency as a Prometheus summary (text exposition format 0.0.4)."""
+    metric = "chapo_stage_duration_seconds"
+    lines = [
+        f"# HELP {metric} Latency of traced assistant stages.",
+        f"# TYPE {metric} summary",
+    ]
+    for name, s in sorted(tracer.stage_stats().items()):
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        for q in QUANTILES:
+            value = s[f"p{int(q * 100)}_ms"] / 1000
+            lines.append(f'{metric}{{stage="{label}",quantile="{q}"}} {value:.6f}')
+        lines.append(f'{metric}_sum{{stage="{label}"}} {s["sum_s"]:.6f}')
+        lines.append(f'{metric}_count{{stage="{label}"}} {s["count"]}')
+    return "\n".join(lines) + "\n"
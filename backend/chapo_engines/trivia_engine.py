@@ -4,25 +4,183 @@ trivia_engine.py
 Handles trivia question game logic for Chapo: load questions, ask, check answers, and manage session state.
 Interns: All trivia state is kept in session_memory; see the function docstrings for details.
 
+The questions live in a TriviaBank, loaded once and reloaded when
+trivia_questions.json changes on disk. Each question is compiled on load
+(normalized answer, option and letter lookup tables), and each session
+draws from its own lazily shuffled deck, so nothing repeats until the
+deck (all questions, or one category / difficulty) runs out. The deck is
+the bank version and filter it was dealt from, a position, and the few
+swaps made so far, so it stays small and JSON-safe in the shared session
+store.
+
 Author: [x-tech], 2025-05-28
 """
 
 import json
 import random
 import os
+import logging
+import threading
+from pathlib import Path
 
 # Path to JSON file storing trivia questions
-TRIVIA_FILE = r"C:\Users\LENOVO\chapo-bot-backend\backend\trivia_questions.json"
+TRIVIA_FILE = Path(__file__).resolve().parent.parent / "trivia_questions.json"
+
+DEFAULT_CATEGORY = "general"
+PROMPT_NEXT = "You could say something like, 'Tell me the next trivia question.'"
+
+
+def _norm(text):
+    return str(text).strip().lower()
+
+
+class TriviaQuestion:
+    """One question, with everything an answer check needs worked out up front."""
+    __slots__ = ("id", "raw", "answer", "options", "letters", "letter_index", "correct", "category", "difficulty")
+
+    def __init__(self, qid, raw):
+        self.id = qid
+        self.raw = raw
+        self.answer = _norm(raw["answer"])
+        self.options = tuple(_norm(opt) for opt in raw["options"])
+        self.letters = tuple(chr(97 + i) for i in range(len(self.options)))
+        self.letter_index = {letter: i for i, letter in enumerate(self.letters)}
+        self.correct = frozenset(i for i, opt in enumerate(self.options) if opt == self.answer)
+        self.category = _norm(raw.get("category") or DEFAULT_CATEGORY)
+        self.difficulty = _norm(raw["difficulty"]) if raw.get("difficulty") else None
+
+    def guessed_letter(self, user_ans):
+        """The first option letter the answer names ("b", "b.", "b is my guess"), else None."""
+        if user_ans in self.letter_index:
+            return user_ans
+        for letter in self.letters:
+            if f"{letter}." in user_ans or f"{letter} " in user_ans:
+                return letter
+        return None
+
+    def is_correct(self, user_input):
+        user_ans = _norm(user_input)
+        if user_ans == self.answer or self.answer in user_ans:
+            return True
+        letter = self.guessed_letter(user_ans)
+        return letter is not None and self.letter_index[letter] in self.correct
+
+
+class TriviaBank:
+    """
+    The questions in `path`, kept in memory. Every read checks the file's
+    mtime (one stat) and reloads when it changed; `version` changes with
+    it, which resets the session decks drawn from the old questions.
+    """
+
+    def __init__(self, path=TRIVIA_FILE):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.version = None
+        self.questions = ()
+        self.by_category = {}
+        self.by_difficulty = {}
+        self._pools = {}
+
+    def refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self.version:
+            return self
+        with self.lock:
+            if mtime != self.version:
+                self._load(mtime)
+        return self
+
+    def _load(self, mtime):
+        raw = []
+        if mtime is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"[TRIVIA] Could not load {self.path}: {e}")
+                if self.questions:
+                    return  # keep serving the last good copy
+        questions = tuple(TriviaQuestion(i, q) for i, q in enumerate(raw))
+        by_category, by_difficulty = {}, {}
+        for q in questions:
+            by_category.setdefault(q.category, []).append(q.id)
+            if q.difficulty:
+                by_difficulty.setdefault(q.difficulty, []).append(q.id)
+        self.questions = questions
+        self.by_category = {k: tuple(v) for k, v in by_category.items()}
+        self.by_difficulty = {k: tuple(v) for k, v in by_difficulty.items()}
+        self._pools = {}
+        self.version = mtime
+        logging.info(f"[TRIVIA] Loaded {len(questions)} question(s) from {self.path}")
+
+    def pool(self, category=None, difficulty=None):
+        """Ids of the questions in a category and/or difficulty (all of them by default)."""
+        self.refresh()
+        key = (_norm(category) if category else None, _norm(difficulty) if difficulty else None)
+        ids = self._pools.get(key)
+        if ids is None:
+            ids = range(len(self.questions))
+            if key[0]:
+                ids = self.by_category.get(key[0], ())
+            if key[1]:
+                wanted = set(self.by_difficulty.get(key[1], ()))
+                ids = [i for i in ids if i in wanted]
+            ids = self._pools[key] = tuple(ids)
+        return ids
+
+    def get(self, qid, version):
+        """The compiled question, if `qid` still refers to the same file contents."""
+        self.refresh()
+        if version != self.version or not 0 <= qid < len(self.questions):
+            return None
+        return self.questions[qid]
+
+    def draw(self, deck, category=None, difficulty=None, rng=random):
+        """
+        Next question of a session's deck (a dict, updated in place), or
+        None when nothing matches. The deck is a Fisher-Yates shuffle done
+        one step per draw: `swaps` records only the positions moved so far.
+        A finished deck, a new filter or a reloaded file starts a new shuffle.
+        """
+        ids = self.pool(category, difficulty)
+        n = len(ids)
+        if not n:
+            return None
+        filt = [category, difficulty]
+        if deck.get("version") != self.version or deck.get("filter") != filt or deck.get("pos", 0) >= n:
+            deck.clear()
+            deck.update(version=self.version, filter=filt, pos=0, swaps={})
+        pos, swaps = deck["pos"], deck["swaps"]
+        j = rng.randrange(pos, n)
+        picked = swaps.get(str(j), j)
+        if j != pos:
+            swaps[str(j)] = swaps.get(str(pos), pos)
+        swaps.pop(str(pos), None)
+        deck["pos"] = pos + 1
+        return self.questions[ids[picked]]
+
+
+# --- Shared instance (one per process) ---
+_bank = None
+
+
+def get_trivia_bank():
+    global _bank
+    if _bank is None:
+        _bank = TriviaBank()
+    return _bank
+
 
 def load_trivia_questions():
     """
     Load trivia questions from the persistent JSON file.
     Returns: List of dicts, each with 'question', 'options', 'answer'
     """
-    if not os.path.exists(TRIVIA_FILE):
-        return []
-    with open(TRIVIA_FILE, "r") as f:
-        return json.load(f)
+    return [q.raw for q in get_trivia_bank().refresh().questions]
 
 def format_trivia_question(question):
     """
@@ -35,22 +193,35 @@ def format_trivia_question(question):
     options_text = "\n".join([f"{chr(65+i)}. {opt}" for i, opt in enumerate(question["options"])])
     return f"🤔 {question['question']}\n{options_text}"
 
-def ask_trivia_question(session_id, session_memory):
+def ask_trivia_question(session_id, session_memory, category=None, difficulty=None):
     """
-    Pick a random trivia question and save it to the session.
+    Draw the session's next trivia question and save it to the session.
+    Questions don't repeat until the session has heard them all.
     Args:
         session_id (str): The user/session identifier
         session_memory (dict): Session dict for storing trivia state
+        category, difficulty (str, optional): Only draw from these questions
     Returns:
         str: Formatted question to present to user
     """
-    questions = load_trivia_questions()
-    if not questions:
+    bank = get_trivia_bank()
+    session = session_memory.get(session_id, {})
+    deck = session.setdefault("trivia_deck", {})
+    question = bank.draw(deck, category, difficulty)
+    if question is None:
         return "❗ No trivia questions are available."
-    question = random.choice(questions)
-    session = session_memory.setdefault(session_id, {})
-    session["pending_trivia_answer"] = question
-    return format_trivia_question(question)
+    session["pending_trivia_answer"] = dict(question.raw, id=question.id, version=bank.version)
+    session_memory[session_id] = session  # write back (session_memory may be a shared store)
+    return format_trivia_question(question.raw)
+
+def _grade(current, user_input):
+    """Feedback for an answer to `current` (a question dict saved in the session)."""
+    question = get_trivia_bank().get(current.get("id", -1), current.get("version"))
+    if question is None:
+        question = TriviaQuestion(-1, current)  # saved before the bank changed: compile it here
+    if question.is_correct(user_input):
+        return f"🎉 Correct! Well done. {PROMPT_NEXT}"
+    return f"❌ Oops, the correct answer was '{current['answer']}'. {PROMPT_NEXT}"
 
 def check_trivia_answer(user_input, session_id, session_memory):
     """
@@ -62,40 +233,16 @@ def check_trivia_answer(user_input, session_id, session_memory):
     Returns:
         str: Feedback to user
     """
-    session = session_memory.setdefault(session_id, {})
+    session = session_memory.get(session_id, {})
     current = session.get("pending_trivia_answer")
     if not current:
         return "❗ No trivia question has been asked yet. Say 'Let's play trivia' to start."
 
-    correct = current["answer"].strip().lower()
-    user_ans = user_input.strip().lower()
-
-    options = [opt.strip().lower() for opt in current["options"]]
-    option_letters = [chr(65 + i).lower() for i in range(len(options))]
-    guessed_letter = None
-    for letter in option_letters:
-        if f"{letter}." in user_ans or f"{letter} " in user_ans or user_ans.strip() == letter:
-            guessed_letter = letter
-            break
-
     # Remove the trivia from memory regardless of outcome
     session.pop("pending_trivia_answer", None)
+    session_memory[session_id] = session
 
-    prompt_next = "You could say something like, 'Tell me the next trivia question.'"
-
-    # Multiple checks for robust answer parsing
-    if user_ans == correct:
-        return f"🎉 Correct! Well done. {prompt_next}"
-    if guessed_letter:
-        idx = option_letters.index(guessed_letter)
-        if options[idx] == correct:
-            return f"🎉 Correct! Well done. {prompt_next}"
-    if any(correct == opt and opt in user_ans for opt in options):
-        return f"🎉 Correct! Well done. {prompt_next}"
-    if correct in user_ans:
-        return f"🎉 Correct! Well done. {prompt_next}"
-
-    return f"❌ Oops, the correct answer was '{current['answer']}'. {prompt_next}"
+    return _grade(current, user_input)
 
 def handle_trivia(intent, user_input, session_id, session_memory):
     """
@@ -126,32 +273,9 @@ def handle_trivia_answer(session_id, user_input, session_memory):
     if not current:
         return "❗ No trivia question has been asked yet. Say 'Let's play trivia' to start."
 
-    correct = current["answer"].strip().lower()
-    user_ans = user_input.strip().lower()
-    options = [opt.strip().lower() for opt in current["options"]]
-    option_letters = [chr(65 + i).lower() for i in range(len(options))]
-    guessed_letter = None
-    for letter in option_letters:
-        if f"{letter}." in user_ans or f"{letter} " in user_ans or user_ans.strip() == letter:
-            guessed_letter = letter
-            break
-
     session.pop("current_trivia", None)
 
-    prompt_next = "You could say something like, 'Tell me the next trivia question.'"
-
-    if user_ans == correct:
-        return f"🎉 Correct! Well done. {prompt_next}"
-    if guessed_letter:
-        idx = option_letters.index(guessed_letter)
-        if options[idx] == correct:
-            return f"🎉 Correct! Well done. {prompt_next}"
-    if any(correct == opt and opt in user_ans for opt in options):
-        return f"🎉 Correct! Well done. {prompt_next}"
-    if correct in user_ans:
-        return f"🎉 Correct! Well done. {prompt_next}"
-
-    return f"❌ Oops, the correct answer was '{current['answer']}'. {prompt_next}"
+    return _grade(current, user_input)
 
 
 # ------- Standalone CLI Test Harness -------
@@ -0,0 +1,94 @@
+"""
+tts_cache.py
+
+LRU disk cache of synthesized speech, keyed on (text, voice_id, model_id,
+output_format). Frequent fixed phrases ("I didn't catch anything...",
+"Goodbye!") are then played straight from disk instead of a round trip
+to ElevenLabs.
+
+- One file per entry, named by the SHA-256 of the key.
+- Recency is the file's mtime (touched on every hit), so the LRU order
+  survives restarts without a separate index file.
+- Writes go to a sibling file and are os.replace()d into place, so a
+  crash never leaves a half-written clip behind.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+def cache_key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+    raw = "\x1f".join([text.strip(), voice_id, model_id, output_format])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    def __init__(self, directory, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, oldest first
+        self._total = 0
+        files = sorted(self.directory.glob("*.pcm"), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self._total += size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pcm"
+
+    def get(self, key: str):
+        """Returns the cached audio bytes or None."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+            return data
+        except OSError:
+            with self._lock:
+                self._total -= self._entries.pop(key, 0)
+            return None
+
+    def put(self, key: str, data: bytes):
+        if not data or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp = path.with_suffix(".part")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.error(f"[TTS Cache] Could not write {path}: {e}")
+            return
+        with self._lock:
+            self._total -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._total += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._entries:
+            old_key, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                self._path(old_key).unlink()
+            except OSError:
+                pass
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
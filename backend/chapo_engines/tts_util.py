@@ -1,48 +1,103 @@
 # chapo_engines/tts_util.py
 
 import os
-import tempfile
-import pygame
+import threading
+from pathlib import Path
 from dotenv import load_dotenv
-from elevenlabs.client import ElevenLabs
+
+from chapo_engines.audio_service import get_audio_service, PRIORITY_TTS
+from chapo_engines.tts_cache import TTSCache, cache_key
+from chapo_engines.phrase_bank import PhraseBank
+from chapo_engines.tracing import traced
 
 load_dotenv()
 
 api_key = os.getenv("ELEVEN_API_KEY")
-if not api_key:
-    raise ValueError("❌ ELEVEN_API_KEY is missing in .env")
 
 VOLUME_LEVEL = 0.6
-client = ElevenLabs(api_key=api_key)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The ElevenLabs client, created on first synthesis (cached phrases never need it)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not api_key:
+                raise ValueError("❌ ELEVEN_API_KEY is missing in .env")
+            from elevenlabs.client import ElevenLabs
+            _client = ElevenLabs(api_key=api_key)
+    return _client
+
+VOICE_ID = "EXAVITQu4vr4xnSDxMaL"
+MODEL_ID = "eleven_turbo_v2"
+# Raw PCM streams straight into the mixer; MP3 would need the whole file to decode
+OUTPUT_FORMAT = "pcm_22050"
+SAMPLE_RATE = 22050
+
+# Only short replies are worth caching; long/dynamic answers would just churn it
+MAX_CACHED_TEXT_LEN = 120
+tts_cache = TTSCache(Path(__file__).parent / "tts_cache")
+# Canned replies pre-synthesized by `python -m chapo_engines.phrase_bank build`
+phrase_bank = PhraseBank()
+
 
-def speak(text):
+def synthesize(text):
+    """Full clip for `text` as raw PCM (used by the phrase bank build job)."""
+    return b"".join(get_client().text_to_speech.convert(
+        text=text.strip(),
+        voice_id=VOICE_ID,
+        model_id=MODEL_ID,
+        output_format=OUTPUT_FORMAT
+    ))
+
+
+def _cache_through(chunks, key):
+    """Yields chunks unchanged and stores the full clip once the stream completes."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    tts_cache.put(key, b"".join(parts))
+
+@traced("tts.speak")
+def speak(text, block=True):
+    """
+    Speaks `text` through the shared AudioService.
+    Phrase-bank and cached phrases play from disk; everything else streams from ElevenLabs
+    and starts playing as soon as the first PCM chunk arrives.
+    With block=True the caller waits (without polling) until playback ends;
+    with block=False it returns the PlaybackJob straight away.
+    """
     if not text or not isinstance(text, str) or not text.strip():
         return  # Skip empty/null text
 
     print(f"🗣️ Chapo: {text}")
     try:
-        audio = client.text_to_speech.convert(
-            text=text.strip(),
-            voice_id="EXAVITQu4vr4xnSDxMaL",
-            model_id="eleven_turbo_v2",
-            output_format="mp3_44100_128"
-        )
+        text = text.strip()
+        key = cache_key(text, VOICE_ID, MODEL_ID, OUTPUT_FORMAT)
+        cached = phrase_bank.lookup(text, VOICE_ID, MODEL_ID, OUTPUT_FORMAT)
+        if cached is None:
+            cached = tts_cache.get(key)
+        if cached is not None:
+            chunks = [cached]
+        else:
+            chunks = get_client().text_to_speech.convert(
+                text=text,
+                voice_id=VOICE_ID,
+                model_id=MODEL_ID,
+                output_format=OUTPUT_FORMAT
+            )
+            if len(text) <= MAX_CACHED_TEXT_LEN:
+                chunks = _cache_through(chunks, key)
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-            for chunk in audio:
-                tmp.write(chunk)
-            tmp_path = tmp.name
-
-        pygame.mixer.init()
-        pygame.mixer.music.load(tmp_path)
-        pygame.mixer.music.set_volume(VOLUME_LEVEL)
-        pygame.mixer.music.play()
-        while pygame.mixer.music.get_busy():
-            pygame.time.Clock().tick(10)
-
-        pygame.mixer.music.stop()
-        pygame.mixer.quit()
-        os.remove(tmp_path)
+        job = get_audio_service().submit_stream(
+            chunks, SAMPLE_RATE, priority=PRIORITY_TTS, volume=VOLUME_LEVEL
+        )
+        if not block:
+            return job
+        job.wait()
 
     except Exception as e:
         print(f"[TTS Error]: {e}")
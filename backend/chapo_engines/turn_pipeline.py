@@ -0,0 +1,292 @@
+"""
+turn_pipeline.py
+
+Asyncio pipeline for one voice turn, with per-stage timing.
+
+The old loop ran every stage back to back: record -> STT -> Wit -> emotion
+-> engine -> speak (blocking until playback ended) -> Mongo/JSON logging
+-> record again. TurnPipeline overlaps them:
+
+- NLU, emotion detection and the spaCy entity fallback run concurrently
+  (understand()); the turn handler only awaits them when it needs them, so
+  commands like "volume up" never wait for Wit.
+- The reply is queued on the AudioService and the next capture is armed
+  right away. If the user starts talking while Chapo is still speaking,
+  the playback is cancelled (barge-in); while playing, capture uses a
+  stricter minimum speech length so Chapo's own voice is less likely to
+  trigger it.
+- Logging goes through BackgroundWriter, one daemon thread draining a
+  queue, so the turn never waits on Mongo or the session log file.
+
+Every stage is timed (StageTimer) and PipelineStats keeps p50/p95 per stage.
+Each turn is also a "turn" span (tracing.py) with one "turn.<stage>" child
+per stage, so engine/DB spans opened inside a stage nest under it.
+ReplayListener / replay_speak run recorded transcripts through the same
+pipeline without a microphone or speakers.
+
+Usage Example:
+    pipeline = TurnPipeline(listen=listen_fn, handle=handle_turn, speak=speak_fn,
+                            nlu=..., emotion=..., spacy=...)
+    await pipeline.run(session_id)
+"""
+
+import asyncio
+import inspect
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from chapo_engines.tracing import span, tracer
+from chapo_engines.utterance import Utterance
+
+BARGE_IN_MIN_SPEECH_MS = 400  # while Chapo is talking; normal capture uses 150
+
+
+class EndSession(Exception):
+    """Raised by the turn handler to end the loop; `farewell` is spoken first."""
+
+    def __init__(self, farewell: str = None):
+        super().__init__(farewell)
+        self.farewell = farewell
+
+
+# ---------- Timing ----------
+class StageTimer:
+    """Wall-clock ms per named stage for one turn."""
+
+    def __init__(self):
+        self.stages = {}
+        self._open = {}
+        self._spans = {}
+
+    def start(self, name):
+        self._open[name] = time.perf_counter()
+        self._spans[name] = tracer.start_span(f"turn.{name}")
+
+    def stop(self, name):
+        started = self._open.pop(name, None)
+        if started is not None:
+            self.stages[name] = round((time.perf_counter() - started) * 1000, 1)
+        stage_span = self._spans.pop(name, None)
+        if stage_span is not None:
+            stage_span.end()
+
+    def record(self, name, ms):
+        if ms is not None:
+            self.stages[name] = round(ms, 1)
+
+    async def run(self, name, fn, *args, **kwargs):
+        """Times `fn`: awaited if it is a coroutine function, else run in a worker thread."""
+        started = time.perf_counter()
+        try:
+            with span(f"turn.{name}"):
+                if inspect.iscoroutinefunction(fn):
+                    return await fn(*args, **kwargs)
+                return await asyncio.to_thread(fn, *args, **kwargs)
+        finally:
+            self.stages[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def summary(self) -> str:
+        return " | ".join(f"{name} {ms:.0f}" for name, ms in self.stages.items())
+
+
+class PipelineStats:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def add(self, timer: StageTimer):
+        for name, ms in timer.stages.items():
+            self.samples[name].append(ms)
+
+    def report(self) -> dict:
+        out = {}
+        for name, values in self.samples.items():
+            values = sorted(values)
+            out[name] = {
+                "n": len(values),
+                "p50_ms": values[len(values) // 2],
+                "p95_ms": values[min(len(values) - 1, int(0.95 * len(values)))],
+            }
+        return out
+
+
+# ---------- Off-critical-path work ----------
+class BackgroundWriter:
+    """One daemon thread that runs submitted callables in order (logging, metrics)."""
+
+    def __init__(self, name="chapo-writer"):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        self._queue.put((fn, args, kwargs))
+
+    def _run(self):
+        while True:
+            fn, args, kwargs = self._queue.get()
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                logging.error(f"[WRITER] {getattr(fn, '__name__', fn)} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Blocks until everything submitted so far has run."""
+        self._queue.join()
+
+
+# ---------- Understanding ----------
+class Understanding:
+    def __init__(self, intent=None, confidence=0.0, entities=None, emotion=None, spacy_entities=None, stage=None):
+        self.intent = intent
+        self.confidence = confidence
+        self.entities = entities or {}
+        self.emotion = emotion
+        self.spacy_entities = spacy_entities or {}
+        self.stage = stage  # NLU cascade stage that answered, if the nlu callable reports one
+
+
+def _safe(fn, default):
+    def wrapper(*args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            logging.error(f"[PIPELINE] {getattr(fn, '__name__', fn)} failed: {e}")
+            return default
+    return wrapper
+
+
+# ---------- Pipeline ----------
+class TurnPipeline:
+    """
+    listen(min_speech_ms, on_speech_start) -> turn (has .text, .intent())   [blocking]
+    handle(turn, understanding_task, session_id, timer) -> reply text/None  [async]
+    speak(text) -> PlaybackJob (returns at once)
+    nlu(turn) -> (intent, confidence, entities) [a Prediction also gives .stage]; emotion(text); spacy(text) -> dict
+    """
+
+    def __init__(self, listen, handle, speak, nlu, emotion=None, spacy=None,
+                 barge_in=True, writer=None, stats=None, verbose=True):
+        self.listen = listen
+        self.handle = handle
+        self.speak = speak
+        self.nlu = _safe(nlu, (None, 0.0, {}))
+        self.emotion = _safe(emotion, None) if emotion else None
+        self.spacy = _safe(spacy, {}) if spacy else None
+        self.barge_in = barge_in
+        self.writer = writer or BackgroundWriter()
+        self.stats = stats or PipelineStats()
+        self.verbose = verbose
+        self.playback = None
+
+    def _playing(self):
+        return self.playback is not None and not self.playback.done.is_set()
+
+    def _on_speech_start(self):
+        if self._playing():
+            logging.info("[PIPELINE] Barge-in: stopping playback")
+            self.playback.cancel()
+
+    async def understand(self, turn, timer: StageTimer) -> Understanding:
+        """NLU, emotion and spaCy entities, concurrently."""
+        timer.start("understand")
+        jobs = [timer.run("nlu", self.nlu, turn)]
+        if self.emotion:
+            jobs.append(timer.run("emotion", self.emotion, turn.text))
+        if self.spacy:
+            jobs.append(timer.run("spacy", self.spacy, turn.text))
+        results = await asyncio.gather(*jobs)
+        timer.stop("understand")
+        intent, confidence, entities = results[0]
+        emotion = results[1] if self.emotion else None
+        spacy_entities = results[-1] if self.spacy else {}
+        stage = getattr(results[0], "stage", None)
+        return Understanding(intent, confidence, entities, emotion, spacy_entities, stage)
+
+    async def run_turn(self, session_id) -> bool:
+        """One listen -> understand -> handle -> speak cycle. Returns False at session end."""
+        with span("turn", session_id=session_id):
+            return await self._run_turn(session_id)
+
+    async def _run_turn(self, session_id) -> bool:
+        timer = StageTimer()
+        if self._playing() and not self.barge_in:
+            await self.playback.wait_async()
+        min_speech_ms = BARGE_IN_MIN_SPEECH_MS if self._playing() else None
+        turn = await timer.run("listen", self.listen, min_speech_ms, self._on_speech_start)
+        timer.record("stt_final", getattr(turn, "timings", {}).get("final_ms"))
+
+        understanding = asyncio.ensure_future(self.understand(turn, timer))
+        keep_going = True
+        try:
+            reply = await timer.run("handle", self.handle, turn, understanding, session_id, timer)
+        except EndSession as end:
+            reply, keep_going = end.farewell, False
+        if not understanding.done():
+            understanding.cancel()
+
+        if reply:
+            timer.start("tts_submit")
+            self.playback = self.speak(reply)
+            timer.stop("tts_submit")
+        if not keep_going and self.playback is not None:
+            await self.playback.wait_async()
+
+        self.stats.add(timer)
+        if self.verbose:
+            print(f"⏱️ {timer.summary()}")
+        return keep_going
+
+    async def run(self, session_id):
+        while await self.run_turn(session_id):
+            pass
+        self.writer.flush()
+
+
+# ---------- Replay (no audio hardware) ----------
+class ReplayTurn:
+    def __init__(self, text, nlu):
+        self.text = Utterance.of(text)
+        self.timings = {}
+        self._nlu = nlu
+
+    def intent(self):
+        return self._nlu(self.text)
+
+
+class ReplayListener:
+    """Feeds recorded transcripts to the pipeline as if they had just been spoken."""
+
+    def __init__(self, texts, nlu, farewell="exit"):
+        self._texts = iter(list(texts) + [farewell])
+        self._nlu = nlu
+
+    def __call__(self, min_speech_ms=None, on_speech_start=None):
+        text = next(self._texts)
+        if on_speech_start:
+            on_speech_start()
+        return ReplayTurn(text, self._nlu)
+
+
+def replay_speak(seconds_per_char=0.0):
+    """speak() stand-in: a PlaybackJob that 'plays' for len(text) * seconds_per_char."""
+    from chapo_engines.audio_service import PRIORITY_TTS, PlaybackJob
+
+    def speak(text):
+        job = PlaybackJob(text, PRIORITY_TTS, 1.0)
+        job.first_audio_at = time.perf_counter()
+
+        def _play():
+            end = time.perf_counter() + len(text) * seconds_per_char
+            while not job.preempted and time.perf_counter() < end:
+                time.sleep(0.005)
+            job.done.set()
+
+        threading.Thread(target=_play, daemon=True).start()
+        return job
+
+    return speak
@@ -0,0 +1,81 @@
+"""
+utterance.py
+
+One preprocessed form of a user utterance, built once per turn and handed
+to everything that used to lowercase / strip / regex-clean the same text
+on its own (keyword fallbacks, emotion detection, small-talk intents,
+shopping item extraction, recipe input normalisation, expected-intent
+lookup, the NLU cascade).
+
+Utterance is an immutable str subclass: it *is* the raw text, so it can be
+logged, stored in Mongo or passed to code that only knows about strings,
+and it carries:
+    .lowered    lowercased and stripped
+    .cleaned    .lowered without punctuation (re [^\\w\\s] removed)
+    .tokens     tuple of words of .cleaned
+    .token_set  frozenset of .tokens, computed on first use
+    .ngrams(n)  word n-grams of .tokens, computed on first use
+
+Consumers call Utterance.of(text): an Utterance comes back as is, a plain
+str is preprocessed then, so callers that still pass strings keep working.
+
+Usage Example:
+    from chapo_engines.utterance import Utterance
+
+    u = Utterance("Add milk, please!")
+    u.cleaned        # 'add milk please'
+    "milk" in u.token_set
+    u.ngrams(2)      # ('add milk', 'milk please')
+"""
+
+import re
+
+_PUNCT = re.compile(r"[^\w\s]")
+
+
+class Utterance(str):
+    def __new__(cls, text=""):
+        self = super().__new__(cls, text or "")
+        lowered = self.lower().strip()
+        cleaned = _PUNCT.sub("", lowered)
+        tokens = tuple(cleaned.split())
+        state = self.__dict__
+        state["lowered"] = lowered
+        state["cleaned"] = cleaned
+        state["tokens"] = tokens
+        return self
+
+    @classmethod
+    def of(cls, text) -> "Utterance":
+        return text if isinstance(text, cls) else cls(text)
+
+    @property
+    def raw(self) -> str:
+        return str.__str__(self)
+
+    @property
+    def token_set(self) -> frozenset:
+        token_set = self.__dict__.get("_token_set")
+        if token_set is None:
+            token_set = self.__dict__["_token_set"] = frozenset(self.tokens)
+        return token_set
+
+    def ngrams(self, n: int) -> tuple:
+        key = f"_ngrams{n}"
+        grams = self.__dict__.get(key)
+        if grams is None:
+            tokens = self.tokens
+            grams = self.__dict__[key] = tuple(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Utterance is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Utterance is immutable")
+
+    def __reduce__(self):
+        return Utterance, (self.raw,)
+
+    def __repr__(self):
+        return f"Utterance({self.raw!r})"
@@ -0,0 +1,226 @@
+"""
+voice_capture.py
+
+Streaming microphone capture with voice activity detection (VAD).
+
+Replaces the fixed 5-second record_audio() -> WAV file -> re-read loop:
+- Frames (30 ms of 16 kHz, 16-bit mono PCM) are read as they arrive.
+- A VAD marks each frame as speech / non-speech: WebRTC VAD when the
+  `webrtcvad` package is installed, otherwise an energy detector with an
+  adaptive noise floor.
+- Capture starts on the first speech, keeps a short pre-roll so the first
+  syllable isn't clipped, and ends after trailing silence (or a hard cap).
+- The utterance stays in memory (CapturedAudio) and is handed to
+  Deepgram as raw linear16, or to Whisper as a float32 array.
+
+Any iterable of PCM frames can be the input, so tests feed recorded WAV
+files (e.g. backend/test.wav) through WavFileSource instead of a mic.
+
+Usage Example:
+    from chapo_engines.voice_capture import MicrophoneSource, capture_utterance
+
+    with MicrophoneSource() as mic:
+        audio = capture_utterance(mic)
+    text = transcribe(audio.pcm)
+"""
+
+import io
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+try:
+    import webrtcvad  # optional, better than energy VAD in noisy rooms
+except ImportError:
+    webrtcvad = None
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+SAMPLE_WIDTH = 2  # bytes, int16
+
+
+def frame_bytes(rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+    return int(rate * frame_ms / 1000) * SAMPLE_WIDTH
+
+
+class CapturedAudio:
+    """One utterance of 16-bit mono PCM, kept in memory."""
+
+    def __init__(self, pcm: bytes, sample_rate: int = SAMPLE_RATE, speech_ms: int = 0):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.speech_ms = speech_ms
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / (self.sample_rate * SAMPLE_WIDTH)
+
+    def __bool__(self):
+        return bool(self.pcm)
+
+    def to_float32(self) -> np.ndarray:
+        """Whisper's input format: float32 in [-1, 1] at 16 kHz."""
+        return np.frombuffer(self.pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def to_wav_bytes(self) -> bytes:
+        """In-memory WAV container, for APIs that insist on one."""
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(SAMPLE_WIDTH)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(self.pcm)
+        return buf.getvalue()
+
+
+# ---------- Frame sources ----------
+class MicrophoneSource:
+    """Live PyAudio input, yielded frame by frame."""
+
+    def __init__(self, rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+        self.rate = rate
+        self.frames_per_buffer = int(rate * frame_ms / 1000)
+        self._pa = None
+        self._stream = None
+
+    def __enter__(self):
+        import pyaudio
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(format=pyaudio.paInt16, channels=1, rate=self.rate,
+                                     input=True, frames_per_buffer=self.frames_per_buffer)
+        return self
+
+    def __exit__(self, *exc):
+        self._stream.stop_stream()
+        self._stream.close()
+        self._pa.terminate()
+        return False
+
+    def __iter__(self):
+        while True:
+            yield self._stream.read(self.frames_per_buffer, exception_on_overflow=False)
+
+
+class WavFileSource:
+    """
+    Fake input stream: plays a WAV file back as mic frames.
+    realtime=True sleeps one frame per frame, like a real microphone.
+    """
+
+    def __init__(self, path, frame_ms=FRAME_MS, realtime=False):
+        with wave.open(str(path), "rb") as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != SAMPLE_WIDTH:
+                raise ValueError(f"{path}: expected 16-bit mono WAV")
+            self.rate = wf.getframerate()
+            self._pcm = wf.readframes(wf.getnframes())
+        self.frame_ms = frame_ms
+        self.realtime = realtime
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        size = frame_bytes(self.rate, self.frame_ms)
+        for start in range(0, len(self._pcm) - size + 1, size):
+            if self.realtime:
+                time.sleep(self.frame_ms / 1000)
+            yield self._pcm[start:start + size]
+
+
+# ---------- VAD ----------
+class EnergyVAD:
+    """
+    RMS energy against an adaptive noise floor. A frame is speech when it is
+    `ratio` times louder than the floor and above `min_rms`.
+    """
+
+    def __init__(self, ratio=3.0, min_rms=100.0, floor_alpha=0.05):
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.floor_alpha = floor_alpha
+        self.noise_floor = 0.0
+
+    def is_speech(self, frame: bytes, rate: int = SAMPLE_RATE) -> bool:
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+        speech = rms > max(self.min_rms, self.noise_floor * self.ratio)
+        if not speech:
+            self.noise_floor += self.floor_alpha * (rms - self.noise_floor)
+        return speech
+
+
+class WebRtcVAD:
+    def __init__(self, aggressiveness=2):
+        self._vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame: bytes, rate: int = SAMPLE_RATE) -> bool:
+        return self._vad.is_speech(frame, rate)
+
+
+def default_vad():
+    return WebRtcVAD() if webrtcvad else EnergyVAD()
+
+
+# ---------- Segmenter ----------
+def capture_utterance(source, vad=None, rate=None, frame_ms=FRAME_MS, pre_roll_ms=300,
+                      silence_ms=700, max_ms=15000, no_speech_timeout_ms=8000,
+                      min_speech_ms=150, on_frame=None) -> CapturedAudio:
+    """
+    Reads frames from `source` until one utterance has been captured.
+
+    - pre_roll_ms: audio kept from just before speech started
+    - silence_ms: trailing silence that ends the utterance
+    - max_ms: hard cap on utterance length
+    - no_speech_timeout_ms: give up (empty CapturedAudio) if nobody talks
+    - min_speech_ms: shorter blips (clicks, coughs) are ignored
+    - on_frame: called with every captured frame as it arrives (pre-roll
+      included), e.g. to push audio to a streaming STT connection
+    """
+    vad = vad or default_vad()
+    rate = rate or getattr(source, "rate", SAMPLE_RATE)
+    pre_roll = deque(maxlen=max(1, pre_roll_ms // frame_ms))
+    frames = []
+    speech_frames = 0
+    silent_run = 0
+    waited = 0
+    triggered = False
+
+    for frame in source:
+        speech = vad.is_speech(frame, rate)
+        if not triggered:
+            pre_roll.append(frame)
+            waited += frame_ms
+            if speech:
+                speech_frames += 1
+                if speech_frames * frame_ms >= min_speech_ms:
+                    triggered = True
+                    frames.extend(pre_roll)
+                    if on_frame:
+                        for f in pre_roll:
+                            on_frame(f)
+                    silent_run = 0
+            else:
+                speech_frames = 0
+                if waited >= no_speech_timeout_ms:
+                    break
+            continue
+
+        frames.append(frame)
+        if on_frame:
+            on_frame(frame)
+        if speech:
+            speech_frames += 1
+            silent_run = 0
+        else:
+            silent_run += frame_ms
+            if silent_run >= silence_ms:
+                break
+        if len(frames) * frame_ms >= max_ms:
+            break
+
+    return CapturedAudio(b"".join(frames), rate, speech_frames * frame_ms)
@@ -11,11 +11,14 @@ import os
 import requests
 import logging
 
+from chapo_engines.tracing import traced
+
 class WeatherEngine:
     def __init__(self, api_key=None):
         self.api_key = api_key or os.getenv("WEATHER_API_KEY", "9da4a523b41c453ab6f91434251604")
         self.base_url = "http://api.weatherapi.com/v1/current.json"
 
+    @traced("engine.weather")
     def get_current_weather(self, city):
         """
         Returns a string with the current weather for the given city.
@@ -1,5 +1,13 @@
+"""
+chapo_server.py
+
+Legacy Flask bridge for /voice-command. Superseded by the FastAPI route
+(routers/voice_command.py), which keeps one event loop and per-session
+emotion state; kept only so benchmarks/load_test_voice_command.py can
+compare the two.
+"""
+
 from flask import Flask, request, jsonify
-import asyncio
 from test_voice import respond, get_intent_from_wit, emotion_tracker
 
 app = Flask(__name__)
@@ -11,8 +19,9 @@ def handle_voice_command():
     session_id = data.get("session_id", "default_user")
 
     intent, confidence, entities = get_intent_from_wit(user_input)
-    user_emotion = emotion_tracker.detect_emotion(user_input)
-    response = asyncio.run(respond(intent, entities, session_id, user_input, user_emotion))
+    user_emotion = emotion_tracker.detect_emotion(user_input, session_id)
+    # respond() is synchronous; it sets alarms on responder.alarm_loop(), which outlives the request
+    response = respond(intent, entities, session_id, user_input, user_emotion)
 
     return jsonify({
         "response": response,
@@ -0,0 +1,295 @@
+"""
+calendar_store.py
+
+Local mirror of the Google calendar (SQLite, WAL mode), so adding an event
+never waits on the network and "what's on today" is a local query.
+
+- calendar_events: one row per event. google_id is NULL until the event
+  has been pushed; rows pulled from Google are upserted by google_id.
+- calendar_span: an R*Tree over (start_at, end_at), kept in step with
+  calendar_events by triggers. Range and overlap queries walk the tree
+  instead of scanning every event; the R*Tree stores 32-bit floats, so
+  its bounds are widened outwards and the exact test is done on the row.
+- calendar_outbox: local changes still to be sent to Google. The event
+  and its outbox row are written in one transaction. A sender claims a
+  row by pushing its next_attempt_at forward (claim_outbox), so several
+  processes never send the same row twice; failures back off.
+- calendar_sync: the sync token of the last incremental pull.
+- calendar_meta: this database's random device key, which the ids we
+  give events pushed to Google are built from (device_key).
+"""
+
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from chapo_engines.time_parser import LONDON
+from chapo_engines.tracing import traced
+from db.local_store import LocalStore
+
+CALENDAR_DB = Path(__file__).resolve().parent.parent / "chapo_engines" / "calendar.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendar_events (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    calendar_id TEXT NOT NULL DEFAULT 'primary',
+    google_id   TEXT UNIQUE,                -- NULL until pushed
+    summary     TEXT NOT NULL,
+    start_at    REAL NOT NULL,              -- epoch seconds (UTC)
+    end_at      REAL NOT NULL,
+    start_iso   TEXT NOT NULL,              -- original tz-aware ISO strings
+    end_iso     TEXT NOT NULL,
+    updated     TEXT                        -- Google's `updated` stamp
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS calendar_span USING rtree (id, start_at, end_at);
+CREATE TRIGGER IF NOT EXISTS calendar_span_insert AFTER INSERT ON calendar_events BEGIN
+    INSERT INTO calendar_span VALUES (new.id, new.start_at, new.end_at);
+END;
+CREATE TRIGGER IF NOT EXISTS calendar_span_update AFTER UPDATE OF start_at, end_at ON calendar_events BEGIN
+    UPDATE calendar_span SET start_at = new.start_at, end_at = new.end_at WHERE id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS calendar_span_delete AFTER DELETE ON calendar_events BEGIN
+    DELETE FROM calendar_span WHERE id = old.id;
+END;
+CREATE TABLE IF NOT EXISTS calendar_outbox (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id        INTEGER NOT NULL,
+    op              TEXT NOT NULL,          -- 'insert'
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error      TEXT,
+    created_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_calendar_outbox_due ON calendar_outbox (next_attempt_at);
+CREATE TABLE IF NOT EXISTS calendar_sync (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token  TEXT,
+    synced_at   REAL
+);
+CREATE TABLE IF NOT EXISTS calendar_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _to_event(row):
+    return {
+        "id": row["id"],
+        "google_id": row["google_id"],
+        "summary": row["summary"],
+        "start": row["start_iso"],
+        "end": row["end_iso"],
+        "start_at": row["start_at"],
+        "end_at": row["end_at"],
+        "synced": row["google_id"] is not None,
+    }
+
+
+def _when(value) -> datetime:
+    """A Google start/end ({"dateTime": ...} or all-day {"date": ...}) as an aware datetime."""
+    if "dateTime" in value:
+        return datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+    return LONDON.localize(datetime.fromisoformat(value["date"]))
+
+
+class CalendarStore(LocalStore):
+    SCHEMA = _SCHEMA
+
+    @traced("db.calendar.add")
+    def add(self, summary: str, start: datetime, end: datetime, calendar_id: str = "primary") -> int:
+        """Adds a local event and queues it for Google in one transaction. Returns the event id."""
+        now = time.time()
+        with self.transaction() as conn:
+            event_id = conn.execute(
+                "INSERT INTO calendar_events (calendar_id, summary, start_at, end_at, start_iso, end_iso) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (calendar_id, summary, start.timestamp(), end.timestamp(), start.isoformat(), end.isoformat()),
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO calendar_outbox (event_id, op, next_attempt_at, created_at) VALUES (?, 'insert', ?, ?)",
+                (event_id, now, now),
+            )
+        return event_id
+
+    def get(self, event_id: int):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM calendar_events WHERE id = ?", (event_id,)).fetchone()
+        return _to_event(row) if row else None
+
+    @traced("db.calendar.between")
+    def between(self, start: datetime, end: datetime, calendar_id: str = "primary"):
+        """Every event overlapping [start, end), soonest first."""
+        lo, hi = start.timestamp(), end.timestamp()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT e.* FROM calendar_span s JOIN calendar_events e ON e.id = s.id "
+                "WHERE s.start_at <= ? AND s.end_at >= ? "
+                "AND e.start_at < ? AND e.end_at > ? AND e.calendar_id = ? ORDER BY e.start_at",
+                (hi, lo, hi, lo, calendar_id),
+            ).fetchall()
+        return [_to_event(r) for r in rows]
+
+    # ---------- Outbox (push) ----------
+    def claim_outbox(self, now: float = None, lease: float = 60.0, limit: int = 20):
+        """
+        Outbox rows due by `now`, each with its event, claimed for `lease`
+        seconds (no other sender picks them up meanwhile), oldest first.
+        """
+        now = time.time() if now is None else now
+        with self.transaction() as conn:
+            rows = conn.execute(
+                "SELECT o.id AS outbox_id, o.op, o.attempts, e.* FROM calendar_outbox o "
+                "JOIN calendar_events e ON e.id = o.event_id "
+                "WHERE o.next_attempt_at <= ? ORDER BY o.next_attempt_at, o.id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE calendar_outbox SET next_attempt_at = ? WHERE id = ?",
+                [(now + lease, r["outbox_id"]) for r in rows],
+            )
+        return [dict(_to_event(r), outbox_id=r["outbox_id"], op=r["op"], attempts=r["attempts"],
+                     calendar_id=r["calendar_id"]) for r in rows]
+
+    def mark_pushed(self, outbox_id: int, event_id: int, google_id: str, updated: str = None):
+        with self.transaction() as conn:
+            # another process may already have pulled the new event back from Google
+            conn.execute("DELETE FROM calendar_events WHERE google_id = ? AND id != ?", (google_id, event_id))
+            conn.execute(
+                "UPDATE calendar_events SET google_id = ?, updated = ? WHERE id = ?", (google_id, updated, event_id)
+            )
+            conn.execute("DELETE FROM calendar_outbox WHERE id = ?", (outbox_id,))
+
+    def retry_later(self, outbox_id: int, error: str, delay: float, now: float = None):
+        now = time.time() if now is None else now
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE calendar_outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (now + delay, error[:500], outbox_id),
+            )
+
+    def device_key(self) -> str:
+        """Random hex key, made once per database file, so two devices never push the same event id."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO calendar_meta (key, value) VALUES ('device_key', ?)", (uuid.uuid4().hex,)
+            )
+            return conn.execute("SELECT value FROM calendar_meta WHERE key = 'device_key'").fetchone()["value"]
+
+    def pending(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM calendar_outbox").fetchone()[0]
+
+    def seconds_until_next_push(self, now: float = None) -> float:
+        """How long until the next outbox row is due (inf when the outbox is empty)."""
+        now = time.time() if now is None else now
+        with self.lock:
+            due = self.conn.execute("SELECT MIN(next_attempt_at) FROM calendar_outbox").fetchone()[0]
+        return float("inf") if due is None else max(0.0, due - now)
+
+    # ---------- Incremental pull ----------
+    def sync_token(self, calendar_id: str = "primary"):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT sync_token FROM calendar_sync WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+        return row["sync_token"] if row else None
+
+    @traced("db.calendar.apply_remote")
+    def apply_remote(self, items, next_sync_token: str = None, calendar_id: str = "primary", full: bool = False) -> int:
+        """
+        Applies one page of events().list() results: upserts by google_id,
+        deletes cancelled events. The sync token is saved with the last page
+        (when `next_sync_token` is given), in the same transaction. `full`
+        marks the first page of a full resync: every event that is not
+        waiting in the outbox is dropped first, since Google is about to
+        send all of them again. Returns the number of rows changed.
+        """
+        changed = 0
+        with self.transaction() as conn:
+            if full:
+                conn.execute(
+                    "DELETE FROM calendar_events WHERE calendar_id = ? "
+                    "AND id NOT IN (SELECT event_id FROM calendar_outbox)", (calendar_id,)
+                )
+            for item in items:
+                if item.get("status") == "cancelled":
+                    changed += conn.execute("DELETE FROM calendar_events WHERE google_id = ?", (item["id"],)).rowcount
+                    continue
+                try:
+                    start, end = _when(item["start"]), _when(item["end"])
+                except (KeyError, ValueError) as e:
+                    logging.warning(f"[CALENDAR] Skipping event {item.get('id')}: {e}")
+                    continue
+                changed += conn.execute(
+                    "INSERT INTO calendar_events "
+                    "(calendar_id, google_id, summary, start_at, end_at, start_iso, end_iso, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (google_id) DO UPDATE SET summary = excluded.summary, "
+                    "start_at = excluded.start_at, end_at = excluded.end_at, start_iso = excluded.start_iso, "
+                    "end_iso = excluded.end_iso, updated = excluded.updated",
+                    (calendar_id, item["id"], item.get("summary") or "Untitled Event", start.timestamp(),
+                     end.timestamp(), start.isoformat(), end.isoformat(), item.get("updated")),
+                ).rowcount
+            if next_sync_token:
+                conn.execute(
+                    "INSERT INTO calendar_sync (calendar_id, sync_token, synced_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (calendar_id) DO UPDATE SET sync_token = excluded.sync_token, "
+                    "synced_at = excluded.synced_at",
+                    (calendar_id, next_sync_token, time.time()),
+                )
+        return changed
+
+    def reset_sync(self, calendar_id: str = "primary"):
+        """Forgets the sync token (Google answered 410 Gone); the next pull is a full one."""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM calendar_sync WHERE calendar_id = ?", (calendar_id,))
+
+    def migrate_json(self, name: str, json_path: Path) -> int:
+        """
+        One-time import of the legacy calendar_events.json
+        ([{"name", "start", "end"}]). Those events were already sent to
+        Google when they were written, so they are not queued again. The
+        claim on the migration commits with the rows, so of several workers
+        starting at once exactly one imports.
+        """
+        if self.has_migrated(name) or not Path(json_path).exists():
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"[CALENDAR] Could not read {json_path} for migration: {e}")
+            return 0
+
+        count = 0
+        with self.transaction() as conn:
+            if not self.claim_migration(conn, name):
+                return 0  # another worker got there first
+            for event in data:
+                try:
+                    start, end = datetime.fromisoformat(event["start"]), datetime.fromisoformat(event["end"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                conn.execute(
+                    "INSERT INTO calendar_events (summary, start_at, end_at, start_iso, end_iso) VALUES (?, ?, ?, ?, ?)",
+                    (event.get("name") or "Untitled Event", start.timestamp(), end.timestamp(),
+                     start.isoformat(), end.isoformat()),
+                )
+                count += 1
+        logging.info(f"[CALENDAR] Migrated {count} event(s) from {json_path}")
+        return count
+
+
+# --- Shared instance (one file for all workers) ---
+_store = None
+
+
+def get_calendar_store() -> CalendarStore:
+    global _store
+    if _store is None:
+        _store = CalendarStore(CALENDAR_DB)
+    return _store
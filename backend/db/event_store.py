@@ -0,0 +1,225 @@
+"""
+event_store.py
+
+Interactions and emotion samples in Mongo, bucketed per session per
+minute, with TTL retention and hourly rollups for dashboards and reports.
+
+The `logs` and `emotions` collections held one document per event, with no
+indexes and no expiry: every range query scanned the collection, and it
+grew forever. Now:
+
+- interaction_buckets / emotion_buckets: one document per session per
+  minute (a busy minute spills into another after MAX_BUCKET_EVENTS).
+  Each bucket keeps its events and running counts per intent / emotion,
+  written with one upsert ($push + $inc), so a minute of a conversation
+  is one document and one index entry instead of one per event.
+  Indexed on (session_id, start) and start; a TTL index on expires_at
+  drops buckets RETENTION_DAYS after their minute.
+- hourly_rollups: per hour, the intent counts and the emotion counts, one
+  document per (kind, hour). rollup() recomputes whole hours from the
+  bucket counts with one aggregation that $merges into the collection,
+  so re-running it is harmless; run_rollup() redoes the last
+  ROLLUP_LOOKBACK_HOURS and is run by the scheduler's leader every
+  ROLLUP_INTERVAL_S. Rollups have their own, longer, TTL.
+- hourly_counts() / totals() / top() read only the rollups.
+
+Timestamps are naive UTC datetimes, as the rest of the Mongo code writes
+them. The rollup uses $dateTrunc and $merge (MongoDB 5.0+; Atlas runs
+newer). pymongo is imported on first use, not with this module.
+
+Usage Example:
+    from db.event_store import get_event_store
+
+    store = get_event_store(db)
+    store.record_interaction({"session_id": "s1", "user_input": "hi", "intent": "greet"})
+    store.run_rollup()
+    store.hourly_counts("intent", start, end)   # [{"hour", "counts", "total"}, ...]
+    store.top("emotion", start, end)            # [("happy", 120), ("sad", 31), ...]
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+
+INTERACTIONS = "interaction_buckets"
+EMOTIONS = "emotion_buckets"
+ROLLUPS = "hourly_rollups"
+KINDS = {"intent": (INTERACTIONS, "intents"), "emotion": (EMOTIONS, "counts")}
+
+MAX_BUCKET_EVENTS = 500
+RETENTION_DAYS = float(os.getenv("CHAPO_EVENT_RETENTION_DAYS", "30"))
+ROLLUP_RETENTION_DAYS = float(os.getenv("CHAPO_ROLLUP_RETENTION_DAYS", "400"))
+ROLLUP_INTERVAL_S = float(os.getenv("CHAPO_ROLLUP_INTERVAL_S", "600"))
+ROLLUP_LOOKBACK_HOURS = 2
+CAMERA_SESSION = "camera"
+
+
+def minute_of(ts: datetime) -> datetime:
+    return ts.replace(second=0, microsecond=0)
+
+
+def hour_of(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def field_key(name) -> str:
+    """An intent / emotion name usable as a field name ('.' and a leading '$' are not)."""
+    key = str(name or "unknown").replace(".", "_")
+    return "_" + key[1:] if key.startswith("$") else key
+
+
+def bucket_update(session_id, ts, event, counts_field, counts, retention_days=RETENTION_DAYS):
+    """(filter, update) upserting `event` into its session's bucket for the minute of `ts`."""
+    start = minute_of(ts)
+    inc = {"count": 1}
+    for name, n in counts.items():
+        inc[f"{counts_field}.{field_key(name)}"] = n
+    return (
+        {"session_id": session_id, "start": start, "count": {"$lt": MAX_BUCKET_EVENTS}},
+        {
+            "$push": {"events": event},
+            "$inc": inc,
+            "$min": {"first": ts},
+            "$max": {"last": ts},
+            "$setOnInsert": {"expires_at": start + timedelta(days=retention_days)},
+        },
+    )
+
+
+def interaction_update(log: dict, retention_days=RETENTION_DAYS):
+    event = dict(log)
+    ts = event.setdefault("timestamp", datetime.utcnow())
+    session_id = event.pop("session_id", None) or "default"
+    event.pop("_id", None)
+    return bucket_update(session_id, ts, event, "intents", {event.get("intent"): 1}, retention_days)
+
+
+def emotion_update(second: dict, session_id=CAMERA_SESSION, retention_days=RETENTION_DAYS):
+    """One per-second summary from the face pipeline (timestamp, samples, counts, dominant)."""
+    filt, update = bucket_update(session_id, second["timestamp"], dict(second), "counts", second["counts"],
+                                 retention_days)
+    update["$inc"]["samples"] = second.get("samples", sum(second["counts"].values()))
+    return filt, update
+
+
+def rollup_pipeline(kind, start, end, retention_days=ROLLUP_RETENTION_DAYS):
+    """Aggregation recomputing the `kind` rollups for the whole hours in [start, end)."""
+    counts_field = KINDS[kind][1]
+    return [
+        {"$match": {"start": {"$gte": start, "$lt": end}}},
+        {"$project": {"hour": {"$dateTrunc": {"date": "$start", "unit": "hour"}},
+                      "pairs": {"$objectToArray": f"${counts_field}"}}},
+        {"$unwind": "$pairs"},
+        {"$group": {"_id": {"hour": "$hour", "key": "$pairs.k"}, "n": {"$sum": "$pairs.v"}}},
+        {"$group": {"_id": "$_id.hour", "counts": {"$push": {"k": "$_id.key", "v": "$n"}}, "total": {"$sum": "$n"}}},
+        {"$project": {
+            "_id": {"$concat": [f"{kind}:", {"$dateToString": {"date": "$_id", "format": "%Y-%m-%dT%H"}}]},
+            "kind": {"$literal": kind},
+            "hour": "$_id",
+            "counts": {"$arrayToObject": "$counts"},
+            "total": 1,
+            "expires_at": {"$add": ["$_id", int(retention_days * 86400 * 1000)]},
+        }},
+        {"$merge": {"into": ROLLUPS, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+class EventStore:
+    def __init__(self, db, retention_days=RETENTION_DAYS, rollup_retention_days=ROLLUP_RETENTION_DAYS):
+        self.db = db
+        self.retention_days = retention_days
+        self.rollup_retention_days = rollup_retention_days
+        self.ensure_indexes()
+
+    def ensure_indexes(self):
+        from pymongo import ASCENDING, DESCENDING  # pymongo loads on first use
+        for name in (INTERACTIONS, EMOTIONS):
+            self.db[name].create_index([("session_id", ASCENDING), ("start", DESCENDING)])
+            self.db[name].create_index([("start", ASCENDING)])
+            self.db[name].create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+        self.db[ROLLUPS].create_index([("kind", ASCENDING), ("hour", ASCENDING)])
+        self.db[ROLLUPS].create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+    # ---------- Writes ----------
+    def record_interaction(self, log: dict):
+        self.db[INTERACTIONS].update_one(*interaction_update(log, self.retention_days), upsert=True)
+
+    def record_interactions(self, logs):
+        self._bulk(INTERACTIONS, [interaction_update(log, self.retention_days) for log in logs])
+
+    def record_emotions(self, seconds, session_id=CAMERA_SESSION):
+        """Per-second emotion summaries (chapo_engines/face_pipeline.py), one bulk write."""
+        self._bulk(EMOTIONS, [emotion_update(s, session_id, self.retention_days) for s in seconds])
+
+    def _bulk(self, name, updates):
+        from pymongo import UpdateOne
+        if updates:
+            self.db[name].bulk_write([UpdateOne(f, u, upsert=True) for f, u in updates], ordered=False)
+
+    # ---------- Raw events ----------
+    def recent(self, session_id=None, limit=10) -> list:
+        """The latest interactions, newest first (all sessions, or one)."""
+        match = {"session_id": session_id} if session_id else {}
+        return list(self.db[INTERACTIONS].aggregate([
+            {"$match": match},
+            {"$sort": {"start": -1, "last": -1}},
+            {"$limit": limit},  # each bucket holds at least one event
+            {"$unwind": "$events"},
+            {"$replaceRoot": {"newRoot": {"$mergeObjects": ["$events", {"session_id": "$session_id"}]}}},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": limit},
+        ]))
+
+    def find_event(self, session_id, timestamp):
+        """The interaction logged for `session_id` at exactly `timestamp`, or None."""
+        found = list(self.db[INTERACTIONS].aggregate([
+            {"$match": {"session_id": session_id, "start": minute_of(timestamp)}},
+            {"$unwind": "$events"},
+            {"$match": {"events.timestamp": timestamp}},
+            {"$replaceRoot": {"newRoot": {"$mergeObjects": ["$events", {"session_id": "$session_id"}]}}},
+            {"$limit": 1},
+        ]))
+        return found[0] if found else None
+
+    # ---------- Rollups ----------
+    def rollup(self, start: datetime, end: datetime):
+        """Recomputes the intent and emotion rollups for every hour touching [start, end)."""
+        start = hour_of(start)
+        end = hour_of(end) + timedelta(hours=1) if end != hour_of(end) else end
+        for kind, (collection, _) in KINDS.items():
+            self.db[collection].aggregate(rollup_pipeline(kind, start, end, self.rollup_retention_days))
+
+    def run_rollup(self, now: datetime = None):
+        """The scheduled job: the last ROLLUP_LOOKBACK_HOURS, including the hour in progress."""
+        now = now or datetime.utcnow()
+        self.rollup(now - timedelta(hours=ROLLUP_LOOKBACK_HOURS), now)
+        logging.info(f"[EVENTS] Rolled up the {ROLLUP_LOOKBACK_HOURS} hour(s) before {now:%H:%M}")
+
+    def hourly_counts(self, kind, start: datetime, end: datetime) -> list:
+        """[{"hour", "counts", "total"}] for the rolled-up hours in [start, end), oldest first."""
+        cursor = self.db[ROLLUPS].find(
+            {"kind": kind, "hour": {"$gte": hour_of(start), "$lt": end}},
+            {"_id": 0, "hour": 1, "counts": 1, "total": 1},
+        ).sort("hour", 1)
+        return list(cursor)
+
+    def totals(self, kind, start: datetime, end: datetime) -> dict:
+        totals = {}
+        for row in self.hourly_counts(kind, start, end):
+            for key, n in row["counts"].items():
+                totals[key] = totals.get(key, 0) + n
+        return totals
+
+    def top(self, kind, start: datetime, end: datetime, n=5) -> list:
+        return sorted(self.totals(kind, start, end).items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+
+
+# --- Shared instances (one per process and database handle; indexes are ensured once) ---
+_stores = {}
+
+
+def get_event_store(db) -> EventStore:
+    store = _stores.get(id(db))
+    if store is None:
+        store = _stores[id(db)] = EventStore(db)  # holds `db`, so its id is not reused
+    return store
@@ -0,0 +1,94 @@
+"""
+local_store.py
+
+Shared helpers for the embedded SQLite stores used by the engines
+(alarms, reminders, ...). MongoDB stays the place for analytics logs;
+this is for small, durable, on-device state.
+
+- WAL journal so readers never block the writer and a crash mid-write
+  cannot corrupt the file.
+- busy_timeout so several processes can share one database file.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+
+
+def connect(path) -> sqlite3.Connection:
+    """
+    Opens (or creates) a SQLite database in WAL mode.
+    Pass ":memory:" for throwaway stores in tests.
+    """
+    if str(path) != ":memory:":
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=10, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=10000")
+    return conn
+
+
+class LocalStore:
+    """
+    Base class for a single-file SQLite store.
+    Subclasses set SCHEMA (a script of CREATE ... IF NOT EXISTS statements).
+    All access goes through self.lock so one instance can be shared across
+    the asyncio loop and the logging threads.
+    """
+
+    SCHEMA = ""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = connect(path)
+        with self.lock:
+            self.conn.executescript(
+                "CREATE TABLE IF NOT EXISTS migrations ("
+                " name TEXT PRIMARY KEY, applied_at TEXT DEFAULT CURRENT_TIMESTAMP);"
+                + self.SCHEMA
+            )
+
+    def transaction(self):
+        """Context manager: BEGIN IMMEDIATE ... COMMIT (or ROLLBACK on error)."""
+        return _Transaction(self)
+
+    def has_migrated(self, name: str) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    @staticmethod
+    def claim_migration(conn, name: str) -> bool:
+        """
+        Inside a transaction(): records `name` as applied; False if it already was.
+        Workers starting together all try, BEGIN IMMEDIATE lines them up, and
+        only the first runs the import; a rollback un-claims it.
+        """
+        return conn.execute("INSERT OR IGNORE INTO migrations (name) VALUES (?)", (name,)).rowcount == 1
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class _Transaction:
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        self.store.lock.acquire()
+        self.store.conn.execute("BEGIN IMMEDIATE")
+        return self.store.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.store.conn.execute("COMMIT")
+            else:
+                self.store.conn.execute("ROLLBACK")
+        finally:
+            self.store.lock.release()
+        return False
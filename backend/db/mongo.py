@@ -5,6 +5,9 @@ import logging
 from urllib.parse import quote_plus
 import os
 
+from chapo_engines.tracing import traced
+from db.event_store import get_event_store
+
 # Globals to hold MongoDB connection
 client = None
 db = None
@@ -50,10 +53,11 @@ def connect_db():
         # Optional: raise to fail-fast, or just log and let the program continue
         # raise
 
+@traced("db.mongo.save_interaction")
 def save_interaction(log: dict) -> bool:
     """
-    Saves a user interaction (log) to the MongoDB 'logs' collection.
-    Adds a UTC timestamp to each log entry.
+    Saves a user interaction (log) into its session's minute bucket
+    (db/event_store.py). Adds a UTC timestamp to each log entry.
     Returns True on success, False on failure (e.g. no DB, connection error).
     """
     if db is None:
@@ -61,16 +65,17 @@ def save_interaction(log: dict) -> bool:
         return False
     try:
         log["timestamp"] = datetime.utcnow()
-        db.logs.insert_one(log)
+        get_event_store(db).record_interaction(log)
         logging.info("📝 Interaction saved to DB.")
         return True
     except PyMongoError as e:
         logging.error(f"❌ Failed to save interaction: {e}")
         return False
 
+@traced("db.mongo.get_interactions")
 def get_interactions(session_id=None, limit=10):
     """
-    Retrieves the most recent interactions (logs) from the 'logs' collection.
+    Retrieves the most recent interactions from the interaction buckets.
     Optionally filters by session_id and limits the result count.
     Returns a list of interaction dictionaries.
     """
@@ -78,12 +83,7 @@ def get_interactions(session_id=None, limit=10):
         logging.warning("⚠️ Cannot retrieve interactions: No database connection.")
         return []
     try:
-        query = {}
-        if session_id:
-            query["session_id"] = session_id
-
-        interactions = db.logs.find(query).sort("timestamp", -1).limit(limit)
-        return list(interactions)
+        return get_event_store(db).recent(session_id, limit)
     except PyMongoError as e:
         logging.error(f"❌ Failed to retrieve interactions: {e}")
         return []
@@ -97,16 +97,12 @@ def get_interaction_by_timestamp(session_id, timestamp):
         logging.warning("⚠️ Cannot retrieve interaction: No database connection.")
         return None
     try:
-        query = {
-            "session_id": session_id,
-            "timestamp": timestamp
-        }
-        interaction = db.logs.find_one(query)
-        return interaction
+        return get_event_store(db).find_event(session_id, timestamp)
     except PyMongoError as e:
         logging.error(f"❌ Failed to retrieve interaction by timestamp: {e}")
         return None
 
+@traced("db.mongo.log_evaluation_metric")
 def log_evaluation_metric(log: dict) -> bool:
     """
     Logs evaluation metrics to the 'evaluation_metrics' collection in MongoDB.
@@ -0,0 +1,228 @@
+"""
+schedule_store.py
+
+Durable storage for alarms and reminders (SQLite, WAL mode).
+
+One row per scheduled item, keyed by session. Two indexes keep the hot
+queries off full scans:
+- (fired, due_at)              -> "next N due" for the scheduler
+- (session_id, kind, due_at)   -> "list for session"
+
+Every write is a single INSERT/UPDATE/DELETE in its own transaction, so
+adding one alarm no longer rewrites the whole file, and a crash can only
+lose the write in flight.
+
+Several server processes share this file, so firing is claim-based:
+claim() / claim_due() flip fired 0 -> 1 in one UPDATE and only the caller
+that flipped it fires the item. The `leases` table elects the one process
+that runs the scheduler loop (chapo_engines/scheduler.py).
+"""
+
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+
+from chapo_engines.tracing import traced
+from db.local_store import LocalStore
+
+SCHEDULE_DB = Path(__file__).resolve().parent.parent / "chapo_engines" / "schedules.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT NOT NULL,              -- 'alarm' | 'reminder'
+    session_id  TEXT NOT NULL DEFAULT 'default',
+    task        TEXT,
+    due_at      REAL NOT NULL,              -- epoch seconds (UTC)
+    due_iso     TEXT NOT NULL,              -- original tz-aware ISO string
+    fired       INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_schedules_pending ON schedules (fired, due_at);
+CREATE INDEX IF NOT EXISTS idx_schedules_session ON schedules (session_id, kind, due_at);
+CREATE TABLE IF NOT EXISTS leases (
+    name        TEXT PRIMARY KEY,           -- 'scheduler'
+    holder      TEXT NOT NULL,              -- host:pid:nonce of the leader
+    expires_at  REAL NOT NULL
+);
+"""
+
+
+def _to_row_dict(row):
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "session_id": row["session_id"],
+        "task": row["task"],
+        "time": row["due_iso"],
+        "due_at": row["due_at"],
+        "fired": bool(row["fired"]),
+    }
+
+
+class ScheduleStore(LocalStore):
+    SCHEMA = _SCHEMA
+
+    @traced("db.schedule.add")
+    def add(self, kind: str, due: datetime, session_id: str = "default", task: str = None) -> int:
+        """Inserts one alarm/reminder and returns its id. `due` must be tz-aware."""
+        with self.transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO schedules (kind, session_id, task, due_at, due_iso, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, session_id or "default", task, due.timestamp(), due.isoformat(), time.time()),
+            )
+            return cur.lastrowid
+
+    def get(self, item_id: int):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM schedules WHERE id = ?", (item_id,)).fetchone()
+        return _to_row_dict(row) if row else None
+
+    @traced("db.schedule.next_due")
+    def next_due(self, n: int = 10, kind: str = None, after: float = None):
+        """The next `n` pending items (optionally of one kind), soonest first."""
+        after = time.time() if after is None else after
+        sql = "SELECT * FROM schedules WHERE fired = 0 AND due_at > ?"
+        params = [after]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += " ORDER BY due_at LIMIT ?"
+        params.append(n)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [_to_row_dict(r) for r in rows]
+
+    @traced("db.schedule.list_for_session")
+    def list_for_session(self, session_id: str, kind: str, include_fired: bool = False):
+        """All items of `kind` for one session, soonest first."""
+        sql = "SELECT * FROM schedules WHERE session_id = ? AND kind = ?"
+        if not include_fired:
+            sql += " AND fired = 0"
+        sql += " ORDER BY due_at"
+        with self.lock:
+            rows = self.conn.execute(sql, (session_id, kind)).fetchall()
+        return [_to_row_dict(r) for r in rows]
+
+    def list_pending(self, kind: str):
+        """Every pending item of `kind` across sessions (used at startup)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM schedules WHERE fired = 0 AND kind = ? ORDER BY due_at", (kind,)
+            ).fetchall()
+        return [_to_row_dict(r) for r in rows]
+
+    def mark_fired(self, item_id: int):
+        with self.transaction() as conn:
+            conn.execute("UPDATE schedules SET fired = 1 WHERE id = ?", (item_id,))
+
+    def claim(self, item_id: int) -> bool:
+        """Marks one pending item fired. True only for the one caller that flipped it."""
+        with self.transaction() as conn:
+            return conn.execute("UPDATE schedules SET fired = 1 WHERE id = ? AND fired = 0", (item_id,)).rowcount > 0
+
+    @traced("db.schedule.claim_due")
+    def claim_due(self, now: float = None, limit: int = 100):
+        """Claims (marks fired) and returns every pending item due by `now`, oldest first."""
+        now = time.time() if now is None else now
+        with self.transaction() as conn:
+            rows = conn.execute(
+                "SELECT * FROM schedules WHERE fired = 0 AND due_at <= ? ORDER BY due_at LIMIT ?", (now, limit)
+            ).fetchall()
+            conn.executemany("UPDATE schedules SET fired = 1 WHERE id = ?", [(r["id"],) for r in rows])
+        return [_to_row_dict(r) for r in rows]
+
+    # ---------- Leader lease ----------
+    def acquire_lease(self, name: str, holder: str, ttl: float, now: float = None) -> bool:
+        """
+        Takes or renews the lease `name` for `holder` for `ttl` seconds.
+        Succeeds if nobody holds it, it expired, or `holder` already has it.
+        """
+        now = time.time() if now is None else now
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+                (name, holder, now + ttl, now),
+            )
+            row = conn.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+        return row["holder"] == holder
+
+    def release_lease(self, name: str, holder: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def delete(self, item_id: int, kind: str = None, session_id: str = None) -> bool:
+        sql = "DELETE FROM schedules WHERE id = ?"
+        params = [item_id]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        if session_id:
+            sql += " AND session_id = ?"
+            params.append(session_id)
+        with self.transaction() as conn:
+            return conn.execute(sql, params).rowcount > 0
+
+    def delete_by_task(self, kind: str, task: str, session_id: str = None) -> bool:
+        sql = "DELETE FROM schedules WHERE kind = ? AND lower(task) = lower(?)"
+        params = [kind, task]
+        if session_id:
+            sql += " AND session_id = ?"
+            params.append(session_id)
+        with self.transaction() as conn:
+            return conn.execute(sql, params).rowcount > 0
+
+    def purge_past(self, before: float = None) -> int:
+        """Removes fired items and anything already in the past. Returns rows removed."""
+        before = time.time() if before is None else before
+        with self.transaction() as conn:
+            return conn.execute(
+                "DELETE FROM schedules WHERE fired = 1 OR due_at <= ?", (before,)
+            ).rowcount
+
+    def migrate_json(self, name: str, json_path: Path, to_rows) -> int:
+        """
+        One-time import of a legacy JSON file.
+        `to_rows(data)` turns the parsed JSON into (kind, due, session_id, task) tuples.
+        The import and its claim on the migration commit together, so of
+        several workers starting at once exactly one imports, and a crash
+        halfway simply reruns the migration on next start.
+        """
+        if self.has_migrated(name) or not Path(json_path).exists():
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"[SCHEDULE] Could not read {json_path} for migration: {e}")
+            return 0
+
+        count = 0
+        with self.transaction() as conn:
+            if not self.claim_migration(conn, name):
+                return 0  # another worker got there first
+            for kind, due, session_id, task in to_rows(data):
+                conn.execute(
+                    "INSERT INTO schedules (kind, session_id, task, due_at, due_iso, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, session_id or "default", task, due.timestamp(), due.isoformat(), time.time()),
+                )
+                count += 1
+        logging.info(f"[SCHEDULE] Migrated {count} item(s) from {json_path}")
+        return count
+
+
+# --- Shared instance (alarm + reminder engines use the same file) ---
+_store = None
+
+
+def get_schedule_store() -> ScheduleStore:
+    global _store
+    if _store is None:
+        _store = ScheduleStore(SCHEDULE_DB)
+    return _store
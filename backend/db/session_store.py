@@ -0,0 +1,240 @@
+"""
+session_store.py
+
+Per-session state shared by every server process (SQLite, WAL mode).
+
+uvicorn with --workers N runs N copies of the app; anything kept in a
+Python global (like the old shared emotion_tracker) is per process, so a
+user's next request may land on a worker that has never seen them. This
+store keeps small JSON values per (session_id, key) in one file that all
+workers open:
+
+- update() is a read-modify-write inside BEGIN IMMEDIATE, so two workers
+  updating the same session serialize instead of losing a write.
+- purge_idle() drops sessions nobody has touched for a while.
+- Process-wide values (live metrics, the household shopping list) live
+  under GLOBAL_SESSION.
+
+Set CHAPO_STATE_URL=redis://host:6379/0 to keep the same state in Redis
+instead (RedisSessionStore, same methods), e.g. when the workers run on
+more than one machine.
+
+SessionMemory wraps a store as the `session_id -> record` dict the voice
+loop and intent router used to keep in a global.
+"""
+
+import json
+import os
+import time
+from collections.abc import MutableMapping
+from pathlib import Path
+
+from db.local_store import LocalStore
+
+SESSION_DB = Path(__file__).resolve().parent.parent / "chapo_engines" / "sessions.db"
+SESSION_TTL_SECONDS = 24 * 3600
+GLOBAL_SESSION = "__global__"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_state (
+    session_id  TEXT NOT NULL,
+    key         TEXT NOT NULL,              -- 'emotion', ...
+    value       TEXT NOT NULL,              -- JSON
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (session_id, key)
+);
+CREATE INDEX IF NOT EXISTS idx_session_state_idle ON session_state (updated_at);
+"""
+
+
+class SessionStore(LocalStore):
+    SCHEMA = _SCHEMA
+
+    def get(self, session_id: str, key: str, default=None, max_age: float = None):
+        """The stored value, or `default` if missing or not written for `max_age` seconds."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, updated_at FROM session_state WHERE session_id = ? AND key = ?", (session_id, key)
+            ).fetchone()
+        if row is None or _expired(row["updated_at"], max_age):
+            return default
+        return json.loads(row["value"])
+
+    def put(self, session_id: str, key: str, value):
+        with self.transaction() as conn:
+            self._write(conn, session_id, key, value)
+
+    def update(self, session_id: str, key: str, fn, max_age: float = None):
+        """
+        Atomically replaces the value with fn(old value or None) and returns
+        whatever fn returned. Safe across processes. A value older than
+        `max_age` seconds is passed as None.
+        """
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT value, updated_at FROM session_state WHERE session_id = ? AND key = ?", (session_id, key)
+            ).fetchone()
+            old = None if row is None or _expired(row["updated_at"], max_age) else json.loads(row["value"])
+            value = fn(old)
+            self._write(conn, session_id, key, value)
+        return value
+
+    def delete(self, session_id: str, key: str = None):
+        with self.transaction() as conn:
+            if key is None:
+                conn.execute("DELETE FROM session_state WHERE session_id = ?", (session_id,))
+            else:
+                conn.execute("DELETE FROM session_state WHERE session_id = ? AND key = ?", (session_id, key))
+
+    def purge_idle(self, ttl_seconds: float = SESSION_TTL_SECONDS) -> int:
+        with self.transaction() as conn:
+            cur = conn.execute("DELETE FROM session_state WHERE updated_at < ?", (time.time() - ttl_seconds,))
+            return cur.rowcount
+
+    def session_ids(self, key: str):
+        with self.lock:
+            rows = self.conn.execute("SELECT session_id FROM session_state WHERE key = ?", (key,)).fetchall()
+        return [r["session_id"] for r in rows]
+
+    @staticmethod
+    def _write(conn, session_id, key, value):
+        conn.execute(
+            "INSERT INTO session_state (session_id, key, value, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (session_id, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+            (session_id, key, json.dumps(value), time.time()),
+        )
+
+
+class RedisSessionStore:
+    """
+    SessionStore on Redis: one hash per session (field = key), expiring
+    SESSION_TTL_SECONDS after its last write. update() is WATCH/MULTI, so
+    it stays atomic across processes and machines.
+    """
+
+    PREFIX = "chapo:session:"
+
+    def __init__(self, client, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    @classmethod
+    def from_url(cls, url: str):
+        import redis  # only needed when CHAPO_STATE_URL points at Redis
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, session_id: str, key: str, default=None, max_age: float = None):
+        raw = self.client.hget(self.PREFIX + session_id, key)
+        updated_at, value = json.loads(raw) if raw is not None else (None, default)
+        return default if updated_at is None or _expired(updated_at, max_age) else value
+
+    def put(self, session_id: str, key: str, value):
+        pipe = self.client.pipeline()
+        self._write(pipe, session_id, key, value)
+        pipe.execute()
+
+    def update(self, session_id: str, key: str, fn, max_age: float = None):
+        from redis.exceptions import WatchError
+
+        name = self.PREFIX + session_id
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(name)
+                    raw = pipe.hget(name, key)
+                    old = None
+                    if raw is not None:
+                        updated_at, old = json.loads(raw)
+                        old = None if _expired(updated_at, max_age) else old
+                    value = fn(old)
+                    pipe.multi()
+                    self._write(pipe, session_id, key, value)
+                    pipe.execute()
+                    return value
+                except WatchError:
+                    continue  # another worker wrote this session first; redo on its value
+
+    def delete(self, session_id: str, key: str = None):
+        if key is None:
+            self.client.delete(self.PREFIX + session_id)
+        else:
+            self.client.hdel(self.PREFIX + session_id, key)
+
+    def purge_idle(self, ttl_seconds: float = SESSION_TTL_SECONDS) -> int:
+        return 0  # Redis expires idle sessions itself
+
+    def session_ids(self, key: str):
+        ids = []
+        for name in self.client.scan_iter(match=self.PREFIX + "*"):
+            name = name.decode() if isinstance(name, bytes) else name
+            if self.client.hexists(name, key):
+                ids.append(name[len(self.PREFIX):])
+        return ids
+
+    def _write(self, pipe, session_id, key, value):
+        name = self.PREFIX + session_id
+        pipe.hset(name, key, json.dumps([time.time(), value]))
+        pipe.expire(name, int(self.ttl_seconds))
+
+
+def _expired(updated_at, max_age):
+    return max_age is not None and time.time() - updated_at > max_age
+
+
+class SessionMemory(MutableMapping):
+    """
+    `session_id -> record` for one key of the session store, usable where
+    code used to keep a plain global dict. Records are copies: assign the
+    record back (memory[session_id] = record) or use modify() to save a
+    change. Records not written for `ttl_seconds` read as missing.
+    """
+
+    def __init__(self, key: str = "memory", ttl_seconds: float = None, store=None):
+        self.key = key
+        self.ttl_seconds = ttl_seconds
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store or get_session_store()
+
+    def __getitem__(self, session_id):
+        record = self.store.get(session_id, self.key, max_age=self.ttl_seconds)
+        if record is None:
+            raise KeyError(session_id)
+        return record
+
+    def __setitem__(self, session_id, record):
+        self.store.put(session_id, self.key, record)
+
+    def __delitem__(self, session_id):
+        if session_id not in self:
+            raise KeyError(session_id)
+        self.store.delete(session_id, self.key)
+
+    def __iter__(self):
+        return iter(self.store.session_ids(self.key))
+
+    def __len__(self):
+        return len(self.store.session_ids(self.key))
+
+    def modify(self, session_id, fn):
+        """Atomic read-modify-write of one record: fn(record or None) -> new record."""
+        return self.store.update(session_id, self.key, fn, max_age=self.ttl_seconds)
+
+    def prune(self, session_id):
+        """Deletes the record if it has expired."""
+        if self.ttl_seconds is not None and session_id not in self:
+            self.store.delete(session_id, self.key)
+
+
+# --- Shared instance (one file, or one Redis, for all workers) ---
+_store = None
+
+
+def get_session_store():
+    global _store
+    if _store is None:
+        url = os.getenv("CHAPO_STATE_URL")
+        _store = RedisSessionStore.from_url(url) if url else SessionStore(SESSION_DB)
+    return _store
@@ -0,0 +1,155 @@
+"""
+shopping_list_store.py
+
+Durable storage for shopping lists, one list per user/household (SQLite,
+WAL mode).
+
+One row per item, keyed by (owner, normalized item), so:
+- adding or removing an item is one INSERT/DELETE, never a rewrite of
+  the whole list;
+- the primary key does the dedupe, even with several server workers
+  adding to the same list at once;
+- `pos` keeps insertion order (idx_shopping_items_order).
+
+shopping_lists.version is bumped by every change to a list, so a process
+holding a cached copy (ShoppingListEngine) can tell with one primary-key
+lookup whether it is still current.
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+
+from db.local_store import LocalStore
+
+SHOPPING_DB = Path(__file__).resolve().parent.parent / "chapo_engines" / "shopping_lists.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shopping_lists (
+    owner       TEXT PRIMARY KEY,           -- user or household id
+    version     INTEGER NOT NULL DEFAULT 0,
+    next_pos    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS shopping_items (
+    owner       TEXT NOT NULL,
+    item_key    TEXT NOT NULL,              -- normalized (see normalize_item)
+    label       TEXT NOT NULL,              -- as added
+    pos         INTEGER NOT NULL,
+    added_at    REAL NOT NULL,
+    PRIMARY KEY (owner, item_key)
+);
+CREATE INDEX IF NOT EXISTS idx_shopping_items_order ON shopping_items (owner, pos);
+"""
+
+
+def normalize_item(item: str) -> str:
+    return " ".join(item.lower().split())
+
+
+class ShoppingListStore(LocalStore):
+    SCHEMA = _SCHEMA
+
+    def version(self, owner: str) -> int:
+        with self.lock:
+            row = self.conn.execute("SELECT version FROM shopping_lists WHERE owner = ?", (owner,)).fetchone()
+        return row["version"] if row else 0
+
+    def items(self, owner: str):
+        """(version, [(item_key, label), ...] in insertion order), read consistently."""
+        with self.transaction() as conn:
+            row = conn.execute("SELECT version FROM shopping_lists WHERE owner = ?", (owner,)).fetchone()
+            rows = conn.execute(
+                "SELECT item_key, label FROM shopping_items WHERE owner = ? ORDER BY pos", (owner,)
+            ).fetchall()
+        return (row["version"] if row else 0), [(r["item_key"], r["label"]) for r in rows]
+
+    def add(self, owner: str, labels):
+        """
+        Adds the labels not already on the list, in order.
+        Returns (version after the change, [(item_key, label) actually added]).
+        """
+        with self.transaction() as conn:
+            return self._add(conn, owner, labels)
+
+    def remove(self, owner: str, item_key: str):
+        """Returns (version after the change, whether the item was there)."""
+        with self.transaction() as conn:
+            self._bump(conn, owner)
+            removed = conn.execute(
+                "DELETE FROM shopping_items WHERE owner = ? AND item_key = ?", (owner, item_key)
+            ).rowcount > 0
+            return self._version(conn, owner), removed
+
+    def clear(self, owner: str) -> int:
+        """Returns the version after the change."""
+        with self.transaction() as conn:
+            self._bump(conn, owner)
+            conn.execute("DELETE FROM shopping_items WHERE owner = ?", (owner,))
+            return self._version(conn, owner)
+
+    def migrate_json(self, name: str, json_path: Path, owner: str) -> int:
+        """
+        One-time import of the legacy single-list JSON file into `owner`'s list.
+        The claim on the migration and the items commit together, so of several
+        workers starting at once exactly one imports, and a crash reruns it.
+        """
+        if self.has_migrated(name) or not Path(json_path).exists():
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                labels = [str(x) for x in json.load(f)]
+        except Exception as e:
+            logging.error(f"[SHOPPING] Could not read {json_path} for migration: {e}")
+            return 0
+        with self.transaction() as conn:
+            if not self.claim_migration(conn, name):
+                return 0  # another worker got there first
+            _, added = self._add(conn, owner, labels)
+        logging.info(f"[SHOPPING] Migrated {len(added)} item(s) from {json_path}")
+        return len(added)
+
+    @classmethod
+    def _add(cls, conn, owner, labels):
+        pos = cls._bump(conn, owner)
+        added = []
+        for label in labels:
+            key = normalize_item(label)
+            if not key:
+                continue
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO shopping_items (owner, item_key, label, pos, added_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (owner, key, label.strip(), pos + len(added), time.time()),
+            )
+            if cur.rowcount:
+                added.append((key, label.strip()))
+        conn.execute(
+            "UPDATE shopping_lists SET next_pos = next_pos + ? WHERE owner = ?", (len(added), owner)
+        )
+        return cls._version(conn, owner), added
+
+    @staticmethod
+    def _bump(conn, owner):
+        """Bumps the list's version (creating the list) and returns its next free position."""
+        conn.execute(
+            "INSERT INTO shopping_lists (owner, version) VALUES (?, 1) "
+            "ON CONFLICT (owner) DO UPDATE SET version = version + 1",
+            (owner,),
+        )
+        return conn.execute("SELECT next_pos FROM shopping_lists WHERE owner = ?", (owner,)).fetchone()["next_pos"]
+
+    @staticmethod
+    def _version(conn, owner):
+        return conn.execute("SELECT version FROM shopping_lists WHERE owner = ?", (owner,)).fetchone()["version"]
+
+
+# --- Shared instance (one file for all workers) ---
+_store = None
+
+
+def get_shopping_list_store() -> ShoppingListStore:
+    global _store
+    if _store is None:
+        _store = ShoppingListStore(SHOPPING_DB)
+    return _store
@@ -15,30 +15,36 @@ from datetime import datetime, timezone, timedelta
 from dateutil.parser import parse
 import requests
 
-import spacy
-from pymongo import MongoClient
+# --- Engines and models come from the lazy registry (built on first use) ---
+from chapo_engines.registry import engines
+from chapo_engines.tracing import traced
+from db.session_store import SessionMemory
 
-# --- Import Engines (for weather/news) ---
-from chapo_engines.weather_engine import WeatherEngine
-from chapo_engines.news_engine import NewsEngine
+weather_engine = engines.lazy("weather")
+news_engine = engines.lazy("news")
 
-weather_engine = WeatherEngine()
-news_engine = NewsEngine()
+# --- spaCy NER model, loaded once on first use ---
+nlp = engines.lazy("spacy")
 
-# --- Load spaCy NER model once ---
-nlp = spacy.load("en_core_web_sm")
+# --- MongoDB Client (optional for cloud logging), connected on first log ---
+_UNSET = object()
+db = _UNSET
 
-# --- MongoDB Client (optional for cloud logging) ---
-mongo_uri = os.getenv("MONGODB_URI")
-client = MongoClient(mongo_uri) if mongo_uri else None
-try:
-    db = client.get_default_database() if client else None
-except Exception:
-    db = None
 
-# --- In-memory session dict (ephemeral) ---
-session_memory = {}
+def get_db():
+    global db
+    if db is _UNSET:
+        mongo_uri = os.getenv("MONGODB_URI")
+        try:
+            from pymongo import MongoClient
+            db = MongoClient(mongo_uri).get_default_database() if mongo_uri else None
+        except Exception:
+            db = None
+    return db
+
+# --- Session memory, shared by all server workers (db/session_store.py) ---
 SESSION_TTL_MINUTES = 15
+session_memory = SessionMemory("memory", ttl_seconds=SESSION_TTL_MINUTES * 60)
 
 # --- Intent Normalization Map ---
 INTENT_NORMALIZATION_MAP = {
@@ -164,7 +170,7 @@ def handle_reminder_flow(session_id, entities):
     if datetime_key:
         memory["datetime"] = entities[datetime_key][0].get("value")
 
-    session_memory[session_id] = {"data": memory, "last_updated": datetime.now(timezone.utc)}
+    session_memory[session_id] = {"data": memory}
 
     task = memory.get("task")
     time = memory.get("datetime")
@@ -184,10 +190,9 @@ def prune_memory(session_id):
     """
     Deletes session memory if expired.
     """
-    record = session_memory.get(session_id)
-    if record and datetime.now(timezone.utc) - record.get("last_updated") > timedelta(minutes=SESSION_TTL_MINUTES):
-        session_memory.pop(session_id, None)
+    session_memory.prune(session_id)
 
+@traced("spacy.ner")
 def extract_spacy_entities(text: str):
     """
     Runs spaCy NER to extract fallback entities from user input.
@@ -199,13 +204,16 @@ def extract_spacy_entities(text: str):
         spacy_ents.setdefault(label, []).append(ent.text)
     return spacy_ents
 
+@traced("db.mongo.log")
 def log_to_mongo(session_id, user_input, intent, response):
     """
     Saves each routed interaction to MongoDB, if available.
     """
-    if db is not None:
+    logs_db = get_db()
+    if logs_db is not None:
         try:
-            db.logs.insert_one({
+            from db.event_store import get_event_store
+            get_event_store(logs_db).record_interaction({
                 "session_id": session_id,
                 "user_input": user_input,
                 "intent": intent,
@@ -215,6 +223,7 @@ def log_to_mongo(session_id, user_input, intent, response):
         except Exception as e:
             logging.error(f"❌ MongoDB logging error: {e}")
 
+@traced("route_intent")
 def route_intent(intent: str, entities: dict, user_input: str, session_id="default"):
     """
     Dispatches the intent to the right engine, handler, or canned response.
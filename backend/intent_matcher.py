@@ -1,5 +1,8 @@
+from chapo_engines.utterance import Utterance
+
+
 def get_expected_intent(text: str) -> str:
-    text = text.lower().strip()
+    text = Utterance.of(text).lowered
 
     intent_keywords = {
         "access_logs": [
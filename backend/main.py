@@ -2,16 +2,28 @@
 main.py - Chapo Bot Backend FastAPI App
 Handles API routing, CORS, and database connection.
 IntentRouter class is the entry point for voice/text intent dispatch.
+Serve on all cores with `uvicorn backend.main:app --workers 4`: sessions,
+lists and metrics live in db/session_store.py (one SQLite file, or Redis via
+CHAPO_STATE_URL, shared by the workers), and alarms/reminders are fired by
+whichever worker holds the scheduler lease (chapo_engines/scheduler.py).
 Author: Your Name, 2025-05-28
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from backend.routers import voice, text, interactions
-from backend.db.mongo import connect_db
+from backend.routers import voice, text, interactions, voice_command
+from backend.services.voice_command import use_io_executor
 from backend.api.shopping_list_routes import router as shopping_list_router
+from chapo_engines.registry import engines
+from chapo_engines.scheduler import get_scheduler
+from chapo_engines.stt_pool import get_stt_pool
+from chapo_engines.tracing import prometheus_text, span, traced
+from db.event_store import ROLLUP_INTERVAL_S
+import asyncio
 import logging
 import os
+import re
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -28,11 +40,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Tracing: one root span per request ---
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    with span("http") as root:
+        response = await call_next(request)
+        # named after the matched route template, so raw paths (ids, scanners)
+        # can't add a /metrics series each
+        route = request.scope.get("route")
+        root.name = f"http {request.method} {getattr(route, 'path', 'unmatched')}"
+        root.set("http.status_code", response.status_code)
+        return response
+
 # --- Routers Registration ---
 app.include_router(shopping_list_router, prefix="/api")
 app.include_router(voice.router)
 app.include_router(text.router)
 app.include_router(interactions.router)
+app.include_router(voice_command.router)
 
 # --- Logging Setup ---
 os.makedirs("logs", exist_ok=True)
@@ -42,119 +67,165 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s %(message)s"
 )
 
-# --- Engine Imports ---
-# --- Engine Imports (exact from  chapo_engines folder) ---
-from chapo_engines.alarm_engine import AlarmEngine
-from chapo_engines.chapo_time_engine import ChapoTimeEngine
-from chapo_engines.core_conversation_engine import CoreConversationEngine
-from chapo_engines.emotion_detector_engine import EmotionDetectorEngine
+# --- Engines ---
+# Built lazily by chapo_engines.registry: nothing heavy is imported until a
+# request needs it or the background warm-up (startup hook) gets to it.
 from chapo_engines.joke_engine import handle_joke
-from chapo_engines.memory_engine import MemoryEngine    # If you use this in routing (not shown in current logic)
-from chapo_engines.news_engine import NewsEngine
-from chapo_engines.reminder_engine import ReminderEngine
-from chapo_engines.shopping_list_engine import ShoppingListEngine
-# from chapo_engines.spotify_engine import SpotifyEngine  # (Optional, for future)
-from chapo_engines.time_engine import ChapoTimeEngine
 from chapo_engines.trivia_engine import handle_trivia
-from chapo_engines.weather_engine import WeatherEngine
 
 
 class IntentRouter:
     def __init__(self):
-        self.alarm_engine = AlarmEngine()
-        self.shopping_engine = ShoppingListEngine()
-        self.core_convo = CoreConversationEngine()
-        self.weather_engine = WeatherEngine()
-        self.news_engine = NewsEngine()
+        self.alarm_engine = engines.lazy("alarm")
+        self.shopping_engine = engines.lazy("shopping_list")
+        self.core_convo = engines.lazy("core_convo")
+        self.weather_engine = engines.lazy("weather")
+        self.news_engine = engines.lazy("news")
         self.joke_engine = handle_joke  # function, not a class
-        self.time_engine = TimeEngine()
-        self.reminder_engine = ReminderEngine()
-        self.emotion_engine = EmotionDetectorEngine()
+        self.time_engine = engines.lazy("time")
+        self.reminder_engine = engines.lazy("reminder")
+        self.emotion_engine = engines.lazy("emotion")
         self.trivia_handler = handle_trivia  # function, not a class
         # Add more as needed (e.g., MemoryEngine, SpotifyEngine)
 
-
-async def handle_intent(self, intent: str, entities: dict, session_id: str, user_input: str, session_memory: dict = None):
-    session_memory = session_memory or {}
-
-    # --- Alarm ---
-    if intent == "set_alarm":
-        return await self.alarm_engine.set_alarm(entities.get('time'), session_id)
-    elif intent == "stop_alarm":
-        return self.alarm_engine.stop_alarm(session_id)
-    
-    # --- Reminder ---
-    elif intent in ["set_reminder", "delete_reminder", "list_reminders"]:
-        return self.reminder_engine.handle_intent(intent, entities, session_id, user_input)
-    
-    # --- Shopping List ---
-    elif intent in ["add_to_shopping_list", "remove_from_shopping_list", "get_shopping_list", "clear_shopping_list", "check_shopping_list"]:
-        return self.shopping_engine.handle_intent(intent, entities, user_input)
-
-    # --- Trivia/Games ---
-    elif intent in ["play_trivia", "trivia_question", "answer_trivia"]:
-        return self.trivia_handler(intent, user_input, session_id, session_memory)
-
-    # --- Jokes ---
-    elif intent == "tell_joke":
-        return self.joke_engine(intent, user_input, entities)
-    
-    # --- Core Conversation ---
-    elif intent in ["greeting", "how_are_you", "tell_me_about_you", "small_talk", "bot_feelings"]:
-        return self.core_convo.process(intent, user_input)
-    
-    # --- Weather ---
-    elif intent in ["get_weather", "weather_forecast", "wit$get_weather"]:
-        city = None
-        if entities and "wit$location" in entities:
-            city = entities["wit$location"][0].get("value")
-        if not city:
-            city = self.weather_engine.extract_city_from_text(user_input)
-        return self.weather_engine.get_current_weather(city) if city else "Please specify a city for weather."
-
-    # --- News ---
-    elif intent in ["get_news", "news_headlines", "top_news", "latest_news"]:
-        country = None
-    # Extract country from entities (adjust structure as needed)
-        if entities and ("country" in entities):
-            country = entities["country"][0].get("value")
-        if not country:
-        # Try fuzzy matching from user_input (optional, fallback)
-            for name in ["nigeria", "united kingdom", "uk", "us", "canada", "germany", "france", "india", "australia"]:
-                if name in user_input.lower():
-                    country = name
+    @traced("intent_router.handle_intent")
+    async def handle_intent(self, intent: str, entities: dict, session_id: str, user_input: str, session_memory: dict = None):
+        session_memory = session_memory or {}
+
+        # --- Alarm ---
+        if intent == "set_alarm":
+            result = await self.alarm_engine.set_alarm(user_input, entities, session_id, {})
+            return result.get("text", "Your alarm is ready.")
+        elif intent == "stop_alarm":
+            return "Sorry, stop alarm isn't supported yet."
+
+        # --- Reminder ---
+        elif intent == "set_reminder":
+            return await self.reminder_engine.handle_reminder(user_input, entities, session_id)
+        elif intent == "list_reminders":
+            return self.reminder_engine.list_reminders(session_id)
+        elif intent == "delete_reminder":
+            reminder_ref = None
+            for k in ["reminder_id", "reminder", "task"]:
+                if k in entities:
+                    reminder_ref = entities[k][0].get("value")
                     break
-        if country:
-            return self.news_engine.get_top_headlines(country)
+            if not reminder_ref:
+                reminder_ref = user_input.replace("delete reminder", "").replace("remove reminder", "").strip()
+            return self.reminder_engine.delete_reminder(reminder_ref, session_id)
+
+        # --- Shopping List ---
+        elif intent in ["add_to_shopping_list", "remove_from_shopping_list", "get_shopping_list", "clear_shopping_list", "check_shopping_list"]:
+            return self.shopping_engine.handle_intent(intent, entities, user_input, owner=session_id)
+
+        # --- Trivia/Games ---
+        elif intent in ["play_trivia", "trivia_question", "answer_trivia"]:
+            return self.trivia_handler(intent, user_input, session_id, session_memory)
+
+        # --- Jokes ---
+        elif intent == "tell_joke":
+            return self.joke_engine(intent, user_input, entities)
+
+        # --- Core Conversation ---
+        elif intent in ["greeting", "how_are_you", "tell_me_about_you", "small_talk", "bot_feelings"]:
+            return self.core_convo.process(user_input)
+
+        # --- Weather ---
+        elif intent in ["get_weather", "weather_forecast", "wit$get_weather"]:
+            city = None
+            if entities and "wit$location" in entities:
+                city = entities["wit$location"][0].get("value")
+            if not city:
+                match = re.search(r"(?:in|for)\s+([A-Za-z\s,]+)", user_input, re.IGNORECASE)
+                city = match.group(1).strip(" ?,") if match else None
+            return self.weather_engine.get_current_weather(city) if city else "Please specify a city for weather."
+
+        # --- News ---
+        elif intent in ["get_news", "news_headlines", "top_news", "latest_news"]:
+            country = None
+            # Extract country from entities (adjust structure as needed)
+            if entities and ("country" in entities):
+                country = entities["country"][0].get("value")
+            if not country:
+                # Try fuzzy matching from user_input (optional, fallback)
+                for name in ["nigeria", "united kingdom", "uk", "us", "canada", "germany", "france", "india", "australia"]:
+                    if name in user_input.lower():
+                        country = name
+                        break
+            if country:
+                return self.news_engine.get_top_headlines(country)
+            else:
+                return self.news_engine.get_latest_headlines()
+
+
+        # --- Time ---
+        elif intent in ["time_now"]:
+            return self.time_engine.get_full_time_response()
+
+        # --- Emotion/Emotion Report ---
+        elif intent == "sentiment_report":
+            self.emotion_engine.detect_emotion(user_input, session_id)
+            return self.emotion_engine.generate_emotion_response(session_id)
+
+        # --- Fallback ---
         else:
-            return self.news_engine.get_latest_headlines()
-
+            logging.warning(f"Unknown intent: {intent}, user_input: {user_input}")
+            return "Sorry, I didn’t understand that. Try again!"
 
-    # --- Time ---
-    elif intent in ["time_now"]:
-        return self.time_engine.get_current_time()
 
-    # --- Emotion/Emotion Report ---
-    elif intent == "sentiment_report":
-        return self.emotion_engine.handle_emotion(user_input)
-
-    # --- Memory (if you want to support memory commands) ---
-    elif intent in ["remember_that", "recall_memory"]:
-        return self.memory_engine.handle_intent(intent, entities, user_input)
-    
-    # --- Fallback ---
-    else:
-        logging.warning(f"Unknown intent: {intent}, user_input: {user_input}")
-        return "Sorry, I didn’t understand that. Try again!"
+engines.register("intent_router", IntentRouter)
 
 # --- FastAPI Startup Hook ---
 @app.on_event("startup")
 async def startup_event():
+    use_io_executor()
     try:
+        from backend.db.mongo import connect_db  # pymongo loads here, not at import
         connect_db()
         logging.info("✅ MongoDB connected.")
     except Exception as e:
         logging.error(f"❌ MongoDB startup error: {e}")
+    # STT workers load + warm their models in the background; a /voice clip
+    # that comes in first queues behind the load instead of delaying startup
+    app.state.stt_warm_up = asyncio.create_task(warm_up_stt())
+    # engines/models build in the background; requests are served meanwhile
+    # (held on app.state: the loop only keeps a weak reference to a task)
+    app.state.engine_warm_up = asyncio.create_task(warm_up_engines())
+    # every worker runs the scheduler loop; only the lease holder fires anything
+    scheduler = get_scheduler()
+    scheduler.on("alarm", lambda item: engines.get("alarm").fire_alarm(item))
+    scheduler.on("reminder", lambda item: engines.get("reminder").fire_reminder(item))
+    scheduler.every(ROLLUP_INTERVAL_S, rollup_events)
+    scheduler.start()
+
+async def warm_up_stt():
+    try:
+        await get_stt_pool().start_async()
+    except Exception as e:
+        logging.error(f"❌ STT pool startup failed: {e}")
+
+async def warm_up_engines():
+    try:
+        await engines.warm_up_async()  # a failed engine is logged there and built again on first use
+    except Exception as e:
+        logging.error(f"❌ Engine warm-up failed: {e}")
+
+def rollup_events():
+    """Hourly intent/emotion rollups in Mongo (db/event_store.py); the scheduler's leader runs it."""
+    from backend.db import mongo
+    if mongo.db is not None:
+        from db.event_store import get_event_store
+        get_event_store(mongo.db).run_rollup()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await get_scheduler().stop()
+    get_stt_pool().shutdown()
+
+# --- Per-stage latency (Prometheus text format) ---
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(prometheus_text(), media_type="text/plain; version=0.0.4")
 
 # --- Health Check Route ---
 @app.get("/health")
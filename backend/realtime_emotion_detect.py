@@ -1,64 +1,95 @@
-import cv2
-import numpy as np
+"""
+realtime_emotion_detect.py
+
+Real-time face & emotion detection from the webcam, a video file or a
+synthetic source, through the staged pipeline in
+chapo_engines/face_pipeline.py: latest-frame capture, FER every Nth
+downscaled frame in a worker process, box tracking in between, and
+per-second emotion buckets written to Mongo in bulk.
+
+Usage Example:
+    python realtime_emotion_detect.py                         # webcam, with a window
+    python realtime_emotion_detect.py --video clip.mp4 --headless
+    python realtime_emotion_detect.py --synthetic --seconds 20 --every 5 --scale 0.5
+
+Prints the frames processed, dropped and detected, the achieved FPS and
+CPU use when it stops.
+"""
+
+import argparse
 import os
-from datetime import datetime
-from pymongo import MongoClient
-from fer import FER  # Facial Expression Recognition library
-
-# ===== MongoDB Setup =====
-mongo_uri = os.getenv("MONGODB_URI")
-client = MongoClient(mongo_uri) if mongo_uri else None
-
-try:
-    db = client.get_default_database() if client else None
-except Exception as e:
-    db = None
-    print(f"❌ Failed to connect to MongoDB: {e}")
-
-# ===== Initialize Webcam =====
-cap = cv2.VideoCapture(0)
-detector = FER(mtcnn=False)
-
-print("📸 Starting real-time face & emotion detection... Press 'q' to quit.")
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("❌ Failed to grab frame")
-        break
-
-    # Detect emotion and face
-    results = detector.detect_emotions(frame)
-
-    for result in results:
-        (x, y, w, h) = result["box"]
-        emotions = result["emotions"]
-        dominant_emotion = max(emotions, key=emotions.get)
-        confidence = emotions[dominant_emotion]
-
-        # Draw box and label
+
+from chapo_engines.face_pipeline import (
+    DETECT_EVERY, DETECT_SCALE, FacePipeline, SyntheticDetector, SyntheticSource, VideoSource, load_fer, mongo_writer,
+)
+
+
+def connect_emotions_db():
+    mongo_uri = os.getenv("MONGODB_URI")
+    if not mongo_uri:
+        return None
+    try:
+        from pymongo import MongoClient
+        return MongoClient(mongo_uri).get_default_database()
+    except Exception as e:
+        print(f"❌ Failed to connect to MongoDB: {e}")
+        return None
+
+
+def show(frame, faces):
+    """Draws the tracked boxes and shows the frame; False when 'q' is pressed."""
+    import cv2
+    for (x, y, w, h), emotion, confidence in faces:
         cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
-        label = f"{dominant_emotion} ({confidence:.2f})"
-        cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (36, 255, 12), 2)
-
-        # MongoDB Logging
-        if db is not None:
-            try:
-                db.emotions.insert_one({
-                    "timestamp": datetime.utcnow(),
-                    "emotion": dominant_emotion,
-                    "confidence": confidence,
-                    "box": result["box"]
-                })
-            except Exception as e:
-                print(f"❌ MongoDB logging error: {e}")
-
-    # Show frame
+        cv2.putText(frame, f"{emotion} ({confidence:.2f})", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9,
+                    (36, 255, 12), 2)
     cv2.imshow("Chapo - Emotion Detection", frame)
+    return not (cv2.waitKey(1) & 0xFF == ord('q'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chapo real-time facial emotion detection")
+    source_group = parser.add_mutually_exclusive_group()
+    source_group.add_argument("--camera", type=int, default=0, help="webcam index (default 0)")
+    source_group.add_argument("--video", help="read frames from a video file instead of the webcam")
+    source_group.add_argument("--synthetic", action="store_true",
+                              help="moving coloured squares and a stand-in detector; no camera or FER needed")
+    parser.add_argument("--every", type=int, default=DETECT_EVERY, help="run the detector on every Nth frame")
+    parser.add_argument("--scale", type=float, default=DETECT_SCALE, help="downscale factor for the detector")
+    parser.add_argument("--seconds", type=float, help="stop after this long")
+    parser.add_argument("--headless", action="store_true", help="no window (implied by --synthetic)")
+    parser.add_argument("--cost-ms", type=float, default=30.0, help="--synthetic: simulated inference time")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        source = SyntheticSource(seconds=args.seconds or 10)
+        detector = SyntheticDetector(cost_s=args.cost_ms / 1000)
+    else:
+        source = VideoSource(args.video if args.video else args.camera)
+        detector = load_fer
+    headless = args.headless or args.synthetic
+
+    db = connect_emotions_db()
+    pipeline = FacePipeline(
+        detector=detector, every=args.every, scale=args.scale,
+        write_many=mongo_writer(db) if db is not None else None,
+        on_frame=None if headless else show,
+    )
+    print("📸 Starting real-time face & emotion detection..." + ("" if headless else " Press 'q' to quit."))
+    try:
+        stats = pipeline.run(source, seconds=args.seconds)
+    finally:
+        pipeline.shutdown()
+        if not headless:
+            import cv2
+            cv2.destroyAllWindows()
+
+    print(f"🎞️ {stats['processed']} frames in {stats['seconds']}s: {stats['fps']} FPS, "
+          f"CPU {stats['cpu_percent']}% of one core")
+    print(f"   {stats['dropped']} dropped, {stats['detections']} detections, {stats['faces']} faces, "
+          f"{stats['buckets_written']} per-second buckets written")
+    print("👋 Goodbye!")
 
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
 
-cap.release()
-cv2.destroyAllWindows()
-print("👋 Goodbye!")
+if __name__ == "__main__":
+    main()
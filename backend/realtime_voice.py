@@ -1,18 +1,15 @@
-import whisper
 import requests
 import os
-import pyaudio
-import wave
 import pyttsx3
 import uuid
 from backend.intent.intent_router import route_intent, extract_spacy_entities
 
-from backend.services.nlp import get_intent_from_wit
+from backend.services.nlp import get_intent
+from chapo_engines.voice_capture import MicrophoneSource, CapturedAudio, capture_utterance
+from chapo_engines.stt_manager import get_stt_manager
 
 # Voice settings
 SAMPLE_RATE = 16000
-DURATION = 5  # seconds
-AUDIO_FILENAME = "voice_input.wav"
 session_id = f"session_{uuid.uuid4().hex[:8]}"
 
 # TTS
@@ -22,41 +19,31 @@ def speak(text):
     engine.say(text)
     engine.runAndWait()
 
-# Record voice
-def record_audio(filename=AUDIO_FILENAME, duration=DURATION, rate=SAMPLE_RATE):
-    p = pyaudio.PyAudio()
-    stream = p.open(format=pyaudio.paInt16,
-                    channels=1,
-                    rate=rate,
-                    input=True,
-                    frames_per_buffer=1024)
+# Record voice (VAD: ends on trailing silence, stays in memory)
+def record_audio(source=None, rate=SAMPLE_RATE):
     print("🎤 Speak now...")
-    frames = []
-    for _ in range(0, int(rate / 1024 * duration)):
-        data = stream.read(1024)
-        frames.append(data)
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
-    with wave.open(filename, 'wb') as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(p.get_sample_size(pyaudio.paInt16))
-        wf.setframerate(rate)
-        wf.writeframes(b''.join(frames))
-    return filename
+    if source is not None:
+        return capture_utterance(source)
+    with MicrophoneSource(rate=rate) as mic:
+        return capture_utterance(mic)
 
-# Transcribe with Whisper
-def transcribe_audio(file):
-    model = whisper.load_model("base")
-    result = model.transcribe(file)
-    return result.get("text", "").strip()
+# Transcribe with Whisper (shared model, loaded once)
+def transcribe_audio(audio):
+    if isinstance(audio, CapturedAudio):
+        if not audio:
+            return ""
+        audio = audio.to_float32()
+    return get_stt_manager().transcribe(audio)
 
 # Real-time loop
 def run_voice_assistant():
+    stt = get_stt_manager()
+    stt.warm_up()
+    print(f"⏱️ Whisper loaded in {stt.load_seconds:.2f}s (warm-up {stt.warm_up_seconds:.2f}s)")
     print("🎙️ Real-time Voice Mode: Say 'exit' to stop.\n")
     while True:
-        audio_path = record_audio()
-        text = transcribe_audio(audio_path)
+        captured = record_audio()
+        text = transcribe_audio(captured)
 
         if not text:
             print("❌ No speech detected.")
@@ -64,11 +51,12 @@ def run_voice_assistant():
 
         if "exit" in text.lower():
             speak("Goodbye!")
+            print(f"📊 STT: {stt.stats()}")
             break
 
         print(f"🧠 You said: {text}")
 
-        intent, confidence, wit_entities = get_intent_from_wit(text)
+        intent, confidence, wit_entities = get_intent(text)
 
         # Normalize intent
         if intent and intent.startswith("wit$"):
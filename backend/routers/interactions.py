@@ -5,8 +5,6 @@ Author: Your Name, 2025-05-28
 """
 
 from fastapi import APIRouter
-from backend.db.mongo import db
-from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
@@ -16,7 +14,8 @@ def get_interactions():
     """
     Returns the most recent user interactions for display or analysis.
     """
-    interactions = db["interactions"].find().sort("timestamp", -1)
+    from backend.db import mongo  # pymongo loads on first use; mongo.db is set by connect_db() at startup
+    interactions = mongo.db["interactions"].find().sort("timestamp", -1)
     result = []
     for doc in interactions:
         result.append({
@@ -5,12 +5,11 @@ Author: x-tech, 2025-05-28
 """
 
 from fastapi import APIRouter, Body, HTTPException
-from backend.core.wit_client import get_intent_from_wit  # Wit.ai handler
-from backend.main import IntentRouter                    # Our dispatcher
+from backend.services.nlp import get_intent            # NLU cascade (Wit.ai last)
+from chapo_engines.registry import engines               # IntentRouter is registered by backend.main
 import logging
 
 router = APIRouter(prefix="/text", tags=["Text Input"])
-intent_router = IntentRouter()
 
 @router.post("/")
 async def handle_text(user_input: str = Body(..., embed=True)):
@@ -22,17 +21,19 @@ async def handle_text(user_input: str = Body(..., embed=True)):
         raise HTTPException(status_code=400, detail="Input text cannot be empty.")
 
     try:
-        # Step 1: NLP (Wit.ai)
-        intent, confidence, entities = get_intent_from_wit(user_input)
+        # Step 1: NLP (cascade: exact / keywords / local model / Wit.ai)
+        prediction = get_intent(user_input)
+        intent, confidence, entities = prediction
         session_id = "web_" + str(hash(user_input))  # Customize per user/session
-        logging.info(f"📝 NLP: '{user_input}' → intent='{intent}' confidence={confidence}")
+        logging.info(f"📝 NLP: '{user_input}' → intent='{intent}' confidence={confidence} stage={prediction.stage}")
 
         # Step 2: Use IntentRouter to process
-        response = await intent_router.handle_intent(intent, entities, session_id, user_input)
+        response = await engines.get("intent_router").handle_intent(intent, entities, session_id, user_input)
         return {
             "intent": intent,
             "confidence": confidence,
             "entities": entities,
+            "nlu_stage": prediction.stage,
             "response": response
         }
     except Exception as e:
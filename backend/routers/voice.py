@@ -1,40 +1,29 @@
 """
-text.py
-POST endpoint for handling text-based user input and intent dispatch.
+voice.py
+POST endpoint for uploaded voice clips: transcription, intent dispatch, logging.
+Answers 503 + Retry-After when the STT worker pool is saturated.
 Author: x-tech, 2025-05-28
 """
 
-from fastapi import APIRouter, Body, HTTPException
-from backend.core.wit_client import get_intent_from_wit  # Wit.ai handler
-from backend.main import IntentRouter                    # Our dispatcher
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from backend.services.voice_handler import process_voice_file
+from chapo_engines.stt_pool import STTBusy
 import logging
 
-router = APIRouter(prefix="/text", tags=["Text Input"])
-intent_router = IntentRouter()
+router = APIRouter(prefix="/voice", tags=["Voice Input"])
 
 @router.post("/")
-async def handle_text(user_input: str = Body(..., embed=True)):
+async def handle_voice(file: UploadFile = File(...)):
     """
-    Receives user text, parses intent/entities, routes to feature engine,
-    and returns the response.
+    Receives an audio file (WAV, MP3, WebM, ...), transcribes it and returns
+    the routed response.
     """
-    if not user_input.strip():
-        raise HTTPException(status_code=400, detail="Input text cannot be empty.")
-
     try:
-        # Step 1: NLP (Wit.ai)
-        intent, confidence, entities = get_intent_from_wit(user_input)
-        session_id = "web_" + str(hash(user_input))  # Customize per user/session
-        logging.info(f"📝 NLP: '{user_input}' → intent='{intent}' confidence={confidence}")
-
-        # Step 2: Use IntentRouter to process
-        response = await intent_router.handle_intent(intent, entities, session_id, user_input)
-        return {
-            "intent": intent,
-            "confidence": confidence,
-            "entities": entities,
-            "response": response
-        }
-    except Exception as e:
-        logging.error(f"❌ Error in /text/: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        return await process_voice_file(file)
+    except STTBusy as e:
+        logging.warning(f"⏳ /voice/ rejected, STT queue full (retry in {e.retry_after}s)")
+        raise HTTPException(
+            status_code=503,
+            detail="Speech recognition is busy. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
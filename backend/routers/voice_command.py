@@ -0,0 +1,23 @@
+"""
+voice_command.py
+POST /voice-command: one text turn for a session (same contract as the old
+Flask chapo_server endpoint), answered on the FastAPI event loop.
+"""
+
+from fastapi import APIRouter, Body, HTTPException
+from backend.services.voice_command import handle_voice_command
+import logging
+
+router = APIRouter(tags=["Voice Command"])
+
+@router.post("/voice-command")
+async def voice_command(text: str = Body("", embed=True), session_id: str = Body("default_user", embed=True)):
+    """
+    Receives {"text": ..., "session_id": ...} and returns the reply with the
+    detected intent, confidence and the session's current emotion.
+    """
+    try:
+        return await handle_voice_command(text, session_id)
+    except Exception as e:
+        logging.error(f"❌ Error in /voice-command: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
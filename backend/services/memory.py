@@ -1,24 +1,22 @@
 # backend/services/memory.py
 
-from collections import defaultdict
-import threading
+from db.session_store import get_session_store
 
-# Thread-safe in-memory session storage
-session_store = defaultdict(list)
-lock = threading.Lock()
+# Per-session message history, kept in the shared session store so every
+# server worker sees the same history for a session.
+HISTORY_KEY = "history"
 
 def session_memory(session_id: str, message: dict):
     """
     Store a message or interaction in session memory for a given session_id.
     """
-    with lock:
-        session_store[session_id].append(message)
+    get_session_store().update(session_id, HISTORY_KEY, lambda history: (history or []) + [message])
 
 def prune_memory(session_id: str, max_length: int = 50):
     """
     Prune session memory for a session_id to keep it within max_length.
     Removes oldest messages if above limit.
     """
-    with lock:
-        if session_id in session_store and len(session_store[session_id]) > max_length:
-            session_store[session_id] = session_store[session_id][-max_length:]
+    history = get_session_store().get(session_id, HISTORY_KEY)
+    if history and len(history) > max_length:
+        get_session_store().update(session_id, HISTORY_KEY, lambda history: (history or [])[-max_length:])
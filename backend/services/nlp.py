@@ -4,12 +4,19 @@ nlp.py
 Handles communication with Wit.ai for NLU (intent/entity detection).
 All calls are logged for traceability.
 
+get_intent() is what the routes use: the shared NLU cascade (exact match,
+keyword rules, local model), which only calls Wit.ai when the cheaper
+stages are not confident. See chapo_engines/nlu_cascade.py.
+
 Author: [Your Name], 2025-05-28
 """
 
 import requests
 import os
 import logging
+import threading
+
+from chapo_engines.nlu_cascade import build_cascade
 
 # --- Configuration ---
 WIT_API_URL = "https://api.wit.ai/message?v=20230228"
@@ -53,6 +60,30 @@ def get_intent_from_wit(text: str):
         logging.error(f"Wit.ai API error: {e}")
         return None, 0.0, {}
 
+# --- NLU cascade ---
+_cascade = None
+_cascade_lock = threading.Lock()
+
+def get_cascade():
+    """The process-wide NLU cascade; Wit.ai is its last (remote) stage."""
+    global _cascade
+    with _cascade_lock:
+        if _cascade is None:
+            # late-bound, so the Wit.ai call can be swapped out (tests, benchmarks)
+            _cascade = build_cascade(wit=lambda text: get_intent_from_wit(text))
+        return _cascade
+
+def get_intent(text: str):
+    """
+    Intent and entities for `text`, cheapest confident stage first.
+
+    Returns:
+        Prediction: unpacks as (intent_name, confidence, entities_dict);
+        .stage names the stage that answered, .confident whether it cleared
+        that stage's threshold.
+    """
+    return get_cascade().resolve(text)
+
 # Example usage for intern onboarding
 # if __name__ == "__main__":
 #     sample = "Set an alarm for 8 AM"
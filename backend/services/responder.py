@@ -0,0 +1,455 @@
+"""
+services/responder.py
+
+The reply to one recognized intent, shared by the voice loop (test_voice.py)
+and the FastAPI /voice-command route (services/voice_command.py).
+
+respond() is synchronous; respond_async() is for callers already on an
+event loop. Both were in test_voice.py, so the server imported the whole
+CLI script to reach them, and with it its file logging setup, background
+writer thread, intent prefetcher and STT backend, in every worker. Alarms
+set through respond() go to one long-lived loop on a daemon thread
+(alarm_loop()), so their timers outlive the call. This module only holds what answering a turn needs: intent normalization,
+session memory, the shopping list / weather / GPT helpers and the engines
+(built lazily through chapo_engines.registry).
+
+Usage Example:
+    from backend.services.responder import respond_async
+
+    reply = await respond_async("get_weather", entities, session_id, "weather in Paris", "happy")
+"""
+
+import asyncio
+import os
+import random
+import re
+import threading
+
+import requests
+
+from intent_responses import INTENT_RESPONSES
+from chapo_engines.registry import engines
+from chapo_engines.shopping_list_engine import DEFAULT_OWNER
+from chapo_engines.trivia_engine import handle_trivia
+from chapo_engines.utterance import Utterance
+from db.session_store import SessionMemory
+
+SESSION_TTL_MINUTES = 15
+
+# Lives in the shared session store, so every server worker sees the same session memory
+session_memory = SessionMemory("memory", ttl_seconds=SESSION_TTL_MINUTES * 60)
+
+# ---------- Engines (built on first use) ----------
+alarm_engine = engines.lazy("alarm")
+shopping_list_engine = engines.lazy("shopping_list")
+core_convo_engine = engines.lazy("core_convo")
+news_engine = engines.lazy("news")
+cooking_engine = engines.lazy("cooking")
+fitness_engine = engines.lazy("fitness")
+
+ALARM_TIMEOUT_S = 30
+
+# ---------- Alarms from sync callers ----------
+# respond() runs on threads with no event loop of their own (chapo_server.py,
+# respond_async's worker threads). asyncio.run() there gave each alarm a loop
+# that closed, timer task and all, as soon as the reply was back.
+_alarm_loop = None
+_alarm_loop_lock = threading.Lock()
+
+
+def alarm_loop():
+    """The process-wide loop that sync callers' alarm timers run on (started on first use)."""
+    global _alarm_loop
+    with _alarm_loop_lock:
+        if _alarm_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="chapo-alarms", daemon=True).start()
+            _alarm_loop = loop
+    return _alarm_loop
+
+
+def set_alarm_sync(user_input, entities, session_id) -> dict:
+    """alarm_engine.set_alarm() on alarm_loop(), waited for from the calling thread."""
+    coro = alarm_engine.set_alarm(text=user_input, entities=entities, session_id=session_id, context={})
+    return asyncio.run_coroutine_threadsafe(coro, alarm_loop()).result(ALARM_TIMEOUT_S)
+
+
+INTENT_NORMALIZATION_MAP = {
+    # --- Main Supported Intents ---
+    "wit$get_weather": "get_weather",
+    "get_weather": "get_weather",
+    "weather_forecast": "get_weather",
+    # Shopping List
+    "add_to_grocery_list": "add_to_shopping_list",
+    "check_grocery_list": "check_shopping_list",
+    "clear_list": "clear_shopping_list",
+    "calendar_integration": "get_shopping_list",
+    "remove_from_shopping_list": "remove_from_shopping_list",
+    # Alarms
+    "set_alarm": "set_alarm",
+    "cancel_alarm": "stop_alarm",
+    "delete_alarm": "stop_alarm",
+    "stop_alarm": "stop_alarm",
+    "list_alarms": "list_alarms",
+    "set_reminder": "set_reminder",
+    "reminder": "set_reminder",
+    # force "alarm" word mapping
+    "set_alarm": "set_alarm",
+    "alarm": "set_alarm",
+    # Reminders
+    "set_reminder": "set_reminder",
+    "delete_reminder": "delete_reminder",
+    "cancel_reminder": "delete_reminder",
+    "list_reminders": "list_reminders",
+    # Trivia
+    "play_trivia": "play_trivia",
+    "trivia_question": "play_trivia",
+    "answer_trivia": "play_trivia",
+    "start_trivia": "play_trivia",
+    "trivia_question": "play_trivia",
+    "answer_trivia": "play_trivia",
+    # Greetings/Core
+    "greeting": "greeting",
+    "goodbye": "goodbye",
+    "how_are_you": "how_are_you",
+    "tell_me_about_you": "tell_me_about_you",
+    "bot_feelings": "bot_feelings",
+    # Help/Joke/Time/Fallback
+    "help": "help",
+    "what_can_you_do": "help",
+    "tell_joke": "tell_joke",
+    "time_now": "time_now",
+    "unknown": "unknown",
+
+
+   ## news
+    "get_news": "get_news",
+    "news_headlines": "get_news",
+    "top_news": "get_news",
+    "latest_news": "get_news",
+    "today_headlines": "get_news",
+    "todays_headlines": "get_news",
+    "headline_news": "get_news",
+    "tech_news": "get_news",
+    # News
+    "get_news": "get_news",
+    "news_headlines": "get_news",
+    "top_news": "get_news",
+    "latest_news": "get_news",
+    "today_headlines": "get_news",
+    "todays_headlines": "get_news",
+    "headlines_today": "get_news",
+    "idle_convo": "small_talk", # or "greeting" or "casual_chat"
+    # Cooking
+    "how_can_i_cook": "suggest_recipe",
+    "what_can_i_make": "suggest_recipe",
+    "what_can_i_cook": "suggest_recipe",
+    "suggest_recipe": "suggest_recipe",
+    "get_recipe": "get_recipe",
+    "how_to_make": "get_recipe",
+    "recipe_request": "get_recipe",
+    "ingredient_recipe": "suggest_recipe",
+    "i_have": "suggest_recipe",
+    "cook_with": "suggest_recipe",
+    "make_with": "suggest_recipe"
+
+}
+
+
+def normalize_intent(intent):
+    if not intent:
+        return "unknown"
+    if intent.startswith("wit$"):
+        return intent.split("$", 1)[-1]
+    return INTENT_NORMALIZATION_MAP.get(intent, intent)
+
+
+# ---------- OpenAI GPT Fallback ----------
+USE_GPT_FALLBACK = False  # Toggle to True if you want to re-enable GPT fallback
+
+def fallback_with_openai_gpt(user_input):
+    api_key = os.getenv('OPENAI_API_KEY')
+    system_message = (
+    "Your name is Chapo. You are NOT an OpenAI model; you are a friendly robot assistant designed by Islington Robotica. You are a caring, natural robot assistant. You help with weather, time, reminders, "
+    "shopping lists, and fun trivia. You speak in short, conversational sentences, without special punctuation. "
+    "You answer with context-awareness and empathy. If the user sounds lonely, sad, or emotional, say something kind to cheer them up and ask if they want to talk or hear a fun fact. "
+    "If you don't fully understand the user's request or intent is unclear, politely ask for clarification, try to guess their intent, and suggest they ask about features like shopping lists, reminders, weather, or time, giving examples. "
+    "If the user shares their name or personal info, remember it during the conversation and use it to make your replies more personal. "
+    "Always use Chapo's own features for direct commands like weather, reminders, add to shopping lists, access the user shopping list, tell the user what is on their current shopping list, or time, and only use gpt fallback for open-ended questions or casual conversation to to check facts on the web. "
+    "For unrecognized queries, help the user find the right command by guiding them to use Chapo’s main features. "
+    "If the user refers to something from earlier in the same conversation, remember and use it. "
+    "It's 2025."
+    )
+
+    response = requests.post(
+        'https://api.openai.com/v1/chat/completions',
+        headers={
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        },
+        json={
+            'model': 'gpt-4',
+            'messages': [
+                {'role': 'system', 'content': system_message},
+                {'role': 'user', 'content': user_input}
+            ],
+            'max_tokens': 150,
+            'temperature': 0.7,
+        }
+    )
+    if response.ok:
+        reply = response.json()['choices'][0]['message']['content']
+        return reply.strip()
+    else:
+        print(f"OpenAI API Error: {response.text}")
+        return "I'm not able to help with that right now. Can you say that differently ?"
+
+
+# ---------- Memory Pruning ----------
+def prune_memory(session_id):
+    session_memory.prune(session_id)
+
+# ---------- Intent Handlers ----------
+def handle_intent(intent_name, entities, transcription, owner=DEFAULT_OWNER):
+    # Shopping List (owner: the user/household whose list it is; the robot's own loop uses the household default)
+    if intent_name == "add_to_shopping_list":
+        items = extract_items_from_entities_or_text(entities, transcription)
+        if items:
+            return shopping_list_engine.add_items(items, owner)
+        return "❗ I couldn't understand the item to add. Please try again."
+    elif intent_name in ["get_shopping_list", "check_shopping_list"]:
+        shopping_list = shopping_list_engine.get_list(owner)
+        if shopping_list:
+            return f"🛒 Your shopping list includes: {', '.join(shopping_list)}."
+        return "🛒 Your shopping list is empty."
+    elif intent_name == "clear_shopping_list":
+        return shopping_list_engine.clear_list(owner)
+    elif intent_name == "remove_from_shopping_list":
+        item = transcription.replace("remove", "").replace("from my shopping list", "").strip()
+        return shopping_list_engine.remove_item(item, owner)
+    else:
+        return "Sorry, I didn't understand that command."
+
+def extract_items_from_entities_or_text(entities, text):
+    if "item" in entities:
+        return [ent.get("value") for ent in entities["item"] if ent.get("value")]
+    words = text.lower().replace("add", "").replace("to my shopping list", "")
+    return [item.strip() for item in re.split(r',| and | with ', words) if item.strip()]
+
+# ---------- Weather Handler ----------
+def get_weather(city_name):
+    if not city_name:
+        return "Please specify a city."
+    weather_api_key = os.getenv('WEATHER_API_KEY')
+    url = f"http://api.weatherapi.com/v1/current.json?key={weather_api_key}&q={city_name}&aqi=no"
+    response = requests.get(url)
+    if response.status_code == 200:
+        data = response.json()
+        temp = data['current']['temp_c']
+        description = data['current']['condition']['text']
+        return f"The weather in {city_name} is {description} with a temperature of {temp}°C."
+    else:
+        return "❗ Sorry, couldn't fetch weather."
+    
+def normalize_user_input(text):
+    # lowercased, punctuation removed
+    text = Utterance.of(text).cleaned
+
+    # Remove known junk phrases
+    phrases_to_remove = [
+        "can you", "could you", "please", "tell me", "i want to",
+        "give me steps for", "how do i make", "how do i cook", "how to make",
+        "how to cook", "what is the recipe for", "teach me how to", "i need to",
+        "show me how to", "what is", "whats", "what can i make", "what can i cook",
+        "any idea", "such as", "such", "something", "suggest", "i have", "with", "and"
+    ]
+    for phrase in sorted(phrases_to_remove, key=len, reverse=True):
+        text = text.replace(phrase, "")
+
+    # Replace connector words with commas
+    text = text.replace(" and ", ",")
+    text = text.replace(" with ", ",")
+    text = text.strip()
+
+    # Remove duplicate commas and whitespace
+    text = re.sub(r"\s*,\s*", ",", text)
+    text = re.sub(r",+", ",", text)
+    text = text.strip(" ,")
+
+    return text
+
+
+# ---------- Main Respond Function ----------
+def respond(intent, entities, session_id, user_input, user_emotion=None):
+    normalized_intent = normalize_intent(intent)
+    try:
+        prune_memory(session_id)
+        # Get or create the session record and merge this turn's entities (one atomic write)
+        def merge_entities(record):
+            record = record or {"data": {}}
+            record["data"].update(entities)
+            return record
+
+        session_memory.modify(session_id, merge_entities)
+
+        
+
+        # ----- Alarm/Reminder -----
+        if normalized_intent == "set_alarm":
+            try:
+                alarm_response = set_alarm_sync(user_input, entities, session_id)
+                return alarm_response["text"]
+            except Exception as e:
+                print(f"Alarm handler error: {e}")
+                return "I ran into an issue handling the alarm."
+
+        elif normalized_intent == "stop_alarm":
+            return "Sorry, stop alarm isn't supported yet."
+
+
+
+        # Trivia/Games
+        if intent in ["play_trivia", "trivia_question", "answer_trivia"]:
+            return handle_trivia(intent, user_input, session_id, session_memory)  # writes back through the store
+
+
+        # Core Conversation
+        if intent in ["greeting", "goodbye", "tell_me_about_you", "bot_feelings", "how_are_you"]:
+            return core_convo_engine.process(user_input)
+
+
+
+        # Time/Weather
+        if intent == "time_now":
+            resp = random.choice(INTENT_RESPONSES["time_now"])
+            return resp() if callable(resp) else resp
+        
+        if intent in ["get_weather", "weather_forecast", "wit$get_weather"]:
+            city = None
+            if entities and "wit$location" in entities:
+                city = entities["wit$location"][0].get("value")
+            if not city:
+                for possible_city in ["new york", "london", "paris", "tokyo", "berlin", "mumbai", "sydney"]:
+                    if possible_city in user_input.lower():
+                        city = possible_city.title()
+                        break
+            return get_weather(city) if city else "Please mention the city name."
+
+        # Shopping List
+        if intent in [
+            "add_to_shopping_list", "get_shopping_list", "clear_shopping_list", 
+            "remove_from_shopping_list", "check_shopping_list"
+        ]:
+            return handle_intent(intent, entities, user_input, owner=session_id)
+
+        # Jokes, help, fallback responses
+        if intent == "tell_joke":
+            return random.choice(INTENT_RESPONSES["tell_joke"])
+        if intent in ["help", "what_can_you_do"]:
+            return random.choice(INTENT_RESPONSES["help"])
+
+        if intent in ["get_news", "news_headlines", "top_news", "latest_news"]:
+            return news_engine.get_latest_headlines()
+
+
+        # ---------- Cooking Intent ----------
+        if normalized_intent == "get_recipe":
+            dish = None
+            # Use Wit.ai entity first
+            if "dish" in entities:
+                dish = entities["dish"][0].get("value")
+
+            if not dish:
+                cleaned = normalize_user_input(user_input)
+
+                # Remove phrases more robustly
+                patterns = [
+                    r"how do i make", r"how i make", r"how to cook", r"make", 
+                    r"cook", r"recipe for", r"give me steps for", r"you me steps for"
+                ]
+                for phrase in patterns:
+                    cleaned = cleaned.replace(phrase, "")
+                dish = cleaned.strip()
+
+            if dish:
+                print(f"[DEBUG] Cooking dish detected: {dish}")
+                return cooking_engine.get_recipe(dish)
+            return "Please tell me the name of the dish you'd like a recipe for."
+
+
+        if normalized_intent == "suggest_recipe":
+            ingredients = None
+            if "ingredient" in entities:
+                ingredients = ", ".join(ent["value"] for ent in entities["ingredient"])
+            if not ingredients:
+                ingredients = normalize_user_input(user_input)
+            print(f"[DEBUG] Cooking ingredients detected: {ingredients}")
+            return cooking_engine.suggest_recipe(ingredients)
+        
+        # ---- Fitness Intents ----
+        if normalized_intent == "start_workout":
+            return fitness_engine.start_structured_workout(session_id)
+
+        elif normalized_intent == "log_workout" or "done" in user_input.lower():
+            return fitness_engine.log_structured_workout(session_id)
+
+        elif normalized_intent == "suggest_workout":
+            return fitness_engine.suggest_workout()
+
+        elif normalized_intent == "fitness_tip":
+            return fitness_engine.get_fitness_tip()
+
+        elif normalized_intent == "calorie_info":
+            food_item = None
+
+            # ✅ Get food entity from Wit if it exists
+            if "food" in entities:
+                food_item = entities["food"][0].get("value")
+
+            # 🧹 Fallback: try to extract from the sentence manually
+            if not food_item:
+                cleaned_input = user_input.lower()
+                for prefix in ["how many calories in", "calories in", "calorie in", "what's the calorie of", "tell me calorie of"]:
+                    if prefix in cleaned_input:
+                        food_item = cleaned_input.split(prefix)[-1].strip()
+                        break
+                if not food_item:
+                    food_item = cleaned_input.strip()
+
+            return fitness_engine.get_calorie_info(food_item)
+
+
+
+
+
+        # Direct mapped INTENT_RESPONSES
+        if intent in INTENT_RESPONSES:
+            responses = INTENT_RESPONSES[intent]
+            chosen = random.choice(responses) if isinstance(responses, list) else responses
+            return chosen() if callable(chosen) else chosen
+
+
+
+        # Otherwise fallback
+        return fallback_with_openai_gpt(user_input)
+
+    except Exception as e:
+        print(f"⚠️ respond() error caught safely: {e}")
+        return "Hmm, I couldn't process that properly. Could you say it a bit differently?"
+
+async def respond_async(intent, entities, session_id, user_input, user_emotion=None):
+    """
+    respond() for callers already on an event loop (the FastAPI /voice-command route).
+    Alarms are set on *this* loop, so their timer tasks outlive the request instead of
+    dying with a throwaway asyncio.run() loop; everything else runs in a worker thread
+    so blocking engine calls never stall the loop.
+    """
+    if normalize_intent(intent) == "set_alarm":
+        try:
+            alarm_response = await alarm_engine.set_alarm(text=user_input, entities=entities,
+                                             session_id=session_id, context={})
+            return alarm_response["text"]
+        except Exception as e:
+            print(f"Alarm handler error: {e}")
+            return "I ran into an issue handling the alarm."
+    return await asyncio.to_thread(respond, intent, entities, session_id, user_input, user_emotion)
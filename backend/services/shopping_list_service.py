@@ -0,0 +1,36 @@
+"""
+shopping_list_service.py
+
+Shopping list operations for the HTTP API (api/shopping_list_routes.py)
+and the text handler. `user_id` picks whose list it is: a user, or a
+household id that several users share.
+"""
+
+from chapo_engines.shopping_list_engine import (
+    DEFAULT_OWNER,
+    extract_items_from_text,
+    get_shopping_list_engine,
+)
+
+
+def add_items_to_shopping_list(items_text, user_id: str = DEFAULT_OWNER) -> str:
+    """Accepts free text ("milk, eggs and bread") or a list of items."""
+    items = extract_items_from_text(items_text) if isinstance(items_text, str) else list(items_text)
+    if not items:
+        return "❗ I couldn't understand the item to add. Please try again."
+    return get_shopping_list_engine().add_items(items, user_id)
+
+
+def get_shopping_list(user_id: str = DEFAULT_OWNER) -> list:
+    return get_shopping_list_engine().get_list(user_id)
+
+
+def clear_shopping_list(user_id: str = DEFAULT_OWNER) -> str:
+    return get_shopping_list_engine().clear_list(user_id)
+
+
+def remove_item_from_shopping_list(item_text: str, user_id: str = DEFAULT_OWNER) -> str:
+    item = item_text.strip()
+    if not item:
+        return "❗ Which item should I remove?"
+    return get_shopping_list_engine().remove_item(item, user_id)
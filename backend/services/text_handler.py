@@ -66,9 +66,10 @@ async def process_text_input(user_input: str, session_id: str = None):
         return {"response": "Please say or type something!", "intent": "none"}
 
     # --- 2. Intent Detection ---
-    from backend.services.nlp import get_intent_from_wit
-    intent, confidence, entities = get_intent_from_wit(user_input)
-    logging.info(f"NLU Intent: {intent} (confidence={confidence:.2f}) | Entities: {entities}")
+    from backend.services.nlp import get_intent
+    prediction = get_intent(user_input)
+    intent, confidence, entities = prediction
+    logging.info(f"NLU Intent: {intent} (confidence={confidence:.2f}, stage={prediction.stage}) | Entities: {entities}")
 
     # --- 3. Session/Memory Management ---
     if not session_id:
@@ -79,7 +80,7 @@ async def process_text_input(user_input: str, session_id: str = None):
     session_memory[session_id] = {"data": memory, "last_updated": datetime.now(timezone.utc)}
 
     # --- 4. Intent Routing & Response Generation ---
-    if not intent or confidence < 0.75:
+    if not intent or not prediction.confident:
         # Fallback for uncertain intent: canned response or GPT fallback
         return {
             "response": "🤖 I'm not sure how to respond to that. Could you rephrase?",
@@ -0,0 +1,70 @@
+"""
+services/voice_command.py
+
+Text turns from the robot/frontend (POST /voice-command), served by the
+FastAPI app on its one long-lived event loop. Replaces the Flask bridge in
+chapo_server.py, which ran asyncio.run() per request: any alarm task a
+turn scheduled died with that loop, and every user shared one global
+emotion_tracker.
+
+- NLU (the cascade; Wit.ai only when the local stages are unsure) and
+  emotion detection run concurrently in worker threads.
+- Emotion is per session, kept in the shared SessionStore (SQLite), so
+  every uvicorn worker sees the same history for a user.
+- The reply comes from services/responder.py's respond_async(), the same
+  code the voice loop answers with: alarms are set on this loop and
+  outlive the request; the rest runs off the loop.
+- Those worker threads are mostly waiting on HTTP (Wit, weather, news,
+  GPT), so the loop's default executor is widened to IO_THREADS at startup
+  (asyncio's default is cpu_count + 4, i.e. 5 threads on a 1-core box).
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.services.nlp import get_intent
+from backend.services.responder import respond_async
+from chapo_engines.emotion_detector_engine import EmotionDetectorEngine
+from db.session_store import get_session_store
+
+EMOTION_KEY = "emotion"
+IO_THREADS = int(os.getenv("CHAPO_IO_THREADS", "32"))
+
+
+def use_io_executor(loop=None):
+    """Gives the loop a default executor sized for blocking network calls, not CPU work."""
+    loop = loop or asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="chapo-io"))
+
+
+def detect_session_emotion(session_id: str, text: str) -> str:
+    """Updates and returns this session's emotion; one atomic read-modify-write."""
+    detected = {}
+
+    def update(state):
+        engine = EmotionDetectorEngine.from_state(state)
+        detected["emotion"] = engine.detect_emotion(text)
+        return engine.to_state()
+
+    get_session_store().update(session_id, EMOTION_KEY, update)
+    return detected["emotion"]
+
+
+async def handle_voice_command(text: str, session_id: str) -> dict:
+    prediction, emotion = await asyncio.gather(
+        asyncio.to_thread(get_intent, text),
+        asyncio.to_thread(detect_session_emotion, session_id, text),
+    )
+    intent, confidence, entities = prediction
+    stage = getattr(prediction, "stage", None)
+    logging.info(f"🗣️ /voice-command [{session_id}] '{text}' → {intent} ({confidence}, {stage}), emotion={emotion}")
+    response = await respond_async(intent, entities, session_id, text, emotion)
+    return {
+        "response": response,
+        "intent": intent,
+        "confidence": confidence,
+        "nlu_stage": stage,
+        "emotion": emotion,
+    }
@@ -2,8 +2,8 @@
 services/voice_handler.py
 
 Handles processing of uploaded voice/audio files:
-- Saves temp file
-- Transcribes to text using Whisper
+- Decodes the upload in memory (no temp file)
+- Transcribes to text using Whisper on the STT process pool
 - Extracts intent/entities from Wit.ai
 - Routes request to the appropriate engine/intent handler via IntentRouter
 - Logs interaction to MongoDB
@@ -11,55 +11,45 @@ Handles processing of uploaded voice/audio files:
 Author: [Your Name], 2025-05-28
 """
 
-import whisper
-import os
-import tempfile
 import logging
 from fastapi import UploadFile
-from backend.services.nlp import get_intent_from_wit
+from backend.services.nlp import get_intent
 from backend.intent.intent_router import route_intent
-from backend.db.mongo import save_interaction
+from chapo_engines.stt_manager import get_stt_manager
+from chapo_engines.stt_pool import get_stt_pool, STTBusy
 from datetime import datetime
 
-# --- Whisper model is loaded once (for efficiency) ---
-_whisper_model = None
-
+# --- Whisper model is shared with realtime_voice (loaded once, see stt_manager) ---
 def get_whisper_model():
-    global _whisper_model
-    if _whisper_model is None:
-        _whisper_model = whisper.load_model("base")
-    return _whisper_model
+    return get_stt_manager().model
 
 async def process_voice_file(file: UploadFile):
     """
     Full processing pipeline for a voice file:
-    1. Save temp file.
-    2. Transcribe to text using Whisper.
+    1. Read the upload into memory.
+    2. Transcribe to text using Whisper (STT worker process).
     3. Query Wit.ai for intent/entities.
     4. Route intent to proper handler.
     5. Log result.
     6. Return structured response.
+
+    Raises STTBusy when the STT queue is full (the router turns it into a 503).
     """
     try:
-        # -- Step 1: Save file to temp for Whisper input --
-        suffix = os.path.splitext(file.filename)[-1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-
+        # -- Step 1: Read upload (decoded in the worker, never written to disk) --
+        audio_bytes = await file.read()
         logging.info(f"🎤 Received voice file: {file.filename}")
 
-        # -- Step 2: Transcribe with Whisper --
-        whisper_model = get_whisper_model()
-        result = whisper_model.transcribe(tmp_path, language='en')
-        transcribed_text = result['text'].strip()
+        # -- Step 2: Transcribe with Whisper (process pool, event loop stays free) --
+        transcribed_text = await get_stt_pool().transcribe_async(audio_bytes)
         logging.info(f"📝 Transcribed: {transcribed_text}")
 
-        # -- Step 3: Query Wit.ai --
-        intent, confidence, entities = get_intent_from_wit(transcribed_text)
+        # -- Step 3: NLU cascade (Wit.ai only if the local stages are unsure) --
+        prediction = get_intent(transcribed_text)
+        intent, confidence, entities = prediction
 
         # -- Step 4: Fallback/routing --
-        if not intent or confidence < 0.75:
+        if not intent or not prediction.confident:
             # ChatGPT fallback could go here if desired
             response = "🤖 I'm not sure how to respond to that. Could you rephrase?"
         else:
@@ -75,15 +65,19 @@ async def process_voice_file(file: UploadFile):
             "input": transcribed_text,
             "intent": intent,
             "confidence": confidence,
+            "nlu_stage": prediction.stage,
             "entities": entities,
             "response": response,
             "source": "voice",
             "timestamp": datetime.utcnow()
         }
+        from backend.db.mongo import save_interaction  # pymongo loads on first use, not with the app
         save_interaction(log)
 
         return log
 
+    except STTBusy:
+        raise
     except Exception as e:
         logging.error(f"Voice processing failed: {e}")
         return {
@@ -91,10 +85,3 @@ async def process_voice_file(file: UploadFile):
             "intent": "error",
             "response": f"Voice processing error: {str(e)}"
         }
-    finally:
-        # -- Step 6: Clean up temp file --
-        try:
-            if tmp_path and os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        except Exception as cleanup_err:
-            logging.warning(f"Could not delete temp file: {tmp_path} - {cleanup_err}")
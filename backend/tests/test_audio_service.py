@@ -0,0 +1,74 @@
+import asyncio
+import math
+import struct
+import time
+import wave
+
+import pytest
+
+from chapo_engines.audio_service import AudioService, PRIORITY_ALARM, PRIORITY_TTS
+
+
+def _tone(path, seconds):
+    rate = 22050
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(b"".join(
+            struct.pack("<h", int(8000 * math.sin(i / 10))) for i in range(int(rate * seconds))
+        ))
+    return path
+
+
+@pytest.fixture
+def audio():
+    service = AudioService(driver="dummy")
+    yield service
+    service.shutdown()
+
+
+def test_play_returns_immediately(audio, tmp_path):
+    audio.register("beep", _tone(tmp_path / "beep.wav", 0.3))
+
+    async def run():
+        start = time.perf_counter()
+        job = await audio.play("beep")
+        elapsed = time.perf_counter() - start
+        await job.wait_async()
+        return elapsed, job
+
+    elapsed, job = asyncio.run(run())
+    assert elapsed < 0.1
+    assert job.done.is_set() and job.error is None and not job.preempted
+
+
+def test_registered_sounds_are_decoded_once(audio, tmp_path):
+    audio.register("beep", _tone(tmp_path / "beep.wav", 0.1))
+    audio.start()
+    sound = audio._sounds["beep"]
+    audio.submit("beep").wait(2)
+    audio.submit("beep").wait(2)
+    assert audio._sounds["beep"] is sound
+
+
+def test_alarm_preempts_tts(audio, tmp_path):
+    audio.register("alarm", _tone(tmp_path / "alarm.wav", 0.2))
+    speech = _tone(tmp_path / "speech.wav", 3.0).read_bytes()
+
+    tts = audio.submit(speech, priority=PRIORITY_TTS)
+    time.sleep(0.2)
+    alarm = audio.submit("alarm", priority=PRIORITY_ALARM)
+
+    assert tts.wait(1.0), "TTS should be cut short by the alarm"
+    assert tts.preempted
+    assert alarm.wait(2.0) and not alarm.preempted
+
+
+def test_stop_all_drops_queue(audio, tmp_path):
+    long_clip = _tone(tmp_path / "long.wav", 3.0)
+    first = audio.submit(long_clip)
+    queued = audio.submit(long_clip)
+    audio.stop_all()
+    assert first.wait(1.0) and queued.wait(1.0)
+    assert queued.preempted
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from chapo_engines.calendar_auth import CredentialManager
+from chapo_engines.calendar_sync import CalendarSync
+from db.calendar_store import CalendarStore
+from tests.test_calendar_mirror import FakeCalendarAPI, _at
+
+
+class FakeOAuth:
+    """Google's device-code and token endpoints on a local port; the user approves after `pending` polls."""
+
+    def __init__(self, pending=2, expires_in=3600):
+        self.pending = pending
+        self.expires_in = expires_in
+        self.requests = []
+        self.issued = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                form = {k: v[0] for k, v in parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode()).items()}
+                fake.requests.append((self.path, form.get("grant_type")))
+                status, body = fake.answer(self.path, form)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, path, form):
+        if path == "/device/code":
+            return 200, {"device_code": "dev-1", "user_code": "ABCD-EFGH", "interval": 0.05,
+                         "verification_url": "https://www.google.com/device", "expires_in": 30}
+        if form.get("grant_type", "").endswith("device_code"):
+            if self.pending:
+                self.pending -= 1
+                return 428, {"error": "authorization_pending"}
+            return 200, self._token(refresh_token="refresh-1")
+        if form.get("grant_type") == "refresh_token" and form.get("refresh_token") == "refresh-1":
+            return 200, self._token()
+        return 400, {"error": "invalid_grant"}
+
+    def _token(self, **extra):
+        self.issued += 1
+        return dict(access_token=f"access-{self.issued}", expires_in=self.expires_in, **extra)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def oauth():
+    server = FakeOAuth()
+    yield server
+    server.close()
+
+
+def _manager(tmp_path, oauth, **kwargs):
+    built, said = [], []
+    manager = CredentialManager(
+        token_file=tmp_path / "token.json", client_id="cid", client_secret="secret",
+        device_auth_url=oauth.url + "/device/code", token_url=oauth.url + "/token",
+        builder=lambda token: built.append(token["access_token"]) or {"service for": token["access_token"]},
+        announce=said.append, **kwargs)
+    return manager, built, said
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_device_flow_runs_in_the_background_and_releases_queued_events(tmp_path, oauth):
+    manager, built, said = _manager(tmp_path, oauth)
+    store = CalendarStore(tmp_path / "calendar.db")
+    api = FakeCalendarAPI()
+    sync = CalendarSync(store, service_factory=lambda: manager.service() and api)
+    manager.on_authorized(sync.sync_once)
+
+    store.add("dentist", _at(2025, 9, 4, 15), _at(2025, 9, 4, 16))
+    start = time.perf_counter()
+    assert sync.push() == 0  # not linked: returns at once, the event stays queued
+    assert time.perf_counter() - start < 0.5 and store.pending() == 1
+    assert _wait_for(lambda: said) and "ABCD-EFGH" in said[0]
+
+    assert _wait_for(lambda: store.pending() == 0)
+    assert said[-1] == "✅ Calendar connected successfully."
+    assert json.loads((tmp_path / "token.json").read_text())["refresh_token"] == "refresh-1"
+    # the service client is built once and reused
+    assert manager.service() is manager.service() and built == ["access-1"]
+    assert [p for p, _ in oauth.requests].count("/device/code") == 1
+
+
+def test_sync_thread_idles_until_google_is_linked(tmp_path):
+    store = CalendarStore(tmp_path / "calendar.db")
+    api = FakeCalendarAPI()
+    linked, calls = [], []
+
+    def service():
+        calls.append(1)
+        return api if linked else None
+
+    sync = CalendarSync(store, service_factory=service, poll_seconds=30)
+    store.add("dentist", _at(2025, 9, 4, 15), _at(2025, 9, 4, 16))
+    sync.start()
+    try:
+        time.sleep(0.2)
+        assert len(calls) <= 4 and store.pending() == 1  # one push + pull, not a spin on the due row
+        linked.append(True)
+        sync.kick()  # what on_authorized does
+        assert _wait_for(lambda: store.pending() == 0)
+    finally:
+        sync.stop()
+
+
+def test_device_flow_is_a_task_on_a_running_loop(tmp_path, oauth):
+    manager, _, _ = _manager(tmp_path, oauth)
+
+    async def scenario():
+        assert manager.service() is None
+        flow = manager.start_device_flow()  # the same flow, not a second one
+        assert isinstance(flow, asyncio.Task)
+        ticks = 0
+        while not flow.done():  # the loop keeps serving other work meanwhile
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return ticks, flow.result()
+
+    ticks, token = asyncio.run(scenario())
+    assert ticks > 1 and token["access_token"] == "access-1"
+    assert manager.service() == {"service for": "access-1"}
+
+
+def test_tokens_are_refreshed_before_they_expire(tmp_path, oauth):
+    (tmp_path / "token.json").write_text(json.dumps(
+        {"access_token": "old", "refresh_token": "refresh-1", "expires_in": 11.2, "created_at": time.time()}))
+    # timer due in 0.2 s; a caller would only refresh by itself from 1.2 s on
+    manager, built, _ = _manager(tmp_path, oauth, refresh_margin=11.0)
+    assert manager.service() == {"service for": "old"}
+
+    assert _wait_for(lambda: manager.token()["access_token"] == "access-1")
+    assert oauth.requests == [("/token", "refresh_token")]  # by the timer, not by a caller
+    assert manager.token()["refresh_token"] == "refresh-1"
+    assert manager.service() == {"service for": "access-1"} and built == ["old", "access-1"]
+    manager.close()
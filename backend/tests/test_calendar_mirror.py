@@ -0,0 +1,233 @@
+import itertools
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from chapo_engines import calendar_engine as calendar_module
+from chapo_engines.calendar_engine import CalendarEngine
+from chapo_engines.calendar_sync import CalendarSync
+from db.calendar_store import CalendarStore
+
+LONDON = pytz.timezone("Europe/London")
+
+
+def _at(*args):
+    return LONDON.localize(datetime(*args))
+
+
+class _Gone(Exception):
+    class resp:
+        status = 410
+
+
+class _Conflict(Exception):
+    class resp:
+        status = 409
+
+
+class _Call:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def execute(self):
+        return self.fn()
+
+
+class FakeCalendarAPI:
+    """
+    events().insert / events().list of the Google Calendar API, in memory:
+    sync tokens are positions in a change log, pages hold `page_size` items,
+    and `fail_inserts` / `lose_responses` / `expire_tokens` simulate outages,
+    inserts that land but whose reply never arrives, and 410 Gone.
+    """
+
+    def __init__(self, page_size=2):
+        self.page_size = page_size
+        self.items = {}
+        self.log = []  # google ids, in change order
+        self.calls = []
+        self.fail_inserts = 0
+        self.lose_responses = 0
+        self.expire_tokens = False
+        self._ids = itertools.count(1)
+
+    def events(self):
+        return self
+
+    def put(self, summary, start, end, google_id=None, status="confirmed"):
+        google_id = google_id or f"g{next(self._ids)}"
+        self.items[google_id] = {
+            "id": google_id, "status": status, "summary": summary, "updated": f"u{len(self.log)}",
+            "start": {"dateTime": start.isoformat()}, "end": {"dateTime": end.isoformat()},
+        }
+        self.log.append(google_id)
+        return self.items[google_id]
+
+    def cancel(self, google_id):
+        self.items[google_id] = {"id": google_id, "status": "cancelled"}
+        self.log.append(google_id)
+
+    def insert(self, calendarId, body):
+        def run():
+            self.calls.append("insert")
+            if self.fail_inserts:
+                self.fail_inserts -= 1
+                raise ConnectionError("calendar unreachable")
+            if body.get("id") in self.items:
+                raise _Conflict("the requested identifier already exists")
+            created = self.put(body["summary"], datetime.fromisoformat(body["start"]["dateTime"]),
+                               datetime.fromisoformat(body["end"]["dateTime"]), google_id=body.get("id"))
+            if self.lose_responses:
+                self.lose_responses -= 1
+                raise TimeoutError("read timed out")
+            return created
+        return _Call(run)
+
+    def list(self, calendarId, showDeleted=False, singleEvents=False, syncToken=None, pageToken=None):
+        def run():
+            self.calls.append(("list", syncToken, pageToken))
+            if syncToken and self.expire_tokens:
+                self.expire_tokens = False
+                raise _Gone("sync token expired")
+            since = int(syncToken) if syncToken else 0
+            changed = list(dict.fromkeys(reversed(self.log[since:])))[::-1]  # latest change per event
+            if not syncToken:
+                changed = [g for g in changed if self.items[g]["status"] != "cancelled"]
+            offset = int(pageToken or 0)
+            page = {"items": [self.items[g] for g in changed[offset:offset + self.page_size]]}
+            if offset + self.page_size < len(changed):
+                page["nextPageToken"] = str(offset + self.page_size)
+            else:
+                page["nextSyncToken"] = str(len(self.log))
+            return page
+        return _Call(run)
+
+
+class _NoThreadSync(CalendarSync):
+    def kick(self):
+        self.kicked = getattr(self, "kicked", 0) + 1
+
+
+def _setup(tmp_path, monkeypatch):
+    spoken = []
+    monkeypatch.setattr(calendar_module, "speak", spoken.append)
+    store = CalendarStore(tmp_path / "calendar.db")
+    api = FakeCalendarAPI()
+    sync = _NoThreadSync(store, service_factory=lambda: api)
+    monkeypatch.setattr(calendar_module, "CALENDAR_FILE", tmp_path / "calendar_events.json")
+    return CalendarEngine(store=store, sync=sync), store, sync, api, spoken
+
+
+def test_add_event_writes_locally_and_only_queues_the_insert(tmp_path, monkeypatch):
+    engine, store, sync, api, spoken = _setup(tmp_path, monkeypatch)
+    engine.add_event("add dentist to my calendar tomorrow at 3 pm")
+
+    assert api.calls == [] and sync.kicked == 1 and store.pending() == 1
+    assert spoken and "dentist" in spoken[-1]
+    assert engine.whats_on("what's on my calendar tomorrow").startswith("📅 Tomorrow you have: dentist at 03:00 PM")
+
+
+def test_outbox_retries_with_backoff_then_pushes_once(tmp_path, monkeypatch):
+    engine, store, sync, api, _ = _setup(tmp_path, monkeypatch)
+    event_id = store.add("standup", _at(2025, 9, 2, 9, 30), _at(2025, 9, 2, 9, 45))
+    api.fail_inserts = 1
+
+    now = time.time()
+    assert sync.push(now) == 0
+    assert store.pending() == 1 and store.seconds_until_next_push(now) == 5.0
+    assert sync.push(now + 1) == 0 and api.calls == ["insert"]  # not due yet
+    assert sync.push(now + 5) == 1 and store.pending() == 0
+
+    pushed = store.get(event_id)
+    assert pushed["synced"] and api.items[pushed["google_id"]]["summary"] == "standup"
+    # the pushed event comes back in the next pull without being duplicated
+    sync.pull()
+    assert [e["summary"] for e in store.between(_at(2025, 9, 2), _at(2025, 9, 3))] == ["standup"]
+
+
+def test_retry_after_a_lost_response_does_not_duplicate_the_event(tmp_path, monkeypatch):
+    engine, store, sync, api, _ = _setup(tmp_path, monkeypatch)
+    event_id = store.add("dentist", _at(2025, 9, 4, 15), _at(2025, 9, 4, 16))
+    api.lose_responses = 1
+
+    now = time.time()
+    assert sync.push(now) == 0 and len(api.items) == 1  # Google has it; we don't know yet
+    assert sync.push(now + 5) == 1 and store.pending() == 0
+    assert api.calls == ["insert", "insert"] and len(api.items) == 1
+    assert store.get(event_id)["google_id"] in api.items
+
+    sync.pull()
+    assert [e["summary"] for e in store.between(_at(2025, 9, 4), _at(2025, 9, 5))] == ["dentist"]
+
+
+def test_pushed_event_ids_are_per_device(tmp_path):
+    store = CalendarStore(tmp_path / "calendar.db")
+    other = CalendarStore(tmp_path / "other.db")
+    assert store.device_key() == CalendarStore(tmp_path / "calendar.db").device_key()
+    assert store.device_key() != other.device_key()
+
+
+def test_claimed_outbox_rows_are_not_sent_twice(tmp_path):
+    store = CalendarStore(tmp_path / "calendar.db")
+    store.add("gym", _at(2025, 9, 3, 18), _at(2025, 9, 3, 19))
+    other = CalendarStore(tmp_path / "calendar.db")  # a second worker on the same file
+    assert len(store.claim_outbox(now=10.0 ** 10)) == 1
+    assert other.claim_outbox(now=10.0 ** 10) == []
+
+
+def test_incremental_pull_applies_only_changes(tmp_path, monkeypatch):
+    engine, store, sync, api, _ = _setup(tmp_path, monkeypatch)
+    day = _at(2025, 9, 5)
+    a = api.put("breakfast", day + timedelta(hours=8), day + timedelta(hours=9))["id"]
+    b = api.put("lunch", day + timedelta(hours=12), day + timedelta(hours=13))["id"]
+    api.put("dinner", day + timedelta(hours=19), day + timedelta(hours=21))
+
+    assert sync.pull() == 3  # full sync over two pages
+    api.calls.clear()
+    api.put("brunch", day + timedelta(hours=10), day + timedelta(hours=11), google_id=a)
+    api.cancel(b)
+    assert sync.pull() == 2
+    assert api.calls == [("list", "3", None)]
+    assert [e["summary"] for e in engine.events_on(day.date())] == ["brunch", "dinner"]
+
+    # 410 Gone: drop the token and resync from scratch
+    api.expire_tokens = True
+    sync.pull()
+    assert api.calls[-2:] == [("list", "5", None), ("list", None, None)]
+    assert [e["summary"] for e in engine.events_on(day.date())] == ["brunch", "dinner"]
+    assert store.sync_token() == "5"
+
+
+def test_overlap_queries_use_the_interval_index(tmp_path):
+    store = CalendarStore(tmp_path / "calendar.db")
+    store.add("overnight", _at(2025, 9, 5, 22), _at(2025, 9, 6, 2))
+    store.add("morning", _at(2025, 9, 6, 9), _at(2025, 9, 6, 10))
+    store.add("ends at midnight", _at(2025, 9, 5, 23), _at(2025, 9, 6, 0))
+    store.add("next day", _at(2025, 9, 7, 0), _at(2025, 9, 7, 1))
+
+    day = [e["summary"] for e in store.between(_at(2025, 9, 6), _at(2025, 9, 7))]
+    assert day == ["overnight", "morning"]  # touching either edge is not an overlap
+    plan = " ".join(r[-1] for r in store.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT e.* FROM calendar_span s JOIN calendar_events e ON e.id = s.id "
+        "WHERE s.start_at <= ? AND s.end_at >= ?", (1, 0)))
+    assert "SCAN s VIRTUAL TABLE INDEX" in plan  # the R*Tree answers the range test
+
+
+def test_workers_starting_together_migrate_once(tmp_path, monkeypatch):
+    legacy = tmp_path / "calendar_events.json"
+    legacy.write_text(json.dumps([{"name": "dentist", "start": "2025-09-06T09:00:00", "end": "2025-09-06T10:00:00"}]))
+    # every worker passes the quick pre-check before any of them has committed
+    monkeypatch.setattr(CalendarStore, "has_migrated", lambda self, name: False)
+    stores = [CalendarStore(tmp_path / "calendar.db") for _ in range(4)]
+    results = []
+    threads = [threading.Thread(target=lambda s=s: results.append(s.migrate_json("calendar_events.json", legacy)))
+               for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [0, 0, 0, 1]
+    assert stores[0].conn.execute("SELECT COUNT(*) FROM calendar_events").fetchone()[0] == 1
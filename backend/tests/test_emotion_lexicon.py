@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from chapo_engines.emotion_detector_engine import EmotionDetectorEngine
+from chapo_engines.emotion_lexicon import EmotionLexicon, get_lexicon
+from chapo_engines.utterance import Utterance
+
+# (utterance, expected emotion): the voice-loop phrasings the old substring scan got right,
+# plus the ones it got wrong (inside other words, negation, volume "down")
+LABELLED = [
+    ("I'm so sad today", "sad"),
+    ("I feel really lonely", "sad"),
+    ("I've been feeling down all week", "sad"),
+    ("feeling blue today", "sad"),
+    ("I'm depressed", "sad"),
+    ("I'm so happy right now", "happy"),
+    ("that's awesome, thanks", "happy"),
+    ("I'm excited for the weekend", "happy"),
+    ("I am not happy with this", "neutral"),
+    ("I'm really angry with my brother", "angry"),
+    ("I'm fed up with this weather", "angry"),
+    ("I'm so tired", "tired"),
+    ("I'm exhausted after work", "tired"),
+    ("I'm worried about my exam", "anxious"),
+    ("I feel nervous and stressed", "anxious"),
+    ("I'm not worried at all", "neutral"),
+    ("I don't feel sad anymore", "neutral"),
+    ("I'm fine thanks", "neutral"),
+    ("download the new update", "neutral"),
+    ("turn the volume down", "neutral"),
+    ("I made a cake", "neutral"),
+    ("what's the weather in Bluewater", "neutral"),
+    ("set an alarm for seven", "neutral"),
+    ("I'm happy but a bit tired", "happy"),
+    ("I'm a bit happy but really tired", "tired"),
+    ("madness, the news today", "neutral"),
+    ("I'm not tired, I'm angry", "angry"),
+]
+
+
+@pytest.mark.parametrize("text,expected", LABELLED)
+def test_lexicon_labels(text, expected):
+    assert get_lexicon().label(text) == expected
+
+
+def test_scores_carry_weights_negation_and_intensity():
+    scores = get_lexicon().scores("I'm not happy, just really tired")
+    assert scores["happy"] < 0 and scores["tired"] == 1.5
+    assert get_lexicon().scores("I'm furious")["angry"] > get_lexicon().scores("I'm annoyed")["angry"]
+    # the negation reaches only the next hit, within a few words
+    assert get_lexicon().label("no, I'm sad") == "neutral"
+    assert get_lexicon().label("no problem at all, but I'm sad") == "sad"
+
+
+def test_batch_matches_one_at_a_time():
+    texts = [t for t, _ in LABELLED] + ["", Utterance("I'm SO glad!")]
+    labels, matrix = get_lexicon().detect_batch(texts)
+    assert labels == [get_lexicon().label(t) for t in texts]
+    assert matrix.shape == (len(texts), 5)
+    assert matrix[-1].tolist() == get_lexicon().vector(texts[-1])
+    assert get_lexicon().detect_batch([])[0] == []
+
+
+def test_custom_lexicon_and_phrases():
+    lexicon = EmotionLexicon({"calm": {"chilled out": 2.0, "calm": 1.0}, "sad": {"sad": 1.0}})
+    assert lexicon.scores("totally chilled out") == {"calm": 2.0, "sad": 0.0}
+    assert lexicon.label("sad") == "sad"
+
+
+def test_history_is_per_session_and_bounded():
+    engine = EmotionDetectorEngine(history_len=3, max_sessions=2)
+    for text in ["I'm sad", "I'm tired", "I'm happy", "I'm angry"]:
+        engine.detect_emotion(text, "alice")
+    assert list(engine.history("alice")) == ["tired", "happy", "angry"]
+    engine.detect_emotion("I'm worried", "bob")
+    assert engine.current("bob") == "anxious" and engine.current_emotion == "neutral"
+
+    engine.detect_emotion("hello", "carol")  # a third session evicts the least recently used
+    assert "alice" not in engine._sessions and list(engine.history("bob")) == ["anxious"]
+
+    state = json.loads(json.dumps(engine.to_state("bob")))
+    restored = EmotionDetectorEngine.from_state(state)
+    assert restored.current_emotion == "anxious" and list(restored.emotion_history) == ["anxious"]
+    assert restored.generate_emotion_response()
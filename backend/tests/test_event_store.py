@@ -0,0 +1,76 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.event_store import (
+    MAX_BUCKET_EVENTS, EventStore, emotion_update, field_key, interaction_update, rollup_pipeline,
+)
+
+T0 = datetime(2025, 9, 3, 10, 15, 42, 123000)
+
+
+def test_interactions_go_into_per_session_minute_buckets():
+    filt, update = interaction_update({"session_id": "s1", "user_input": "hi", "intent": "greet", "timestamp": T0},
+                                      retention_days=30)
+    assert filt == {"session_id": "s1", "start": datetime(2025, 9, 3, 10, 15), "count": {"$lt": MAX_BUCKET_EVENTS}}
+    assert update["$push"]["events"] == {"user_input": "hi", "intent": "greet", "timestamp": T0}
+    assert update["$inc"] == {"count": 1, "intents.greet": 1}
+    assert update["$setOnInsert"]["expires_at"] == datetime(2025, 10, 3, 10, 15)
+
+    _, update = interaction_update({"intent": "weather.get"})
+    assert update["$inc"] == {"count": 1, "intents.weather_get": 1} and "timestamp" in update["$push"]["events"]
+    assert field_key("$where") == "_where" and field_key(None) == "unknown"
+
+
+def test_emotion_seconds_count_their_samples():
+    second = {"timestamp": T0.replace(microsecond=0), "samples": 5, "counts": {"happy": 4, "sad": 1},
+              "dominant": "happy"}
+    filt, update = emotion_update(second)
+    assert filt["session_id"] == "camera" and filt["start"] == datetime(2025, 9, 3, 10, 15)
+    assert update["$inc"] == {"count": 1, "counts.happy": 4, "counts.sad": 1, "samples": 5}
+
+
+def test_rollup_recomputes_whole_hours_idempotently():
+    pipeline = rollup_pipeline("intent", datetime(2025, 9, 3, 9), datetime(2025, 9, 3, 11))
+    assert pipeline[0] == {"$match": {"start": {"$gte": datetime(2025, 9, 3, 9), "$lt": datetime(2025, 9, 3, 11)}}}
+    assert pipeline[1]["$project"]["pairs"] == {"$objectToArray": "$intents"}
+    assert pipeline[-1]["$merge"]["whenMatched"] == "replace"
+    assert rollup_pipeline("emotion", T0, T0)[1]["$project"]["pairs"] == {"$objectToArray": "$counts"}
+
+
+@pytest.fixture
+def mongo_db():
+    pymongo = pytest.importorskip("pymongo")
+    client = pymongo.MongoClient(os.getenv("CHAPO_TEST_MONGO_URI", "mongodb://localhost:27017"),
+                                 serverSelectionTimeoutMS=300)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        pytest.skip("no mongod to test against")
+    name = f"chapo_test_{os.getpid()}"
+    yield client[name]
+    client.drop_database(name)
+
+
+def test_buckets_rollups_and_queries_against_mongo(mongo_db):
+    store = EventStore(mongo_db)
+    logs = [{"session_id": f"s{i % 3}", "intent": "greet" if i % 4 else "get_weather", "user_input": f"u{i}",
+             "timestamp": T0 + timedelta(seconds=5 * i)} for i in range(600)]  # 50 minutes, 3 sessions
+    store.record_interactions(logs[:-1])
+    store.record_interaction(logs[-1])
+    store.record_emotions([{"timestamp": T0, "samples": 3, "counts": {"happy": 2, "sad": 1}, "dominant": "happy"}])
+
+    buckets = mongo_db["interaction_buckets"]
+    assert buckets.count_documents({}) == 153 and sum(b["count"] for b in buckets.find()) == 600  # 51 minutes x 3
+    assert store.recent("s2", limit=2)[0]["user_input"] == "u599"
+    assert store.find_event("s0", logs[3]["timestamp"])["user_input"] == "u3"
+
+    store.rollup(T0, T0 + timedelta(hours=4))
+    store.rollup(T0, T0 + timedelta(hours=4))  # re-running replaces, doesn't double
+    hours = store.hourly_counts("intent", T0 - timedelta(hours=1), T0 + timedelta(hours=4))
+    assert [(h["hour"].hour, h["total"]) for h in hours] == [(10, 532), (11, 68)]
+    assert store.totals("intent", T0, T0 + timedelta(hours=4)) == {"greet": 450, "get_weather": 150}
+    assert store.top("emotion", T0, T0 + timedelta(hours=1)) == [("happy", 2), ("sad", 1)]
+    ttl = [i for i in buckets.list_indexes() if "expireAfterSeconds" in i]
+    assert ttl and ttl[0]["key"] == {"expires_at": 1}
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from chapo_engines.face_pipeline import (
+    BoxTracker, BulkWriter, EmotionBuckets, FacePipeline, LatestFrame, SyntheticDetector, SyntheticSource,
+    downscale, iou,
+)
+
+
+def test_latest_frame_keeps_only_the_newest():
+    slot = LatestFrame()
+    for frame in range(3):
+        slot.put(frame)
+    assert slot.take() == 2 and slot.dropped == 2 and slot.captured == 3
+    assert slot.take(timeout=0.01) is None and not slot.closed
+
+    threading.Timer(0.05, slot.close).start()
+    assert slot.take() is None and slot.closed  # woken by close, not a timeout
+
+
+def test_tracker_carries_boxes_between_detections():
+    tracker = BoxTracker()
+    tracker.update(0, [{"box": (100, 100, 50, 50), "emotion": "happy", "confidence": 0.9}])
+    tracker.update(5, [{"box": (110, 105, 50, 50), "emotion": "happy", "confidence": 0.8}])
+    assert tracker.predict(8) == [((116, 108, 50, 50), "happy", 0.8)]  # 2 px/frame right, 1 down
+
+    tracker.update(10, [{"box": (400, 300, 50, 50), "emotion": "sad", "confidence": 0.7}])
+    assert len(tracker.tracks) == 2  # no overlap: a second face
+    tracker.update(10 + 31, [])
+    assert tracker.predict(41) == []  # both unseen for too long
+    assert iou((0, 0, 10, 10), (5, 0, 10, 10)) == pytest.approx(1 / 3)
+
+
+def test_buckets_write_finished_seconds_in_bulk():
+    batches = []
+    writer = BulkWriter(batches.append)
+    buckets = EmotionBuckets(writer)
+    for ts, emotion, conf in [(100.1, "happy", 0.9), (100.5, "happy", 0.7), (100.9, "sad", 0.6),
+                              (101.2, "sad", 0.8), (103.0, "happy", 1.0)]:
+        buckets.add(ts, emotion, conf)
+    buckets.flush()
+    writer.close()
+
+    assert [len(b) for b in batches] == [1, 1, 1]  # one insert per finished second, none per sample
+    first = batches[0][0]
+    assert first["samples"] == 3 and first["counts"] == {"happy": 2, "sad": 1}
+    assert first["confidence"]["happy"] == 0.8 and first["dominant"] == "happy"
+    assert first["timestamp"].timestamp() == pytest.approx(100, abs=86400)  # naive UTC, as before
+    assert writer.written == 3
+
+
+def test_synthetic_detector_finds_faces_on_downscaled_frames():
+    source = SyntheticSource(seconds=1, faces=2, realtime=False)
+    frame = next(iter(source))
+    small, step = downscale(frame, 0.5)
+    assert small.shape == (240, 320, 3) and step == 2
+    found = SyntheticDetector().detect(small)
+    truth = source.boxes(0)
+    assert len(found) == 2
+    boxes = sorted(tuple(v * step for v in r["box"]) for r in found)
+    for (x, y, w, h), (tx, ty, tw, th) in zip(boxes, sorted(b for _, b in truth)):
+        assert iou((x, y, w, h), (tx, ty, tw, th)) > 0.9
+
+
+def test_pipeline_runs_headless_with_a_worker_process():
+    seen = []
+    pipeline = FacePipeline(detector=SyntheticDetector(cost_s=0.01), every=3, scale=0.5,
+                            write_many=seen.extend, on_frame=lambda frame, faces: seen.append(len(faces)) or True)
+    try:
+        stats = pipeline.run(SyntheticSource(seconds=1.5, fps=30, faces=2))
+    finally:
+        pipeline.shutdown()
+
+    assert stats["processed"] + stats["dropped"] == stats["captured"] == 45
+    assert stats["detections"] >= 10 and stats["faces"] == 2 * stats["detections"]
+    assert stats["fps"] > 20 and stats["cpu_percent"] > 0
+    docs = [d for d in seen if isinstance(d, dict)]
+    assert docs and stats["buckets_written"] == len(docs)
+    assert sum(d["samples"] for d in docs) == stats["faces"]
+    assert {e for d in docs for e in d["counts"]} == {"angry", "disgust"}
+    assert max(n for n in seen if isinstance(n, int)) == 2  # tracked faces reach every frame
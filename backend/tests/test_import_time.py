@@ -0,0 +1,65 @@
+"""
+Import-time profile (python -X importtime) for the entry points.
+
+Each check runs in a fresh interpreter, prints the slowest imports and
+fails if the module goes over its budget or drags in a heavy dependency
+that should only load on first use (see chapo_engines/registry.py).
+Run with -s to see the report.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND = Path(__file__).resolve().parent.parent
+COLD_START_TARGET_S = float(os.getenv("CHAPO_COLD_START_TARGET_S", "2.0"))  # FastAPI app
+ROUTER_IMPORT_BUDGET_S = 1.0
+HEAVY = ["spacy", "transformers", "torch", "elevenlabs", "openai", "googleapiclient", "pymongo", "wikipedia"]
+
+
+def import_profile(module, forbid=()):
+    """(total seconds, [(cumulative us, self us, name)], heavy modules loaded) for `import module`."""
+    code = (
+        f"import sys, {module}\n"
+        f"print(','.join(m for m in {list(forbid)!r} if m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(BACKEND), str(BACKEND.parent)]),
+               CHAPO_TRACE_EXPORT="none")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND,
+                          env=env, capture_output=True, text=True, timeout=120)
+    if proc.returncode != 0:
+        last = proc.stderr.strip().splitlines()[-1]
+        pytest.skip(f"{module} is not importable here: {last}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    total = next(c for c, _, name in rows if name.strip() == module)
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return total / 1e6, rows, loaded
+
+
+def report(module, total, rows, top=15):
+    print(f"\n{module}: {total * 1000:.0f} ms")
+    for cumulative, own, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  (self {own / 1000:6.1f})  {name}")
+
+
+def test_intent_router_imports_without_models():
+    total, rows, loaded = import_profile("intent.intent_router", forbid=HEAVY)
+    report("intent.intent_router", total, rows)
+    assert loaded == [], f"imported eagerly: {loaded}"
+    assert total < ROUTER_IMPORT_BUDGET_S
+
+
+def test_fastapi_app_cold_start():
+    total, rows, loaded = import_profile("backend.main", forbid=HEAVY)
+    report("backend.main", total, rows)
+    assert loaded == [], f"imported eagerly: {loaded}"
+    assert total < COLD_START_TARGET_S, f"cold start {total:.2f}s > target {COLD_START_TARGET_S}s"
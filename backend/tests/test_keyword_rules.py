@@ -0,0 +1,47 @@
+from benchmarks.bench_keyword_rules import clean, legacy_fallbacks, load_utterances
+from chapo_engines.keyword_rules import KeywordMatcher, command_intent, fallback_rules
+
+# no intent, unsure, between the guard thresholds, confident, and the odd "unknown" with high confidence
+NLU_OUTCOMES = [(None, 0.0), ("", 0.3), ("greeting", 0.55), ("greeting", 0.65), ("help", 0.72),
+                ("what_can_you_do", 0.8), ("unknown", 0.9), ("get_weather", 0.95)]
+
+
+def test_rule_table_matches_the_old_fallback_blocks_on_the_training_csv():
+    rules = fallback_rules()
+    mismatches = [
+        (text, intent, confidence)
+        for text in map(clean, load_utterances())
+        for intent, confidence in NLU_OUTCOMES
+        if rules.resolve(text, intent, confidence)[0] != legacy_fallbacks(text, intent, confidence)
+    ]
+    assert mismatches == []
+
+
+def test_one_scan_returns_every_matching_rule():
+    rules = fallback_rules()
+    matched = [r.name for r in rules.matches("add the latest news quiz to my shopping list and set an alarm")]
+    assert matched == ["NEWS", "GET SHOPPING LIST", "ADD TO SHOPPING", "TRIVIA", "ALARM", "ALARM PHRASE", "MATH"]
+
+    intent, fired = rules.resolve("add milk to my shopping list and remove eggs", None, 0.0)
+    # only the top rule of the shopping chain fires; "add" is also a math word, and the later rule wins as before
+    assert [r.name for r in fired] == ["ADD TO SHOPPING", "MATH"] and intent == "get_fact"
+    # a confident intent only yields to an explicit alarm phrase
+    assert rules.resolve("wake me up with the news", "get_news", 0.9) == ("set_alarm", [rules.rules[7]])
+    assert rules.resolve("read me the news", "get_news", 0.9) == ("get_news", [])
+
+
+def test_matcher_finds_overlapping_and_prefix_keywords():
+    matcher = KeywordMatcher(["add", "add to calendar", "news", "latest news", "to cal"])
+    assert matcher.find("please add to calendar the latest news") == {
+        "add", "add to calendar", "to cal", "news", "latest news"}
+    assert matcher.find("nothing here") == set()
+
+
+def test_command_rules_match_whole_words_and_share_the_fallback_intents():
+    assert command_intent("please clear my shopping list") == "clear_shopping_list"
+    assert command_intent("whats on my shopping list") == "get_shopping_list"
+    assert command_intent("set alarm for seven") == "set_alarm"
+    assert command_intent("reset alarm") is None and command_intent("quiz mel") is None
+    fallback_intents = {r.intent for r in fallback_rules().rules}
+    for text in ["clear my shopping list", "whats on my shopping list", "set an alarm", "play trivia", "top news"]:
+        assert command_intent(text) in fallback_intents
@@ -0,0 +1,104 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # backend.* imports
+
+from backend.services import nlp  # noqa: E402
+from chapo_engines.nlu_cascade import (  # noqa: E402
+    ExactStage, KeywordStage, LocalModelStage, NearestUtteranceModel, NLUCascade, WitStage, parse_stages,
+)
+
+
+class CountingWit:
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return self.answers.get(text, (None, 0.0, {}))
+
+
+def _cascade(wit):
+    model = NearestUtteranceModel({
+        "get_weather": ["what's the weather like today", "will it rain tomorrow"],
+        "tell_joke": ["tell me something funny"],
+    })
+    return NLUCascade([
+        ExactStage(0.9, known={"hello chapo": "greeting"}),
+        KeywordStage(0.8),
+        LocalModelStage(0.8, model),
+        WitStage(0.7, wit),
+    ])
+
+
+def test_cheapest_confident_stage_answers():
+    wit = CountingWit({"book a table for two": ("book_table", 0.95, {})})
+    nlu = _cascade(wit)
+
+    assert nlu.resolve("Hello, Chapo!").stage == "exact"
+    assert nlu.resolve("please tell me a joke").stage == "keywords"
+    local = nlu.resolve("What's the weather like today?")
+    assert (local.intent, local.stage) == ("get_weather", "local")
+    assert wit.calls == []
+
+    intent, confidence, entities = remote = nlu.resolve("book a table for two")
+    assert (intent, remote.stage, remote.confident) == ("book_table", "wit", True)
+    stats = nlu.stats()
+    assert stats["answered_by"] == {"exact": 1, "keywords": 1, "local": 1, "wit": 1}
+    assert stats["remote_calls"] == 1 and stats["remote_avoided_pct"] == 75.0
+
+
+def test_confident_remote_answers_are_cached_unless_time_bound():
+    wit = CountingWit({
+        "book a table for two": ("book_table", 0.95, {}),
+        "remind me in ten minutes": ("set_reminder", 0.9, {"wit$datetime:datetime": [{"value": "..."}]}),
+    })
+    nlu = _cascade(wit)
+    for _ in range(3):
+        nlu.resolve("book a table for two")
+        nlu.resolve("remind me in ten minutes")
+    assert wit.calls.count("book a table for two") == 1
+    assert wit.calls.count("remind me in ten minutes") == 3
+    assert nlu.resolve("Book a table for two!").stage == "exact"
+
+
+def test_local_answers_carry_the_slots_their_intent_needs():
+    wit = CountingWit({"set an alarm please": ("set_alarm", 0.9, {"wit$datetime:datetime": [{"value": "wit"}]})})
+    nlu = NLUCascade([
+        ExactStage(0.9, known={"whats the weather in paris": "get_weather"}),
+        KeywordStage(0.8),
+        WitStage(0.7, wit),
+    ])
+
+    for text, body in [("set an alarm for 7 am", "7 am"), ("wake me up at 7 am", "at 7 am")]:
+        intent, _, entities = prediction = nlu.resolve(text)
+        assert (intent, prediction.stage) == ("set_alarm", "keywords")
+        [slot] = entities["wit$datetime:datetime"]
+        assert slot["body"] == body and slot["value"][11:16] == "07:00"
+    weather = nlu.resolve("What's the weather in Paris?")
+    assert (weather.stage, weather.entities) == ("exact", {"wit$location": [{"value": "Paris"}]})
+    assert wit.calls == []
+
+    # no time the local parser can read: Wit fills the slot
+    alarm = nlu.resolve("set an alarm please")
+    assert (alarm.stage, alarm.entities) == ("wit", {"wit$datetime:datetime": [{"value": "wit"}]})
+    assert wit.calls == ["set an alarm please"]
+
+
+def test_best_guess_when_no_stage_is_confident():
+    wit = CountingWit({"mumble": ("greeting", 0.4, {})})
+    prediction = _cascade(wit).resolve("mumble")
+    assert (prediction.intent, prediction.stage, prediction.confident) == ("greeting", "wit", False)
+    assert _cascade(wit).resolve("  ?! ").stage is None
+
+
+def test_stage_spec_and_shared_route_cascade(monkeypatch):
+    assert parse_stages("exact:0.9, wit:0.65,local") == [("exact", 0.9), ("wit", 0.65), ("local", 0.0)]
+
+    monkeypatch.setenv("CHAPO_NLU_STAGES", "keywords:0.8,wit:0.7")
+    monkeypatch.setattr(nlp, "_cascade", None)
+    monkeypatch.setattr(nlp, "get_intent_from_wit", lambda text: ("get_weather", 0.8, {}))
+    assert [s.name for s in nlp.get_cascade().stages] == ["keywords", "wit"]
+    assert nlp.get_intent("is it sunny").stage == "wit"
+    assert nlp.get_intent("what's the time").stage == "keywords"
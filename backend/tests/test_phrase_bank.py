@@ -0,0 +1,68 @@
+import json
+import threading
+
+from chapo_engines.phrase_bank import (
+    PhraseBank, bank_coverage, build_phrase_bank, collect_static_phrases
+)
+
+SETTINGS = ("voice", "model", "pcm_22050")
+
+
+def _fake_synth():
+    calls = []
+    lock = threading.Lock()
+
+    def synthesize(text):
+        with lock:
+            calls.append(text)
+        return text.encode("utf-8")
+
+    return synthesize, calls
+
+
+def test_collects_all_static_sources():
+    phrases = collect_static_phrases()
+    assert "Goodbye!" in phrases                                  # test_voice loop
+    assert "I didn't catch anything. Could you please repeat?" in phrases
+    assert "Hello! How can I help you today?" in phrases          # CoreConversationEngine
+    assert "Accessibility mode is now on!" in phrases             # INTENT_RESPONSES
+    assert "unknown" not in phrases
+    assert len(phrases) == len(set(phrases))
+
+
+def test_build_is_incremental(tmp_path):
+    synthesize, calls = _fake_synth()
+    made, reused, removed = build_phrase_bank(synthesize, *SETTINGS, directory=tmp_path,
+                                              phrases=["Goodbye!", "Volume muted."])
+    assert (made, reused, removed) == (2, 0, 0)
+
+    made, reused, removed = build_phrase_bank(synthesize, *SETTINGS, directory=tmp_path,
+                                              phrases=["Goodbye!", "I'm awake again."])
+    assert (made, reused, removed) == (1, 1, 1)
+    assert sorted(calls) == ["Goodbye!", "I'm awake again.", "Volume muted."]
+
+    bank = PhraseBank(tmp_path)
+    assert bank.lookup("Goodbye!", *SETTINGS) == b"Goodbye!"
+    assert bank.lookup("Goodbye!", "other-voice", "model", "pcm_22050") is None
+    assert bank.lookup("Volume muted.", *SETTINGS) is None
+
+
+def test_failed_synthesis_is_left_out_of_manifest(tmp_path):
+    def synthesize(text):
+        if text == "boom.":
+            raise RuntimeError("network down")
+        return b"ok"
+
+    made, _, _ = build_phrase_bank(synthesize, *SETTINGS, directory=tmp_path, phrases=["fine.", "boom."])
+    assert made == 1
+    assert "boom." not in PhraseBank(tmp_path)
+
+
+def test_bank_coverage_counts_logged_turns(tmp_path):
+    log = tmp_path / "session_logs.json"
+    log.write_text("\n".join(json.dumps(r) for r in [
+        {"response": "Goodbye!"},
+        {"response": "The weather in London is Sunny."},
+        {"response": ""},
+    ]))
+    assert bank_coverage(["Goodbye!"], log_files=[log]) == (1, 2)
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from chapo_engines.registry import EngineRegistry
+
+
+class SlowEngine:
+    built = 0
+
+    def __init__(self):
+        time.sleep(0.05)
+        SlowEngine.built += 1
+
+    def answer(self):
+        return "42"
+
+
+def test_lazy_proxy_builds_once_on_first_use():
+    SlowEngine.built = 0
+    registry = EngineRegistry()
+    registry.register("slow", SlowEngine)
+    engine = registry.lazy("slow")
+    assert SlowEngine.built == 0 and not registry.is_built("slow")
+
+    threads = [threading.Thread(target=engine.answer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert SlowEngine.built == 1
+    assert engine.answer() == "42"
+    assert registry.stats()["slow"]["build_s"] >= 0.05
+
+
+def test_dotted_paths_and_callable_models():
+    registry = EngineRegistry()
+    registry.register("weather", "chapo_engines.weather_engine:WeatherEngine")
+    registry.register("model", lambda: (lambda text: text.upper()))
+    assert type(registry.get("weather")).__name__ == "WeatherEngine"
+    assert registry.lazy("model")("hi") == "HI"
+
+
+def test_warm_up_skips_cold_entries_and_logs_failures():
+    registry = EngineRegistry()
+    registry.register("ok", SlowEngine)
+    registry.register("cold", SlowEngine, warm=False)
+    registry.register("broken", "chapo_engines.no_such_module:Engine")
+
+    failed = registry.warm_up()
+
+    assert registry.is_built("ok")
+    assert not registry.is_built("cold")
+    assert set(failed) == {"broken"}
@@ -0,0 +1,42 @@
+import asyncio
+import sys
+import time
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # backend.* imports
+
+from backend.services import responder  # noqa: E402
+from db.session_store import SessionMemory, SessionStore  # noqa: E402
+
+
+def test_trivia_state_survives_between_turns(monkeypatch):
+    memory = SessionMemory("memory", ttl_seconds=60, store=SessionStore(":memory:"))
+    monkeypatch.setattr(responder, "session_memory", memory)
+
+    questions = []
+    for _ in range(6):
+        questions.append(responder.respond("play_trivia", {}, "alice", "play trivia"))
+    assert len(set(questions)) == 6  # the deck is saved, so nothing repeats
+
+    answer = memory["alice"]["pending_trivia_answer"]["answer"]
+    assert responder.respond("answer_trivia", {}, "alice", answer).startswith("🎉 Correct!")
+    assert responder.respond("answer_trivia", {}, "alice", answer).startswith("❗ No trivia question")
+    assert responder.respond("answer_trivia", {}, "bob", answer).startswith("❗ No trivia question")
+
+
+def test_alarms_set_through_sync_respond_outlive_the_call(monkeypatch):
+    fired = []
+
+    async def set_alarm(text, entities, session_id, context):
+        async def ring():
+            await asyncio.sleep(0.05)
+            fired.append(session_id)
+        asyncio.get_running_loop().create_task(ring())
+        return {"text": "Alarm set in 0 seconds"}
+
+    monkeypatch.setattr(responder, "alarm_engine", types.SimpleNamespace(set_alarm=set_alarm))
+    assert responder.respond("set_alarm", {}, "carol", "wake me up") == "Alarm set in 0 seconds"
+    assert fired == []
+    time.sleep(0.2)
+    assert fired == ["carol"]
@@ -0,0 +1,128 @@
+import asyncio
+import datetime
+import json
+import threading
+
+import pytz
+
+from db.schedule_store import ScheduleStore
+
+BST = pytz.timezone("Europe/London")
+
+
+def _in(minutes):
+    return datetime.datetime.now(BST) + datetime.timedelta(minutes=minutes)
+
+
+def test_next_due_and_list_for_session(tmp_path):
+    store = ScheduleStore(tmp_path / "s.db")
+    store.add("alarm", _in(30), session_id="alice")
+    first = store.add("reminder", _in(5), session_id="bob", task="call mum")
+    store.add("reminder", _in(60), session_id="alice", task="gym")
+
+    due = store.next_due(2)
+    assert [d["id"] for d in due][0] == first
+    assert len(due) == 2
+
+    alice = store.list_for_session("alice", "reminder")
+    assert [r["task"] for r in alice] == ["gym"]
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    store = ScheduleStore(tmp_path / "s.db")
+    plan = " ".join(
+        r[-1] for r in store.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM schedules WHERE fired = 0 AND due_at > ? ORDER BY due_at LIMIT 5", (0,)
+        )
+    )
+    assert "idx_schedules_pending" in plan
+    plan = " ".join(
+        r[-1] for r in store.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM schedules WHERE session_id = ? AND kind = ? ORDER BY due_at", ("a", "alarm")
+        )
+    )
+    assert "idx_schedules_session" in plan
+
+
+def test_purge_past_removes_fired_and_expired(tmp_path):
+    store = ScheduleStore(tmp_path / "s.db")
+    old = store.add("alarm", _in(-10))
+    fired = store.add("alarm", _in(10))
+    keep = store.add("alarm", _in(20))
+    store.mark_fired(fired)
+
+    assert store.purge_past() == 2
+    assert store.get(old) is None and store.get(fired) is None
+    assert store.get(keep) is not None
+
+
+def test_json_migration_runs_once(tmp_path):
+    legacy = tmp_path / "alarms.json"
+    legacy.write_text(json.dumps([_in(10).isoformat(), _in(20).isoformat()]))
+    store = ScheduleStore(tmp_path / "s.db")
+
+    def rows(data):
+        for s in data:
+            yield "alarm", datetime.datetime.fromisoformat(s), "default", None
+
+    assert store.migrate_json("alarms.json", legacy, rows) == 2
+    assert store.migrate_json("alarms.json", legacy, rows) == 0
+    assert len(store.list_pending("alarm")) == 2
+
+
+def test_workers_starting_together_migrate_once(tmp_path, monkeypatch):
+    legacy = tmp_path / "alarms.json"
+    legacy.write_text(json.dumps([_in(10).isoformat(), _in(20).isoformat()]))
+
+    def rows(data):
+        for s in data:
+            yield "alarm", datetime.datetime.fromisoformat(s), "default", None
+
+    # every worker passes the quick pre-check before any of them has committed
+    monkeypatch.setattr(ScheduleStore, "has_migrated", lambda self, name: False)
+    stores = [ScheduleStore(tmp_path / "s.db") for _ in range(4)]
+    results = []
+    threads = [threading.Thread(target=lambda s=s: results.append(s.migrate_json("alarms.json", legacy, rows)))
+               for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [0, 0, 0, 2]
+    assert len(stores[0].list_pending("alarm")) == 2
+
+
+def test_reminder_engine_round_trip(tmp_path, monkeypatch):
+    from chapo_engines import reminder_engine as re_mod
+
+    monkeypatch.setattr(re_mod, "REMINDER_FILE", tmp_path / "missing.json")
+    monkeypatch.setattr(re_mod.notification, "notify", lambda **kw: None)
+    engine = re_mod.ReminderEngine(store=ScheduleStore(tmp_path / "s.db"))
+
+    async def run():
+        reply = await engine.handle_reminder("remind me to water plants in 15 minutes", {}, session_id="s1")
+        for t in engine.tasks:
+            t.cancel()
+        return reply
+
+    reply = asyncio.run(run())
+    assert "water plants" in reply
+    assert "water plants" in engine.list_reminders("s1")
+    assert engine.list_reminders("someone_else") == "🔕 No reminders set."
+    assert engine.delete_reminder("water plants") == "🗑️ Reminder deleted."
+    assert engine.reminders == []
+
+
+def test_reminders_are_only_deleted_by_their_own_session(tmp_path, monkeypatch):
+    from chapo_engines import reminder_engine as re_mod
+
+    monkeypatch.setattr(re_mod, "REMINDER_FILE", tmp_path / "missing.json")
+    store = ScheduleStore(tmp_path / "s.db")
+    engine = re_mod.ReminderEngine(store=store)
+    item_id = store.add("reminder", _in(30), session_id="alice", task="call mum")
+
+    assert engine.delete_reminder(str(item_id), "bob") == "⚠️ Reminder not found."
+    assert engine.delete_reminder("call mum", "bob") == "⚠️ Reminder not found."
+    assert len(store.list_pending("reminder")) == 1
+    assert engine.delete_reminder(item_id, "alice") == "🗑️ Reminder deleted."
+
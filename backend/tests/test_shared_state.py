@@ -0,0 +1,135 @@
+import asyncio
+import datetime
+import multiprocessing
+import time
+
+import pytest
+import pytz
+
+from chapo_engines.scheduler import LeaderScheduler
+from db.schedule_store import ScheduleStore
+from db.session_store import RedisSessionStore, SessionMemory, SessionStore
+
+BST = pytz.timezone("Europe/London")
+
+
+def _count_turns(path, n):
+    store = SessionStore(path)
+    for _ in range(n):
+        store.update("__global__", "turns", lambda total: (total or 0) + 1)
+
+
+def test_updates_from_several_processes_are_not_lost(tmp_path):
+    path = tmp_path / "sessions.db"
+    SessionStore(path)
+    workers = [multiprocessing.Process(target=_count_turns, args=(path, 50)) for _ in range(4)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(30)
+    assert SessionStore(path).get("__global__", "turns") == 200
+
+
+def test_session_memory_is_shared_and_expires(tmp_path):
+    worker_a = SessionMemory("memory", ttl_seconds=60, store=SessionStore(tmp_path / "s.db"))
+    worker_b = SessionMemory("memory", ttl_seconds=60, store=SessionStore(tmp_path / "s.db"))
+
+    worker_a.modify("alice", lambda r: {"data": {"task": "call mum"}})
+    worker_b.modify("alice", lambda r: {"data": {**r["data"], "datetime": "6pm"}})
+    assert worker_a["alice"]["data"] == {"task": "call mum", "datetime": "6pm"}
+    assert list(worker_a) == ["alice"] and "bob" not in worker_b
+
+    worker_a.store.conn.execute("UPDATE session_state SET updated_at = ?", (time.time() - 120,))
+    assert worker_b.get("alice") is None
+    worker_b.prune("alice")
+    assert worker_a.store.session_ids("memory") == []
+
+
+def test_one_leader_fires_each_alarm_once(tmp_path):
+    store_path = tmp_path / "schedules.db"
+    due = datetime.datetime.now(BST) - datetime.timedelta(seconds=1)
+    ids = [ScheduleStore(store_path).add("alarm", due, session_id=s) for s in ("alice", "bob")]
+    fired = []
+
+    async def fire(item):
+        fired.append(item["id"])
+
+    schedulers = [LeaderScheduler(ScheduleStore(store_path), holder=f"worker-{i}", lease_ttl=30) for i in range(4)]
+    for s in schedulers:
+        s.on("alarm", fire)
+
+    async def scenario():
+        for _ in range(3):
+            for s in schedulers:
+                await s.tick()
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert sorted(fired) == ids
+    assert [s.is_leader for s in schedulers] == [True, False, False, False]
+    # an alarm's own timer loses the race once the leader has claimed it
+    assert ScheduleStore(store_path).claim(ids[0]) is False
+
+
+def test_leadership_moves_when_the_lease_expires(tmp_path):
+    store = ScheduleStore(tmp_path / "schedules.db")
+    assert store.acquire_lease("scheduler", "a", ttl=5, now=100)
+    assert not store.acquire_lease("scheduler", "b", ttl=5, now=103)
+    assert store.acquire_lease("scheduler", "a", ttl=5, now=104)  # renewal
+    assert store.acquire_lease("scheduler", "b", ttl=5, now=110)
+    store.release_lease("scheduler", "b")
+    assert store.acquire_lease("scheduler", "c", ttl=5, now=111)
+
+
+def test_redis_store_matches_sqlite_store():
+    fakeredis = pytest.importorskip("fakeredis")
+    store = RedisSessionStore(fakeredis.FakeRedis())
+    memory = SessionMemory("memory", ttl_seconds=60, store=store)
+
+    memory.modify("alice", lambda r: {"data": {"task": "gym"}})
+    store.update("alice", "emotion", lambda s: {"current": "happy"})
+    assert memory["alice"] == {"data": {"task": "gym"}}
+    assert list(memory) == ["alice"]
+    store.delete("alice")
+    assert store.get("alice", "emotion") is None
+
+
+def test_periodic_jobs_run_on_the_leader_only(tmp_path):
+    store_path = tmp_path / "schedules.db"
+    runs = []
+    schedulers = [LeaderScheduler(ScheduleStore(store_path), holder=f"worker-{i}", lease_ttl=30) for i in range(3)]
+    for i, s in enumerate(schedulers):
+        s.every(60, lambda i=i: runs.append(i))
+
+    async def scenario():
+        for now in (1000.0, 1010.0, 1070.0):
+            for s in schedulers:
+                await s.tick(now)
+        await asyncio.sleep(0.1)  # jobs run in a thread
+
+    asyncio.run(scenario())
+    assert runs == [0, 0]  # at 1000 and again at 1070, never on a follower
+
+
+def test_fired_handlers_are_held_until_they_finish(tmp_path):
+    store_path = tmp_path / "schedules.db"
+    ScheduleStore(store_path).add("alarm", datetime.datetime.now(BST) - datetime.timedelta(seconds=1))
+    scheduler = LeaderScheduler(ScheduleStore(store_path), holder="worker-0", lease_ttl=30)
+    done = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def fire(item):
+            await release.wait()
+            done.append(item["id"])
+
+        scheduler.on("alarm", fire)
+        assert await scheduler.tick() == 1
+        await asyncio.sleep(0)
+        assert len(scheduler._running) == 1  # a strong reference while the handler waits
+        release.set()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert len(done) == 1 and not scheduler._running
@@ -0,0 +1,92 @@
+import sys
+import threading
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # backend.* imports
+
+from backend.api import shopping_list_routes  # noqa: E402
+from backend.services import shopping_list_service  # noqa: E402
+from chapo_engines.shopping_list_engine import ShoppingListEngine  # noqa: E402
+from db.shopping_list_store import ShoppingListStore  # noqa: E402
+
+
+def _engine(tmp_path, legacy=None):
+    return ShoppingListEngine(ShoppingListStore(tmp_path / "lists.db"), legacy_file=legacy or tmp_path / "none.json")
+
+
+def test_lists_are_per_owner_ordered_and_deduped(tmp_path):
+    engine = _engine(tmp_path)
+    assert engine.add_items(["Milk", "eggs", "milk ", "bread"], owner="alice") == "Added 3 item(s) to your shopping list."
+    engine.add_items("Eggs", owner="alice")
+    engine.add_items("tea", owner="bob")
+
+    assert engine.get_list("alice") == ["Milk", "eggs", "bread"]
+    assert engine.remove_item("MILK", owner="alice") == "Removed 'MILK' from your shopping list."
+    assert engine.remove_item("milk", owner="alice") == "'milk' not found in your shopping list."
+    engine.add_items("milk", owner="alice")
+    assert engine.get_list("alice") == ["eggs", "bread", "milk"]
+    assert engine.get_list("bob") == ["tea"]
+
+
+def test_changes_are_single_rows_and_visible_to_other_workers(tmp_path):
+    worker_a, worker_b = _engine(tmp_path), _engine(tmp_path)
+    worker_a.add_items(["milk", "eggs"], owner="home")
+    assert worker_b.get_list("home") == ["milk", "eggs"]  # b now holds a cached copy
+
+    worker_a.remove_item("milk", owner="home")
+    worker_a.add_items("jam", owner="home")
+    assert worker_b.add_items("JAM", owner="home") == "No new items added (already present)."
+    assert worker_b.get_list("home") == ["eggs", "jam"]
+
+    rows = worker_a.store.conn.execute("SELECT label FROM shopping_items WHERE owner = 'home' ORDER BY pos").fetchall()
+    assert [r["label"] for r in rows] == ["eggs", "jam"]
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "shopping_list.json"
+    legacy.write_text('["milk", "bread"]')
+    engine = _engine(tmp_path, legacy)
+    engine.clear_list()
+    assert _engine(tmp_path, legacy).get_list() == []
+
+
+def test_api_routes_use_the_callers_list(tmp_path, monkeypatch):
+    import asyncio
+
+    engine = _engine(tmp_path)
+    monkeypatch.setattr(shopping_list_service, "get_shopping_list_engine", lambda: engine)
+    app = FastAPI()
+    app.include_router(shopping_list_routes.router, prefix="/api")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://chapo") as client:
+            await client.post("/api/shopping-list/add", json={"items": "milk, eggs and bread", "user_id": "alice"})
+            await client.post("/api/shopping-list/remove", json={"item": "eggs", "user_id": "alice"})
+            alice = await client.get("/api/shopping-list", params={"user_id": "alice"})
+            default = await client.get("/api/shopping-list")
+            return alice.json(), default.json()
+
+    alice, default = asyncio.run(scenario())
+    assert alice == {"shopping_list": ["milk", "bread"]}
+    assert default == {"shopping_list": []}
+
+
+def test_workers_starting_together_import_the_legacy_list_once(tmp_path, monkeypatch):
+    legacy = tmp_path / "shopping_list.json"
+    legacy.write_text('["milk", "eggs"]')
+    # every worker passes the quick pre-check before any of them has committed
+    monkeypatch.setattr(ShoppingListStore, "has_migrated", lambda self, name: False)
+    stores = [ShoppingListStore(tmp_path / "lists.db") for _ in range(4)]
+    results = []
+    threads = [threading.Thread(target=lambda s=s: results.append(s.migrate_json("shopping_list.json", legacy, "x")))
+               for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [0, 0, 0, 2]
+    assert stores[0].items("x")[1] == [("milk", "milk"), ("eggs", "eggs")]
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from chapo_engines.stt_manager import STTConfig, STTManager
+
+
+class FakeWhisper:
+    loads = 0
+
+    def __init__(self, config):
+        FakeWhisper.loads += 1
+        time.sleep(0.05)  # "weights"
+        self.calls = []
+
+    def transcribe(self, audio):
+        self.calls.append((threading.current_thread().name, audio))
+        time.sleep(0.01)
+        return "hello chapo"
+
+
+def _manager():
+    FakeWhisper.loads = 0
+    return STTManager(STTConfig(model_size="tiny", compute="int8"), loader=FakeWhisper)
+
+
+def test_model_loads_once_across_threads():
+    stt = _manager()
+    threads = [threading.Thread(target=stt.transcribe, args=("clip.wav",)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert FakeWhisper.loads == 1
+    assert len(stt.model.calls) == 5
+    stt.shutdown()
+
+
+def test_warm_up_runs_silent_clip_and_times_load_separately():
+    stt = _manager()
+    stt.warm_up()
+    name, clip = stt.model.calls[0]
+    assert name.startswith("chapo-stt")
+    assert isinstance(clip, np.ndarray) and not clip.any()
+    stt.transcribe("clip.wav")
+    stats = stt.stats()
+    assert stats["load_ms"] >= 50
+    assert stats["utterances"] == 1          # warm-up isn't counted as an utterance
+    assert stats["p50_ms"] < stats["load_ms"]
+    stt.shutdown()
+
+
+def test_transcribe_async_keeps_event_loop_free():
+    stt = _manager()
+
+    async def scenario():
+        ticks = 0
+        task = asyncio.create_task(stt.transcribe_async("clip.wav"))
+        while not task.done():
+            ticks += 1
+            await asyncio.sleep(0.005)
+        return await task, ticks
+
+    text, ticks = asyncio.run(scenario())
+    assert text == "hello chapo"
+    assert ticks > 3   # loop kept running while the model loaded + transcribed
+    stt.shutdown()
@@ -0,0 +1,90 @@
+import asyncio
+import io
+import os
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from chapo_engines.stt_manager import STTConfig
+from chapo_engines.stt_pool import STTBusy, STTPool, decode_audio
+
+TEST_WAV = Path(__file__).resolve().parent.parent / "test.wav"
+
+
+class SlowFakeWhisper:
+    """Runs inside the worker process; 'transcribes' by reporting what it got."""
+
+    def __init__(self, config):
+        self.pid = os.getpid()
+
+    def transcribe(self, audio):
+        time.sleep(0.2)
+        return f"{self.pid}:{len(audio)}:{audio.dtype}"
+
+
+def _wav_bytes(rate, seconds, channels=1):
+    samples = (np.sin(np.arange(int(rate * seconds) * channels) / 10) * 8000).astype(np.int16)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+
+def test_decode_wav_in_memory_to_16k_mono():
+    audio = decode_audio(_wav_bytes(44100, 1.0, channels=2))
+    assert audio.dtype == np.float32
+    assert abs(len(audio) - 16000) <= 1
+    assert np.abs(audio).max() <= 1.0
+    assert len(decode_audio(TEST_WAV.read_bytes())) > 0
+
+
+@pytest.fixture
+def pool():
+    p = STTPool(STTConfig(model_size="tiny"), workers=1, max_pending=2, loader=SlowFakeWhisper)
+    p.start()
+    yield p
+    p.shutdown()
+
+
+def test_transcribes_in_worker_process(pool):
+    text = asyncio.run(pool.transcribe_async(_wav_bytes(16000, 0.5)))
+    pid, n, dtype = text.split(":")
+    assert int(pid) != os.getpid()
+    assert (int(n), dtype) == (8000, "float32")
+    assert pool.stats()["p50_ms"] >= 200
+
+
+def test_rejects_with_retry_after_when_saturated(pool):
+    clip = _wav_bytes(16000, 0.1)
+    futures = [pool.submit(clip), pool.submit(clip)]
+    with pytest.raises(STTBusy) as busy:
+        pool.submit(clip)
+    assert busy.value.retry_after >= 1
+    assert pool.stats()["rejected"] == 1
+    for f in futures:
+        f.result(timeout=10)
+    deadline = time.time() + 2
+    while pool.pending and time.time() < deadline:   # done-callbacks run just after result()
+        time.sleep(0.01)
+    assert pool.pending == 0
+    pool.submit(clip).result(timeout=10)   # accepted again once drained
+
+
+def test_defaults_to_one_worker_and_queues_behind_model_load(monkeypatch):
+    monkeypatch.delenv("CHAPO_STT_WORKERS", raising=False)
+    p = STTPool(STTConfig(model_size="tiny"), loader=SlowFakeWhisper)
+    assert p.workers == 1 and not p.ready
+    try:
+        future = p.submit(_wav_bytes(16000, 0.1))   # never waits for start()
+        assert not p.ready
+        assert future.result(timeout=30)[0].endswith(":1600:float32")
+        asyncio.run(p.start_async())
+        assert p.ready and p.stats()["ready"]
+    finally:
+        p.shutdown()
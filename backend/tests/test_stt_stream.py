@@ -0,0 +1,85 @@
+import threading
+import time
+from pathlib import Path
+
+from chapo_engines.stt_stream import (
+    FakeFileSTT, FakeStreamingSTT, IntentPrefetcher, Transcript, listen
+)
+from chapo_engines.voice_capture import EnergyVAD, WavFileSource
+
+TEST_WAV = Path(__file__).resolve().parent.parent / "test.wav"
+SCRIPT = "what time is it"
+
+
+def _classifier(delay=0.15):
+    calls = []
+    lock = threading.Lock()
+
+    def classify(text):
+        with lock:
+            calls.append((text, time.perf_counter()))
+        time.sleep(delay)
+        return "get_time", 0.95, {}
+
+    return classify, calls
+
+
+def _listen(stt, prefetcher):
+    return listen(WavFileSource(TEST_WAV, realtime=True), stt, prefetcher, vad=EnergyVAD())
+
+
+def test_streaming_prefetches_intent_before_speech_end():
+    classify, calls = _classifier()
+    prefetcher = IntentPrefetcher(classify)
+    turn = _listen(FakeStreamingSTT(SCRIPT, frames_per_word=3), prefetcher)
+
+    assert turn.text == SCRIPT
+    assert turn.intent() == ("get_time", 0.95, {})
+    # classification of the stable partial began while the user was still talking
+    assert calls[0][0] == SCRIPT and calls[0][1] < turn.speech_end
+    assert len(calls) == 1
+    assert turn.timings["intent_ms"] < 150
+
+
+def test_batch_backend_same_interface_no_prefetch():
+    classify, calls = _classifier()
+    prefetcher = IntentPrefetcher(classify)
+    turn = _listen(FakeFileSTT(SCRIPT, base_latency=0.1, per_audio_second=0.0), prefetcher)
+
+    assert turn.text == SCRIPT
+    assert turn.timings["final_ms"] >= 100
+    turn.intent()
+    assert calls[0][1] > turn.speech_end
+    assert turn.timings["intent_ms"] >= turn.timings["final_ms"] + 150
+
+
+def test_prefetch_waits_for_stable_partials_and_caches():
+    classify, calls = _classifier(delay=0)
+    prefetcher = IntentPrefetcher(classify, stable_after=2)
+    prefetcher.on_transcript(Transcript("what"))
+    prefetcher.on_transcript(Transcript("what time"))
+    assert calls == []                           # still changing
+    prefetcher.on_transcript(Transcript("what time"))
+    prefetcher.result("What time?")              # same text after normalisation
+    prefetcher.reset()
+    prefetcher.on_transcript(Transcript("what time", is_final=True))
+    assert [text for text, _ in calls] == ["what time"]
+
+
+def test_datetime_results_are_not_reused_by_a_later_turn():
+    answers = iter(["2025-09-01T10:10:00+01:00", "2025-09-01T11:30:00+01:00"])
+    calls = []
+
+    def classify(text):
+        calls.append(text)
+        return "set_reminder", 0.9, {"wit$datetime:datetime": [{"value": next(answers)}]}
+
+    prefetcher = IntentPrefetcher(classify)
+    prefetcher.reset()
+    prefetcher.on_transcript(Transcript("remind me in 10 minutes", is_final=True))
+    first = prefetcher.result("remind me in 10 minutes")  # same turn: the prefetch is reused
+    prefetcher.reset()
+    second = prefetcher.result("remind me in 10 minutes")
+    assert calls == ["remind me in 10 minutes"] * 2
+    assert first[2] != second[2]
+
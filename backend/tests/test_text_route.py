@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # backend.* imports
+
+from backend.main import app  # noqa: E402
+from backend.routers import text  # noqa: E402
+from chapo_engines.nlu_cascade import Prediction  # noqa: E402
+from chapo_engines.registry import engines  # noqa: E402
+from chapo_engines.shopping_list_engine import ShoppingListEngine  # noqa: E402
+from chapo_engines.tracing import tracer  # noqa: E402
+from db.shopping_list_store import ShoppingListStore  # noqa: E402
+
+
+def test_text_dispatches_through_the_intent_router(monkeypatch, tmp_path):
+    intents = {"what time is it": "time_now", "add milk and eggs to my shopping list": "add_to_shopping_list"}
+    monkeypatch.setattr(text, "get_intent", lambda s: Prediction(intents[s], 0.99, {}, stage="exact", confident=True))
+    engine = ShoppingListEngine(ShoppingListStore(tmp_path / "lists.db"), legacy_file=tmp_path / "none.json")
+    engines.provide("shopping_list", engine)
+    try:
+        client = TestClient(app)
+        resp = client.post("/text/", json={"user_input": "what time is it"})
+        assert resp.status_code == 200
+        assert resp.json()["intent"] == "time_now" and resp.json()["nlu_stage"] == "exact"
+
+        resp = client.post("/text/", json={"user_input": "add milk and eggs to my shopping list"})
+        assert resp.status_code == 200
+        assert resp.json()["response"] == "Added 2 item(s) to your shopping list."
+        assert client.post("/text/", json={"user_input": "  "}).status_code == 400
+    finally:
+        engines.register("shopping_list", "chapo_engines.shopping_list_engine:get_shopping_list_engine")
+
+
+def test_request_spans_are_named_by_route_template():
+    tracer.reset()
+    client = TestClient(app)
+    client.get("/health")
+    client.get("/no/such/page/12345")
+    client.get("/no/such/page/67890")
+    names = {name for name in tracer.stage_stats() if name.startswith("http ")}
+    assert names == {"http GET /health", "http GET unmatched"}
+    tracer.reset()
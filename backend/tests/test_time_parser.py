@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import dateparser
+import pytest
+
+from chapo_engines import time_parser
+from chapo_engines.time_parser import LONDON, fast_parse, fast_search, parse, search
+
+# what alarms, reminders and Wit entities say; every one must take a fast path
+CORPUS = [
+    "in 10 minutes", "in 5 mins", "in 2 hrs", "in an hour", "in a minute", "in 30 secs", "in 90 seconds",
+    "In 15 Minutes", "at 7 am", "at 7am", "7 pm", "7pm", "at 19:00", "at 0:15", "at 12 am", "at 12 pm",
+    "at 9:30pm", "9:30 pm", "at 7 a.m.", "7 A.M.", "at 23:59", "at 7 am.", "tomorrow at 3 pm", "tomorrow 3pm",
+    "Tomorrow at 3 PM", "tomorrow at 15:00", "tomorrow at 7:45 am", "friday at 3 pm", "on friday at 3 pm",
+    "monday at 9:30 am", "sunday 10am", "on saturday at 18:30", "Wednesday at 8 p.m.",
+    "2025-08-29T19:00:00.000+01:00", "2025-08-29T19:00:00Z", "2025-12-01T07:00:00",
+]
+
+
+def _london(*args):
+    return LONDON.localize(datetime(*args))
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_fast_paths_agree_with_dateparser(text):
+    expected = dateparser.parse(text, settings=time_parser.PARSE_SETTINGS)
+    got = fast_parse(text)
+    assert got is not None
+    assert abs((got - expected).total_seconds()) < 2 and got.utcoffset() == expected.utcoffset()
+
+
+def test_reference_time_rules():
+    friday = _london(2025, 8, 29, 14, 30, 20)
+    assert fast_parse("at 3 pm", friday) == _london(2025, 8, 29, 15, 0)
+    assert fast_parse("at 2:30 pm", friday) == _london(2025, 8, 30, 14, 30)  # passed -> tomorrow
+    assert fast_parse("friday at 4 pm", friday) == _london(2025, 9, 5, 16, 0)  # same weekday -> next week
+    assert fast_parse("in 20 minutes", friday) == _london(2025, 8, 29, 14, 50, 20)
+    # clocks go back on 2025-10-26
+    saturday = _london(2025, 10, 25, 23, 50)
+    assert fast_parse("tomorrow at 3 pm", saturday).utcoffset().total_seconds() == 0
+    later = fast_parse("in 3 hours", saturday)
+    assert (later - saturday).total_seconds() == 3 * 3600
+    assert later.strftime("%H:%M %Z") == "01:50 GMT"  # 3 elapsed hours, not 3 on the wall clock
+
+
+def test_other_forms_fall_back_to_dateparser_once_a_minute(monkeypatch):
+    calls = []
+    monkeypatch.setattr(dateparser, "parse", lambda text, settings=None: calls.append(text))
+    time_parser.clear_cache()
+    for text in ["at 7", "set an alarm for 7 am", "at 7", "set an alarm for 7 am"]:
+        assert fast_parse(text) is None and parse(text) is None
+    assert calls == ["at 7", "set an alarm for 7 am"]
+    assert parse("in 10 minutes") is not None and len(calls) == 2
+
+
+def test_search_finds_a_lone_expression_in_a_sentence():
+    monday = _london(2025, 9, 1, 9, 0)
+    assert fast_search("add meeting on friday at 10 am to my calendar", monday) == (
+        "on friday at 10 am", _london(2025, 9, 5, 10, 0))
+    assert search("add dentist to my calendar tomorrow at 3 pm", monday) == [
+        ("tomorrow at 3 pm", _london(2025, 9, 2, 15, 0))]
+    # a date the fast paths don't cover is left to dateparser
+    assert fast_search("add call on 5 june at 3 pm", monday) is None
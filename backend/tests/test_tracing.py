@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import pytest
+
+from chapo_engines import tracing
+from chapo_engines.tracing import FileExporter, prometheus_text, span, traced, tracer
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, s):
+        self.spans.append(s)
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    exporter = ListExporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    tracer.reset()
+    yield exporter.spans
+    tracer.reset()
+
+
+def test_spans_nest_across_await_and_threads(exported):
+    @traced("engine")
+    def engine():
+        with span("db"):
+            pass
+
+    @traced("handle")
+    async def handle():
+        await asyncio.sleep(0)
+        await asyncio.to_thread(engine)
+
+    async def turn():
+        with span("turn"):
+            await asyncio.gather(handle(), handle())
+
+    asyncio.run(turn())
+
+    by_id = {s.span_id: s for s in exported}
+    root = next(s for s in exported if s.name == "turn")
+    assert root.parent_span_id is None
+    for s in exported:
+        assert s.trace_id == root.trace_id
+    for s in (s for s in exported if s.name == "db"):
+        assert by_id[s.parent_span_id].name == "engine"
+        assert by_id[by_id[s.parent_span_id].parent_span_id].name == "handle"
+    assert tracing.current_span() is None
+
+
+def test_error_status_and_stage_percentiles(exported):
+    with pytest.raises(ValueError):
+        with span("wit.intent"):
+            raise ValueError("timeout")
+    assert exported[0].to_otel()["status"]["code"] == "STATUS_CODE_ERROR"
+
+    for ms in range(1, 101):
+        s = tracer.start_span("stage")
+        s._start -= ms / 1000
+        s.end()
+    stats = tracer.stage_stats()["stage"]
+    assert stats["count"] == 100
+    assert 50 <= stats["p50_ms"] <= 52
+    assert 95 <= stats["p95_ms"] <= 97
+    assert 99 <= stats["p99_ms"] <= 101
+
+
+def test_prometheus_text_and_file_export(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracer, "exporter", FileExporter(path))
+    tracer.reset()
+    with span("engine.weather", city="Paris"):
+        pass
+    tracer.exporter.flush()
+
+    record = json.loads(path.read_text().strip())
+    assert record["name"] == "engine.weather"
+    assert record["endTimeUnixNano"] >= record["startTimeUnixNano"]
+    assert {"key": "city", "value": {"stringValue": "Paris"}} in record["attributes"]
+
+    text = prometheus_text()
+    assert "# TYPE chapo_stage_duration_seconds summary" in text
+    assert 'chapo_stage_duration_seconds{stage="engine.weather",quantile="0.95"}' in text
+    assert 'chapo_stage_duration_seconds_count{stage="engine.weather"} 1' in text
+    tracer.reset()
@@ -0,0 +1,94 @@
+import json
+import os
+import random
+
+from chapo_engines import trivia_engine
+from chapo_engines.trivia_engine import TriviaBank, ask_trivia_question, check_trivia_answer
+
+QUESTIONS = [
+    {"question": f"Q{i}?", "options": [f"w{i}", f"Right {i}", "x", "y"], "answer": f"Right {i}",
+     "category": "science" if i % 2 else "history", "difficulty": "hard" if i < 3 else "easy"}
+    for i in range(6)
+]
+
+
+def _bank(tmp_path, monkeypatch, questions=QUESTIONS):
+    path = tmp_path / "trivia.json"
+    path.write_text(json.dumps(questions))
+    bank = TriviaBank(path)
+    monkeypatch.setattr(trivia_engine, "_bank", bank)
+    return bank, path
+
+
+def _asked(session_memory, session_id="s"):
+    return session_memory[session_id]["pending_trivia_answer"]["question"]
+
+
+def test_sessions_hear_every_question_once_per_round(tmp_path, monkeypatch):
+    _bank(tmp_path, monkeypatch)
+    memory = {}
+    for session_id in ("a", "b"):
+        first_round = []
+        for _ in QUESTIONS:
+            ask_trivia_question(session_id, memory)
+            first_round.append(_asked(memory, session_id))
+        assert sorted(first_round) == sorted(q["question"] for q in QUESTIONS)
+    ask_trivia_question("a", memory)  # a finished deck is reshuffled
+    assert memory["a"]["trivia_deck"]["pos"] == 1
+    json.dumps(memory)  # the deck stays storable in the shared session store
+
+
+def test_lazy_deck_is_a_uniform_permutation(tmp_path, monkeypatch):
+    bank, _ = _bank(tmp_path, monkeypatch)
+    rng = random.Random(7)
+    firsts = [0] * len(QUESTIONS)
+    for _ in range(3000):
+        deck = {}
+        order = [bank.draw(deck, rng=rng).id for _ in QUESTIONS]
+        assert sorted(order) == list(range(len(QUESTIONS)))
+        assert len(deck["swaps"]) <= len(QUESTIONS)
+        firsts[order[0]] += 1
+    assert min(firsts) > 400  # ~500 each
+
+
+def test_category_and_difficulty_filters(tmp_path, monkeypatch):
+    bank, _ = _bank(tmp_path, monkeypatch)
+    assert bank.pool("Science") == (1, 3, 5)
+    assert bank.pool(difficulty="hard") == (0, 1, 2)
+    assert bank.pool("science", "hard") == (1,)
+    memory = {}
+    asked = set()
+    for _ in range(3):
+        ask_trivia_question("s", memory, category="science")
+        asked.add(_asked(memory))
+    assert asked == {"Q1?", "Q3?", "Q5?"}
+    assert ask_trivia_question("s", memory, category="sport") == "❗ No trivia questions are available."
+
+
+def test_answers_match_by_text_letter_or_phrase(tmp_path, monkeypatch):
+    _bank(tmp_path, monkeypatch)
+    memory = {}
+    for reply, right in [("right 0", True), ("B", True), ("b. Right", True), ("I think it's right 0", True),
+                         ("a", False), ("w0", False), ("", False)]:
+        monkeypatch.setattr(trivia_engine.random, "randrange", lambda lo, hi: lo)  # always Q0
+        memory.pop("s", None)
+        ask_trivia_question("s", memory)
+        feedback = check_trivia_answer(reply, "s", memory)
+        assert feedback.startswith("🎉") == right, reply
+        assert "pending_trivia_answer" not in memory["s"]
+    assert "Right 0" in feedback
+
+
+def test_bank_reloads_when_the_file_changes(tmp_path, monkeypatch):
+    bank, path = _bank(tmp_path, monkeypatch)
+    memory = {}
+    ask_trivia_question("s", memory)
+    pending = memory["s"]["pending_trivia_answer"]
+
+    path.write_text(json.dumps(QUESTIONS[:1]))
+    os.utime(path, ns=(bank.version + 10 ** 9, bank.version + 10 ** 9))
+    assert len(bank.refresh().questions) == 1
+    # a question asked before the reload is still graded against what was asked
+    assert check_trivia_answer(pending["answer"], "s", memory).startswith("🎉")
+    ask_trivia_question("s", memory)
+    assert _asked(memory) == "Q0?" and memory["s"]["trivia_deck"]["version"] == bank.version
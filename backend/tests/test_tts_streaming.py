@@ -0,0 +1,90 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from chapo_engines.audio_service import (
+    AudioService, PcmRingBuffer, pcm_to_mixer, MIXER_CHANNELS, MIXER_FREQUENCY
+)
+from chapo_engines.tts_cache import TTSCache, cache_key
+
+RATE = 22050
+
+
+def fake_tts_stream(seconds=1.0, chunks=10, first_delay=0.05, chunk_delay=0.05):
+    """Stands in for ElevenLabs convert(): PCM chunks trickling in over the network."""
+    total = int(RATE * seconds)
+    pcm = (np.sin(np.arange(total) / 8) * 6000).astype(np.int16).tobytes()
+    step = len(pcm) // chunks
+    time.sleep(first_delay)
+    for i in range(chunks):
+        yield pcm[i * step:(i + 1) * step]
+        time.sleep(chunk_delay)
+
+
+@pytest.fixture
+def audio():
+    service = AudioService(driver="dummy")
+    yield service
+    service.shutdown()
+
+
+def test_ring_buffer_wraps_and_closes():
+    ring = PcmRingBuffer(8)
+    ring.write(b"abcdef")
+    assert ring.read(4) == b"abcd"
+    ring.write(b"ghijk")          # wraps around the end
+    assert ring.read(10) == b"efghij"
+    assert ring.read(10, timeout=0.01) == b""   # half a sample: held back
+    ring.close()
+    assert ring.read(10) == b"k"  # a closed stream's tail comes out as is
+    assert ring.read(4) is None
+
+
+def test_odd_sized_chunks_keep_samples_aligned():
+    samples = (np.sin(np.arange(5000) / 8) * 6000).astype(np.int16)
+    pcm = samples.tobytes()
+    chunks, i, size = [], 0, 1
+    while i < len(pcm):
+        chunks.append(pcm[i:i + size])
+        i += size
+        size = size + 2 if size < 301 else 1   # odd lengths only
+    ring = PcmRingBuffer(1000)
+    feeder = threading.Thread(target=lambda: ([ring.write(c) for c in chunks], ring.close()))
+    feeder.start()
+    blocks = []
+    while (block := ring.read(441, timeout=1)) is not None:
+        assert len(block) % 2 == 0
+        blocks.append(block)
+    feeder.join()
+    assert np.array_equal(np.frombuffer(b"".join(blocks), dtype=np.int16), samples)
+
+
+def test_pcm_to_mixer_resamples_and_duplicates_channels():
+    mono = np.arange(100, dtype=np.int16).tobytes()
+    out = np.frombuffer(pcm_to_mixer(mono, RATE), dtype=np.int16)
+    assert len(out) == int(100 * MIXER_FREQUENCY / RATE) * MIXER_CHANNELS
+
+
+def test_stream_starts_before_download_finishes(audio):
+    audio.start()
+    job = audio.submit_stream(fake_tts_stream(chunk_delay=0.1), RATE)
+    assert job.wait(5)
+    assert job.error is None
+    # 10 chunks at 100 ms each: a buffered player could not start before ~1 s
+    assert job.time_to_first_audio < 0.5
+
+
+def test_tts_cache_lru_eviction(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=10)
+    a = cache_key("Goodbye!", "v", "m", "pcm_22050")
+    b = cache_key("I didn't catch anything.", "v", "m", "pcm_22050")
+    c = cache_key("Hello!", "v", "m", "pcm_22050")
+    cache.put(a, b"aaaa")
+    cache.put(b, b"bbbb")
+    assert cache.get(a) == b"aaaa"   # a is now most recent
+    cache.put(c, b"cccc")            # over budget -> evicts b
+    assert b not in cache and a in cache and c in cache
+    # recency survives a restart
+    assert len(TTSCache(tmp_path, max_bytes=10)) == 2
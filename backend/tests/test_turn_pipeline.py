@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+from chapo_engines.turn_pipeline import (
+    BackgroundWriter, EndSession, ReplayListener, TurnPipeline, replay_speak
+)
+
+DELAY = 0.1
+
+
+def slow_nlu(text):
+    time.sleep(DELAY)
+    return "greeting", 0.9, {}
+
+
+def slow_emotion(text):
+    time.sleep(DELAY)
+    return "happy"
+
+
+def slow_spacy(text):
+    time.sleep(DELAY)
+    return {"gpe": ["Paris"]}
+
+
+def _pipeline(texts, handle, speak=None, writer=None):
+    spoken = []
+    speak = speak or replay_speak()
+
+    def _speak(text):
+        spoken.append(text)
+        return speak(text)
+
+    pipeline = TurnPipeline(
+        listen=ReplayListener(texts, nlu=slow_nlu), handle=handle, speak=_speak,
+        nlu=lambda turn: turn.intent(), emotion=slow_emotion, spacy=slow_spacy,
+        writer=writer, verbose=False,
+    )
+    return pipeline, spoken
+
+
+def test_understanding_stages_run_concurrently():
+    seen = []
+
+    async def handle(turn, understanding, session_id, timer):
+        if turn.text == "exit":
+            raise EndSession("Goodbye!")
+        u = await understanding
+        seen.append((u.intent, u.emotion, u.spacy_entities))
+        return "Hello!"
+
+    pipeline, spoken = _pipeline(["hi there"], handle)
+    asyncio.run(pipeline.run("s1"))
+
+    assert seen == [("greeting", "happy", {"gpe": ["Paris"]})]
+    assert spoken == ["Hello!", "Goodbye!"]
+    stats = pipeline.stats.report()
+    assert stats["understand"]["p50_ms"] < 2 * DELAY * 1000   # not 3 x DELAY back to back
+    assert stats["nlu"]["p50_ms"] >= DELAY * 1000
+
+
+def test_fast_paths_do_not_wait_for_nlu():
+    async def handle(turn, understanding, session_id, timer):
+        if turn.text == "exit":
+            raise EndSession()
+        if "volume" in turn.text:
+            return "Volume muted."
+        await understanding
+        return "ok"
+
+    pipeline, spoken = _pipeline(["volume mute"], handle)
+    asyncio.run(pipeline.run("s1"))
+    assert spoken == ["Volume muted."]
+    assert pipeline.stats.report()["handle"]["p50_ms"] < DELAY * 1000
+
+
+def test_barge_in_stops_playback_and_capture_is_rearmed():
+    jobs = []
+    speak = replay_speak(seconds_per_char=0.05)
+
+    def tracking_speak(text):
+        job = speak(text)
+        jobs.append(job)
+        return job
+
+    async def handle(turn, understanding, session_id, timer):
+        if turn.text == "exit":
+            raise EndSession()
+        return "a long answer that would play for a couple of seconds"
+
+    pipeline, _ = _pipeline(["first", "second"], handle, speak=tracking_speak)
+    started = time.perf_counter()
+    asyncio.run(pipeline.run("s1"))
+    assert time.perf_counter() - started < 1.5       # never waited for a full playback
+    assert jobs[0].preempted                          # cut off when "second" started
+    assert jobs[0].done.wait(1)
+
+
+def test_logging_stays_off_the_critical_path():
+    writer = BackgroundWriter()
+    written = []
+
+    def slow_log(text):
+        time.sleep(0.2)
+        written.append(text)
+
+    async def handle(turn, understanding, session_id, timer):
+        if turn.text == "exit":
+            raise EndSession()
+        writer.submit(slow_log, turn.text)
+        return None
+
+    pipeline, _ = _pipeline(["one", "two", "three"], handle, writer=writer)
+    started = time.perf_counter()
+    asyncio.run(pipeline.run_turn("s1"))
+    asyncio.run(pipeline.run_turn("s1"))
+    assert time.perf_counter() - started < 0.2
+    writer.flush()
+    assert written == ["one", "two"]
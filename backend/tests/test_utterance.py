@@ -0,0 +1,41 @@
+import json
+import pickle
+
+import pytest
+
+from chapo_engines.core_conversation_engine import CoreConversationEngine
+from chapo_engines.emotion_detector_engine import EmotionDetectorEngine
+from chapo_engines.nlu_cascade import clean_utterance
+from chapo_engines.shopping_list_engine import extract_items_from_text
+from chapo_engines.turn_pipeline import ReplayTurn
+from chapo_engines.utterance import Utterance
+
+
+def test_forms_are_computed_once_and_immutable():
+    u = Utterance("  Add milk, eggs & BREAD please!  ")
+    assert u == "  Add milk, eggs & BREAD please!  " and u.raw == u and type(u.raw) is str
+    assert u.lowered == "add milk, eggs & bread please!"
+    assert u.cleaned == "add milk eggs  bread please"
+    assert u.tokens == ("add", "milk", "eggs", "bread", "please")
+    assert {"milk", "bread"} <= u.token_set
+    assert u.ngrams(2)[:2] == ("add milk", "milk eggs") and u.ngrams(2) is u.ngrams(2)
+    assert Utterance.of(u) is u
+
+    with pytest.raises(AttributeError):
+        u.cleaned = "changed"
+    assert json.loads(json.dumps({"user_input": u})) == {"user_input": u.raw}
+    assert pickle.loads(pickle.dumps(u)).tokens == u.tokens
+
+
+@pytest.mark.parametrize("text", ["I'm so SAD today", "Hello, how are you?", "Add Milk and eggs to my shopping list"])
+def test_consumers_give_the_same_answer_for_str_and_utterance(text):
+    u = Utterance(text)
+    assert EmotionDetectorEngine().detect_emotion(u) == EmotionDetectorEngine().detect_emotion(text)
+    assert CoreConversationEngine().detect_intent(u) == CoreConversationEngine().detect_intent(text)
+    assert extract_items_from_text(u) == extract_items_from_text(text)
+    assert clean_utterance(u) == clean_utterance(text)
+
+
+def test_turns_carry_one_utterance():
+    turn = ReplayTurn("What's the weather?", nlu=lambda text: (None, 0.0, {}))
+    assert isinstance(turn.text, Utterance) and turn.text.cleaned == "whats the weather"
@@ -0,0 +1,59 @@
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from chapo_engines.voice_capture import (
+    CapturedAudio, EnergyVAD, WavFileSource, capture_utterance
+)
+
+TEST_WAV = Path(__file__).resolve().parent.parent / "test.wav"
+RATE = 16000
+
+
+def _write_wav(path, samples):
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(samples.astype(np.int16).tobytes())
+    return path
+
+
+def _tone(seconds, amplitude=8000):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return amplitude * np.sin(2 * np.pi * 220 * t)
+
+
+def _quiet(seconds):
+    return np.random.default_rng(0).normal(0, 20, int(RATE * seconds))
+
+
+def test_recorded_clip_ends_well_before_fixed_window():
+    audio = capture_utterance(WavFileSource(TEST_WAV), vad=EnergyVAD())
+    assert isinstance(audio, CapturedAudio)
+    assert audio
+    assert 0.3 < audio.duration < 5.0
+    assert audio.to_float32().dtype == np.float32
+
+
+def test_keeps_pre_roll_and_stops_on_trailing_silence(tmp_path):
+    samples = np.concatenate([_quiet(1.0), _tone(1.0), _quiet(3.0)])
+    wav = _write_wav(tmp_path / "speech.wav", samples)
+    audio = capture_utterance(WavFileSource(wav), vad=EnergyVAD(), pre_roll_ms=300, silence_ms=600)
+    # ~0.3 s pre-roll + 1 s speech + 0.6 s trailing silence, not the 5 s file
+    assert 1.6 <= audio.duration <= 2.1
+    assert audio.speech_ms >= 900
+
+
+def test_no_speech_times_out_empty(tmp_path):
+    wav = _write_wav(tmp_path / "silence.wav", _quiet(3.0))
+    audio = capture_utterance(WavFileSource(wav), vad=EnergyVAD(), no_speech_timeout_ms=1000)
+    assert not audio
+    assert audio.duration == 0
+
+
+def test_max_length_caps_long_speech(tmp_path):
+    wav = _write_wav(tmp_path / "long.wav", _tone(6.0))
+    audio = capture_utterance(WavFileSource(wav), vad=EnergyVAD(), max_ms=2000)
+    assert 1.9 <= audio.duration <= 2.0 + 0.03  # cap is checked per 30 ms frame
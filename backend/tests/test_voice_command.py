@@ -0,0 +1,63 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # backend.* imports
+
+from backend.routers import voice_command as voice_command_router  # noqa: E402
+from backend.services import voice_command  # noqa: E402
+from db.session_store import SessionStore  # noqa: E402
+
+
+def _setup(monkeypatch, respond_async):
+    store = SessionStore(":memory:")
+    monkeypatch.setattr(voice_command, "get_session_store", lambda: store)
+    monkeypatch.setattr(voice_command, "get_intent", lambda text: ("greeting", 0.9, {}))
+    monkeypatch.setattr(voice_command, "respond_async", respond_async)
+    app = FastAPI()
+    app.include_router(voice_command_router.router)
+    return store, httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://chapo")
+
+
+def test_emotion_state_is_per_session(monkeypatch):
+    async def respond_async(intent, entities, session_id, text, emotion):
+        return f"{session_id}:{emotion}"
+
+    store, client = _setup(monkeypatch, respond_async)
+
+    async def scenario():
+        async with client:
+            sad = await client.post("/voice-command", json={"text": "I feel so sad", "session_id": "alice"})
+            happy = await client.post("/voice-command", json={"text": "I'm happy today", "session_id": "bob"})
+            return sad.json(), happy.json()
+
+    sad, happy = asyncio.run(scenario())
+    assert sad["emotion"] == "sad" and sad["response"] == "alice:sad"
+    assert happy["emotion"] == "happy"
+    assert store.get("alice", "emotion")["history"] == ["sad"]
+    assert store.get("bob", "emotion")["current"] == "happy"
+
+
+def test_tasks_scheduled_by_a_request_outlive_it(monkeypatch):
+    fired = []
+
+    async def respond_async(intent, entities, session_id, text, emotion):
+        async def alarm():
+            await asyncio.sleep(0.05)
+            fired.append(session_id)
+        asyncio.create_task(alarm())
+        return "Alarm set in 0 seconds"
+
+    _, client = _setup(monkeypatch, respond_async)
+
+    async def scenario():
+        async with client:
+            resp = await client.post("/voice-command", json={"text": "wake me up", "session_id": "carol"})
+            assert resp.status_code == 200 and fired == []
+            await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert fired == ["carol"]